@@ -16,6 +16,11 @@ except ImportError:
     ldap = None
 
 from reviewboard.accounts.backends.base import BaseAuthBackend
+from reviewboard.accounts.backends.credential_cache import (
+    cache_login,
+    get_cached_login,
+    invalidate_cached_login)
+from reviewboard.accounts.backends.ldap_pool import get_ldap_connection_pool
 from reviewboard.accounts.forms.auth import ActiveDirectorySettingsForm
 
 
@@ -284,6 +289,24 @@ class ActiveDirectoryBackend(BaseAuthBackend):
             tuple of (unicode, ldap.LDAPObject):
             The connections to the configured LDAP servers.
         """
+        for ldap_uri in self._get_domain_controller_uris(userdomain):
+            connection = self._connect(ldap_uri, userdomain)
+
+            if connection is not None:
+                yield ldap_uri, connection
+
+    def _get_domain_controller_uris(self, userdomain=None):
+        """Return the URIs of the domain controllers to connect to.
+
+        Args:
+            userdomain (unicode, optional):
+                An explicit domain used to find domain controllers. If not
+                provided, :py:meth:`get_domain_name` will be used.
+
+        Returns:
+            list of unicode:
+            The LDAP URIs of the domain controllers.
+        """
         if settings.AD_FIND_DC_FROM_DNS:
             dcs = self.find_domain_controllers_from_dns(userdomain)
         else:
@@ -298,32 +321,73 @@ class ActiveDirectoryBackend(BaseAuthBackend):
 
                 dcs.append([port, host])
 
-        for dc in dcs:
-            port, host = dc
-            ldap_uri = 'ldap://%s:%s' % (host, port)
-            connection = ldap.initialize(ldap_uri)
-
-            if settings.AD_USE_TLS:
-                try:
-                    connection.start_tls_s()
-                except ldap.UNAVAILABLE:
-                    logger.warning('Domain controller "%s:%d" for domain "%s" '
-                                   'unavailable',
-                                   host, int(port), userdomain)
-                    continue
-                except ldap.CONNECT_ERROR:
-                    logger.warning('Could not connect to domain controller '
-                                   '"%s:%d" for domain "%s". The certificate '
-                                   'may not be verifiable.',
-                                   host, int(port), userdomain)
-                    continue
-
-            connection.set_option(ldap.OPT_REFERRALS, 0)
-            yield ldap_uri, connection
+        return [
+            'ldap://%s:%s' % (host, port)
+            for port, host in dcs
+        ]
+
+    def _connect(self, ldap_uri, userdomain=None):
+        """Open a connection to a domain controller.
+
+        Args:
+            ldap_uri (unicode):
+                The LDAP URI of the domain controller.
+
+            userdomain (unicode, optional):
+                The domain being authenticated against, for logging.
+
+        Returns:
+            ldap.LDAPObject:
+            The connection, or ``None`` if the domain controller could not
+            be reached.
+        """
+        connection = ldap.initialize(ldap_uri)
+
+        if settings.AD_USE_TLS:
+            try:
+                connection.start_tls_s()
+            except ldap.UNAVAILABLE:
+                logger.warning('Domain controller "%s" for domain "%s" '
+                               'unavailable',
+                               ldap_uri, userdomain)
+                return None
+            except ldap.CONNECT_ERROR:
+                logger.warning('Could not connect to domain controller '
+                               '"%s" for domain "%s". The certificate '
+                               'may not be verifiable.',
+                               ldap_uri, userdomain)
+                return None
+
+        connection.set_option(ldap.OPT_REFERRALS, 0)
+
+        return connection
+
+    def _get_connection_pool(self, ldap_uri):
+        """Return the pool of connections to a domain controller.
+
+        Connections in the pool aren't bound to any particular user. Each
+        login binds as the user logging in.
+
+        Args:
+            ldap_uri (unicode):
+                The LDAP URI of the domain controller.
+
+        Returns:
+            reviewboard.accounts.backends.ldap_pool.LDAPConnectionPool:
+            The connection pool.
+        """
+        return get_ldap_connection_pool(
+            'ad-%s' % ldap_uri,
+            (settings.AD_USE_TLS,),
+            lambda: self._connect(ldap_uri))
 
     def authenticate(self, username, password, **kwargs):
         """Authenticate a user against Active Directory.
 
+        Successful logins are remembered for a short time (see
+        :py:mod:`~reviewboard.accounts.backends.credential_cache`), and
+        connections to domain controllers are reused between logins.
+
         Args:
             username (unicode):
                 The username to authenticate.
@@ -347,6 +411,12 @@ class ActiveDirectoryBackend(BaseAuthBackend):
                          username)
             return None
 
+        login_username = username
+        user = get_cached_login(self.backend_id, login_username, password)
+
+        if user is not None:
+            return user
+
         user_subdomain = ''
 
         if '@' in username:
@@ -373,47 +443,61 @@ class ActiveDirectoryBackend(BaseAuthBackend):
             user_subdomain = user_subdomain.encode('utf-8')
 
         if isinstance(password, six.text_type):
-            password = password.encode('utf-8')
+            password_bytes = password.encode('utf-8')
+        else:
+            password_bytes = password
 
-        for uri, connection in self.get_ldap_connections(userdomain):
+        for uri in self._get_domain_controller_uris(userdomain):
             try:
-                bind_username = b'%s@%s' % (username_bytes, userdomain)
-                connection.simple_bind_s(bind_username, password)
-                user_data = self.search_ad(
-                    connection,
-                    filter_format('(&(objectClass=user)(sAMAccountName=%s))',
-                                  (username_bytes,)),
-                    userdomain)
-
-                if not user_data:
-                    return None
-
-                if required_group:
-                    try:
-                        group_names = self.get_member_of(connection, user_data)
-                    except Exception as e:
-                        logger.error('Unable to retrieve groups for user '
-                                     '"%s" from controller "%s": %s',
-                                     username, uri, e, exc_info=1)
-                        return None
+                with self._get_connection_pool(uri).connection() as connection:
+                    if connection is None:
+                        continue
+
+                    bind_username = b'%s@%s' % (username_bytes, userdomain)
+                    connection.simple_bind_s(bind_username, password_bytes)
+                    user_data = self.search_ad(
+                        connection,
+                        filter_format(
+                            '(&(objectClass=user)(sAMAccountName=%s))',
+                            (username_bytes,)),
+                        userdomain)
 
-                    if required_group not in group_names:
-                        logger.warning('User %s is not in required group "%s" '
-                                       'on controller "%s"',
-                                       username, required_group, uri)
+                    if not user_data:
                         return None
 
-                return self.get_or_create_user(username=username,
-                                               request=None,
-                                               ad_user_data=user_data)
+                    if required_group:
+                        try:
+                            group_names = self.get_member_of(connection,
+                                                             user_data)
+                        except Exception as e:
+                            logger.error('Unable to retrieve groups for user '
+                                         '"%s" from controller "%s": %s',
+                                         username, uri, e, exc_info=1)
+                            return None
+
+                        if required_group not in group_names:
+                            logger.warning('User %s is not in required group '
+                                           '"%s" on controller "%s"',
+                                           username, required_group, uri)
+                            return None
+
+                    user = self.get_or_create_user(username=username,
+                                                   request=None,
+                                                   ad_user_data=user_data)
             except ldap.SERVER_DOWN:
                 logger.warning('domain controller "%s" is down', uri)
                 continue
             except ldap.INVALID_CREDENTIALS:
                 logger.warning('Failed login for user "%s" on controller "%s"',
                                username, uri)
+                invalidate_cached_login(self.backend_id, login_username)
                 return None
 
+            if user is not None:
+                cache_login(self.backend_id, login_username, password, user)
+
+            return user
+
         logger.error('Could not contact any domain controller servers')
 
         return None
@@ -0,0 +1,183 @@
+"""Short-lived caching of verified logins for directory backends.
+
+Backends that verify passwords against a directory server, such as LDAP or
+Active Directory, need several round trips to that server for every login.
+Clients using HTTP Basic authentication with the API log in on every
+request.
+
+After a successful login, these backends remember it for a short time,
+controlled by the ``LDAP_AUTH_CACHE_SECONDS`` setting. The password itself
+is never stored. The cache holds a salted PBKDF2 hash of it (keyed with the
+server's secret key), which later login attempts are compared against.
+
+A cached login stops being accepted when it expires, when a login attempt
+for that username is rejected by the server, when a different password is
+accepted for it, or when the local user account's password or active state
+changes.
+"""
+
+from __future__ import unicode_literals
+
+import binascii
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import six
+from django.utils.crypto import (constant_time_compare, get_random_string,
+                                 pbkdf2)
+from djblets.cache.backend import make_cache_key
+
+
+_PASSWORD_HASH_ITERATIONS = 10000
+
+
+def _make_cache_key(backend_id, username):
+    """Return the cache key for a cached login.
+
+    Args:
+        backend_id (unicode):
+            The ID of the authentication backend.
+
+        username (unicode):
+            The username used to log in.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    if isinstance(username, six.text_type):
+        username = username.encode('utf-8')
+
+    return make_cache_key('auth-login-%s-%s'
+                          % (backend_id, hashlib.sha256(username).hexdigest()))
+
+
+def _hash_password(password, salt):
+    """Return the hash of a password for storage in the cache.
+
+    Args:
+        password (unicode or bytes):
+            The password to hash.
+
+        salt (unicode):
+            The random salt for the cached login.
+
+    Returns:
+        bytes:
+        The hex-encoded hash.
+    """
+    if isinstance(password, six.text_type):
+        password = password.encode('utf-8')
+
+    return binascii.hexlify(pbkdf2(password, salt + settings.SECRET_KEY,
+                                   _PASSWORD_HASH_ITERATIONS,
+                                   digest=hashlib.sha256))
+
+
+def _get_user_fingerprint(user):
+    """Return a fingerprint of the local state of a user account.
+
+    This changes when the user's local password or active state changes.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user.
+
+    Returns:
+        unicode:
+        The fingerprint.
+    """
+    state = '%s:%s' % (user.password, user.is_active)
+
+    return hashlib.sha256(state.encode('utf-8')).hexdigest()
+
+
+def get_cached_login(backend_id, username, password):
+    """Return the user for a cached login, if the credentials match.
+
+    Args:
+        backend_id (unicode):
+            The ID of the authentication backend.
+
+        username (unicode):
+            The username used to log in.
+
+        password (unicode or bytes):
+            The password used to log in.
+
+    Returns:
+        django.contrib.auth.models.User:
+        The user, if there's a cached login matching the credentials.
+        Otherwise, ``None`` is returned.
+    """
+    if not settings.LDAP_AUTH_CACHE_SECONDS:
+        return None
+
+    cache_key = _make_cache_key(backend_id, username)
+    entry = cache.get(cache_key)
+
+    if (not entry or
+        not constant_time_compare(_hash_password(password, entry['salt']),
+                                  entry['password_hash'])):
+        return None
+
+    try:
+        user = User.objects.get(pk=entry['user_id'])
+    except User.DoesNotExist:
+        user = None
+
+    if (user is None or
+        _get_user_fingerprint(user) != entry['user_fingerprint']):
+        cache.delete(cache_key)
+        return None
+
+    return user
+
+
+def cache_login(backend_id, username, password, user):
+    """Remember a successful login.
+
+    This replaces any login cached for the username.
+
+    Args:
+        backend_id (unicode):
+            The ID of the authentication backend.
+
+        username (unicode):
+            The username used to log in.
+
+        password (unicode or bytes):
+            The password used to log in.
+
+        user (django.contrib.auth.models.User):
+            The user who logged in.
+    """
+    if not settings.LDAP_AUTH_CACHE_SECONDS:
+        return
+
+    salt = get_random_string(12)
+
+    cache.set(
+        _make_cache_key(backend_id, username),
+        {
+            'salt': salt,
+            'password_hash': _hash_password(password, salt),
+            'user_id': user.pk,
+            'user_fingerprint': _get_user_fingerprint(user),
+        },
+        settings.LDAP_AUTH_CACHE_SECONDS)
+
+
+def invalidate_cached_login(backend_id, username):
+    """Forget any cached login for a username.
+
+    Args:
+        backend_id (unicode):
+            The ID of the authentication backend.
+
+        username (unicode):
+            The username used to log in.
+    """
+    cache.delete(_make_cache_key(backend_id, username))
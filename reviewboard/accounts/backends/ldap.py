@@ -15,6 +15,11 @@ except ImportError:
     ldap = None
 
 from reviewboard.accounts.backends.base import BaseAuthBackend
+from reviewboard.accounts.backends.credential_cache import (
+    cache_login,
+    get_cached_login,
+    invalidate_cached_login)
+from reviewboard.accounts.backends.ldap_pool import get_ldap_connection_pool
 from reviewboard.accounts.forms.auth import LDAPSettingsForm
 
 
@@ -99,6 +104,10 @@ class LDAPBackend(BaseAuthBackend):
         :py:class:`~django.contrib.auth.models.User` will be returned, and
         added to the database if it doesn't already exist.
 
+        Successful logins are remembered for a short time (see
+        :py:mod:`~reviewboard.accounts.backends.credential_cache`), and
+        connections to the server are reused between logins.
+
         Args:
             username (unicode):
                 The username used to authenticate.
@@ -123,10 +132,23 @@ class LDAPBackend(BaseAuthBackend):
                             username)
             return None
 
-        ldapo = self._connect()
+        user = get_cached_login(self.backend_id, username, password)
 
-        if ldapo is None:
-            return None
+        if user is not None:
+            return user
+
+        with self._get_connection_pool('search').connection() as ldapo:
+            if ldapo is None:
+                return None
+
+            userdn = self._get_user_dn(ldapo, username)
+
+            if userdn is None:
+                # The lookup may have failed due to a problem with the
+                # connection, so don't reuse it.
+                self._get_connection_pool('search').discard(ldapo)
+
+                return None
 
         if isinstance(username, six.text_type):
             username_bytes = username.encode('utf-8')
@@ -134,34 +156,49 @@ class LDAPBackend(BaseAuthBackend):
             username_bytes = username
 
         if isinstance(password, six.text_type):
-            password = password.encode('utf-8')
-
-        userdn = self._get_user_dn(ldapo, username)
+            password_bytes = password.encode('utf-8')
+        else:
+            password_bytes = password
 
         try:
-            # Now that we have the user, attempt to bind to verify
-            # authentication.
-            logging.debug('Attempting to authenticate user DN "%s" '
-                          '(username %s) in LDAP',
-                          userdn.decode('utf-8'), username)
-            ldapo.bind_s(userdn, password)
-
-            return self.get_or_create_user(username=username_bytes,
-                                           ldapo=ldapo,
-                                           userdn=userdn)
+            # Bind as the user on a separate connection to verify
+            # authentication, so that the connection used for searching stays
+            # bound to the service account.
+            with self._get_connection_pool('bind').connection() as ldapo:
+                if ldapo is None:
+                    return None
+
+                logging.debug('Attempting to authenticate user DN "%s" '
+                              '(username %s) in LDAP',
+                              userdn.decode('utf-8'), username)
+                ldapo.bind_s(userdn, password_bytes)
+
+                user = self.get_or_create_user(username=username_bytes,
+                                               ldapo=ldapo,
+                                               userdn=userdn)
         except ldap.INVALID_CREDENTIALS:
             logging.warning('Error authenticating user "%s" in LDAP: The '
                             'credentials provided were invalid',
                             username)
+            invalidate_cached_login(self.backend_id, username)
+
+            return None
         except ldap.LDAPError as e:
             logging.warning('Error authenticating user "%s" in LDAP: %s',
                             username, e)
+
+            return None
         except Exception as e:
             logging.exception('Unexpected error authenticating user "%s" '
                               'in LDAP: %s',
                               username, e)
 
-        return None
+            return None
+
+        if user is not None:
+            cache_login(self.backend_id, username, password, user)
+
+        return user
 
     def get_or_create_user(self, username, request=None, ldapo=None,
                            userdn=None):
@@ -292,7 +329,28 @@ class LDAPBackend(BaseAuthBackend):
 
         return None
 
-    def _connect(self, request=None):
+    def _get_connection_pool(self, purpose):
+        """Return the pool of connections to the LDAP server.
+
+        Args:
+            purpose (unicode):
+                What the connections are used for. ``search`` connections are
+                bound as the service account (or anonymously), and ``bind``
+                connections are not bound, for verifying users' credentials.
+
+        Returns:
+            reviewboard.accounts.backends.ldap_pool.LDAPConnectionPool:
+            The connection pool.
+        """
+        bind_service_account = (purpose == 'search')
+
+        return get_ldap_connection_pool(
+            'ldap-%s' % purpose,
+            (settings.LDAP_URI, settings.LDAP_TLS,
+             settings.LDAP_ANON_BIND_UID, settings.LDAP_ANON_BIND_PASSWD),
+            lambda: self._connect(bind_service_account=bind_service_account))
+
+    def _connect(self, request=None, bind_service_account=True):
         """Connect to LDAP.
 
         This will attempt to connect and authenticate (if needed) to the
@@ -302,6 +360,10 @@ class LDAPBackend(BaseAuthBackend):
             request (django.http.HttpRequest, optional):
                 The optional HTTP request used for logging context.
 
+            bind_service_account (bool, optional):
+                Whether to bind as the service account (or anonymously) after
+                connecting.
+
         Returns:
             ldap.LDAPObject:
             The resulting LDAP connection, if it could connect. If LDAP
@@ -319,13 +381,14 @@ class LDAPBackend(BaseAuthBackend):
             if settings.LDAP_TLS:
                 ldapo.start_tls_s()
 
-            if settings.LDAP_ANON_BIND_UID:
-                # Log in as the service account before searching.
-                ldapo.simple_bind_s(settings.LDAP_ANON_BIND_UID,
-                                    settings.LDAP_ANON_BIND_PASSWD)
-            else:
-                # Bind anonymously to the server.
-                ldapo.simple_bind_s()
+            if bind_service_account:
+                if settings.LDAP_ANON_BIND_UID:
+                    # Log in as the service account before searching.
+                    ldapo.simple_bind_s(settings.LDAP_ANON_BIND_UID,
+                                        settings.LDAP_ANON_BIND_PASSWD)
+                else:
+                    # Bind anonymously to the server.
+                    ldapo.simple_bind_s()
 
             return ldapo
         except ldap.INVALID_CREDENTIALS:
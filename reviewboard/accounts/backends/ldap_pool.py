@@ -0,0 +1,247 @@
+"""Pooling of connections to LDAP servers.
+
+Setting up a connection to an LDAP server (including a TLS handshake and
+binding as a service account) takes several round trips, which the LDAP
+and Active Directory backends would otherwise pay for every login.
+Connections are instead kept open in a pool after use and reused by later
+logins. The number of idle connections kept for each server is controlled
+by the ``LDAP_CONNECTION_POOL_SIZE`` setting.
+
+Connections that have been idle for a while are checked before they're
+reused, and connections that fail with a connection-level error are closed
+rather than returned to the pool.
+"""
+
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import ldap
+except ImportError:
+    ldap = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _is_connection_error(e):
+    """Return whether an error means a connection can't be reused.
+
+    Args:
+        e (Exception):
+            The error raised while using the connection.
+
+    Returns:
+        bool:
+        ``True`` if the connection should be closed.
+    """
+    return (ldap is not None and
+            isinstance(e, (ldap.CONNECT_ERROR, ldap.SERVER_DOWN,
+                           ldap.TIMEOUT, ldap.UNAVAILABLE)))
+
+
+class LDAPConnectionPool(object):
+    """A pool of open connections to an LDAP server."""
+
+    #: The number of seconds a connection can be idle before it must pass a
+    #: health check to be reused.
+    health_check_idle_seconds = 30
+
+    #: The number of seconds after which an idle connection is closed
+    #: instead of reused.
+    max_idle_seconds = 300
+
+    def __init__(self, connect, max_size):
+        """Initialize the pool.
+
+        Args:
+            connect (callable):
+                A function that opens and sets up a new connection. This
+                may return ``None`` if a connection couldn't be made.
+
+            max_size (int):
+                The maximum number of idle connections to keep.
+        """
+        self.connect = connect
+        self.max_size = max_size
+        self._idle = []
+        self._discarded = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Use a connection from the pool.
+
+        This is a context manager that provides an idle connection, or a
+        new one if there are none. The connection is returned to the pool
+        afterward, unless it raised a connection-level error or was
+        discarded.
+
+        Context:
+            ldap.LDAPObject:
+            The connection, or ``None`` if one could not be made.
+        """
+        ldapo = self._acquire()
+        close = False
+
+        try:
+            yield ldapo
+        except Exception as e:
+            close = _is_connection_error(e)
+            raise
+        finally:
+            if ldapo is not None:
+                with self._lock:
+                    if id(ldapo) in self._discarded:
+                        self._discarded.discard(id(ldapo))
+                        close = True
+
+                if close:
+                    self._close(ldapo)
+                else:
+                    self._release(ldapo)
+
+    def discard(self, ldapo):
+        """Prevent a connection in use from being returned to the pool.
+
+        This should be called for a connection that may no longer be
+        usable, when the error that indicated this has already been
+        handled.
+
+        Args:
+            ldapo (ldap.LDAPObject):
+                The connection to discard.
+        """
+        with self._lock:
+            self._discarded.add(id(ldapo))
+
+    def close_all(self):
+        """Close all idle connections in the pool."""
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+
+        for ldapo, last_used in idle:
+            self._close(ldapo)
+
+    def _acquire(self):
+        """Return an idle connection, or open a new one.
+
+        Returns:
+            ldap.LDAPObject:
+            The connection, or ``None`` if one could not be made.
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+
+                ldapo, last_used = self._idle.pop()
+
+            idle_time = time.time() - last_used
+
+            if (idle_time > self.max_idle_seconds or
+                (idle_time > self.health_check_idle_seconds and
+                 not self._is_healthy(ldapo))):
+                self._close(ldapo)
+            else:
+                return ldapo
+
+        return self.connect()
+
+    def _release(self, ldapo):
+        """Return a connection to the pool.
+
+        If the pool is full, the connection is closed.
+
+        Args:
+            ldapo (ldap.LDAPObject):
+                The connection to return.
+        """
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((ldapo, time.time()))
+                return
+
+        self._close(ldapo)
+
+    def _is_healthy(self, ldapo):
+        """Return whether a connection can still be used.
+
+        Args:
+            ldapo (ldap.LDAPObject):
+                The connection to check.
+
+        Returns:
+            bool:
+            ``True`` if the server responded on the connection.
+        """
+        try:
+            ldapo.whoami_s()
+            return True
+        except ldap.LDAPError as e:
+            logger.debug('Closing idle LDAP connection that failed a health '
+                         'check: %s',
+                         e)
+            return False
+
+    def _close(self, ldapo):
+        """Close a connection.
+
+        Args:
+            ldapo (ldap.LDAPObject):
+                The connection to close.
+        """
+        try:
+            ldapo.unbind_s()
+        except Exception as e:
+            logger.debug('Error closing LDAP connection: %s', e)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_ldap_connection_pool(name, config, connect):
+    """Return the connection pool with the given name.
+
+    The pool is created the first time it's requested. If the configuration
+    has changed since then (for instance, if the server or credentials were
+    changed in the settings), the old pool's connections are closed and a
+    new pool is created.
+
+    Args:
+        name (unicode):
+            A name identifying the pool.
+
+        config (tuple):
+            The configuration used to connect. This is only compared against
+            the configuration of the existing pool.
+
+        connect (callable):
+            A function that opens and sets up a new connection. See
+            :py:class:`LDAPConnectionPool`.
+
+    Returns:
+        LDAPConnectionPool:
+        The connection pool.
+    """
+    with _pools_lock:
+        pool, pool_config = _pools.get(name, (None, None))
+
+        if pool is None or pool_config != config:
+            if pool is not None:
+                pool.close_all()
+
+            pool = LDAPConnectionPool(
+                connect,
+                max_size=settings.LDAP_CONNECTION_POOL_SIZE)
+            _pools[name] = (pool, config)
+
+        return pool
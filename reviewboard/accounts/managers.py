@@ -2,7 +2,9 @@ from __future__ import unicode_literals
 
 import logging
 
+from django.db import IntegrityError, connections, router, transaction
 from django.db.models import Manager
+from django.utils import six
 from djblets.db.managers import ConcurrencyManager
 
 from reviewboard.accounts.trophies import trophies_registry
@@ -85,6 +87,158 @@ class ReviewRequestVisitManager(ConcurrencyManager):
 
         return visit
 
+    def update_timestamps(self, visits, batch_size=500):
+        """Record the times that users visited review requests.
+
+        This writes many visit timestamps at once, creating any visits that
+        don't yet exist. A visit's timestamp is never moved backward, so
+        timestamps can be written out of order.
+
+        Where the database supports it, each batch of visits is written in a
+        single upsert query.
+
+        Args:
+            visits (list of tuple):
+                A list of 3-tuples, each containing a user ID, a review request
+                ID, and the :py:class:`~datetime.datetime` of the visit.
+
+            batch_size (int, optional):
+                The maximum number of visits to write in a single query.
+        """
+        db_alias = router.db_for_write(self.model)
+        connection = connections[db_alias]
+
+        for i in range(0, len(visits), batch_size):
+            batch = visits[i:i + batch_size]
+
+            if (connection.vendor == 'mysql' or
+                (connection.vendor == 'postgresql' and
+                 getattr(connection, 'pg_version', 0) >= 90500)):
+                self._upsert_timestamps(connection, batch)
+            else:
+                self._update_timestamps(db_alias, batch)
+
+    def _upsert_timestamps(self, connection, visits):
+        """Write visit timestamps using a database-specific upsert query.
+
+        Args:
+            connection (django.db.backends.BaseDatabaseWrapper):
+                The database connection to write to.
+
+            visits (list of tuple):
+                The visits to write.
+        """
+        qn = connection.ops.quote_name
+        timestamp_field = self.model._meta.get_field('timestamp')
+        params = []
+
+        for user_id, review_request_id, timestamp in visits:
+            params += [
+                user_id,
+                review_request_id,
+                timestamp_field.get_db_prep_value(timestamp, connection),
+                self.model.VISIBLE,
+            ]
+
+        if connection.vendor == 'mysql':
+            on_conflict = (
+                'ON DUPLICATE KEY UPDATE'
+                '  %(timestamp)s = GREATEST(%(timestamp)s,'
+                '                           VALUES(%(timestamp)s))'
+            )
+        else:
+            on_conflict = (
+                'ON CONFLICT (%(user_id)s, %(review_request_id)s)'
+                '  DO UPDATE SET'
+                '    %(timestamp)s = GREATEST(%(table)s.%(timestamp)s,'
+                '                             EXCLUDED.%(timestamp)s)'
+            )
+
+        names = {
+            'table': qn(self.model._meta.db_table),
+            'user_id': qn('user_id'),
+            'review_request_id': qn('review_request_id'),
+            'timestamp': qn('timestamp'),
+            'visibility': qn('visibility'),
+        }
+
+        cursor = connection.cursor()
+        cursor.execute(
+            ('INSERT INTO %(table)s'
+             '  (%(user_id)s, %(review_request_id)s, %(timestamp)s,'
+             '   %(visibility)s)'
+             '  VALUES %(values)s '
+             % dict(names, values=', '.join(['(%s, %s, %s, %s)'] *
+                                            len(visits)))) +
+            on_conflict % names,
+            params)
+
+    def _update_timestamps(self, db_alias, visits):
+        """Write visit timestamps using standard queries.
+
+        This is used for databases without a suitable upsert query. Existing
+        visits are updated individually, and new ones are created in bulk.
+
+        Args:
+            db_alias (unicode):
+                The name of the database to write to.
+
+            visits (list of tuple):
+                The visits to write.
+        """
+        queryset = self.using(db_alias)
+        latest = {}
+
+        for user_id, review_request_id, timestamp in visits:
+            key = (user_id, review_request_id)
+
+            if key not in latest or latest[key] < timestamp:
+                latest[key] = timestamp
+
+        existing = set(
+            queryset
+            .filter(user__in=set(key[0] for key in latest),
+                    review_request__in=set(key[1] for key in latest))
+            .values_list('user_id', 'review_request_id')
+        )
+        new_visits = []
+
+        with transaction.atomic(using=db_alias):
+            for key, timestamp in six.iteritems(latest):
+                user_id, review_request_id = key
+
+                if key in existing:
+                    queryset.filter(user=user_id,
+                                    review_request=review_request_id,
+                                    timestamp__lt=timestamp).update(
+                        timestamp=timestamp)
+                else:
+                    new_visits.append(self.model(
+                        user_id=user_id,
+                        review_request_id=review_request_id,
+                        timestamp=timestamp))
+
+        if new_visits:
+            try:
+                with transaction.atomic(using=db_alias):
+                    queryset.bulk_create(new_visits)
+            except IntegrityError:
+                # Some of these visits were created while we were working.
+                # Fall back on writing them one at a time.
+                for new_visit in new_visits:
+                    visit, is_new = queryset.get_or_create(
+                        user_id=new_visit.user_id,
+                        review_request_id=new_visit.review_request_id,
+                        defaults={
+                            'timestamp': new_visit.timestamp,
+                        })
+
+                    if not is_new:
+                        queryset.filter(
+                            pk=visit.pk,
+                            timestamp__lt=new_visit.timestamp,
+                        ).update(timestamp=new_visit.timestamp)
+
 
 class TrophyManager(Manager):
     """Manager for trophies.
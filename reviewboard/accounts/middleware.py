@@ -5,11 +5,13 @@ from __future__ import unicode_literals
 import pytz
 from django.conf import settings
 from django.contrib import auth
+from django.contrib.auth.models import User
 from django.utils import timezone
 from djblets.siteconfig.models import SiteConfiguration
 
 from reviewboard.accounts.backends import X509Backend
 from reviewboard.accounts.models import Profile
+from reviewboard.admin.activity_stats import record_last_login_change
 
 
 class TimezoneMiddleware(object):
@@ -51,8 +53,15 @@ class UpdateLastLoginMiddleware(object):
             delta = now - request.user.last_login
 
             if delta.total_seconds() >= self.UPDATE_PERIOD_SECS:
+                # This is written with an update query rather than a save, so
+                # that the post_save handlers for users (which reindex the
+                # user and invalidate cached access data) aren't triggered by
+                # what is just an activity time. The login activity counts
+                # are updated here instead.
+                old_last_login = user.last_login
                 user.last_login = now
-                user.save(update_fields=('last_login',))
+                User.objects.filter(pk=user.pk).update(last_login=now)
+                record_last_login_change(user, old_last_login, now)
 
 
 class X509AuthMiddleware(object):
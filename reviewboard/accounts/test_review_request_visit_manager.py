@@ -2,7 +2,10 @@
 
 from __future__ import unicode_literals
 
+from datetime import datetime
+
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 from reviewboard.accounts.models import ReviewRequestVisit
 from reviewboard.testing import TestCase
@@ -57,3 +60,50 @@ class ReviewRequestVisitTests(TestCase):
             review_request, user, ReviewRequestVisit.ARCHIVED)
 
         self.assertEqual(visit.visibility, ReviewRequestVisit.ARCHIVED)
+
+    def test_update_timestamps(self):
+        """Testing ReviewRequestVisitManager.update_timestamps creates and
+        updates visits
+        """
+        review_request1 = self.create_review_request(publish=True)
+        review_request2 = self.create_review_request(publish=True)
+        user = User.objects.get(username='admin')
+
+        visit = ReviewRequestVisit.objects.create(
+            review_request=review_request1, user=user,
+            timestamp=datetime(2018, 3, 1, tzinfo=timezone.utc),
+            visibility=ReviewRequestVisit.ARCHIVED)
+
+        timestamp = datetime(2018, 3, 2, tzinfo=timezone.utc)
+        ReviewRequestVisit.objects.update_timestamps([
+            (user.pk, review_request1.pk, timestamp),
+            (user.pk, review_request2.pk, timestamp),
+        ])
+
+        visit = ReviewRequestVisit.objects.get(pk=visit.pk)
+        self.assertEqual(visit.timestamp, timestamp)
+        self.assertEqual(visit.visibility, ReviewRequestVisit.ARCHIVED)
+
+        visit = ReviewRequestVisit.objects.get(review_request=review_request2,
+                                               user=user)
+        self.assertEqual(visit.timestamp, timestamp)
+        self.assertEqual(visit.visibility, ReviewRequestVisit.VISIBLE)
+
+    def test_update_timestamps_older(self):
+        """Testing ReviewRequestVisitManager.update_timestamps does not move
+        timestamps backward
+        """
+        review_request = self.create_review_request(publish=True)
+        user = User.objects.get(username='admin')
+        timestamp = datetime(2018, 3, 2, tzinfo=timezone.utc)
+
+        visit = ReviewRequestVisit.objects.create(
+            review_request=review_request, user=user, timestamp=timestamp)
+
+        ReviewRequestVisit.objects.update_timestamps([
+            (user.pk, review_request.pk,
+             datetime(2018, 3, 1, tzinfo=timezone.utc)),
+        ])
+
+        visit = ReviewRequestVisit.objects.get(pk=visit.pk)
+        self.assertEqual(visit.timestamp, timestamp)
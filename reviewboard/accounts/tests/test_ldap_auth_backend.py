@@ -162,6 +162,52 @@ class LDAPAuthBackendTests(SpyAgency, TestCase):
         user = self.backend.authenticate(username='doc', password='mypass')
         self.assertIsNone(user)
 
+    @add_fixtures(['test_users'])
+    def test_authenticate_with_cached_login(self):
+        """Testing LDAPBackend.authenticate with a cached login"""
+        self._patch_ldap(self._make_valid_credentials_ldap_object())
+
+        user = self.backend.authenticate(username='doc', password='mypass')
+        self.assertIsNotNone(user)
+
+        num_connections = len(ldap.initialize.spy.calls)
+
+        self.assertEqual(
+            self.backend.authenticate(username='doc', password='mypass'),
+            user)
+        self.assertEqual(len(ldap.initialize.spy.calls), num_connections)
+
+    @add_fixtures(['test_users'])
+    def test_authenticate_with_cached_login_and_other_password(self):
+        """Testing LDAPBackend.authenticate with a cached login and a
+        different password
+        """
+        self._patch_ldap(self._make_valid_credentials_ldap_object())
+
+        self.assertIsNotNone(
+            self.backend.authenticate(username='doc', password='mypass'))
+        self.assertIsNone(
+            self.backend.authenticate(username='doc', password='otherpass'))
+
+    @add_fixtures(['test_users'])
+    def test_authenticate_with_cached_login_after_password_change(self):
+        """Testing LDAPBackend.authenticate with a cached login after the
+        local password changes
+        """
+        self._patch_ldap(self._make_valid_credentials_ldap_object())
+
+        user = self.backend.authenticate(username='doc', password='mypass')
+        self.assertIsNotNone(user)
+
+        user.set_unusable_password()
+        user.save()
+
+        num_connections = len(ldap.initialize.spy.calls)
+
+        self.assertIsNotNone(
+            self.backend.authenticate(username='doc', password='mypass'))
+        self.assertGreater(len(ldap.initialize.spy.calls), num_connections)
+
     @add_fixtures(['test_users'])
     def test_get_or_create_user_with_existing_user(self):
         """Testing LDAPBackend.get_or_create_user with existing user"""
@@ -282,6 +328,19 @@ class LDAPAuthBackendTests(SpyAgency, TestCase):
         self.assertEqual(user.first_name, 'Bob')
         self.assertEqual(user.last_name, '')
 
+    def _make_valid_credentials_ldap_object(self):
+        class TestLDAPObject(BaseTestLDAPObject):
+            def bind_s(ldapo, username, password):
+                if password != 'mypass':
+                    raise ldap.INVALID_CREDENTIALS()
+
+            def search_s(ldapo, base, scope,
+                         filter_str=self.DEFAULT_FILTER_STR,
+                         *args, **kwargs):
+                return [['CN=Doc Dwarf,OU=MyOrg,DC=example,DC=COM']]
+
+        return TestLDAPObject
+
     def _patch_ldap(self, cls):
         self.spy_on(ldap.initialize,
                     call_fake=lambda uri, *args, **kwargs: cls(uri))
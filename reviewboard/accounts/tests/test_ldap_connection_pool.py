@@ -0,0 +1,140 @@
+"""Unit tests for reviewboard.accounts.backends.ldap_pool."""
+
+from __future__ import unicode_literals
+
+import nose
+
+try:
+    import ldap
+except ImportError:
+    ldap = None
+
+from reviewboard.accounts.backends.ldap_pool import LDAPConnectionPool
+from reviewboard.testing import TestCase
+
+
+class TestLDAPObject(object):
+    def __init__(self):
+        self.healthy = True
+        self.unbound = False
+
+    def whoami_s(self):
+        if not self.healthy:
+            raise ldap.SERVER_DOWN()
+
+        return ''
+
+    def unbind_s(self):
+        self.unbound = True
+
+
+class LDAPConnectionPoolTests(TestCase):
+    """Unit tests for LDAPConnectionPool."""
+
+    def setUp(self):
+        if ldap is None:
+            raise nose.SkipTest()
+
+        super(LDAPConnectionPoolTests, self).setUp()
+
+        self.connections = []
+        self.pool = LDAPConnectionPool(self._connect, max_size=2)
+
+    def test_reuse(self):
+        """Testing LDAPConnectionPool reuses idle connections"""
+        with self.pool.connection() as ldapo1:
+            pass
+
+        with self.pool.connection() as ldapo2:
+            pass
+
+        self.assertIs(ldapo1, ldapo2)
+        self.assertEqual(len(self.connections), 1)
+        self.assertFalse(ldapo1.unbound)
+
+    def test_max_size(self):
+        """Testing LDAPConnectionPool closes connections when full"""
+        with self.pool.connection():
+            with self.pool.connection():
+                with self.pool.connection():
+                    pass
+
+        self.assertEqual(len(self.connections), 3)
+        self.assertEqual(
+            [ldapo.unbound for ldapo in self.connections],
+            [True, False, False])
+
+    def test_connection_error(self):
+        """Testing LDAPConnectionPool closes connections after connection
+        errors
+        """
+        with self.assertRaises(ldap.SERVER_DOWN):
+            with self.pool.connection() as ldapo1:
+                raise ldap.SERVER_DOWN()
+
+        with self.pool.connection() as ldapo2:
+            pass
+
+        self.assertTrue(ldapo1.unbound)
+        self.assertIsNot(ldapo1, ldapo2)
+
+    def test_other_error(self):
+        """Testing LDAPConnectionPool reuses connections after other errors"""
+        with self.assertRaises(ldap.INVALID_CREDENTIALS):
+            with self.pool.connection() as ldapo1:
+                raise ldap.INVALID_CREDENTIALS()
+
+        with self.pool.connection() as ldapo2:
+            pass
+
+        self.assertIs(ldapo1, ldapo2)
+
+    def test_discard(self):
+        """Testing LDAPConnectionPool.discard"""
+        with self.pool.connection() as ldapo1:
+            self.pool.discard(ldapo1)
+
+        with self.pool.connection() as ldapo2:
+            pass
+
+        self.assertTrue(ldapo1.unbound)
+        self.assertIsNot(ldapo1, ldapo2)
+
+    def test_health_check(self):
+        """Testing LDAPConnectionPool checks idle connections before reuse"""
+        self.pool.health_check_idle_seconds = -1
+
+        with self.pool.connection() as ldapo1:
+            pass
+
+        with self.pool.connection() as ldapo2:
+            pass
+
+        self.assertIs(ldapo1, ldapo2)
+
+        ldapo1.healthy = False
+
+        with self.pool.connection() as ldapo3:
+            pass
+
+        self.assertTrue(ldapo1.unbound)
+        self.assertIsNot(ldapo1, ldapo3)
+
+    def test_max_idle_time(self):
+        """Testing LDAPConnectionPool closes connections idle for too long"""
+        self.pool.max_idle_seconds = -1
+
+        with self.pool.connection() as ldapo1:
+            pass
+
+        with self.pool.connection() as ldapo2:
+            pass
+
+        self.assertTrue(ldapo1.unbound)
+        self.assertIsNot(ldapo1, ldapo2)
+
+    def _connect(self):
+        ldapo = TestLDAPObject()
+        self.connections.append(ldapo)
+
+        return ldapo
@@ -10,6 +10,9 @@ from django.utils import timezone
 from kgb import SpyAgency
 
 from reviewboard.accounts.middleware import UpdateLastLoginMiddleware
+from reviewboard.admin.activity_stats import (USER_LOGINS,
+                                              get_daily_activity_counts,
+                                              update_activity_counts)
 from reviewboard.testing import TestCase
 
 
@@ -56,3 +59,20 @@ class UpdateLastLoginMiddlewareTests(SpyAgency, TestCase):
         self.middleware.process_request(self.request)
 
         self.assertEqual(self.user.last_login, cur_last_login)
+
+    def test_process_request_updates_login_counts(self):
+        """Testing UpdateLastLoginMiddleware.process_request updates the
+        login activity counts
+        """
+        self.user.last_login = self.now - timedelta(days=2)
+        self.user.save(update_fields=('last_login',))
+        update_activity_counts()
+
+        with self.settings(TRACK_ACTIVITY_STATS=True):
+            self.middleware.process_request(self.request)
+
+        counts = get_daily_activity_counts(
+            [USER_LOGINS],
+            start=(self.now - timedelta(days=2)).date())[USER_LOGINS]
+
+        self.assertEqual(counts, [(self.now.date(), 1)])
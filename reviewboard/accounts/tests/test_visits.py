@@ -0,0 +1,73 @@
+"""Unit tests for reviewboard.accounts.visits."""
+
+from __future__ import unicode_literals
+
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+from kgb import SpyAgency
+
+from reviewboard.accounts.models import ReviewRequestVisit
+from reviewboard.accounts.visits import (ReviewRequestVisitBuffer,
+                                         get_buffered_visits)
+from reviewboard.reviews.models import ReviewRequest
+from reviewboard.testing import TestCase
+
+
+class ReviewRequestVisitBufferTests(SpyAgency, TestCase):
+    """Unit tests for ReviewRequestVisitBuffer."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(ReviewRequestVisitBufferTests, self).setUp()
+
+        cache.clear()
+
+        self.buffer = ReviewRequestVisitBuffer(delay=30)
+        self.spy_on(self.buffer._schedule_flush, call_original=False)
+
+        self.user = User.objects.get(username='doc')
+        self.review_request = self.create_review_request(publish=True)
+        self.visit = self.create_visit(self.review_request,
+                                       ReviewRequestVisit.VISIBLE,
+                                       user=self.user)
+        self.timestamp = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+    def test_add(self):
+        """Testing ReviewRequestVisitBuffer.add buffers the visit"""
+        self.buffer.add(self.user.pk, self.review_request.pk, self.timestamp)
+        self.buffer.add(self.user.pk, self.review_request.pk, self.timestamp)
+
+        self.assertEqual(len(self.buffer._schedule_flush.spy.calls), 1)
+        self.assertEqual(get_buffered_visits(self.user),
+                         {self.review_request.pk: self.timestamp})
+
+        visit = ReviewRequestVisit.objects.get(pk=self.visit.pk)
+        self.assertNotEqual(visit.timestamp, self.timestamp)
+
+    def test_flush(self):
+        """Testing ReviewRequestVisitBuffer.flush writes buffered visits"""
+        self.buffer.add(self.user.pk, self.review_request.pk, self.timestamp)
+        self.buffer.flush()
+
+        visit = ReviewRequestVisit.objects.get(pk=self.visit.pk)
+        self.assertEqual(visit.timestamp, self.timestamp)
+        self.assertEqual(get_buffered_visits(self.user), {})
+
+    def test_with_counts(self):
+        """Testing ReviewRequestQuerySet.with_counts uses buffered visits"""
+        self.create_review(self.review_request, publish=True)
+        queryset = ReviewRequest.objects.filter(pk=self.review_request.pk)
+
+        self.assertEqual(
+            queryset.with_counts(self.user).get().new_review_count,
+            1)
+
+        self.buffer.add(self.user.pk, self.review_request.pk, self.timestamp)
+
+        self.assertEqual(
+            queryset.with_counts(self.user).get().new_review_count,
+            0)
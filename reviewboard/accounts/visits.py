@@ -0,0 +1,236 @@
+"""Buffered tracking of review request visits.
+
+Every time a logged-in user views a review request, the time of their visit
+is recorded so that the dashboard can show whether there have been updates
+since. Writing that timestamp to the database on every page view puts a lot
+of write load on a few frequently-viewed rows.
+
+Instead, visit timestamps are buffered and written to the database in
+batches by a background worker, after a short delay (controlled by the
+``REVIEW_REQUEST_VISIT_FLUSH_DELAY`` setting). Until they're written, the
+buffered timestamps for each user are also kept in the cache, so that code
+reading visit times (such as the dashboard's new update counts) can take
+them into account through :py:func:`get_buffered_visits`.
+
+When background tasks are run inline (such as in the test suite), visits
+are written immediately.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import six, timezone
+from djblets.cache.backend import make_cache_key
+
+from reviewboard.background import (DelayedBatchBuffer,
+                                    should_run_tasks_inline)
+
+
+def _make_cache_key(user_id):
+    """Return the cache key for a user's buffered visits.
+
+    Args:
+        user_id (int):
+            The ID of the user.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('review-request-visits-%s' % user_id)
+
+
+class ReviewRequestVisitBuffer(DelayedBatchBuffer):
+    """Collects visit timestamps and writes them in batches.
+
+    Only the latest timestamp for each user and review request is kept, so
+    repeated views of a page between writes result in a single update.
+    """
+
+    queue_name = 'review-request-visits'
+
+    def add(self, user_id, review_request_id, timestamp):
+        """Buffer a visit.
+
+        Args:
+            user_id (int):
+                The ID of the user who visited the review request.
+
+            review_request_id (int):
+                The ID of the review request that was visited.
+
+            timestamp (datetime.datetime):
+                The time of the visit.
+        """
+        self._cache_visit(user_id, review_request_id, timestamp)
+        self.add_item((user_id, review_request_id), timestamp)
+
+    def combine(self, old_timestamp, new_timestamp):
+        """Return the latest of two visits to the same review request.
+
+        Args:
+            old_timestamp (datetime.datetime):
+                The time of the pending visit.
+
+            new_timestamp (datetime.datetime):
+                The time of the visit being added.
+
+        Returns:
+            datetime.datetime:
+            The later of the two times.
+        """
+        return max(old_timestamp, new_timestamp)
+
+    def process(self, items):
+        """Write a batch of visits to the database.
+
+        Args:
+            items (dict):
+                A dictionary mapping user and review request ID pairs to the
+                times of the visits.
+        """
+        from reviewboard.accounts.models import ReviewRequestVisit
+
+        try:
+            ReviewRequestVisit.objects.update_timestamps([
+                (user_id, review_request_id, timestamp)
+                for (user_id, review_request_id), timestamp in
+                six.iteritems(items)
+            ])
+        except Exception as e:
+            logging.exception('Unable to write %d review request visits: %s',
+                              len(items), e)
+            return
+
+        user_ids = set(user_id for user_id, review_request_id in items)
+
+        for user_id in user_ids:
+            self._uncache_visits(user_id, items)
+
+    def _cache_visit(self, user_id, review_request_id, timestamp):
+        """Store a buffered visit in the user's cached visits.
+
+        Args:
+            user_id (int):
+                The ID of the user.
+
+            review_request_id (int):
+                The ID of the review request.
+
+            timestamp (datetime.datetime):
+                The time of the visit.
+        """
+        cache_key = _make_cache_key(user_id)
+        visits = cache.get(cache_key) or {}
+        visits[review_request_id] = max(
+            timestamp, visits.get(review_request_id, timestamp))
+
+        # Keep these around long enough to survive a slow write. If they do
+        # expire first, the dashboard briefly shows the older timestamps.
+        cache.set(cache_key, visits, max(self.delay * 10, 300))
+
+    def _uncache_visits(self, user_id, written):
+        """Remove written visits from the user's cached visits.
+
+        Visits that were buffered again since the write (in this or another
+        process) are kept.
+
+        Args:
+            user_id (int):
+                The ID of the user.
+
+            written (dict):
+                The visits that were written, mapping user and review request
+                ID pairs to timestamps.
+        """
+        cache_key = _make_cache_key(user_id)
+        visits = cache.get(cache_key)
+
+        if not visits:
+            return
+
+        remaining = {}
+
+        for review_request_id, timestamp in six.iteritems(visits):
+            written_timestamp = written.get((user_id, review_request_id))
+
+            if written_timestamp is None or timestamp > written_timestamp:
+                remaining[review_request_id] = timestamp
+
+        if remaining:
+            cache.set(cache_key, remaining, max(self.delay * 10, 300))
+        else:
+            cache.delete(cache_key)
+
+
+_visit_buffer = None
+_visit_buffer_lock = threading.Lock()
+
+
+def get_visit_buffer():
+    """Return the visit buffer for this process.
+
+    Returns:
+        ReviewRequestVisitBuffer:
+        The visit buffer.
+    """
+    global _visit_buffer
+
+    if _visit_buffer is None:
+        with _visit_buffer_lock:
+            if _visit_buffer is None:
+                _visit_buffer = ReviewRequestVisitBuffer(
+                    delay=settings.REVIEW_REQUEST_VISIT_FLUSH_DELAY)
+
+    return _visit_buffer
+
+
+def record_visit(user, review_request, timestamp=None):
+    """Record that a user visited a review request.
+
+    The visit will be written to the database shortly afterward, or
+    immediately if background tasks are run inline.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user who visited the review request.
+
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request that was visited.
+
+        timestamp (datetime.datetime, optional):
+            The time of the visit. Defaults to the current time.
+    """
+    from reviewboard.accounts.models import ReviewRequestVisit
+
+    if timestamp is None:
+        timestamp = timezone.now()
+
+    if should_run_tasks_inline():
+        ReviewRequestVisit.objects.update_timestamps(
+            [(user.pk, review_request.pk, timestamp)])
+    else:
+        get_visit_buffer().add(user.pk, review_request.pk, timestamp)
+
+
+def get_buffered_visits(user):
+    """Return a user's visits that haven't yet been written.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user whose visits should be returned.
+
+    Returns:
+        dict:
+        A dictionary mapping review request IDs to the times they were last
+        visited.
+    """
+    if not user.is_authenticated():
+        return {}
+
+    return cache.get(_make_cache_key(user.pk)) or {}
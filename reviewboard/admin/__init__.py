@@ -10,12 +10,15 @@ def _on_initializing(*args, **kwargs):
     """Handler for when Review Board is initializing.
 
     This will begin listening for save/delete events on Group and
-    Repository, invalidating the widget caches when changed.
+    Repository, invalidating the widget caches when changed, and on the
+    objects counted in the daily activity stats.
 
     We do this during the initializing process instead of when the module
     is loaded in order to avoid any circular imports caused by
     reviewboard.reviews.models.
     """
+    from reviewboard.admin import activity_stats
     from reviewboard.admin.widgets import init_widgets
 
     init_widgets()
+    activity_stats.connect_signals()
@@ -0,0 +1,676 @@
+"""Pre-aggregated daily counts of activity on the server.
+
+The activity widgets in the administration dashboard and the activity stats
+API show how many comments, reviews, review requests and other objects were
+created each day, along with totals. Computing these directly means grouping
+several of the largest tables by date, which gets slow on large databases.
+
+Instead, the counts for each day are stored in
+:py:class:`~reviewboard.reviews.models.DailyActivityCount` rows. Changes to
+them are collected as objects are created, deleted or moved to a new date
+(for instance, when a draft review is published), and written in batches by
+a background worker after a short delay (controlled by the
+``ACTIVITY_STATS_FLUSH_DELAY`` setting). The counts are also recomputed by
+the ``update-activity-stats`` management command, which should be run
+periodically to correct for changes that weren't tracked, such as bulk
+updates or changes lost when a process exits. The counts are first computed
+from scratch by the management command, which is run by ``rb-site upgrade``.
+
+Dates are always in UTC. Objects without a creation date (file attachments,
+screenshots and review request drafts) are counted under
+:py:data:`UNDATED`, so that only their totals are available.
+
+The ``user_logins`` counts hold the number of users whose last login was on
+each day. When a user logs in, or when
+:py:class:`~reviewboard.accounts.middleware.UpdateLastLoginMiddleware`
+updates their last login time, they're moved from the day of their previous
+login to the current day.
+"""
+
+from __future__ import unicode_literals
+
+import datetime
+import logging
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.aggregates import Count
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import six, timezone
+from djblets.siteconfig.models import SiteConfiguration
+
+from reviewboard.attachments.models import FileAttachment
+from reviewboard.background import (DelayedBatchBuffer,
+                                    should_run_tasks_inline)
+from reviewboard.changedescs.models import ChangeDescription
+from reviewboard.diffviewer.models import DiffSet
+from reviewboard.reviews.models import (Comment, DailyActivityCount, Review,
+                                        ReviewRequest, ReviewRequestDraft,
+                                        Screenshot)
+from reviewboard.reviews.signals import comments_bulk_created
+
+
+#: The date that objects without a creation date are counted under.
+UNDATED = datetime.date(1970, 1, 1)
+
+#: The object type for counts of users by last login date.
+USER_LOGINS = 'user_logins'
+
+#: The types of objects counted, along with their model and date field.
+#:
+#: Objects with a date field of ``None`` are counted under
+#: :py:data:`UNDATED`.
+ACTIVITY_SOURCES = [
+    ('change_descriptions', ChangeDescription, 'timestamp'),
+    ('comments', Comment, 'timestamp'),
+    ('diffsets', DiffSet, 'timestamp'),
+    ('file_attachments', FileAttachment, None),
+    ('review_request_drafts', ReviewRequestDraft, None),
+    ('review_requests', ReviewRequest, 'time_added'),
+    ('reviews', Review, 'timestamp'),
+    ('screenshots', Screenshot, None),
+    ('users', User, 'date_joined'),
+]
+
+#: All object types that counts are stored for.
+OBJECT_TYPES = [
+    object_type
+    for object_type, model, date_field in ACTIVITY_SOURCES
+] + [USER_LOGINS]
+
+
+_sources_by_model = dict(
+    (model, (object_type, date_field))
+    for object_type, model, date_field in ACTIVITY_SOURCES
+)
+
+_BACKFILLED_SITECONFIG_KEY = 'activity_stats_backfilled'
+
+_TIMESTAMP_ATTR = '_activity_stats_timestamp'
+
+_LAST_LOGIN_ATTR = '_activity_stats_last_login'
+
+
+def _get_utc_date(value):
+    """Return the UTC date for a date/time.
+
+    Args:
+        value (datetime.datetime):
+            The date/time.
+
+    Returns:
+        datetime.date:
+        The date.
+    """
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.utc)
+
+    return value.date()
+
+
+def _add_to_count(object_type, date, delta):
+    """Add to the stored count for an object type on a day.
+
+    Args:
+        object_type (unicode):
+            The type of object.
+
+        date (datetime.date):
+            The day.
+
+        delta (int):
+            The amount to add. This may be negative.
+    """
+    queryset = DailyActivityCount.objects.filter(object_type=object_type,
+                                                 date=date)
+
+    if queryset.update(count=F('count') + delta) or delta < 0:
+        # Either the row was updated, or there's nothing to subtract from.
+        # The latter can happen for objects created before the counts were
+        # computed, and will be corrected the next time they're computed.
+        return
+
+    try:
+        with transaction.atomic():
+            DailyActivityCount.objects.create(object_type=object_type,
+                                              date=date,
+                                              count=delta)
+    except IntegrityError:
+        # Another process created the row first.
+        queryset.update(count=F('count') + delta)
+
+
+class ActivityCountBuffer(DelayedBatchBuffer):
+    """Collects changes to the stored counts and writes them in batches.
+
+    Changes to the same count between writes are combined, so that a burst
+    of new comments results in a single update.
+    """
+
+    queue_name = 'activity-stats'
+
+    def add(self, object_type, date, delta):
+        """Buffer a change to a count.
+
+        Args:
+            object_type (unicode):
+                The type of object.
+
+            date (datetime.date):
+                The day.
+
+            delta (int):
+                The amount to add. This may be negative.
+        """
+        self.add_item((object_type, date), delta)
+
+    def combine(self, old_delta, new_delta):
+        """Return the sum of two changes to the same count.
+
+        Args:
+            old_delta (int):
+                The pending change.
+
+            new_delta (int):
+                The change being added.
+
+        Returns:
+            int:
+            The combined change.
+        """
+        return old_delta + new_delta
+
+    def process(self, items):
+        """Write a batch of changes to the database.
+
+        Args:
+            items (dict):
+                A dictionary mapping object type and date pairs to the
+                amounts to add.
+        """
+        for (object_type, date), delta in six.iteritems(items):
+            if delta:
+                try:
+                    _add_to_count(object_type, date, delta)
+                except Exception as e:
+                    logging.exception('Unable to update the %s activity '
+                                      'count for %s: %s',
+                                      object_type, date, e)
+
+
+_count_buffer = None
+_count_buffer_lock = threading.Lock()
+
+
+def _record_change(object_type, date, delta):
+    """Record a change to a stored count.
+
+    The change is written to the database shortly afterward, or immediately
+    if background tasks are run inline.
+
+    Args:
+        object_type (unicode):
+            The type of object.
+
+        date (datetime.date):
+            The day.
+
+        delta (int):
+            The amount to add. This may be negative.
+    """
+    global _count_buffer
+
+    if should_run_tasks_inline():
+        _add_to_count(object_type, date, delta)
+        return
+
+    if _count_buffer is None:
+        with _count_buffer_lock:
+            if _count_buffer is None:
+                _count_buffer = ActivityCountBuffer(
+                    delay=settings.ACTIVITY_STATS_FLUSH_DELAY)
+
+    _count_buffer.add(object_type, date, delta)
+
+
+def _on_post_init(sender, instance, **kwargs):
+    """Remember the creation date of a loaded object.
+
+    This is used to detect when a later save moves the object to a new date.
+
+    Args:
+        sender (type):
+            The model class.
+
+        instance (django.db.models.Model):
+            The object that was loaded.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    object_type, date_field = _sources_by_model[sender]
+
+    # This avoids loading a deferred field.
+    value = instance.__dict__.get(date_field)
+
+    if value is not None:
+        setattr(instance, _TIMESTAMP_ATTR, value)
+
+
+def _on_post_save(sender, instance, created, **kwargs):
+    """Update the counts when an object is saved.
+
+    Args:
+        sender (type):
+            The model class.
+
+        instance (django.db.models.Model):
+            The object that was saved.
+
+        created (bool):
+            Whether the object was newly created.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    if not settings.TRACK_ACTIVITY_STATS:
+        return
+
+    object_type, date_field = _sources_by_model[sender]
+
+    if date_field is None:
+        if created:
+            _record_change(object_type, UNDATED, 1)
+
+        return
+
+    value = getattr(instance, date_field)
+    new_date = _get_utc_date(value)
+
+    if created:
+        _record_change(object_type, new_date, 1)
+    else:
+        old_value = getattr(instance, _TIMESTAMP_ATTR, None)
+
+        if old_value is not None:
+            old_date = _get_utc_date(old_value)
+
+            if old_date != new_date:
+                _record_change(object_type, old_date, -1)
+                _record_change(object_type, new_date, 1)
+
+    setattr(instance, _TIMESTAMP_ATTR, value)
+
+
+def _on_post_delete(sender, instance, **kwargs):
+    """Update the counts when an object is deleted.
+
+    Args:
+        sender (type):
+            The model class.
+
+        instance (django.db.models.Model):
+            The object that was deleted.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    if not settings.TRACK_ACTIVITY_STATS:
+        return
+
+    object_type, date_field = _sources_by_model[sender]
+
+    if date_field is None:
+        date = UNDATED
+    else:
+        date = _get_utc_date(getattr(instance, _TIMESTAMP_ATTR, None) or
+                             getattr(instance, date_field))
+
+    _record_change(object_type, date, -1)
+
+
+def _on_comments_bulk_created(comments, **kwargs):
+    """Update the counts when comments are added to a review in bulk.
+
+    Args:
+        comments (list of reviewboard.reviews.models.BaseComment):
+            The comments that were added.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    if not settings.TRACK_ACTIVITY_STATS:
+        return
+
+    deltas = {}
+
+    for comment in comments:
+        try:
+            object_type, date_field = _sources_by_model[type(comment)]
+        except KeyError:
+            continue
+
+        value = getattr(comment, date_field)
+        key = (object_type, _get_utc_date(value))
+        deltas[key] = deltas.get(key, 0) + 1
+        setattr(comment, _TIMESTAMP_ATTR, value)
+
+    for (object_type, date), delta in six.iteritems(deltas):
+        _record_change(object_type, date, delta)
+
+
+def _on_user_post_init(sender, instance, **kwargs):
+    """Remember the last login time of a loaded user.
+
+    This is used to detect when a later save (such as when the user logs in)
+    moves the user to a new day in the ``user_logins`` counts.
+
+    Args:
+        sender (type):
+            The model class.
+
+        instance (django.contrib.auth.models.User):
+            The user that was loaded.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    # This avoids loading a deferred field.
+    value = instance.__dict__.get('last_login')
+
+    if value is not None:
+        setattr(instance, _LAST_LOGIN_ATTR, value)
+
+
+def record_last_login_change(user, old_last_login, new_last_login):
+    """Update the login counts for a change to a user's last login time.
+
+    Saving a user updates the counts automatically. This must be called when
+    the last login time is written some other way, such as with an update
+    query.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user whose last login time changed.
+
+        old_last_login (datetime.datetime):
+            The previous last login time, or ``None`` if the user hadn't
+            logged in before.
+
+        new_last_login (datetime.datetime):
+            The new last login time.
+    """
+    if not settings.TRACK_ACTIVITY_STATS or new_last_login is None:
+        return
+
+    new_date = _get_utc_date(new_last_login)
+
+    if old_last_login is None:
+        _record_change(USER_LOGINS, new_date, 1)
+    else:
+        old_date = _get_utc_date(old_last_login)
+
+        if old_date != new_date:
+            _record_change(USER_LOGINS, old_date, -1)
+            _record_change(USER_LOGINS, new_date, 1)
+
+    setattr(user, _LAST_LOGIN_ATTR, new_last_login)
+
+
+def _on_user_post_save(sender, instance, created, **kwargs):
+    """Update the login counts when a user is saved.
+
+    Args:
+        sender (type):
+            The model class.
+
+        instance (django.contrib.auth.models.User):
+            The user that was saved.
+
+        created (bool):
+            Whether the user was newly created.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    if created:
+        old_value = None
+    else:
+        old_value = getattr(instance, _LAST_LOGIN_ATTR, None)
+
+    # If the field was deferred or cleared, there's nothing to compare.
+    record_last_login_change(instance, old_value,
+                             instance.__dict__.get('last_login'))
+
+
+def _on_user_post_delete(sender, instance, **kwargs):
+    """Update the login counts when a user is deleted.
+
+    Args:
+        sender (type):
+            The model class.
+
+        instance (django.contrib.auth.models.User):
+            The user that was deleted.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    if not settings.TRACK_ACTIVITY_STATS:
+        return
+
+    value = (getattr(instance, _LAST_LOGIN_ATTR, None) or
+             instance.__dict__.get('last_login'))
+
+    if value is not None:
+        _record_change(USER_LOGINS, _get_utc_date(value), -1)
+
+
+def connect_signals():
+    """Connect the signal handlers that keep the counts up to date."""
+    for object_type, model, date_field in ACTIVITY_SOURCES:
+        if date_field is not None:
+            post_init.connect(_on_post_init, sender=model)
+
+        post_save.connect(_on_post_save, sender=model)
+        post_delete.connect(_on_post_delete, sender=model)
+
+    post_init.connect(_on_user_post_init, sender=User)
+    post_save.connect(_on_user_post_save, sender=User)
+    post_delete.connect(_on_user_post_delete, sender=User)
+
+    comments_bulk_created.connect(_on_comments_bulk_created, sender=Review)
+
+
+def _get_counts_by_day(queryset, date_field):
+    """Return the number of objects in a queryset per day.
+
+    Args:
+        queryset (django.db.models.query.QuerySet):
+            The objects to count.
+
+        date_field (unicode):
+            The name of the date/time field to group by.
+
+    Returns:
+        list of tuple:
+        A list of ``(date, count)`` tuples.
+    """
+    column = queryset.model._meta.get_field(date_field).column
+    results = []
+
+    for row in (queryset
+                .extra({'day': 'date(%s)' % column})
+                .values('day')
+                .annotate(day_count=Count('pk'))
+                .order_by()):
+        day = row['day']
+
+        if isinstance(day, six.string_types):
+            # SQLite returns dates as strings.
+            day = datetime.datetime.strptime(day, '%Y-%m-%d').date()
+
+        results.append((day, row['day_count']))
+
+    return results
+
+
+def _replace_counts(object_type, counts, start=None, end=None):
+    """Replace the stored counts for an object type.
+
+    Args:
+        object_type (unicode):
+            The type of object.
+
+        counts (list of tuple):
+            A list of ``(date, count)`` tuples.
+
+        start (datetime.date, optional):
+            The first day to replace counts for. If not provided, all
+            stored counts for the type are replaced.
+
+        end (datetime.date, optional):
+            The last day to replace counts for.
+    """
+    queryset = DailyActivityCount.objects.filter(object_type=object_type)
+
+    if start is not None:
+        queryset = queryset.filter(date__range=(start, end))
+
+    with transaction.atomic():
+        queryset.delete()
+        DailyActivityCount.objects.bulk_create([
+            DailyActivityCount(object_type=object_type,
+                               date=date,
+                               count=count)
+            for date, count in counts
+            if count
+        ])
+
+
+def update_activity_counts(start=None, end=None):
+    """Recompute stored counts from the database.
+
+    The totals for objects without a creation date and the counts of users
+    by last login date are always fully recomputed. If the counts have never
+    been computed, all counts are recomputed, regardless of the range.
+
+    Args:
+        start (datetime.date, optional):
+            The first day (in UTC) to recompute counts for. If not provided,
+            all counts are recomputed.
+
+        end (datetime.date, optional):
+            The last day (in UTC) to recompute counts for. This defaults to
+            today.
+    """
+    siteconfig = SiteConfiguration.objects.get_current()
+    backfilled = siteconfig.get(_BACKFILLED_SITECONFIG_KEY, False)
+
+    if not backfilled:
+        start = None
+    elif start is not None:
+        if end is None:
+            end = _get_utc_date(timezone.now())
+
+        range_start = datetime.datetime.combine(start, datetime.time.min)
+        range_end = datetime.datetime.combine(
+            end + datetime.timedelta(days=1), datetime.time.min)
+
+        if settings.USE_TZ:
+            range_start = timezone.make_aware(range_start, timezone.utc)
+            range_end = timezone.make_aware(range_end, timezone.utc)
+
+    for object_type, model, date_field in ACTIVITY_SOURCES:
+        if date_field is None:
+            _replace_counts(object_type, [(UNDATED, model.objects.count())])
+        elif start is None:
+            _replace_counts(object_type,
+                            _get_counts_by_day(model.objects.all(),
+                                               date_field))
+        else:
+            queryset = model.objects.filter(**{
+                '%s__gte' % date_field: range_start,
+                '%s__lt' % date_field: range_end,
+            })
+            _replace_counts(object_type,
+                            _get_counts_by_day(queryset, date_field),
+                            start, end)
+
+    _replace_counts(
+        USER_LOGINS,
+        _get_counts_by_day(User.objects.filter(last_login__isnull=False),
+                           'last_login'))
+
+    if not backfilled:
+        siteconfig.set(_BACKFILLED_SITECONFIG_KEY, True)
+        siteconfig.save()
+
+
+def get_activity_totals(object_types=OBJECT_TYPES):
+    """Return the total number of objects of each type.
+
+    Args:
+        object_types (list of unicode, optional):
+            The types of objects to return totals for.
+
+    Returns:
+        dict:
+        A dictionary mapping each object type to its total.
+    """
+    totals = dict((object_type, 0) for object_type in object_types)
+    totals.update(
+        (row['object_type'], row['total'])
+        for row in (DailyActivityCount.objects
+                    .filter(object_type__in=object_types)
+                    .values('object_type')
+                    .annotate(total=Sum('count'))
+                    .order_by())
+    )
+
+    return totals
+
+
+def get_daily_activity_counts(object_types=OBJECT_TYPES, start=None,
+                              end=None):
+    """Return the number of objects of each type created per day.
+
+    Days with no objects are left out.
+
+    Args:
+        object_types (list of unicode, optional):
+            The types of objects to return counts for.
+
+        start (datetime.date, optional):
+            The first day (in UTC) to return counts for.
+
+        end (datetime.date, optional):
+            The last day (in UTC) to return counts for.
+
+    Returns:
+        dict:
+        A dictionary mapping each object type to a list of
+        ``(date, count)`` tuples, sorted by date.
+    """
+    queryset = DailyActivityCount.objects.filter(
+        object_type__in=object_types,
+        count__gt=0)
+
+    if start is not None:
+        queryset = queryset.filter(date__gte=start)
+
+    if end is not None:
+        queryset = queryset.filter(date__lte=end)
+
+    results = dict((object_type, []) for object_type in object_types)
+
+    for object_type, date, count in (queryset
+                                     .order_by('date')
+                                     .values_list('object_type', 'date',
+                                                  'count')):
+        results[object_type].append((date, count))
+
+    return results
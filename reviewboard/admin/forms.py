@@ -56,6 +56,7 @@ from reviewboard.admin.checks import (get_can_use_amazon_s3,
 from reviewboard.admin.siteconfig import load_site_config
 from reviewboard.admin.support import get_install_key
 from reviewboard.avatars import avatar_services
+from reviewboard.diffviewer.compression import diff_compressor_registry
 from reviewboard.search import search_backend_registry
 from reviewboard.ssh.client import SSHClient
 
@@ -115,6 +116,15 @@ class GeneralSettingsForm(SiteSettingsForm):
         required=False,
         widget=forms.TextInput(attrs={'size': '30'}))
 
+    push_notifications_enabled = forms.BooleanField(
+        label=_('Enable push notifications'),
+        help_text=_('Notify open review request pages of new activity as it '
+                    'happens, instead of checking periodically. Each open '
+                    'page holds a connection to the server, so this '
+                    'requires a web server that can handle many '
+                    'long-running requests.'),
+        required=False)
+
     site_media_url = forms.CharField(
         label=_("Media URL"),
         help_text=(_('The URL to the media files. Set to '
@@ -382,7 +392,8 @@ class GeneralSettingsForm(SiteSettingsForm):
                 'fields': ('company', 'server', 'site_media_url',
                            'site_static_url', 'site_admin_name',
                            'site_admin_email', 'locale_timezone',
-                           'site_read_only', 'read_only_message'),
+                           'site_read_only', 'read_only_message',
+                           'push_notifications_enabled'),
             },
             {
                 'classes': ('wide',),
@@ -817,6 +828,41 @@ class DiffSettingsForm(SiteSettingsForm):
                     'to disable size restrictions.'),
         widget=forms.TextInput(attrs={'size': '15'}))
 
+    diffviewer_compression = forms.ChoiceField(
+        label=_('Diff storage compression'),
+        help_text=_('The compression used to store newly uploaded diffs. '
+                    'Existing diffs can be converted by running '
+                    '<code>rb-site manage /path/to/site recompressdiffs'
+                    '</code>.'))
+
+    diffviewer_compression_level = forms.IntegerField(
+        label=_('Diff storage compression level'),
+        help_text=_('The compression level to use. Higher levels produce '
+                    'smaller diffs, but take longer to compress. Leave '
+                    'blank to use the default for the compression type.'),
+        min_value=0,
+        max_value=9,
+        required=False,
+        widget=forms.TextInput(attrs={'size': '5'}))
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the form.
+
+        Args:
+            *args (tuple):
+                Positional arguments to pass to the parent constructor.
+
+            **kwargs (dict):
+                Keyword arguments to pass to the parent constructor.
+        """
+        super(DiffSettingsForm, self).__init__(*args, **kwargs)
+
+        self.fields['diffviewer_compression'].choices = [
+            (compressor.compressor_id, compressor.name)
+            for compressor in
+            diff_compressor_registry.get_available_compressors()
+        ]
+
     def load(self):
         """Load the form."""
         super(DiffSettingsForm, self).load()
@@ -853,7 +899,9 @@ class DiffSettingsForm(SiteSettingsForm):
                 'fields': ('diffviewer_max_diff_size',
                            'diffviewer_context_num_lines',
                            'diffviewer_paginate_by',
-                           'diffviewer_paginate_orphans')
+                           'diffviewer_paginate_orphans',
+                           'diffviewer_compression',
+                           'diffviewer_compression_level')
             }
         )
 
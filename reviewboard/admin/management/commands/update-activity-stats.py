@@ -0,0 +1,55 @@
+from __future__ import unicode_literals
+
+from datetime import timedelta
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.translation import ugettext as _
+
+from reviewboard.admin.activity_stats import update_activity_counts
+
+
+class Command(BaseCommand):
+    help = _('Recomputes the daily activity counts shown in the '
+             'administration dashboard and the activity stats API. This '
+             'should be run periodically to correct for changes that '
+             'weren\'t tracked as they happened.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--days',
+                    type='int',
+                    default=7,
+                    dest='days',
+                    help=_('The number of most recent days to recompute '
+                           'counts for.')),
+        make_option('--backfill',
+                    action='store_true',
+                    default=False,
+                    dest='backfill',
+                    help=_('Recompute counts for all days. This may take a '
+                           'while on large databases.')),
+    )
+
+    def handle(self, *args, **options):
+        days = options['days']
+
+        if days < 1:
+            raise CommandError(_('--days must be a positive number.'))
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        if options['backfill']:
+            update_activity_counts()
+
+            self.stdout.write(_('Recomputed all activity counts.'))
+        else:
+            end = timezone.now().date()
+            update_activity_counts(start=end - timedelta(days=days - 1),
+                                   end=end)
+
+            self.stdout.write(_('Recomputed activity counts for the last %d '
+                                'days.')
+                              % days)
@@ -11,6 +11,7 @@ from reviewboard.accounts.backends.x509 import X509Backend
 from reviewboard.admin.checks import check_updates_required
 from reviewboard.admin.siteconfig import load_site_config
 from reviewboard.admin.views import manual_updates_required
+from reviewboard.background import start_periodic_tasks
 
 
 class InitReviewBoardMiddleware(object):
@@ -25,6 +26,10 @@ class InitReviewBoardMiddleware(object):
         """Ensure that Review Board initialization code has run."""
         if not self._initialized:
             initialize()
+
+            # Resume any work left in the database by earlier processes.
+            start_periodic_tasks()
+
             self._initialized = True
 
 
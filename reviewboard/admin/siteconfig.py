@@ -145,6 +145,8 @@ defaults.update({
     'auth_x509_autocreate_users': False,
     'company': '',
     'default_use_rich_text': True,
+    'diffviewer_compression': 'bzip2',
+    'diffviewer_compression_level': None,
     'diffviewer_context_num_lines': 5,
     'diffviewer_include_space_patterns': [],
     'diffviewer_max_diff_size': 0,
@@ -157,6 +159,7 @@ defaults.update({
     'mail_send_new_user_mail': False,
     'mail_send_password_changed_mail': False,
     'mail_enable_autogenerated_header': True,
+    'push_notifications_enabled': False,
     'search_enable': False,
     'send_support_usage_stats': True,
     'site_domain_method': 'http',
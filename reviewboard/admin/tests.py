@@ -3,20 +3,29 @@ from __future__ import unicode_literals
 import os
 import shutil
 import tempfile
+from datetime import date, datetime
 
 from django.conf import settings
 from django.forms import ValidationError
+from django.utils import timezone
 from django.utils.encoding import force_str
 from djblets.siteconfig.models import SiteConfiguration
 
 from reviewboard.admin import checks
+from reviewboard.admin.activity_stats import (USER_LOGINS,
+                                              get_activity_totals,
+                                              get_daily_activity_counts,
+                                              update_activity_counts)
 from reviewboard.admin.forms import SearchSettingsForm
 from reviewboard.admin.validation import validate_bug_tracker
-from reviewboard.admin.widgets import (Widget,
+from reviewboard.admin.widgets import (DatabaseStatsWidget,
+                                       Widget,
                                        primary_widgets,
                                        register_admin_widget,
                                        secondary_widgets,
                                        unregister_admin_widget)
+from reviewboard.changedescs.models import ChangeDescription
+from reviewboard.reviews.models import DailyActivityCount
 from reviewboard.search import search_backend_registry
 from reviewboard.search.search_backends.base import (SearchBackend,
                                                      SearchBackendForm)
@@ -241,6 +250,154 @@ class SSHSettingsFormTestCase(TestCase):
         self.assertEqual(self.ssh_client.get_user_key(), None)
 
 
+class ActivityStatsTests(TestCase):
+    """Unit tests for reviewboard.admin.activity_stats."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(ActivityStatsTests, self).setUp()
+
+        self.review_request = self.create_review_request(publish=True)
+
+    def test_update_activity_counts(self):
+        """Testing update_activity_counts computes counts for each day"""
+        self.create_review(self.review_request,
+                           timestamp=datetime(2017, 1, 2, 10, 0,
+                                              tzinfo=timezone.utc))
+        self.create_review(self.review_request,
+                           timestamp=datetime(2017, 1, 2, 23, 0,
+                                              tzinfo=timezone.utc))
+        self.create_review(self.review_request,
+                           timestamp=datetime(2017, 1, 5, 1, 0,
+                                              tzinfo=timezone.utc))
+
+        update_activity_counts()
+
+        self.assertEqual(
+            get_daily_activity_counts(['reviews'],
+                                      start=date(2017, 1, 1),
+                                      end=date(2017, 1, 31)),
+            {
+                'reviews': [
+                    (date(2017, 1, 2), 2),
+                    (date(2017, 1, 5), 1),
+                ],
+            })
+
+        totals = get_activity_totals(['reviews', 'review_requests'])
+        self.assertEqual(totals['reviews'], 3)
+        self.assertEqual(totals['review_requests'], 1)
+
+    def test_update_activity_counts_with_range(self):
+        """Testing update_activity_counts only recomputes counts in the
+        given range
+        """
+        self.create_review(self.review_request,
+                           timestamp=datetime(2017, 1, 2, 10, 0,
+                                              tzinfo=timezone.utc))
+        self.create_review(self.review_request,
+                           timestamp=datetime(2017, 1, 5, 1, 0,
+                                              tzinfo=timezone.utc))
+
+        update_activity_counts()
+        DailyActivityCount.objects.filter(object_type='reviews').update(
+            count=10)
+
+        update_activity_counts(start=date(2017, 1, 4),
+                               end=date(2017, 1, 6))
+
+        self.assertEqual(
+            get_daily_activity_counts(['reviews'],
+                                      start=date(2017, 1, 1),
+                                      end=date(2017, 1, 31)),
+            {
+                'reviews': [
+                    (date(2017, 1, 2), 10),
+                    (date(2017, 1, 5), 1),
+                ],
+            })
+
+    def test_track_created(self):
+        """Testing activity counts are updated when objects are created"""
+        update_activity_counts()
+
+        with self.settings(TRACK_ACTIVITY_STATS=True):
+            self.create_review_request(publish=True)
+            self.create_file_attachment(self.review_request)
+
+        totals = get_activity_totals(['file_attachments', 'review_requests'])
+        self.assertEqual(totals['file_attachments'], 1)
+        self.assertEqual(totals['review_requests'], 2)
+
+    def test_track_deleted(self):
+        """Testing activity counts are updated when objects are deleted"""
+        review = self.create_review(self.review_request)
+        update_activity_counts()
+
+        with self.settings(TRACK_ACTIVITY_STATS=True):
+            review.delete()
+
+        self.assertEqual(get_activity_totals(['reviews'])['reviews'], 0)
+
+    def test_track_date_changed(self):
+        """Testing activity counts are updated when an object moves to a
+        new date
+        """
+        update_activity_counts()
+
+        with self.settings(TRACK_ACTIVITY_STATS=True):
+            changedesc = ChangeDescription.objects.create(
+                timestamp=datetime(2017, 1, 2, 10, 0, tzinfo=timezone.utc))
+
+            changedesc = ChangeDescription.objects.get(pk=changedesc.pk)
+            changedesc.timestamp = datetime(2017, 1, 5, 1, 0,
+                                            tzinfo=timezone.utc)
+            changedesc.save()
+
+        self.assertEqual(
+            get_daily_activity_counts(['change_descriptions'],
+                                      start=date(2017, 1, 1),
+                                      end=date(2017, 1, 31)),
+            {
+                'change_descriptions': [(date(2017, 1, 5), 1)],
+            })
+
+    def test_track_login(self):
+        """Testing login activity counts are updated when a user logs in"""
+        update_activity_counts()
+
+        with self.settings(TRACK_ACTIVITY_STATS=True):
+            self.assertTrue(self.client.login(username='doc',
+                                              password='doc'))
+
+        today = timezone.now().astimezone(timezone.utc).date()
+        counts = get_daily_activity_counts([USER_LOGINS])[USER_LOGINS]
+
+        self.assertIn((date(2007, 6, 24), 2), counts)
+        self.assertIn((today, 1), counts)
+
+    def test_reads_dont_compute_counts(self):
+        """Testing reading activity counts doesn't compute them from scratch
+        """
+        self.assertEqual(
+            get_activity_totals(['review_requests'])['review_requests'],
+            0)
+        self.assertFalse(DailyActivityCount.objects.exists())
+
+    def test_database_stats_widget(self):
+        """Testing DatabaseStatsWidget reads totals from activity counts"""
+        self.create_review(self.review_request)
+        self.create_file_attachment(self.review_request)
+        update_activity_counts()
+
+        data = DatabaseStatsWidget().generate_data(None)
+
+        self.assertEqual(data['count_reviews'], 1)
+        self.assertEqual(data['count_attachments'], 1)
+        self.assertEqual(data['count_comments'], 0)
+
+
 class WidgetTests(TestCase):
     """Tests for administrator dashboard widgets."""
 
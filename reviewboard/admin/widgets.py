@@ -6,8 +6,6 @@ import re
 import time
 
 from django.core.cache import cache
-from django.contrib.auth.models import User
-from django.db.models.aggregates import Count
 from django.db.models.signals import post_save, post_delete
 from django.template.context import RequestContext
 from django.template.loader import render_to_string
@@ -15,13 +13,11 @@ from django.utils import six, timezone
 from django.utils.translation import ugettext_lazy as _
 from djblets.cache.backend import cache_memoize
 
+from reviewboard.admin.activity_stats import (USER_LOGINS,
+                                              get_activity_totals,
+                                              get_daily_activity_counts)
 from reviewboard.admin.cache_stats import get_cache_stats
-from reviewboard.attachments.models import FileAttachment
-from reviewboard.changedescs.models import ChangeDescription
-from reviewboard.diffviewer.models import DiffSet
-from reviewboard.reviews.models import (ReviewRequest, Group,
-                                        Comment, Review, Screenshot,
-                                        ReviewRequestDraft)
+from reviewboard.reviews.models import ReviewRequest, Group
 from reviewboard.scmtools.models import Repository
 
 
@@ -150,29 +146,35 @@ class UserActivityWidget(Widget):
 
     def generate_data(self, request):
         """Generate data for the widget."""
-        now = timezone.now()
-        users = User.objects
+        today = datetime.datetime.utcnow().date()
+        data = {
+            'now': 0,
+            'seven_days': 0,
+            'thirty_days': 0,
+            'sixty_days': 0,
+            'ninety_days': 0,
+            'total': get_activity_totals(['users'])['users'],
+        }
 
-        week = datetime.timedelta(days=7)
-        day = datetime.timedelta(days=1)
-        month = datetime.timedelta(days=30)
-        two_months = datetime.timedelta(days=60)
-        three_months = datetime.timedelta(days=90)
+        logins = get_daily_activity_counts([USER_LOGINS])[USER_LOGINS]
 
-        one_day = (now - week, now + day)
-        seven_days = (now - month, now - week)
-        thirty_days = (now - two_months, now - month)
-        sixty_days = (now - three_months, now - two_months)
-        ninety_days = now - three_months
+        for date, count in logins:
+            days_ago = (today - date).days
 
-        return {
-            'now': users.filter(last_login__range=one_day).count(),
-            'seven_days': users.filter(last_login__range=seven_days).count(),
-            'thirty_days': users.filter(last_login__range=thirty_days).count(),
-            'sixty_days': users.filter(last_login__range=sixty_days).count(),
-            'ninety_days': users.filter(last_login__lte=ninety_days).count(),
-            'total': users.count()
-        }
+            if days_ago < 7:
+                key = 'now'
+            elif days_ago < 30:
+                key = 'seven_days'
+            elif days_ago < 60:
+                key = 'thirty_days'
+            elif days_ago < 90:
+                key = 'sixty_days'
+            else:
+                key = 'ninety_days'
+
+            data[key] += count
+
+        return data
 
 
 class ReviewRequestStatusesWidget(Widget):
@@ -338,13 +340,22 @@ class DatabaseStatsWidget(Widget):
 
     def generate_data(self, request):
         """Generate data for the widget."""
+        totals = get_activity_totals([
+            'comments',
+            'diffsets',
+            'file_attachments',
+            'review_request_drafts',
+            'reviews',
+            'screenshots',
+        ])
+
         return {
-            'count_comments': Comment.objects.all().count(),
-            'count_reviews': Review.objects.all().count(),
-            'count_attachments': FileAttachment.objects.all().count(),
-            'count_reviewdrafts': ReviewRequestDraft.objects.all().count(),
-            'count_screenshots': Screenshot.objects.all().count(),
-            'count_diffsets': DiffSet.objects.all().count()
+            'count_comments': totals['comments'],
+            'count_reviews': totals['reviews'],
+            'count_attachments': totals['file_attachments'],
+            'count_reviewdrafts': totals['review_request_drafts'],
+            'count_screenshots': totals['screenshots'],
+            'count_diffsets': totals['diffsets'],
         }
 
 
@@ -407,46 +418,25 @@ def dynamic_activity_data(request):
     }
 
     def large_stats_data(range_start, range_end):
-        def get_objects(model_name, timestamp_field, date_field):
-            """Perform timestamp based queries.
-
-            This method receives a dynamic model name and performs a filter
-            query. Later the results are grouped by day and prepared for the
-            charting library.
-            """
-            args = '%s__range' % timestamp_field
-            q = model_name.objects.filter(**{
-                args: (range_start, range_end)
-            })
-            q = q.extra({timestamp_field: date_field})
-            q = q.values(timestamp_field)
-            q = q.annotate(created_count=Count('pk'))
-            q = q.order_by(timestamp_field)
-
-            data = []
-
-            for obj in q:
-                data.append([
-                    time.mktime(time.strptime(
-                        six.text_type(obj[timestamp_field]),
-                        "%Y-%m-%d")) * 1000,
-                    obj['created_count']
-                ])
-
-            return data
-
-        comment_array = get_objects(Comment, "timestamp", "date(timestamp)")
-        change_desc_array = get_objects(ChangeDescription, "timestamp",
-                                        "date(timestamp)")
-        review_array = get_objects(Review, "timestamp", "date(timestamp)")
-        rr_array = get_objects(ReviewRequest, "time_added", "date(time_added)")
+        """Return the activity counts for each day in the range.
 
-        return {
-            'change_descriptions': change_desc_array,
-            'comments': comment_array,
-            'reviews': review_array,
-            'review_requests': rr_array
-        }
+        The results are prepared for the charting library.
+        """
+        counts = get_daily_activity_counts(
+            ['change_descriptions', 'comments', 'reviews', 'review_requests'],
+            start=range_start.date(),
+            end=range_end.date())
+
+        return dict(
+            (object_type, [
+                [
+                    time.mktime(date.timetuple()) * 1000,
+                    count,
+                ]
+                for date, count in object_counts
+            ])
+            for object_type, object_counts in six.iteritems(counts)
+        )
 
     stats_data = large_stats_data(new_range_start, new_range_end)
 
@@ -19,4 +19,15 @@ def _register_mimetype_handlers(**kwargs):
     register_mimetype_handler(TextMimetype)
 
 
+def _connect_thumbnail_signals(**kwargs):
+    """Connect signals for generating thumbnails in the background."""
+    from django.db.models.signals import post_save
+
+    from reviewboard.attachments.models import FileAttachment
+    from reviewboard.attachments.thumbnails import on_file_attachment_saved
+
+    post_save.connect(on_file_attachment_saved, sender=FileAttachment)
+
+
 initializing.connect(_register_mimetype_handlers)
+initializing.connect(_connect_thumbnail_signals)
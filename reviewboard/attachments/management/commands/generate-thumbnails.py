@@ -0,0 +1,79 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _
+
+from reviewboard.attachments.models import FileAttachment
+from reviewboard.attachments.thumbnails import generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = _('Generates thumbnails for existing file attachments.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--start-id',
+                    type='int',
+                    default=0,
+                    dest='start_id',
+                    help=_('The file attachment ID to start from. This can '
+                           'be used to resume an interrupted run.')),
+        make_option('--batch-size',
+                    type='int',
+                    default=100,
+                    dest='batch_size',
+                    help=_('The number of file attachments to load at a '
+                           'time.')),
+    )
+
+    def handle(self, *args, **options):
+        start_id = options['start_id']
+        batch_size = options['batch_size']
+
+        if batch_size < 1:
+            raise CommandError(_('--batch-size must be a positive number.'))
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        queryset = (
+            FileAttachment.objects
+            .exclude(file='')
+            .exclude(file__isnull=True)
+            .order_by('pk')
+        )
+
+        processed_count = 0
+        failed_count = 0
+        last_id = start_id - 1
+
+        while True:
+            attachments = list(queryset.filter(pk__gt=last_id)[:batch_size])
+
+            if not attachments:
+                break
+
+            for attachment in attachments:
+                if not generate_thumbnail(attachment):
+                    failed_count += 1
+
+            processed_count += len(attachments)
+            last_id = attachments[-1].pk
+
+            self.stdout.write(
+                _('Processed %(count)d file attachments (last ID: '
+                  '%(last_id)d)')
+                % {
+                    'count': processed_count,
+                    'last_id': last_id,
+                })
+
+        self.stdout.write(
+            _('Generated thumbnails for %(count)d file attachments '
+              '(%(failed)d failed).')
+            % {
+                'count': processed_count - failed_count,
+                'failed': failed_count,
+            })
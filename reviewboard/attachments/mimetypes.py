@@ -9,17 +9,21 @@ import subprocess
 
 import mimeparse
 from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
 from django.contrib.staticfiles.templatetags.staticfiles import static
 from django.utils.html import format_html, format_html_join
 from django.utils.encoding import smart_str, force_text
 from django.utils.safestring import mark_safe
-from djblets.cache.backend import cache_memoize
+from djblets.cache.backend import cache_memoize, make_cache_key
 from djblets.util.filesystem import is_exe_in_path
 from djblets.util.templatetags.djblets_images import thumbnail
+from PIL.Image import registered_extensions
 from pygments import highlight
 from pygments.lexers import (ClassNotFound, guess_lexer_for_filename,
                              TextLexer)
 
+from reviewboard.attachments.thumbnails import (is_thumbnail_ready,
+                                                queue_thumbnail_generation)
 from reviewboard.reviews.markdown_utils import render_markdown
 
 
@@ -393,6 +397,72 @@ class MimetypeHandler(object):
         """
         return mark_safe('<pre class="file-thumbnail"></pre>')
 
+    def generate_thumbnail(self):
+        """Generate and store the thumbnail for the attachment.
+
+        This is called in a background worker when a file attachment is
+        created, or when a thumbnail is first requested for an attachment
+        that doesn't have one yet. Subclasses that perform expensive work
+        to build a thumbnail (such as resizing images or reading file
+        contents) should do that work here and store the result, so that
+        :py:meth:`get_thumbnail` only needs to look it up.
+
+        By default, this does nothing.
+        """
+        pass
+
+    def has_generated_thumbnail(self):
+        """Return whether the results of generate_thumbnail() are stored.
+
+        Subclasses that override :py:meth:`generate_thumbnail` should
+        override this to check for the stored results. This is only called
+        when readiness isn't already recorded in the cache, such as after
+        the cache is cleared.
+
+        By default, this returns ``True``, since there is nothing to
+        generate.
+
+        Returns:
+            bool:
+            ``True`` if the generated thumbnail is stored.
+        """
+        return True
+
+    def get_thumbnail_placeholder(self):
+        """Return HTML shown while the thumbnail is being generated.
+
+        Returns:
+            django.utils.safestring.SafeText:
+            The HTML for the placeholder thumbnail.
+        """
+        return format_html(
+            '<div class="file-thumbnail file-thumbnail-pending">'
+            ' <img src="{src}" alt="{caption}" />'
+            '</div>',
+            src=self.get_icon_url(),
+            caption=self.attachment.caption)
+
+    def is_thumbnail_ready(self):
+        """Return whether the generated thumbnail is ready for display.
+
+        If the thumbnail has not been generated, this will queue generation
+        in the background.
+
+        Returns:
+            bool:
+            ``True`` if the thumbnail is ready. If ``False``, callers should
+            show :py:meth:`get_thumbnail_placeholder` instead.
+        """
+        if is_thumbnail_ready(self.attachment):
+            return True
+
+        queue_thumbnail_generation(self.attachment)
+
+        # Generation may have happened immediately (for instance, if
+        # background tasks are run inline), in which case it's been recorded
+        # in the cache. There's no need to check the storage again.
+        return is_thumbnail_ready(self.attachment, check_storage=False)
+
     def set_thumbnail(self):
         """Set the thumbnail data for this attachment.
 
@@ -410,13 +480,52 @@ class ImageMimetype(MimetypeHandler):
 
     supported_mimetypes = ['image/*']
 
+    #: The widths of the generated thumbnails.
+    THUMBNAIL_WIDTHS = (300, 600)
+
+    def generate_thumbnail(self):
+        """Generate the resized thumbnail images.
+
+        The thumbnails are stored alongside the attachment in the file
+        storage.
+        """
+        for width in self.THUMBNAIL_WIDTHS:
+            thumbnail(self.attachment.file, (width, None))
+
+    def has_generated_thumbnail(self):
+        """Return whether the resized thumbnail images are stored.
+
+        Returns:
+            bool:
+            ``True`` if all resized images exist in the file storage.
+        """
+        f = self.attachment.file
+        ext = os.path.splitext(f.name)[1].lower()
+
+        if ext not in registered_extensions():
+            # thumbnail() serves these images as-is, without resizing.
+            return True
+
+        storage = f.storage
+
+        return all(
+            storage.exists(self._get_thumbnail_filename(width))
+            for width in self.THUMBNAIL_WIDTHS
+        )
+
     def get_thumbnail(self):
         """Return a thumbnail of the image.
 
+        If the resized images have not yet been generated, a placeholder will
+        be returned instead.
+
         Returns:
             django.utils.safestring.SafeText:
             The HTML for the thumbnail for the associated attachment.
         """
+        if not self.is_thumbnail_ready():
+            return self.get_thumbnail_placeholder()
+
         return format_html(
             '<div class="file-thumbnail">'
             ' <img src="{src_1x}" srcset="{src_1x} 1x, {src_2x} 2x"'
@@ -426,6 +535,29 @@ class ImageMimetype(MimetypeHandler):
             src_2x=thumbnail(self.attachment.file, (600, None)),
             caption=self.attachment.caption)
 
+    def _get_thumbnail_filename(self, width):
+        """Return the stored filename of a resized thumbnail image.
+
+        This matches the filename used by
+        :py:func:`djblets.util.templatetags.djblets_images.thumbnail`.
+
+        Args:
+            width (int):
+                The width of the thumbnail.
+
+        Returns:
+            unicode:
+            The filename of the thumbnail in the file storage.
+        """
+        filename = self.attachment.file.name
+
+        if '.' in filename:
+            basename, ext = filename.rsplit('.', 1)
+
+            return '%s_%d.%s' % (basename, width, ext)
+        else:
+            return '%s_%d' % (filename, width)
+
 
 class TextMimetype(MimetypeHandler):
     """Handles text mimetypes.
@@ -514,10 +646,18 @@ class TextMimetype(MimetypeHandler):
             '</div>',
             self._generate_preview_html(data))
 
+    def generate_thumbnail(self):
+        """Generate the HTML thumbnail and store it in the cache."""
+        cache_memoize(self._get_thumbnail_cache_key(),
+                      self._generate_thumbnail,
+                      force_overwrite=True)
+
     def get_thumbnail(self):
         """Return the thumbnail of the text file as rendered as html.
 
-        The content will be generated and then cached for future requests.
+        The content is generated in the background and then cached for future
+        requests. If it has not been generated yet, a placeholder will be
+        returned instead.
 
         Returns:
             django.utils.safestring.SafeText:
@@ -527,10 +667,30 @@ class TextMimetype(MimetypeHandler):
         # reload to:
         # 1) re-read the file attachment
         # 2) re-generate the html based on the data read
-        return mark_safe(
-            cache_memoize('file-attachment-thumbnail-%s-html-%s'
-                          % (self.__class__.__name__, self.attachment.pk),
-                          self._generate_thumbnail))
+        cache_key = make_cache_key(self._get_thumbnail_cache_key())
+        html = cache.get(cache_key)
+
+        if html is None:
+            queue_thumbnail_generation(self.attachment)
+
+            # Generation may have happened immediately (for instance, if
+            # background tasks are run inline).
+            html = cache.get(cache_key)
+
+            if html is None:
+                return self.get_thumbnail_placeholder()
+
+        return mark_safe(html)
+
+    def _get_thumbnail_cache_key(self):
+        """Return the cache key for the generated thumbnail.
+
+        Returns:
+            unicode:
+            The cache key.
+        """
+        return ('file-attachment-thumbnail-%s-html-%s'
+                % (self.__class__.__name__, self.attachment.pk))
 
 
 class ReStructuredTextMimetype(TextMimetype):
@@ -7,17 +7,21 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import override_settings
 from django.utils.safestring import SafeText
 from djblets.testing.decorators import add_fixtures
 from kgb import SpyAgency
 
 from reviewboard.attachments.forms import UploadFileForm, UploadUserFileForm
-from reviewboard.attachments.mimetypes import (MimetypeHandler,
+from reviewboard.attachments.mimetypes import (ImageMimetype,
+                                               MimetypeHandler,
                                                register_mimetype_handler,
                                                score_match,
                                                unregister_mimetype_handler)
 from reviewboard.attachments.models import (FileAttachment,
                                             FileAttachmentHistory)
+from reviewboard.attachments.thumbnails import is_thumbnail_ready
+from reviewboard.background import BackgroundTaskQueue
 from reviewboard.diffviewer.models import DiffSet, DiffSetHistory, FileDiff
 from reviewboard.scmtools.core import PRE_CREATION
 from reviewboard.site.models import LocalSite
@@ -769,6 +773,75 @@ class SandboxTests(SpyAgency, BaseFileAttachmentTestCase):
         self.assertTrue(SandboxMimetypeHandler.get_icon_url.called)
 
 
+class ThumbnailGenerationTests(SpyAgency, TestCase):
+    """Unit tests for background thumbnail generation."""
+
+    def test_generated_on_create(self):
+        """Testing thumbnails are generated when a FileAttachment is created
+        """
+        self.spy_on(ImageMimetype.generate_thumbnail)
+
+        review_request = self.create_review_request()
+        file_attachment = self.create_file_attachment(review_request)
+
+        self.assertEqual(len(ImageMimetype.generate_thumbnail.spy.calls), 1)
+        self.assertTrue(is_thumbnail_ready(file_attachment))
+        self.assertIn('<img src="', file_attachment.thumbnail)
+        self.assertNotIn('file-thumbnail-pending', file_attachment.thumbnail)
+
+    def test_ready_after_cache_cleared(self):
+        """Testing thumbnails remain ready after the cache is cleared"""
+        review_request = self.create_review_request()
+        file_attachment = self.create_file_attachment(review_request)
+
+        cache.clear()
+        self.spy_on(ImageMimetype.generate_thumbnail)
+
+        self.assertTrue(is_thumbnail_ready(file_attachment))
+        self.assertNotIn('file-thumbnail-pending', file_attachment.thumbnail)
+        self.assertFalse(ImageMimetype.generate_thumbnail.called)
+
+    def test_ready_cached_after_generation(self):
+        """Testing rendering generated thumbnails doesn't check the file
+        storage
+        """
+        review_request = self.create_review_request()
+        file_attachment = self.create_file_attachment(review_request)
+
+        self.spy_on(ImageMimetype.has_generated_thumbnail)
+
+        self.assertNotIn('file-thumbnail-pending', file_attachment.thumbnail)
+        self.assertNotIn('file-thumbnail-pending', file_attachment.thumbnail)
+        self.assertFalse(ImageMimetype.has_generated_thumbnail.called)
+
+        # Once the storage has been checked, the result is cached again.
+        cache.clear()
+
+        self.assertTrue(is_thumbnail_ready(file_attachment))
+        self.assertTrue(is_thumbnail_ready(file_attachment))
+        self.assertEqual(
+            len(ImageMimetype.has_generated_thumbnail.spy.calls), 1)
+
+    @override_settings(RUN_BACKGROUND_TASKS_INLINE=False)
+    def test_placeholder_when_pending(self):
+        """Testing ImageMimetype.get_thumbnail returns a placeholder while
+        thumbnails are being generated
+        """
+        self.spy_on(BackgroundTaskQueue.add,
+                    call_fake=lambda *args, **kwargs: None)
+        self.spy_on(ImageMimetype.generate_thumbnail)
+
+        review_request = self.create_review_request()
+        file_attachment = self.create_file_attachment(review_request)
+
+        self.assertIn('file-thumbnail-pending', file_attachment.thumbnail)
+        self.assertFalse(ImageMimetype.generate_thumbnail.called)
+
+        # Only the creation should have queued the thumbnail, since it's
+        # still pending.
+        self.assertEqual(len(BackgroundTaskQueue.add.spy.calls), 1)
+
+
 class TextMimetypeTests(SpyAgency, TestCase):
     """Unit tests for reviewboard.attachments.mimetypes.TextMimetype."""
 
@@ -0,0 +1,211 @@
+"""Background generation of file attachment thumbnails.
+
+Thumbnails are generated by the attachment's
+:py:class:`~reviewboard.attachments.mimetypes.MimetypeHandler` in a
+background worker when a file attachment is created (or the first time a
+thumbnail is requested for an older attachment). Until a thumbnail is ready,
+handlers render a lightweight placeholder instead.
+
+Once thumbnails are generated, that's recorded in the cache, so rendering
+them doesn't need to check the file storage (which may be remote, such as
+Amazon S3). The storage is only checked if the flag isn't in the cache.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+
+from django.core.cache import cache
+from djblets.cache.backend import make_cache_key
+
+from reviewboard.background import run_in_background
+
+
+#: How long a pending thumbnail generation blocks re-queueing, in seconds.
+THUMBNAIL_PENDING_TIMEOUT = 5 * 60
+
+#: How long generated thumbnails are remembered as ready, in seconds.
+THUMBNAIL_READY_TIMEOUT = 30 * 24 * 60 * 60
+
+
+def _make_pending_cache_key(attachment_id):
+    """Return the cache key tracking a queued thumbnail generation.
+
+    Args:
+        attachment_id (int):
+            The ID of the file attachment.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('file-attachment-thumbnail-pending-%s'
+                          % attachment_id)
+
+
+def _make_ready_cache_key(attachment):
+    """Return the cache key recording that thumbnails have been generated.
+
+    The key includes the name of the stored file, so a flag can't apply to
+    different file contents.
+
+    Args:
+        attachment (reviewboard.attachments.models.FileAttachment):
+            The file attachment.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('file-attachment-thumbnail-ready-%s-%s'
+                          % (attachment.pk, attachment.file.name))
+
+
+def is_thumbnail_ready(attachment, check_storage=True):
+    """Return whether thumbnails have been generated for an attachment.
+
+    This first checks the cache. If readiness isn't cached, the attachment's
+    mimetype handler is asked whether its generated thumbnails are present
+    in storage, and the result is cached if they are.
+
+    Args:
+        attachment (reviewboard.attachments.models.FileAttachment):
+            The file attachment.
+
+        check_storage (bool, optional):
+            Whether to check the storage if readiness isn't cached.
+
+    Returns:
+        bool:
+        ``True`` if the thumbnails are ready to be displayed.
+    """
+    handler = attachment.mimetype_handler
+
+    if handler is None:
+        return True
+
+    cache_key = _make_ready_cache_key(attachment)
+
+    if cache.get(cache_key):
+        return True
+
+    if not check_storage:
+        return False
+
+    try:
+        ready = handler.has_generated_thumbnail()
+    except Exception as e:
+        logging.exception('Error when calling has_generated_thumbnail for '
+                          'MimetypeHandler %r on file attachment %s: %s',
+                          handler, attachment.pk, e)
+        return False
+
+    if ready:
+        cache.set(cache_key, True, THUMBNAIL_READY_TIMEOUT)
+
+    return ready
+
+
+def generate_thumbnail(attachment):
+    """Generate the thumbnails for an attachment.
+
+    This calls the attachment's mimetype handler to generate and store its
+    thumbnails, and records in the cache that they're ready. Errors are
+    logged, rather than raised.
+
+    Args:
+        attachment (reviewboard.attachments.models.FileAttachment):
+            The file attachment.
+
+    Returns:
+        bool:
+        ``True`` if the thumbnails were generated successfully.
+    """
+    handler = attachment.mimetype_handler
+
+    if handler is None:
+        return False
+
+    try:
+        handler.generate_thumbnail()
+    except Exception as e:
+        logging.exception('Error when calling generate_thumbnail for '
+                          'MimetypeHandler %r on file attachment %s: %s',
+                          handler, attachment.pk, e)
+        return False
+    finally:
+        cache.delete(_make_pending_cache_key(attachment.pk))
+
+    cache.set(_make_ready_cache_key(attachment), True,
+              THUMBNAIL_READY_TIMEOUT)
+
+    return True
+
+
+def _generate_thumbnail_for_id(attachment_id):
+    """Generate the thumbnails for an attachment with the given ID.
+
+    This is run from a background worker.
+
+    Args:
+        attachment_id (int):
+            The ID of the file attachment.
+    """
+    from reviewboard.attachments.models import FileAttachment
+
+    try:
+        attachment = FileAttachment.objects.get(pk=attachment_id)
+    except FileAttachment.DoesNotExist:
+        logging.warning('Unable to generate thumbnails for missing file '
+                        'attachment %s',
+                        attachment_id)
+        cache.delete(_make_pending_cache_key(attachment_id))
+        return
+
+    generate_thumbnail(attachment)
+
+
+def queue_thumbnail_generation(attachment):
+    """Queue generation of the thumbnails for an attachment.
+
+    If generation is already pending for the attachment, this does nothing.
+
+    Args:
+        attachment (reviewboard.attachments.models.FileAttachment):
+            The file attachment.
+
+    Returns:
+        bool:
+        ``True`` if generation was queued.
+    """
+    if not attachment.pk or not attachment.file:
+        return False
+
+    if not cache.add(_make_pending_cache_key(attachment.pk), True,
+                     THUMBNAIL_PENDING_TIMEOUT):
+        return False
+
+    run_in_background(_generate_thumbnail_for_id, attachment.pk)
+
+    return True
+
+
+def on_file_attachment_saved(instance, created=False, raw=False, **kwargs):
+    """Queue thumbnail generation when a file attachment is created.
+
+    Args:
+        instance (reviewboard.attachments.models.FileAttachment):
+            The file attachment that was saved.
+
+        created (bool, optional):
+            Whether the file attachment was newly created.
+
+        raw (bool, optional):
+            Whether the file attachment was saved as part of loading a
+            fixture.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    if created and not raw:
+        queue_thumbnail_generation(instance)
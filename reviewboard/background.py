@@ -0,0 +1,423 @@
+"""Support for running work in background worker threads.
+
+Some operations (such as generating thumbnails or delivering notifications)
+are too slow to run while a user is waiting on a response. These can be
+handed off to a :py:class:`BackgroundTaskQueue`, which runs them on a small
+pool of worker threads within the process.
+
+Frequent small writes (such as visit timestamps or search index updates) can
+be collected in a :py:class:`DelayedBatchBuffer`, which combines them and
+processes them in a batch from a background worker after a short delay.
+
+Work that's stored in the database to be done later (such as retries of
+failed deliveries) is picked up by a :py:class:`PeriodicTask`, which polls
+for it from a single thread. These tasks are registered using
+:py:func:`register_periodic_task` and started along with each web server
+process, so pending work is resumed after a restart.
+
+When running the test suite (or when ``RUN_BACKGROUND_TASKS_INLINE`` is set
+in :file:`settings_local.py`), tasks are run immediately in the calling
+thread instead, which keeps behavior deterministic. Periodic tasks aren't
+started.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import six
+from django.utils.six.moves import queue
+
+
+class BackgroundTaskQueue(object):
+    """A queue of tasks processed by a pool of worker threads.
+
+    Worker threads are started lazily when the first task is added, and are
+    daemon threads, so they won't keep the process alive on shutdown.
+
+    Attributes:
+        name (unicode):
+            The name of the queue, used for thread names and logging.
+
+        num_workers (int):
+            The number of worker threads processing the queue.
+    """
+
+    def __init__(self, name, num_workers=2):
+        """Initialize the queue.
+
+        Args:
+            name (unicode):
+                The name of the queue.
+
+            num_workers (int, optional):
+                The number of worker threads to start.
+        """
+        self.name = name
+        self.num_workers = num_workers
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def add(self, func, *args, **kwargs):
+        """Add a task to the queue.
+
+        Args:
+            func (callable):
+                The function to call.
+
+            *args (tuple):
+                Positional arguments to pass to the function.
+
+            **kwargs (dict):
+                Keyword arguments to pass to the function.
+        """
+        self._start_workers()
+        self._queue.put((func, args, kwargs))
+
+    def join(self):
+        """Block until all queued tasks have been processed."""
+        self._queue.join()
+
+    def _start_workers(self):
+        """Start the worker threads, if not already started."""
+        if self._threads:
+            return
+
+        with self._lock:
+            if not self._threads:
+                for i in range(self.num_workers):
+                    thread = threading.Thread(
+                        name='%s-worker-%d' % (self.name, i + 1),
+                        target=self._run_worker)
+                    thread.daemon = True
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _run_worker(self):
+        """Process tasks from the queue until the process exits."""
+        while True:
+            func, args, kwargs = self._queue.get()
+
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                logging.exception('Unexpected error running background task '
+                                  '%r in queue "%s": %s',
+                                  func, self.name, e)
+            finally:
+                # Each worker thread has its own database connection, which
+                # needs to be cleaned up the same way a request's would be.
+                close_old_connections()
+                self._queue.task_done()
+
+
+_task_queues = {}
+_task_queues_lock = threading.Lock()
+
+
+def should_run_tasks_inline():
+    """Return whether background tasks should run in the calling thread.
+
+    Returns:
+        bool:
+        ``True`` if tasks should be run inline.
+    """
+    return getattr(settings, 'RUN_BACKGROUND_TASKS_INLINE',
+                   getattr(settings, 'RUNNING_TEST', False))
+
+
+def get_task_queue(name='default', num_workers=2):
+    """Return the background task queue with the given name.
+
+    The queue will be created the first time it's requested.
+
+    Args:
+        name (unicode, optional):
+            The name of the queue.
+
+        num_workers (int, optional):
+            The number of worker threads to use if the queue is created.
+
+    Returns:
+        BackgroundTaskQueue:
+        The task queue.
+    """
+    try:
+        return _task_queues[name]
+    except KeyError:
+        with _task_queues_lock:
+            if name not in _task_queues:
+                _task_queues[name] = BackgroundTaskQueue(
+                    name, num_workers=num_workers)
+
+            return _task_queues[name]
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run a function in the default background task queue.
+
+    If tasks are configured to run inline (see
+    :py:func:`should_run_tasks_inline`), the function will be called
+    immediately instead.
+
+    Args:
+        func (callable):
+            The function to call.
+
+        *args (tuple):
+            Positional arguments to pass to the function.
+
+        **kwargs (dict):
+            Keyword arguments to pass to the function.
+    """
+    if should_run_tasks_inline():
+        func(*args, **kwargs)
+    else:
+        get_task_queue().add(func, *args, **kwargs)
+
+
+class DelayedBatchBuffer(object):
+    """Collects items and processes them in batches after a delay.
+
+    Items are stored by key. An item added for a key that's already pending
+    is combined with it through :py:meth:`combine`, so several changes to the
+    same thing between batches are only processed once.
+
+    When the first item is added, :py:meth:`flush` is scheduled to run after
+    the delay on a single worker in the :py:attr:`queue_name` task queue.
+    Items added in the meantime are processed along with the rest.
+
+    Subclasses must set :py:attr:`queue_name` and implement
+    :py:meth:`process`.
+
+    Attributes:
+        delay (float):
+            The number of seconds to collect items before processing them.
+    """
+
+    #: The name of the task queue that processes the batches.
+    #:
+    #: Type:
+    #:     unicode
+    queue_name = None
+
+    def __init__(self, delay):
+        """Initialize the buffer.
+
+        Args:
+            delay (float):
+                The number of seconds to collect items before processing
+                them.
+        """
+        self.delay = delay
+        self._pending = {}
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+
+    def add_item(self, key, value):
+        """Add an item to the next batch.
+
+        Args:
+            key (object):
+                The key identifying the item. This must be hashable.
+
+            value (object):
+                The value of the item.
+        """
+        with self._lock:
+            if key in self._pending:
+                value = self.combine(self._pending[key], value)
+
+            self._pending[key] = value
+
+            if self._flush_scheduled:
+                return
+
+            self._flush_scheduled = True
+
+        self._schedule_flush()
+
+    def flush(self):
+        """Process all pending items."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._flush_scheduled = False
+
+        if pending:
+            self.process(pending)
+
+    def combine(self, old_value, new_value):
+        """Return the combination of two values added for the same key.
+
+        By default, the newest value is kept.
+
+        Args:
+            old_value (object):
+                The pending value.
+
+            new_value (object):
+                The value being added.
+
+        Returns:
+            object:
+            The value to keep pending.
+        """
+        return new_value
+
+    def process(self, items):
+        """Process a batch of items.
+
+        This must be implemented by subclasses.
+
+        Args:
+            items (dict):
+                A dictionary mapping keys to the combined values.
+        """
+        raise NotImplementedError
+
+    def _schedule_flush(self):
+        """Schedule the pending items to be processed.
+
+        After the configured delay, :py:meth:`flush` will be run by a
+        background worker.
+        """
+        timer = threading.Timer(
+            self.delay,
+            get_task_queue(self.queue_name, num_workers=1).add,
+            args=(self.flush,))
+        timer.daemon = True
+        timer.start()
+
+
+class PeriodicTask(object):
+    """A function run periodically by a background thread.
+
+    The function is first run when the task is started, and then every
+    :py:attr:`interval` seconds, or sooner if :py:meth:`wake` is called.
+
+    Attributes:
+        name (unicode):
+            The name of the task, used for the thread name and logging.
+
+        func (callable):
+            The function to run. This takes no arguments.
+
+        interval (float):
+            The number of seconds between runs.
+    """
+
+    def __init__(self, name, func, interval):
+        """Initialize the task.
+
+        Args:
+            name (unicode):
+                The name of the task.
+
+            func (callable):
+                The function to run.
+
+            interval (float):
+                The number of seconds between runs.
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._thread = None
+        self._wake_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        """Whether the task's thread has been started."""
+        return self._thread is not None
+
+    def start(self):
+        """Start running the task, if not already started."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    name='%s-periodic' % self.name,
+                    target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def wake(self):
+        """Run the task as soon as possible."""
+        self._wake_event.set()
+
+    def _run(self):
+        """Run the function until the process exits."""
+        while True:
+            try:
+                self.func()
+            except Exception as e:
+                logging.exception('Unexpected error running periodic task '
+                                  '"%s": %s',
+                                  self.name, e)
+            finally:
+                close_old_connections()
+
+            self._wake_event.wait(self.interval)
+            self._wake_event.clear()
+
+
+_periodic_tasks = {}
+_periodic_tasks_lock = threading.Lock()
+_periodic_tasks_started = False
+
+
+def register_periodic_task(name, func, interval):
+    """Register a function to run periodically in web server processes.
+
+    If periodic tasks have already been started in this process, the new
+    task is started immediately.
+
+    Args:
+        name (unicode):
+            The unique name of the task.
+
+        func (callable):
+            The function to run. This takes no arguments.
+
+        interval (float):
+            The number of seconds between runs.
+
+    Returns:
+        PeriodicTask:
+        The registered task. If a task with this name was already
+        registered, that task is returned instead.
+    """
+    with _periodic_tasks_lock:
+        try:
+            return _periodic_tasks[name]
+        except KeyError:
+            task = PeriodicTask(name, func, interval)
+            _periodic_tasks[name] = task
+
+            if _periodic_tasks_started:
+                task.start()
+
+            return task
+
+
+def start_periodic_tasks():
+    """Start all registered periodic tasks.
+
+    This is called when a web server process has been initialized. Tasks
+    aren't started if background tasks are run inline.
+    """
+    global _periodic_tasks_started
+
+    if should_run_tasks_inline():
+        return
+
+    with _periodic_tasks_lock:
+        _periodic_tasks_started = True
+
+        for task in six.itervalues(_periodic_tasks):
+            task.start()
@@ -1767,6 +1767,9 @@ class UpgradeCommand(Command):
                   "Resetting in-database caches.")
             site.run_manage_command("fixreviewcounts")
 
+            print("Updating activity stats.")
+            site.run_manage_command("update-activity-stats")
+
         site.harden_passwords()
 
         from djblets.siteconfig.models import SiteConfiguration
@@ -37,21 +37,24 @@ import logging
 import os
 import select
 import sys
-from optparse import OptionParser
+from optparse import OptionParser, SUPPRESS_HELP
 
 if str('RBSITE_PYTHONPATH') in os.environ:
     for path in reversed(os.environ[str('RBSITE_PYTHONPATH')].split(str(':'))):
         sys.path.insert(1, path)
 
-import paramiko
+from django.utils.six.moves.urllib.parse import urlparse
 
-from reviewboard import initialize, get_version_string
-from reviewboard.scmtools.core import SCMTool
-from reviewboard.ssh.client import SSHClient
+from reviewboard import get_version_string
+
+# Django, paramiko, and the SSH client are only imported when connecting to
+# a server, so that commands run through an existing control master (see
+# reviewboard.ssh.multiplexer) start quickly.
 
 
 DEBUG = os.getenv('DEBUG_RBSSH')
 DEBUG_LOGDIR = os.getenv('RBSSH_LOG_DIR')
+CONTROL_PERSIST = int(os.getenv('RBSSH_CONTROL_PERSIST') or 5 * 60)
 
 SSH_PORT = 22
 
@@ -248,6 +251,20 @@ def parse_options(args):
                       default=os.getenv('RB_LOCAL_SITE'),
                       help='the local site name containing the SSH keys to '
                            'use')
+    parser.add_option('--rb-control-master',
+                      action='store_true', dest='control_master',
+                      default=os.getenv('RBSSH_CONTROL_MASTER') == '1',
+                      help='share connections to a host through a '
+                           'long-lived control master process')
+    parser.add_option('--rb-control-persist',
+                      type='int', dest='control_persist', metavar='SECONDS',
+                      default=CONTROL_PERSIST,
+                      help='the number of seconds an idle control master '
+                           'keeps running')
+    parser.add_option('--rb-run-control-master',
+                      action='store_true', dest='run_control_master',
+                      default=False,
+                      help=SUPPRESS_HELP)
 
     (options, args) = parser.parse_args(args)
 
@@ -275,49 +292,83 @@ def parse_options(args):
     return hostname, port, args
 
 
-def main():
-    """Run the application."""
-    os.environ.setdefault(str('DJANGO_SETTINGS_MODULE'),
-                          str('reviewboard.settings'))
+def get_auth_from_path(path, username):
+    """Return the username and hostname from the given path.
 
-    if DEBUG:
-        pid = os.getpid()
-        log_filename = 'rbssh-%s.log' % pid
+    This works like :py:meth:`SCMTool.get_auth_from_uri
+    <reviewboard.scmtools.core.SCMTool.get_auth_from_uri>`, but doesn't
+    require importing any of Review Board's models.
 
-        if DEBUG_LOGDIR:
-            log_path = os.path.join(DEBUG_LOGDIR, log_filename)
-        else:
-            log_path = log_filename
+    Args:
+        path (unicode):
+            The path to parse, in the form of ``[user@]hostname``.
 
-        logging.basicConfig(level=logging.DEBUG,
-                            format='%(asctime)s %(name)-18s %(levelname)-8s '
-                                   '%(message)s',
-                            datefmt='%m-%d %H:%M',
-                            filename=log_path,
-                            filemode='w')
+        username (unicode):
+            The username provided on the command line, if any.
 
-        logging.debug('%s' % sys.argv)
-        logging.debug('PID %s' % pid)
+    Returns:
+        tuple:
+        A tuple containing 2 string items: The username, and the hostname.
+    """
+    if '://' not in path:
+        path = 'ssh://' + path
+
+    netloc = urlparse(path)[1]
+
+    if '@' in netloc:
+        netloc_username, hostname = netloc.split('@', 1)
+    else:
+        netloc_username = None
+        hostname = netloc
+
+    return netloc_username or username, hostname
 
-    initialize()
 
+def add_console_log_handler():
+    """Add a handler for displaying log messages on the console.
+
+    Returns:
+        logging.Handler:
+        The new handler.
+    """
     ch = logging.StreamHandler()
     ch.setLevel(logging.INFO)
     ch.setFormatter(logging.Formatter('%(message)s'))
     ch.addFilter(logging.Filter('root'))
     logging.getLogger('').addHandler(ch)
 
-    path, port, command = parse_options(sys.argv[1:])
+    return ch
 
-    if '://' not in path:
-        path = 'ssh://' + path
 
-    username, hostname = SCMTool.get_auth_from_uri(path, options.username)
+def connect(hostname, port, username, interactive=True):
+    """Initialize Review Board and connect to a server.
 
-    if username is None:
-        username = getpass.getuser()
+    This will exit the process if the connection fails.
 
-    logging.debug('!!! %s, %s, %s' % (hostname, username, command))
+    Args:
+        hostname (unicode):
+            The host to connect to.
+
+        port (int):
+            The port to connect to.
+
+        username (unicode):
+            The user to log in as.
+
+        interactive (bool, optional):
+            Whether the user can be prompted for a password.
+
+    Returns:
+        reviewboard.ssh.client.SSHClient:
+        The connected client.
+    """
+    import paramiko
+
+    from reviewboard import initialize
+    from reviewboard.ssh.client import SSHClient
+
+    initialize()
+    add_console_log_handler()
 
     client = SSHClient(namespace=options.local_site_name)
     client.set_missing_host_key_policy(paramiko.WarningPolicy())
@@ -334,7 +385,8 @@ def main():
                            allow_agent=options.allow_agent)
             break
         except paramiko.AuthenticationException as e:
-            if attempts == 3 or not sys.stdin.isatty():
+            if (attempts == 3 or not interactive or
+                not sys.stdin.isatty()):
                 logging.error('Too many authentication failures for %s' %
                               username)
                 sys.exit(1)
@@ -350,6 +402,154 @@ def main():
                           (e, type(e)))
             sys.exit(1)
 
+    return client
+
+
+def run_control_master(hostname, port, username):
+    """Run a control master for a host.
+
+    This is started in the background by :py:func:`run_multiplexed`. It
+    connects to the server without prompting for a password, and then
+    serves channels to other rbssh processes until idle.
+
+    Args:
+        hostname (unicode):
+            The host to connect to.
+
+        port (int):
+            The port to connect to.
+
+        username (unicode):
+            The user to log in as.
+
+    Returns:
+        int:
+        The exit status for the process.
+    """
+    from reviewboard.ssh.multiplexer import (ControlMaster,
+                                             get_control_socket_path)
+
+    client = connect(hostname, port, username, interactive=False)
+
+    try:
+        socket_path = get_control_socket_path(hostname, port, username,
+                                              options.local_site_name)
+        ControlMaster(client.get_transport(), socket_path,
+                      idle_timeout=options.control_persist).serve()
+    finally:
+        client.close()
+
+    return 0
+
+
+def run_multiplexed(hostname, port, username, command):
+    """Run a command through a control master.
+
+    If there isn't a control master running for the host, one will be
+    started.
+
+    Args:
+        hostname (unicode):
+            The host to connect to.
+
+        port (int):
+            The port to connect to.
+
+        username (unicode):
+            The user to log in as.
+
+        command (list of unicode):
+            The command to run, if not using the sftp subsystem.
+
+    Returns:
+        int:
+        The exit status of the command, or ``None`` if a control master
+        couldn't be used.
+    """
+    from reviewboard.ssh import multiplexer
+
+    if not multiplexer.is_supported():
+        return None
+
+    master_args = [
+        sys.executable, '-m', 'reviewboard.cmdline.rbssh',
+        '--rb-run-control-master',
+        '--rb-control-persist', '%d' % options.control_persist,
+        '-p', '%d' % port,
+        '-l', username,
+    ]
+
+    if not options.allow_agent:
+        master_args.append('--rb-disallow-agent')
+
+    if options.local_site_name:
+        master_args += ['--rb-local-site', options.local_site_name]
+
+    master_args.append(hostname)
+
+    if options.subsystem == 'sftp':
+        logging.debug('!!! Invoking sftp subsystem through control master')
+        return multiplexer.run_multiplexed(hostname, port, username,
+                                           options.local_site_name,
+                                           master_args,
+                                           subsystem='sftp')
+    else:
+        logging.debug('!!! Sending command %s through control master'
+                      % command)
+        return multiplexer.run_multiplexed(hostname, port, username,
+                                           options.local_site_name,
+                                           master_args,
+                                           command=' '.join(command))
+
+
+def main():
+    """Run the application."""
+    os.environ.setdefault(str('DJANGO_SETTINGS_MODULE'),
+                          str('reviewboard.settings'))
+
+    if DEBUG:
+        pid = os.getpid()
+        log_filename = 'rbssh-%s.log' % pid
+
+        if DEBUG_LOGDIR:
+            log_path = os.path.join(DEBUG_LOGDIR, log_filename)
+        else:
+            log_path = log_filename
+
+        logging.basicConfig(level=logging.DEBUG,
+                            format='%(asctime)s %(name)-18s %(levelname)-8s '
+                                   '%(message)s',
+                            datefmt='%m-%d %H:%M',
+                            filename=log_path,
+                            filemode='w')
+
+        logging.debug('%s' % sys.argv)
+        logging.debug('PID %s' % pid)
+
+    path, port, command = parse_options(sys.argv[1:])
+    username, hostname = get_auth_from_path(path, options.username)
+
+    if username is None:
+        username = getpass.getuser()
+
+    logging.debug('!!! %s, %s, %s' % (hostname, username, command))
+
+    if options.run_control_master:
+        return run_control_master(hostname, port, username)
+
+    if options.control_master and (command or options.subsystem == 'sftp'):
+        # Interactive shells always use their own connection. Everything
+        # else can share one, without ever having to set up Django.
+        ch = add_console_log_handler()
+        status = run_multiplexed(hostname, port, username, command)
+
+        if status is not None:
+            return status
+
+        logging.debug('!!! Falling back on a direct connection')
+        logging.getLogger('').removeHandler(ch)
+
+    client = connect(hostname, port, username)
     transport = client.get_transport()
     channel = transport.open_session()
 
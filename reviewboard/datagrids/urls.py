@@ -15,6 +15,9 @@ urlpatterns = [
     url(r'^dashboard/$',
         views.dashboard,
         name='dashboard'),
+    url(r'^dashboard/_events/$',
+        views.dashboard_events,
+        name='dashboard-events'),
 
     # Users
     url(r'^users/', include([
@@ -14,6 +14,9 @@ from reviewboard.datagrids.grids import (DashboardDataGrid,
                                          UsersDataGrid,
                                          UserPageReviewsDataGrid,
                                          UserPageReviewRequestDataGrid)
+from reviewboard.notifications.push import (build_event_stream_response,
+                                            get_dashboard_channels,
+                                            is_push_enabled)
 from reviewboard.reviews.models import Group, ReviewRequest
 from reviewboard.site.decorators import check_local_site_access
 from reviewboard.site.urlresolvers import local_site_reverse
@@ -95,6 +98,41 @@ def dashboard(request,
     return grid.render_to_response(template_name)
 
 
+@login_required
+@check_local_site_access
+def dashboard_events(request, local_site=None):
+    """Stream update notifications for the dashboard.
+
+    This streams Server-Sent Events announcing activity on review requests
+    that the user or their review groups are involved in, allowing the
+    dashboard to refresh only when something has changed. Only review
+    requests the user can access are announced.
+
+    This is only available when push notifications are enabled.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+        local_site (reviewboard.site.models.LocalSite, optional):
+            The optional local site.
+
+    Returns:
+        django.http.StreamingHttpResponse:
+        The HTTP response streaming the events.
+
+    Raises:
+        django.http.Http404:
+            Push notifications are disabled.
+    """
+    if not is_push_enabled():
+        raise Http404
+
+    return build_event_stream_response(
+        request,
+        get_dashboard_channels(request.user, local_site))
+
+
 @check_login_required
 @check_local_site_access
 @valid_prefs_required(disable_consent_checks=_is_datagrid_gridonly)
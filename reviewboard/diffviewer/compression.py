@@ -0,0 +1,344 @@
+"""Compression support for stored diff data.
+
+Diff content stored in
+:py:class:`~reviewboard.diffviewer.models.raw_file_diff_data.RawFileDiffData`
+may be compressed using any of the registered compressors. The compressor
+used for new diffs is chosen in the site configuration, and existing diffs
+can be converted using the :command:`recompressdiffs` management command.
+"""
+
+from __future__ import unicode_literals
+
+import bz2
+import zlib
+
+from django.utils.translation import ugettext_lazy as _
+from djblets.siteconfig.models import SiteConfiguration
+
+from reviewboard.registries.registry import Registry
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+class BaseDiffCompressor(object):
+    """Base class for a diff compressor.
+
+    Subclasses must set :py:attr:`compressor_id`,
+    :py:attr:`compression_flag`, and :py:attr:`name`, and implement
+    :py:meth:`compress` and :py:meth:`decompress`.
+    """
+
+    #: The unique ID of the compressor, used in the site configuration.
+    compressor_id = None
+
+    #: The flag stored in ``RawFileDiffData.compression``.
+    #:
+    #: This must be a single character.
+    compression_flag = None
+
+    #: The displayed name of the compressor.
+    name = None
+
+    #: The compression level used if one isn't configured.
+    default_level = None
+
+    #: The range of supported compression levels, as a (min, max) tuple.
+    levels = None
+
+    def is_available(self):
+        """Return whether the compressor can be used on this system.
+
+        Returns:
+            bool:
+            ``True`` if any required modules are installed.
+        """
+        return True
+
+    def normalize_level(self, level):
+        """Return a valid compression level for this compressor.
+
+        Args:
+            level (int):
+                The requested compression level. This may be ``None`` to use
+                the default level.
+
+        Returns:
+            int:
+            The compression level, clamped to :py:attr:`levels`.
+        """
+        if level is None:
+            return self.default_level
+
+        min_level, max_level = self.levels
+
+        return max(min_level, min(level, max_level))
+
+    def compress(self, data, level=None):
+        """Compress data.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+            level (int, optional):
+                The compression level. If not provided,
+                :py:attr:`default_level` will be used.
+
+        Returns:
+            bytes:
+            The compressed data.
+        """
+        raise NotImplementedError
+
+    def decompress(self, data):
+        """Decompress data.
+
+        Args:
+            data (bytes):
+                The data to decompress.
+
+        Returns:
+            bytes:
+            The decompressed data.
+        """
+        raise NotImplementedError
+
+
+class BZip2DiffCompressor(BaseDiffCompressor):
+    """Compresses diffs using bzip2.
+
+    This offers good compression ratios, but is slow to both compress and
+    decompress.
+    """
+
+    compressor_id = 'bzip2'
+    compression_flag = 'B'
+    name = _('BZip2')
+    default_level = 9
+    levels = (1, 9)
+
+    def compress(self, data, level=None):
+        """Compress data.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+            level (int, optional):
+                The compression level (1-9).
+
+        Returns:
+            bytes:
+            The compressed data.
+        """
+        return bz2.compress(data, self.normalize_level(level))
+
+    def decompress(self, data):
+        """Decompress data.
+
+        Args:
+            data (bytes):
+                The data to decompress.
+
+        Returns:
+            bytes:
+            The decompressed data.
+        """
+        return bz2.decompress(data)
+
+
+class ZLibDiffCompressor(BaseDiffCompressor):
+    """Compresses diffs using zlib.
+
+    This is considerably faster than bzip2 to both compress and decompress,
+    at the cost of slightly larger data.
+    """
+
+    compressor_id = 'zlib'
+    compression_flag = 'Z'
+    name = _('zlib')
+    default_level = 6
+    levels = (1, 9)
+
+    def compress(self, data, level=None):
+        """Compress data.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+            level (int, optional):
+                The compression level (1-9).
+
+        Returns:
+            bytes:
+            The compressed data.
+        """
+        return zlib.compress(data, self.normalize_level(level))
+
+    def decompress(self, data):
+        """Decompress data.
+
+        Args:
+            data (bytes):
+                The data to decompress.
+
+        Returns:
+            bytes:
+            The decompressed data.
+        """
+        return zlib.decompress(data)
+
+
+class LZMADiffCompressor(BaseDiffCompressor):
+    """Compresses diffs using LZMA.
+
+    This offers the best compression ratios, and decompresses faster than
+    bzip2. It requires the :py:mod:`lzma` module (available on Python 2
+    through the ``backports.lzma`` package).
+    """
+
+    compressor_id = 'lzma'
+    compression_flag = 'X'
+    name = _('LZMA')
+    default_level = 6
+    levels = (0, 9)
+
+    def is_available(self):
+        """Return whether the compressor can be used on this system.
+
+        Returns:
+            bool:
+            ``True`` if the :py:mod:`lzma` module is available.
+        """
+        return lzma is not None
+
+    def compress(self, data, level=None):
+        """Compress data.
+
+        Args:
+            data (bytes):
+                The data to compress.
+
+            level (int, optional):
+                The compression preset (0-9).
+
+        Returns:
+            bytes:
+            The compressed data.
+        """
+        return lzma.compress(data, preset=self.normalize_level(level))
+
+    def decompress(self, data):
+        """Decompress data.
+
+        Args:
+            data (bytes):
+                The data to decompress.
+
+        Returns:
+            bytes:
+            The decompressed data.
+        """
+        return lzma.decompress(data)
+
+
+class DiffCompressorRegistry(Registry):
+    """A registry for diff compressors.
+
+    Extensions can add support for additional compressors. Once diffs have
+    been stored using a compressor, it must remain registered in order for
+    them to be read.
+
+    See :py:ref:`the registry documentation <registry-guides>` for information
+    on how registries work.
+    """
+
+    lookup_attrs = ['compressor_id', 'compression_flag']
+
+    def get_compressor(self, compressor_id):
+        """Return the compressor with the specified ID.
+
+        Args:
+            compressor_id (unicode):
+                The unique identifier of the compressor.
+
+        Returns:
+            BaseDiffCompressor:
+            The compressor, if it could be found. Otherwise, ``None``.
+        """
+        return self.get('compressor_id', compressor_id)
+
+    def get_compressor_for_flag(self, compression_flag):
+        """Return the compressor for a stored compression flag.
+
+        Args:
+            compression_flag (unicode):
+                The value of ``RawFileDiffData.compression``.
+
+        Returns:
+            BaseDiffCompressor:
+            The compressor, if it could be found. Otherwise, ``None``.
+        """
+        return self.get('compression_flag', compression_flag)
+
+    def get_available_compressors(self):
+        """Return the compressors that can be used on this system.
+
+        Returns:
+            list of BaseDiffCompressor:
+            The available compressors.
+        """
+        return [
+            compressor
+            for compressor in self
+            if compressor.is_available()
+        ]
+
+    def get_defaults(self):
+        """Return the default compressors.
+
+        Returns:
+            list of BaseDiffCompressor:
+            The default compressors.
+        """
+        return [
+            BZip2DiffCompressor(),
+            ZLibDiffCompressor(),
+            LZMADiffCompressor(),
+        ]
+
+    @property
+    def current_compressor(self):
+        """The compressor to use for new diffs.
+
+        If the configured compressor isn't available, bzip2 will be used.
+        """
+        siteconfig = SiteConfiguration.objects.get_current()
+        compressor = self.get_compressor(
+            siteconfig.get('diffviewer_compression'))
+
+        if compressor is None or not compressor.is_available():
+            compressor = self.get_compressor(BZip2DiffCompressor.compressor_id)
+
+        return compressor
+
+    @property
+    def current_level(self):
+        """The configured compression level for new diffs.
+
+        This will be ``None`` if the compressor's default should be used.
+        """
+        siteconfig = SiteConfiguration.objects.get_current()
+
+        return siteconfig.get('diffviewer_compression_level')
+
+
+#: The registry of diff compressors.
+diff_compressor_registry = DiffCompressorRegistry()
@@ -1,17 +1,20 @@
 from __future__ import unicode_literals
 
 import fnmatch
+import hashlib
 import logging
 import os
 import re
 import shutil
 import subprocess
 import tempfile
+from bisect import bisect_left, bisect_right
 from difflib import SequenceMatcher
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import six
 from django.utils.translation import ugettext as _
+from djblets.cache.backend import cache_memoize
 from djblets.log import log_timed
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.util.contextmanagers import controlled_subprocess
@@ -335,15 +338,15 @@ def get_original_file(filediff, request, encoding_list):
                                                encoding_list)
 
         if not oldest_ancestor.is_diff_empty:
-            data = patch(oldest_ancestor.diff, data,
-                         oldest_ancestor.source_file, request)
+            data = patch_cached(oldest_ancestor.diff, data,
+                                oldest_ancestor.source_file, request)
 
         for ancestor in ancestors[1:]:
-            # TODO: Cache these results so that if this ``filediff`` is an
+            # These results are cached, so that if this ``filediff`` is an
             # ancestor of another FileDiff, computing that FileDiff's original
-            # file will be cheaper. This will also allow an ancestor filediff's
-            # original file to be computed cheaper.
-            data = patch(ancestor.diff, data, ancestor.source_file, request)
+            # file will be cheaper.
+            data = patch_cached(ancestor.diff, data, ancestor.source_file,
+                                request)
     elif not filediff.is_new:
         data = get_original_file_from_repo(filediff,
                                            request,
@@ -353,10 +356,77 @@ def get_original_file(filediff, request, encoding_list):
 
 
 def get_patched_file(buffer, filediff, request):
+    """Return the patched file for a FileDiff.
+
+    Patched files are cached by the contents of the original file and the
+    diff, so a file will only be patched once for the diff viewer, interdiffs
+    and the API.
+
+    Args:
+        buffer (bytes):
+            The contents of the original file.
+
+        filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff to apply.
+
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+    Returns:
+        bytes:
+        The contents of the patched file.
+
+    Raises:
+        reviewboard.diffutils.errors.PatchError:
+            An error occurred when trying to apply the patch.
+    """
     tool = filediff.diffset.repository.get_scmtool()
     diff = tool.normalize_patch(filediff.diff, filediff.source_file,
                                 filediff.source_revision)
-    return patch(diff, buffer, filediff.dest_file, request)
+    return patch_cached(diff, buffer, filediff.dest_file, request)
+
+
+def patch_cached(diff, orig_file, filename, request=None):
+    """Apply a diff to a file, using a cached result if available.
+
+    The result is cached by the SHA-256 hashes of the original file and the
+    diff, so the same patch applied to the same file (for any FileDiff,
+    in any process) only has to run :command:`patch` once. Large files are
+    split across several cache entries, and entries are evicted by the cache
+    backend as needed.
+
+    Failed patches are not cached.
+
+    Args:
+        diff (bytes):
+            The contents of the diff to apply.
+
+        orig_file (bytes):
+            The contents of the original file.
+
+        filename (unicode):
+            The name of the file being patched.
+
+        request (django.http.HttpRequest, optional):
+            The HTTP request, for use in logging.
+
+    Returns:
+        bytes:
+        The contents of the patched file.
+
+    Raises:
+        reviewboard.diffutils.errors.PatchError:
+            An error occurred when trying to apply the patch.
+    """
+    if not diff.strip():
+        # There's nothing to patch, so there's nothing worth caching.
+        return orig_file
+
+    return cache_memoize(
+        'patched-file-%s-%s' % (hashlib.sha256(orig_file).hexdigest(),
+                                hashlib.sha256(diff).hexdigest()),
+        lambda: patch(diff, orig_file, filename, request),
+        large_data=True)
 
 
 def get_revision_str(revision):
@@ -820,8 +890,6 @@ def get_diff_files(diffset, filediff=None, interdiffset=None,
     for parts in filediff_parts:
         filediff, interfilediff, force_interdiff = parts
 
-        newfile = filediff.is_new
-
         if interdiffset:
             # First, find out if we want to even process this one.
             # If the diffs are identical, or the patched files are identical,
@@ -835,37 +903,9 @@ def get_diff_files(diffset, filediff=None, interdiffset=None,
                   filediff.patched_sha1 == interfilediff.patched_sha1))):
                 continue
 
-            source_revision = _("Diff Revision %s") % diffset.revision
-
-        else:
-            source_revision = get_revision_str(filediff.source_revision)
-
-        if interfilediff:
-            dest_revision = _('Diff Revision %s') % interdiffset.revision
-        else:
-            if force_interdiff:
-                dest_revision = (_('Diff Revision %s - File Reverted') %
-                                 interdiffset.revision)
-            elif newfile:
-                dest_revision = _('New File')
-            else:
-                dest_revision = _('New Change')
-
-        if interfilediff:
-            raw_depot_filename = filediff.dest_file
-            raw_dest_filename = interfilediff.dest_file
-        else:
-            raw_depot_filename = filediff.source_file
-            raw_dest_filename = filediff.dest_file
-
-        depot_filename = tool.normalize_path_for_display(raw_depot_filename)
-        dest_filename = tool.normalize_path_for_display(raw_dest_filename)
-
         if filename_patterns:
-            if dest_filename == depot_filename:
-                filenames = [dest_filename]
-            else:
-                filenames = [dest_filename, depot_filename]
+            filenames = _get_diff_file_match_filenames(tool, filediff,
+                                                       interfilediff)
 
             if not get_filenames_match_patterns(patterns=filename_patterns,
                                                 filenames=filenames):
@@ -899,45 +939,14 @@ def get_diff_files(diffset, filediff=None, interdiffset=None,
                             base_filediff = ancestor
                             break
 
-        f = {
-            'depot_filename': depot_filename,
-            'dest_filename': dest_filename or depot_filename,
-            'revision': source_revision,
-            'dest_revision': dest_revision,
-            'filediff': filediff,
-            'interfilediff': interfilediff,
-            'force_interdiff': force_interdiff,
-            'binary': filediff.binary,
-            'deleted': filediff.deleted,
-            'moved': filediff.moved,
-            'copied': filediff.copied,
-            'moved_or_copied': filediff.moved or filediff.copied,
-            'newfile': newfile,
-            'is_symlink': filediff.extra_data.get('is_symlink', False),
-            'index': len(files),
-            'chunks_loaded': False,
-            'is_new_file': (
-                (newfile or
-                 (base_filediff is not None and
-                  base_filediff.is_new)) and
-                not interfilediff and
-                not filediff.parent_diff
-            ),
-            'base_filediff': base_filediff,
-        }
-
-        # When displaying an interdiff, we do not want to display the
-        # revision of the base filediff. Instead, we will display the diff
-        # revision as computed above.
-        if base_filediff and not interdiffset:
-            f['revision'] = get_revision_str(base_filediff.source_revision)
-            f['depot_filename'] = tool.normalize_path_for_display(
-                base_filediff.source_file)
-
-        if force_interdiff:
-            f['force_interdiff_revision'] = interdiffset.revision
-
-        files.append(f)
+        files.append(_make_diff_file(tool=tool,
+                                     diffset=diffset,
+                                     interdiffset=interdiffset,
+                                     filediff=filediff,
+                                     interfilediff=interfilediff,
+                                     force_interdiff=force_interdiff,
+                                     base_filediff=base_filediff,
+                                     index=len(files)))
 
     log_timer.done()
 
@@ -949,6 +958,346 @@ def get_diff_files(diffset, filediff=None, interdiffset=None,
             key=lambda f: f['interfilediff'] or f['filediff'])
 
 
+def _get_diff_file_display_filenames(tool, filediff, interfilediff):
+    """Return the original and modified filenames displayed for a file.
+
+    Args:
+        tool (reviewboard.scmtools.core.SCMTool):
+            The SCMTool for the repository.
+
+        filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff being displayed.
+
+        interfilediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff on the other side of an interdiff, if any.
+
+    Returns:
+        tuple:
+        A 2-tuple of the original and modified filenames.
+    """
+    if interfilediff:
+        raw_depot_filename = filediff.dest_file
+        raw_dest_filename = interfilediff.dest_file
+    else:
+        raw_depot_filename = filediff.source_file
+        raw_dest_filename = filediff.dest_file
+
+    return (tool.normalize_path_for_display(raw_depot_filename),
+            tool.normalize_path_for_display(raw_dest_filename))
+
+
+def _get_diff_file_match_filenames(tool, filediff, interfilediff):
+    """Return the filenames matched against filename patterns for a file.
+
+    Args:
+        tool (reviewboard.scmtools.core.SCMTool):
+            The SCMTool for the repository.
+
+        filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff being displayed.
+
+        interfilediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff on the other side of an interdiff, if any.
+
+    Returns:
+        list of unicode:
+        The filenames to match.
+    """
+    depot_filename, dest_filename = _get_diff_file_display_filenames(
+        tool, filediff, interfilediff)
+
+    if dest_filename == depot_filename:
+        return [dest_filename]
+    else:
+        return [dest_filename, depot_filename]
+
+
+def _make_diff_file(tool, diffset, interdiffset, filediff, interfilediff,
+                    force_interdiff, base_filediff, index):
+    """Return the information on a file displayed in a diff.
+
+    Args:
+        tool (reviewboard.scmtools.core.SCMTool):
+            The SCMTool for the repository.
+
+        diffset (reviewboard.diffviewer.models.diffset.DiffSet):
+            The diffset being displayed.
+
+        interdiffset (reviewboard.diffviewer.models.diffset.DiffSet):
+            The other diffset in an interdiff range, if any.
+
+        filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff being displayed.
+
+        interfilediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiff on the other side of an interdiff, if any.
+
+        force_interdiff (bool):
+            Whether the file is shown as reverted in an interdiff.
+
+        base_filediff (reviewboard.diffviewer.models.filediff.FileDiff):
+            The base FileDiff for a commit range, if any.
+
+        index (int):
+            The index of the file in the diff.
+
+    Returns:
+        dict:
+        The information on the file, as documented in
+        :py:func:`get_diff_files`.
+    """
+    newfile = filediff.is_new
+
+    if interdiffset:
+        source_revision = _("Diff Revision %s") % diffset.revision
+    else:
+        source_revision = get_revision_str(filediff.source_revision)
+
+    if interfilediff:
+        dest_revision = _('Diff Revision %s') % interdiffset.revision
+    else:
+        if force_interdiff:
+            dest_revision = (_('Diff Revision %s - File Reverted') %
+                             interdiffset.revision)
+        elif newfile:
+            dest_revision = _('New File')
+        else:
+            dest_revision = _('New Change')
+
+    depot_filename, dest_filename = _get_diff_file_display_filenames(
+        tool, filediff, interfilediff)
+
+    f = {
+        'depot_filename': depot_filename,
+        'dest_filename': dest_filename or depot_filename,
+        'revision': source_revision,
+        'dest_revision': dest_revision,
+        'filediff': filediff,
+        'interfilediff': interfilediff,
+        'force_interdiff': force_interdiff,
+        'binary': filediff.binary,
+        'deleted': filediff.deleted,
+        'moved': filediff.moved,
+        'copied': filediff.copied,
+        'moved_or_copied': filediff.moved or filediff.copied,
+        'newfile': newfile,
+        'is_symlink': filediff.extra_data.get('is_symlink', False),
+        'index': index,
+        'chunks_loaded': False,
+        'is_new_file': (
+            (newfile or
+             (base_filediff is not None and
+              base_filediff.is_new)) and
+            not interfilediff and
+            not filediff.parent_diff
+        ),
+        'base_filediff': base_filediff,
+    }
+
+    # When displaying an interdiff, we do not want to display the
+    # revision of the base filediff. Instead, we will display the diff
+    # revision as computed above.
+    if base_filediff and not interdiffset:
+        f['revision'] = get_revision_str(base_filediff.source_revision)
+        f['depot_filename'] = tool.normalize_path_for_display(
+            base_filediff.source_file)
+
+    if force_interdiff:
+        f['force_interdiff_revision'] = interdiffset.revision
+
+    return f
+
+
+def get_diff_file_manifest(diffset, interdiffset=None, base_commit=None,
+                           tip_commit=None, request=None):
+    """Return a cached list of the files displayed in a diff.
+
+    This is a compact form of the results of :py:func:`get_diff_files`,
+    containing only the IDs of the FileDiffs for each file and the
+    information needed to filter and paginate them. Computing the full list
+    of files for a large diff (particularly an interdiff) is expensive, so the
+    manifest is cached, allowing pages of the diff viewer to load only the
+    files they show through :py:func:`get_diff_files_from_manifest`.
+
+    Args:
+        diffset (reviewboard.diffviewer.models.diffset.DiffSet):
+            The diffset containing the files.
+
+        interdiffset (reviewboard.diffviewer.models.diffset.DiffSet,
+                      optional):
+            A second diffset used for an interdiff range.
+
+        base_commit (reviewboard.diffviewer.models.diffcommit.DiffCommit,
+                     optional):
+            An optional base commit for the range of commits shown.
+
+        tip_commit (reviewboard.diffviewer.models.diffcommit.DiffCommit,
+                    optional):
+            An optional tip commit for the range of commits shown.
+
+        request (django.http.HttpRequest, optional):
+            The HTTP request from the client.
+
+    Returns:
+        list of dict:
+        A list of entries for the files shown in the diff, in display order.
+        Each contains the following keys:
+
+        ``filediff_id`` (:py:class:`int`):
+            The ID of the FileDiff.
+
+        ``interfilediff_id`` (:py:class:`int`):
+            The ID of the FileDiff on the other side of an interdiff, if any.
+
+        ``base_filediff_id`` (:py:class:`int`):
+            The ID of the base FileDiff for a commit range, if any.
+
+        ``force_interdiff`` (:py:class:`bool`):
+            Whether the file is shown as reverted in an interdiff.
+
+        ``filenames`` (:py:class:`list` of :py:class:`unicode`):
+            The filenames matched against filename patterns.
+
+        ``index`` (:py:class:`int`):
+            The index of the file in the diff.
+    """
+    def _build_manifest():
+        tool = diffset.repository.get_scmtool()
+        files = get_diff_files(diffset=diffset,
+                               interdiffset=interdiffset,
+                               base_commit=base_commit,
+                               tip_commit=tip_commit,
+                               request=request)
+
+        return [
+            {
+                'filediff_id': f['filediff'].pk,
+                'interfilediff_id': (f['interfilediff'] and
+                                     f['interfilediff'].pk),
+                'base_filediff_id': (f['base_filediff'] and
+                                     f['base_filediff'].pk),
+                'force_interdiff': f['force_interdiff'],
+                'filenames': _get_diff_file_match_filenames(
+                    tool, f['filediff'], f['interfilediff']),
+                'index': f['index'],
+            }
+            for f in files
+        ]
+
+    return cache_memoize(
+        'diff-file-manifest-%s-%s-%s-%s' % (
+            diffset.pk,
+            interdiffset and interdiffset.pk,
+            base_commit and base_commit.pk,
+            tip_commit and tip_commit.pk),
+        _build_manifest)
+
+
+def filter_diff_file_manifest(manifest, filename_patterns):
+    """Return the entries in a diff file manifest matching filename patterns.
+
+    The indexes of the matching entries are renumbered to match those that
+    :py:func:`get_diff_files` would assign for the same patterns.
+
+    Args:
+        manifest (list of dict):
+            The manifest returned by :py:func:`get_diff_file_manifest`.
+
+        filename_patterns (list of unicode):
+            A list of filenames or :py:mod:`patterns <fnmatch>` used to
+            limit the results.
+
+    Returns:
+        list of dict:
+        The matching entries.
+    """
+    if not filename_patterns:
+        return manifest
+
+    entries = [
+        entry
+        for entry in manifest
+        if get_filenames_match_patterns(patterns=filename_patterns,
+                                        filenames=entry['filenames'])
+    ]
+    new_indexes = {
+        index: new_index
+        for new_index, index in enumerate(sorted(
+            entry['index']
+            for entry in entries
+        ))
+    }
+
+    return [
+        dict(entry, index=new_indexes[entry['index']])
+        for entry in entries
+    ]
+
+
+def get_diff_files_from_manifest(diffset, interdiffset, entries):
+    """Return the files to display for entries in a diff file manifest.
+
+    This loads the FileDiffs for only the given entries (such as those on
+    one page of the diff viewer) in a single query, and returns the same
+    information for them as :py:func:`get_diff_files`.
+
+    Args:
+        diffset (reviewboard.diffviewer.models.diffset.DiffSet):
+            The diffset containing the files.
+
+        interdiffset (reviewboard.diffviewer.models.diffset.DiffSet):
+            A second diffset used for an interdiff range, if any.
+
+        entries (list of dict):
+            Entries from :py:func:`get_diff_file_manifest`.
+
+    Returns:
+        list of dict:
+        A list of dictionaries containing information on the files to show
+        in the diff, in the order of the entries.
+    """
+    from reviewboard.diffviewer.models import FileDiff
+
+    filediff_ids = set()
+
+    for entry in entries:
+        for key in ('filediff_id', 'interfilediff_id', 'base_filediff_id'):
+            if entry[key] is not None:
+                filediff_ids.add(entry[key])
+
+    if not filediff_ids:
+        return []
+
+    diffsets = {
+        diffset.pk: diffset,
+    }
+
+    if interdiffset:
+        diffsets[interdiffset.pk] = interdiffset
+
+    filediffs = FileDiff.objects.in_bulk(filediff_ids)
+
+    # The FileDiffs may belong to either diffset. Set them here so we don't
+    # end up causing an SQL query later when looking them up.
+    for filediff in six.itervalues(filediffs):
+        filediff.diffset = diffsets[filediff.diffset_id]
+
+    tool = diffset.repository.get_scmtool()
+
+    return [
+        _make_diff_file(
+            tool=tool,
+            diffset=diffset,
+            interdiffset=interdiffset,
+            filediff=filediffs[entry['filediff_id']],
+            interfilediff=filediffs.get(entry['interfilediff_id']),
+            force_interdiff=entry['force_interdiff'],
+            base_filediff=filediffs.get(entry['base_filediff_id']),
+            index=entry['index'])
+        for entry in entries
+    ]
+
+
 def populate_diff_chunks(files, enable_syntax_highlighting=True,
                          request=None):
     """Populates a list of diff files with chunk data.
@@ -1046,92 +1395,7 @@ def get_last_line_number_in_diff(context, filediff, interfilediff):
 
 def _get_last_header_in_chunks_before_line(chunks, target_line):
     """Find the last header in the list of chunks before the target line."""
-    def find_last_line_numbers(lines):
-        """Return a tuple of the last line numbers in the given list of lines.
-
-        The last line numbers are not always contained in the last element of
-        the ``lines`` list. This is the case when dealing with interdiffs that
-        have filtered out opcodes.
-
-        See :py:func:`get_chunks_in_range` for a description of what is
-        contained in each element of ``lines``.
-        """
-        last_left = None
-        last_right = None
-
-        for line in reversed(lines):
-            if not last_right and line[4]:
-                last_right = line[4]
-
-            if not last_left and line[1]:
-                last_left = line[1]
-
-            if last_left and last_right:
-                break
-
-        return last_left, last_right
-
-    def find_header(headers, offset, last_line):
-        """Return the last header that occurs before a line.
-
-        The offset parameter is the difference between the virtual number and
-        and actual line number in the chunk. This is required because the
-        header line numbers are original or patched line numbers, not virtual
-        line numbers.
-        """
-        # In the case of interdiffs, it is possible that there will be headers
-        # in the chunk that don't belong to it, but were put there due to
-        # chunks being merged together. We must therefore ensure that the
-        # header we're looking at is actually in the chunk.
-        end_line = min(last_line, target_line)
-
-        for header in reversed(headers):
-            virtual_line = header[0] + offset
-
-            if virtual_line < end_line:
-                return {
-                    'line': virtual_line,
-                    'text': header[1]
-                }
-
-    # The most up-to-date header information
-    header = {
-        'left': None,
-        'right': None
-    }
-
-    for chunk in chunks:
-        lines = chunk['lines']
-        virtual_first_line = lines[0][0]
-
-        if virtual_first_line <= target_line:
-            if virtual_first_line == target_line:
-                # The given line number is the first line of a new chunk so
-                # there can't be any relevant header information here.
-                break
-
-            last_left, last_right = find_last_line_numbers(lines)
-
-            if 'left_headers' in chunk['meta'] and lines[0][1]:
-                offset = virtual_first_line - lines[0][1]
-
-                left_header = find_header(chunk['meta']['left_headers'],
-                                          offset, last_left + offset)
-
-                header['left'] = left_header or header['left']
-
-            if 'right_headers' in chunk['meta'] and lines[0][4]:
-                offset = virtual_first_line - lines[0][4]
-
-                right_header = find_header(chunk['meta']['right_headers'],
-                                           offset, last_right + offset)
-
-                header['right'] = right_header or header['right']
-        else:
-            # We've gone past the given line number.
-            break
-
-    return header
+    return ChunkLineIndex(chunks).get_last_header_before_line(target_line)
 
 
 def get_last_header_before_line(context, filediff, interfilediff, target_line):
@@ -1149,7 +1413,7 @@ def get_last_header_before_line(context, filediff, interfilediff, target_line):
     """
     f = get_file_from_filediff(context, filediff, interfilediff)
 
-    return _get_last_header_in_chunks_before_line(f['chunks'], target_line)
+    return _get_chunk_line_index(f).get_last_header_before_line(target_line)
 
 
 def get_file_chunks_in_range(context, filediff, interfilediff,
@@ -1167,7 +1431,8 @@ def get_file_chunks_in_range(context, filediff, interfilediff,
     f = get_file_from_filediff(context, filediff, interfilediff)
 
     if f:
-        return get_chunks_in_range(f['chunks'], first_line, num_lines)
+        return _get_chunk_line_index(f).get_chunks_in_range(first_line,
+                                                            num_lines)
     else:
         return []
 
@@ -1205,7 +1470,30 @@ def get_chunks_in_range(chunks, first_line, num_lines):
     7        True if line consists of only whitespace changes
     ======== =============================================================
     """
-    for i, chunk in enumerate(chunks):
+    return _iter_chunks_in_range(enumerate(chunks), first_line, num_lines)
+
+
+def _iter_chunks_in_range(indexed_chunks, first_line, num_lines):
+    """Generate the chunks within a range of lines.
+
+    See :py:func:`get_chunks_in_range` for information on the returned state
+    of the chunks.
+
+    Args:
+        indexed_chunks (iterable):
+            An iterable of ``(index, chunk)`` tuples, in order.
+
+        first_line (int):
+            The first virtual line number in the range.
+
+        num_lines (int):
+            The number of lines in the range.
+
+    Yields:
+        dict:
+        Each chunk in the range.
+    """
+    for i, chunk in indexed_chunks:
         lines = chunk['lines']
 
         if lines[-1][0] >= first_line >= lines[0][0]:
@@ -1234,6 +1522,224 @@ def get_chunks_in_range(chunks, first_line, num_lines):
                 break
 
 
+class ChunkLineIndex(object):
+    """An index for looking up a file's chunks by virtual line number.
+
+    Rendering comment fragments for a file means finding the chunks covering
+    a range of lines and the last headers before that range, once per
+    comment. Scanning the full list of chunks for each of those is slow for
+    large files with many comments.
+
+    This builds, once for a list of chunks, a sorted table of the first
+    virtual line number of each chunk and a table of the headers that can be
+    reported for each chunk, so that these lookups can be done with a binary
+    search.
+    """
+
+    def __init__(self, chunks):
+        """Initialize the index.
+
+        Args:
+            chunks (list of dict):
+                The chunks to index. See :py:func:`get_chunks_in_range` for a
+                description of their contents.
+        """
+        self.chunks = chunks
+        self.first_lines = [
+            chunk['lines'][0][0]
+            for chunk in chunks
+        ]
+        self._left_headers = self._build_header_table('left_headers', 1)
+        self._right_headers = self._build_header_table('right_headers', 4)
+
+    def get_chunks_in_range(self, first_line, num_lines):
+        """Generate the chunks within a range of lines.
+
+        See :py:func:`get_chunks_in_range` for information on the returned
+        state of the chunks.
+
+        Args:
+            first_line (int):
+                The first virtual line number in the range.
+
+            num_lines (int):
+                The number of lines in the range.
+
+        Returns:
+            iterable:
+            The chunks in the range.
+        """
+        start = max(bisect_right(self.first_lines, first_line) - 1, 0)
+
+        return _iter_chunks_in_range(
+            ((i, self.chunks[i])
+             for i in six.moves.range(start, len(self.chunks))),
+            first_line,
+            num_lines)
+
+    def get_last_header_before_line(self, target_line):
+        """Return the last headers that occur before the given line.
+
+        See :py:func:`get_last_header_before_line` for a description of the
+        result.
+
+        Args:
+            target_line (int):
+                The virtual line number.
+
+        Returns:
+            dict:
+            The ``left`` and ``right`` headers.
+        """
+        # Only chunks starting before the line can contain relevant header
+        # information.
+        num_chunks = bisect_left(self.first_lines, target_line)
+
+        return {
+            'left': self._find_header(self._left_headers, num_chunks,
+                                      target_line),
+            'right': self._find_header(self._right_headers, num_chunks,
+                                       target_line),
+        }
+
+    def _build_header_table(self, meta_key, line_index):
+        """Build the table of headers for one side of the diff.
+
+        Args:
+            meta_key (unicode):
+                The key in the chunk metadata containing the headers.
+
+            line_index (int):
+                The index of the real line number for this side in each line.
+
+        Returns:
+            tuple:
+            A 3-tuple of:
+
+            1. A list of the headers in each chunk that belong to it, as
+               ``(virtual_line, text)`` tuples.
+            2. A list of the highest virtual line number of any header in
+               each chunk or the chunks before it.
+            3. A list of the last header in each chunk or the chunks before
+               it.
+        """
+        chunk_headers = []
+        max_header_lines = []
+        last_headers = []
+        max_header_line = None
+        last_header = None
+
+        for chunk in self.chunks:
+            lines = chunk['lines']
+            headers = []
+
+            if meta_key in chunk['meta'] and lines[0][line_index]:
+                offset = lines[0][0] - lines[0][line_index]
+
+                # The last line number is not always in the last line. This
+                # is the case when dealing with interdiffs that have filtered
+                # out opcodes.
+                last_line = None
+
+                for line in reversed(lines):
+                    if line[line_index]:
+                        last_line = line[line_index] + offset
+                        break
+
+                # In the case of interdiffs, it is possible that there will
+                # be headers in the chunk that don't belong to it, but were
+                # put there due to chunks being merged together.
+                for header in chunk['meta'][meta_key]:
+                    virtual_line = header[0] + offset
+
+                    if virtual_line < last_line:
+                        headers.append((virtual_line, header[1]))
+
+            if headers:
+                chunk_max = max(
+                    virtual_line
+                    for virtual_line, text in headers
+                )
+
+                if max_header_line is None or chunk_max > max_header_line:
+                    max_header_line = chunk_max
+
+                last_header = headers[-1]
+
+            chunk_headers.append(headers)
+            max_header_lines.append(max_header_line)
+            last_headers.append(last_header)
+
+        return chunk_headers, max_header_lines, last_headers
+
+    def _find_header(self, header_table, num_chunks, target_line):
+        """Return the last header before a line for one side of the diff.
+
+        Args:
+            header_table (tuple):
+                The table built by :py:meth:`_build_header_table`.
+
+            num_chunks (int):
+                The number of chunks starting before the line.
+
+            target_line (int):
+                The virtual line number.
+
+        Returns:
+            dict:
+            The header, or ``None`` if there isn't one.
+        """
+        chunk_headers, max_header_lines, last_headers = header_table
+
+        for i in six.moves.range(num_chunks - 1, -1, -1):
+            if max_header_lines[i] is None:
+                # There are no headers in this chunk or any before it.
+                break
+
+            if max_header_lines[i] < target_line:
+                # Every header up to here comes before the line, so the
+                # answer has been precomputed.
+                virtual_line, text = last_headers[i]
+
+                return {
+                    'line': virtual_line,
+                    'text': text,
+                }
+
+            for virtual_line, text in reversed(chunk_headers[i]):
+                if virtual_line < target_line:
+                    return {
+                        'line': virtual_line,
+                        'text': text,
+                    }
+
+        return None
+
+
+def _get_chunk_line_index(diff_file):
+    """Return the line index for a diff file's chunks.
+
+    The index is built the first time it's needed and stored in the diff
+    file, alongside the chunks, so that it can be reused for other lookups
+    on the same file.
+
+    Args:
+        diff_file (dict):
+            The diff file, with its chunks populated.
+
+    Returns:
+        ChunkLineIndex:
+        The index for the file's chunks.
+    """
+    index = diff_file.get('chunk_line_index')
+
+    if index is None or index.chunks is not diff_file['chunks']:
+        index = ChunkLineIndex(diff_file['chunks'])
+        diff_file['chunk_line_index'] = index
+
+    return index
+
+
 def get_enable_highlighting(user):
     user_syntax_highlighting = True
 
@@ -0,0 +1,159 @@
+from __future__ import unicode_literals, division
+
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _
+
+from reviewboard.diffviewer.compression import diff_compressor_registry
+from reviewboard.diffviewer.models import RawFileDiffData
+
+
+class Command(BaseCommand):
+    help = _('Recompresses the diffs stored in the database using the '
+             'configured compression.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--compression',
+                    dest='compression',
+                    default=None,
+                    help=_('The compression to convert diffs to. Defaults '
+                           'to the compression configured for the site.')),
+        make_option('--level',
+                    type='int',
+                    dest='level',
+                    default=None,
+                    help=_('The compression level to use.')),
+        make_option('--start-id',
+                    type='int',
+                    default=0,
+                    dest='start_id',
+                    help=_('The diff data ID to start from. This can be used '
+                           'to resume an interrupted run.')),
+        make_option('--batch-size',
+                    type='int',
+                    default=100,
+                    dest='batch_size',
+                    help=_('The number of diffs to load at a time.')),
+    )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        compressor_id = options['compression']
+        level = options['level']
+
+        if batch_size < 1:
+            raise CommandError(_('--batch-size must be a positive number.'))
+
+        if compressor_id:
+            compressor = diff_compressor_registry.get_compressor(compressor_id)
+
+            if compressor is None or not compressor.is_available():
+                raise CommandError(
+                    _('"%s" is not an available compression type.')
+                    % compressor_id)
+        else:
+            compressor = diff_compressor_registry.current_compressor
+
+            if level is None:
+                level = diff_compressor_registry.current_level
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        # Only compressed data is converted. Anything stored uncompressed
+        # didn't benefit from compression in the first place.
+        queryset = (
+            RawFileDiffData.objects
+            .exclude(compression=compressor.compression_flag)
+            .exclude(compression__isnull=True)
+            .only('pk', 'binary', 'compression')
+            .order_by('pk')
+        )
+
+        processed_count = 0
+        changed_count = 0
+        old_size = 0
+        new_size = 0
+        old_decode_time = 0
+        new_decode_time = 0
+        last_id = options['start_id'] - 1
+
+        self.stdout.write(_('Recompressing diffs using %s...')
+                          % compressor.name)
+
+        while True:
+            batch = list(queryset.filter(pk__gt=last_id)[:batch_size])
+
+            if not batch:
+                break
+
+            for raw_file_diff_data in batch:
+                old_size += len(raw_file_diff_data.binary)
+
+                start = time.time()
+                raw_file_diff_data.content
+                old_decode_time += time.time() - start
+
+                if raw_file_diff_data.recompress(compressor, level=level):
+                    changed_count += 1
+
+                new_size += len(raw_file_diff_data.binary)
+
+                start = time.time()
+                raw_file_diff_data.content
+                new_decode_time += time.time() - start
+
+            processed_count += len(batch)
+            last_id = batch[-1].pk
+
+            self.stdout.write(
+                _('Processed %(count)d diffs (last ID: %(last_id)d)')
+                % {
+                    'count': processed_count,
+                    'last_id': last_id,
+                })
+
+        if processed_count == 0:
+            self.stdout.write(_('There are no diffs to recompress.'))
+            return
+
+        self.stdout.write(
+            _('Recompressed %(changed_count)d of %(count)d diffs.\n'
+              'Stored size went from %(old_size)s bytes to %(new_size)s '
+              'bytes (%(size_pct)0.2f%% savings).\n'
+              'Decompression time went from %(old_time)0.3f seconds to '
+              '%(new_time)0.3f seconds (%(time_pct)0.2f%% savings).')
+            % {
+                'changed_count': changed_count,
+                'count': processed_count,
+                'old_size': intcomma(old_size),
+                'new_size': intcomma(new_size),
+                'size_pct': self._get_savings_pct(old_size, new_size),
+                'old_time': old_decode_time,
+                'new_time': new_decode_time,
+                'time_pct': self._get_savings_pct(old_decode_time,
+                                                  new_decode_time),
+            })
+
+    def _get_savings_pct(self, old_value, new_value):
+        """Return the percentage saved between two values.
+
+        Args:
+            old_value (float):
+                The original value.
+
+            new_value (float):
+                The new value.
+
+        Returns:
+            float:
+            The percentage saved.
+        """
+        if not old_value:
+            return 0.0
+
+        return (old_value - new_value) / old_value * 100
@@ -2,7 +2,6 @@
 
 from __future__ import unicode_literals
 
-import bz2
 import gc
 import hashlib
 import warnings
@@ -16,6 +15,7 @@ from django.utils.six.moves import range
 
 from reviewboard.deprecation import RemovedInReviewBoard40Warning
 from reviewboard.diffviewer.commit_utils import get_file_exists_in_history
+from reviewboard.diffviewer.compression import diff_compressor_registry
 from reviewboard.diffviewer.differ import DiffCompatVersion
 from reviewboard.diffviewer.diffutils import check_diff_size
 from reviewboard.diffviewer.filediff_creator import create_filediffs
@@ -337,17 +337,41 @@ class RawFileDiffDataManager(models.Manager):
     This provides conveniences for creating an entry based on a
     LegacyFileDiffData object.
     """
-    def process_diff_data(self, data):
+    def process_diff_data(self, data, compressor=None, level=None):
         """Processes a diff, returning the resulting content and compression.
 
         If the content would benefit from being compressed, this will
         return the compressed content and the value for the compression
         flag. Otherwise, it will return the raw content.
+
+        Args:
+            data (bytes):
+                The raw diff content.
+
+            compressor (reviewboard.diffviewer.compression.
+                        BaseDiffCompressor, optional):
+                The compressor to use. If not provided, the compressor
+                configured for the site will be used.
+
+            level (int, optional):
+                The compression level. If neither this nor ``compressor``
+                are provided, the level configured for the site will be used.
+
+        Returns:
+            tuple:
+            A 2-tuple of the content to store and the compression flag (or
+            ``None`` if the content is stored uncompressed).
         """
-        compressed_data = bz2.compress(data, 9)
+        if compressor is None:
+            compressor = diff_compressor_registry.current_compressor
+
+            if level is None:
+                level = diff_compressor_registry.current_level
+
+        compressed_data = compressor.compress(data, level)
 
         if len(compressed_data) < len(data):
-            return compressed_data, self.model.COMPRESSION_BZIP2
+            return compressed_data, compressor.compression_flag
         else:
             return data, None
 
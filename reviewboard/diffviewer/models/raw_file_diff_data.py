@@ -2,13 +2,13 @@
 
 from __future__ import unicode_literals
 
-import bz2
 import logging
 
 from django.db import models
 from django.utils.translation import ugettext_lazy as _
 from djblets.db.fields import JSONField
 
+from reviewboard.diffviewer.compression import diff_compressor_registry
 from reviewboard.diffviewer.errors import DiffParserError
 from reviewboard.diffviewer.managers import RawFileDiffDataManager
 
@@ -18,14 +18,21 @@ class RawFileDiffData(models.Model):
 
     This is the class used in Review Board 2.5+ to store diff content.
     Unlike in previous versions, the content is not base64-encoded. Instead,
-    it is stored either as bzip2-compressed data (if the resulting
-    compressed data is smaller than the raw data), or as the raw data itself.
+    it is stored either as compressed data (if the resulting compressed data
+    is smaller than the raw data), or as the raw data itself.
+
+    The compressor used for new diffs is chosen in the site configuration.
+    See :py:mod:`reviewboard.diffviewer.compression`.
     """
 
     COMPRESSION_BZIP2 = 'B'
+    COMPRESSION_ZLIB = 'Z'
+    COMPRESSION_LZMA = 'X'
 
     COMPRESSION_CHOICES = (
         (COMPRESSION_BZIP2, _('BZip2-compressed')),
+        (COMPRESSION_ZLIB, _('zlib-compressed')),
+        (COMPRESSION_LZMA, _('LZMA-compressed')),
     )
 
     binary_hash = models.CharField(_("hash"), max_length=40, unique=True)
@@ -43,15 +50,19 @@ class RawFileDiffData(models.Model):
         The content will be uncompressed (if necessary) and returned as the
         raw set of bytes originally uploaded.
         """
-        if self.compression == self.COMPRESSION_BZIP2:
-            return bz2.decompress(self.binary)
-        elif self.compression is None:
+        if self.compression is None:
             return bytes(self.binary)
-        else:
+
+        compressor = \
+            diff_compressor_registry.get_compressor_for_flag(self.compression)
+
+        if compressor is None:
             raise NotImplementedError(
                 'Unsupported compression method %s for RawFileDiffData %s'
                 % (self.compression, self.pk))
 
+        return compressor.decompress(self.binary)
+
     @property
     def insert_count(self):
         return self.extra_data.get('insert_count')
@@ -68,6 +79,49 @@ class RawFileDiffData(models.Model):
     def delete_count(self, value):
         self.extra_data['delete_count'] = value
 
+    def recompress(self, compressor, level=None, save=True):
+        """Recompress the stored content using a different compressor.
+
+        If compressing with the new compressor doesn't result in smaller
+        data than the raw content, the raw content will be stored instead.
+
+        Args:
+            compressor (reviewboard.diffviewer.compression.
+                        BaseDiffCompressor):
+                The compressor to use.
+
+            level (int, optional):
+                The compression level. If not provided, the compressor's
+                default will be used.
+
+            save (bool, optional):
+                Whether to save the new content. If the row has been
+                recompressed by another process in the meantime, it will be
+                left alone.
+
+        Returns:
+            bool:
+            ``True`` if the stored content changed.
+        """
+        old_compression = self.compression
+        binary, compression = RawFileDiffData.objects.process_diff_data(
+            self.content, compressor=compressor, level=level)
+
+        if compression == old_compression:
+            return False
+
+        self.binary = binary
+        self.compression = compression
+
+        if save and self.pk:
+            RawFileDiffData.objects.filter(
+                pk=self.pk,
+                compression=old_compression,
+            ).update(binary=binary,
+                     compression=compression)
+
+        return True
+
     def recalculate_line_counts(self, tool):
         """Recalculates the insert_count and delete_count values.
 
@@ -339,7 +339,30 @@ class DiffParser(object):
             bytes:
             The diff composed of all the component FileDiffs.
         """
-        return b''.join([filediff.diff for filediff in collection.files.all()])
+        return b''.join(self.iter_raw_diff(collection))
+
+    def iter_raw_diff(self, collection):
+        """Yield the raw diff for each FileDiff in a collection.
+
+        The FileDiffs are loaded and decompressed a few at a time, allowing
+        large diffs to be streamed to a client without holding the entire
+        diff in memory. Subclasses that override :py:meth:`raw_diff` should
+        override this as well.
+
+        Args:
+            collection (reviewboard.diffviewer.models.mixins.
+                        FileDiffCollectionMixin)
+                The model whose :py:class:`FileDiffs
+                <reviewboard.diffviewer.models.FileDiff>` are to be rendered.
+
+        Yields:
+            bytes:
+            The diff for each FileDiff, in order.
+        """
+        from reviewboard.diffviewer.raw_diff import iter_filediffs_with_data
+
+        for filediff in iter_filediffs_with_data(collection):
+            yield filediff.diff
 
     def get_orig_commit_id(self):
         """Returns the commit ID of the original revision for the diff.
@@ -0,0 +1,216 @@
+"""Streaming of raw diff downloads.
+
+Raw diffs for a DiffSet can be hundreds of megabytes in size. Rather than
+decompressing every FileDiff and joining the results before sending
+anything, the responses built here stream the diff one FileDiff at a time.
+"""
+
+from __future__ import unicode_literals
+
+import re
+import struct
+import zlib
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import six
+from django.utils.cache import patch_vary_headers
+
+from reviewboard.diffviewer.models import RawFileDiffData
+from reviewboard.diffviewer.parser import DiffParser
+
+
+#: The number of FileDiffs to load diff data for at a time.
+RAW_DIFF_BATCH_SIZE = 20
+
+#: The header for each gzip member.
+#:
+#: This uses the deflate method, no flags, no modification time, no extra
+#: flags, and an unknown OS.
+_GZIP_MEMBER_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+
+_accepts_gzip_re = re.compile(r'\bgzip\b')
+
+
+def iter_filediffs_with_data(collection, batch_size=RAW_DIFF_BATCH_SIZE):
+    """Yield the FileDiffs in a collection, with their diff data loaded.
+
+    FileDiffs are iterated in ID order without caching the full result set,
+    and their :py:class:`~reviewboard.diffviewer.models.raw_file_diff_data.
+    RawFileDiffData` are loaded in batches. Only one batch of (compressed)
+    diff data is held in memory at a time.
+
+    Args:
+        collection (reviewboard.diffviewer.models.mixins.
+                    FileDiffCollectionMixin):
+            The model whose FileDiffs are being iterated.
+
+        batch_size (int, optional):
+            The number of FileDiffs to load diff data for at a time.
+
+    Yields:
+        reviewboard.diffviewer.models.filediff.FileDiff:
+        Each FileDiff in the collection.
+    """
+    filediffs = (
+        collection.files
+        .order_by('pk')
+        .defer('diff64', 'parent_diff64')
+        .iterator()
+    )
+    batch = []
+
+    for filediff in filediffs:
+        batch.append(filediff)
+
+        if len(batch) >= batch_size:
+            for loaded_filediff in _load_filediff_data(batch):
+                yield loaded_filediff
+
+            batch = []
+
+    for loaded_filediff in _load_filediff_data(batch):
+        yield loaded_filediff
+
+
+def _load_filediff_data(filediffs):
+    """Load the diff data for a batch of FileDiffs.
+
+    FileDiffs still using legacy storage are left alone, and will be
+    migrated when their diffs are accessed.
+
+    Args:
+        filediffs (list of reviewboard.diffviewer.models.filediff.FileDiff):
+            The FileDiffs to load diff data for.
+
+    Returns:
+        list of reviewboard.diffviewer.models.filediff.FileDiff:
+        The provided FileDiffs.
+    """
+    raw_file_diff_datas = RawFileDiffData.objects.in_bulk([
+        filediff.diff_hash_id
+        for filediff in filediffs
+        if filediff.diff_hash_id is not None
+    ])
+
+    for filediff in filediffs:
+        raw_file_diff_data = raw_file_diff_datas.get(filediff.diff_hash_id)
+
+        if raw_file_diff_data is not None:
+            filediff.diff_hash = raw_file_diff_data
+
+    return filediffs
+
+
+def iter_gzip_members(collection):
+    """Yield a raw diff as a series of gzip members.
+
+    A gzip stream may consist of several concatenated members, each of
+    which decompresses to part of the content. Each FileDiff is sent as its
+    own member. Diff data that's stored using zlib is sent as-is, without
+    being compressed again. Other diff data is compressed individually.
+
+    Args:
+        collection (reviewboard.diffviewer.models.mixins.
+                    FileDiffCollectionMixin):
+            The model whose FileDiffs are being sent.
+
+    Yields:
+        bytes:
+        Each gzip member.
+    """
+    for filediff in iter_filediffs_with_data(collection):
+        diff = filediff.diff
+
+        if not diff:
+            continue
+
+        raw_file_diff_data = filediff.diff_hash
+
+        if raw_file_diff_data.compression == RawFileDiffData.COMPRESSION_ZLIB:
+            # Strip the 2-byte zlib header and 4-byte Adler-32 checksum,
+            # leaving the raw deflate stream.
+            deflated = bytes(raw_file_diff_data.binary)[2:-4]
+        else:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+            deflated = compressor.compress(diff) + compressor.flush()
+
+        yield b''.join([
+            _GZIP_MEMBER_HEADER,
+            deflated,
+            struct.pack(b'<II',
+                        zlib.crc32(diff) & 0xFFFFFFFF,
+                        len(diff) & 0xFFFFFFFF),
+        ])
+
+
+def _uses_legacy_raw_diff(parser):
+    """Return whether a parser only provides the diff through raw_diff().
+
+    Parsers written before streaming support may override
+    :py:meth:`~reviewboard.diffviewer.parser.DiffParser.raw_diff` without
+    overriding :py:meth:`~reviewboard.diffviewer.parser.DiffParser.
+    iter_raw_diff`. Their diffs must be built through ``raw_diff()``.
+
+    Args:
+        parser (reviewboard.diffviewer.parser.DiffParser):
+            The diff parser.
+
+    Returns:
+        bool:
+        ``True`` if the parser overrides ``raw_diff()`` but not
+        ``iter_raw_diff()``.
+    """
+    parser_cls = type(parser)
+
+    def _is_overridden(name):
+        return (six.get_unbound_function(getattr(parser_cls, name)) is not
+                six.get_unbound_function(getattr(DiffParser, name)))
+
+    return (_is_overridden('raw_diff') and
+            not _is_overridden('iter_raw_diff'))
+
+
+def build_raw_diff_response(request, parser, collection):
+    """Return a streaming response containing a raw diff.
+
+    If :django:setting:`SERVE_PRECOMPRESSED_RAW_DIFFS` is enabled and the
+    client accepts gzip-encoded content, the diff will be sent using
+    :py:func:`iter_gzip_members`. Otherwise, it will be sent uncompressed
+    (leaving any compression to the middleware).
+
+    If the parser overrides ``raw_diff()`` without providing
+    ``iter_raw_diff()``, the diff is built by ``raw_diff()`` and sent in one
+    piece instead.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+        parser (reviewboard.diffviewer.parser.DiffParser):
+            The diff parser for the repository.
+
+        collection (reviewboard.diffviewer.models.mixins.
+                    FileDiffCollectionMixin):
+            The model whose FileDiffs are being sent.
+
+    Returns:
+        django.http.StreamingHttpResponse:
+        The response. Callers can set additional headers on it.
+    """
+    if _uses_legacy_raw_diff(parser):
+        response = StreamingHttpResponse([parser.raw_diff(collection)],
+                                         content_type='text/x-patch')
+    elif (getattr(settings, 'SERVE_PRECOMPRESSED_RAW_DIFFS', False) and
+          _accepts_gzip_re.search(request.META.get('HTTP_ACCEPT_ENCODING',
+                                                   ''))):
+        response = StreamingHttpResponse(iter_gzip_members(collection),
+                                         content_type='text/x-patch')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(parser.iter_raw_diff(collection),
+                                         content_type='text/x-patch')
+
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+    return response
@@ -1,6 +1,7 @@
 from __future__ import print_function, unicode_literals
 
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.test.client import RequestFactory
 from django.utils.six.moves import zip_longest
 from djblets.siteconfig.models import SiteConfiguration
@@ -8,10 +9,16 @@ from djblets.testing.decorators import add_fixtures
 from kgb import SpyAgency
 
 from reviewboard.diffviewer.diffutils import (
+    ChunkLineIndex,
+    filter_diff_file_manifest,
     get_diff_data_chunks_info,
+    get_diff_file_manifest,
     get_diff_files,
+    get_diff_files_from_manifest,
+    get_chunks_in_range,
     get_displayed_diff_line_ranges,
     get_file_chunks_in_range,
+    get_file_from_filediff,
     get_last_header_before_line,
     get_last_line_number_in_diff,
     get_line_changed_regions,
@@ -21,6 +28,7 @@ from reviewboard.diffviewer.diffutils import (
     get_revision_str,
     get_sorted_filediffs,
     patch,
+    patch_cached,
     _PATCH_GARBAGE_INPUT,
     _get_last_header_in_chunks_before_line)
 from reviewboard.diffviewer.errors import PatchError
@@ -1432,6 +1440,76 @@ class GetDiffFilesTests(BaseFileDiffAncestorTests):
             for filediff_details, base_filediff_details in details
         }
 
+class GetDiffFileManifestTests(TestCase):
+    """Unit tests for get_diff_file_manifest and related functions."""
+
+    fixtures = ['test_users', 'test_scmtools']
+
+    def setUp(self):
+        super(GetDiffFileManifestTests, self).setUp()
+
+        repository = self.create_repository(tool_name='Git')
+        review_request = self.create_review_request(repository=repository)
+        self.diffset = self.create_diffset(review_request=review_request)
+
+        for filename in ('b.txt', 'a.py', 'c.txt'):
+            self.create_filediff(diffset=self.diffset,
+                                 source_file=filename,
+                                 dest_file=filename)
+
+    def test_get_diff_file_manifest(self):
+        """Testing get_diff_file_manifest"""
+        files = get_diff_files(diffset=self.diffset)
+        manifest = get_diff_file_manifest(self.diffset)
+
+        self.assertEqual(
+            [entry['filediff_id'] for entry in manifest],
+            [f['filediff'].pk for f in files])
+        self.assertEqual(
+            [entry['index'] for entry in manifest],
+            [f['index'] for f in files])
+
+    def test_get_diff_file_manifest_cached(self):
+        """Testing get_diff_file_manifest caches the manifest"""
+        manifest = get_diff_file_manifest(self.diffset)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_diff_file_manifest(self.diffset), manifest)
+
+    def test_filter_diff_file_manifest(self):
+        """Testing filter_diff_file_manifest matches get_diff_files with
+        filename patterns
+        """
+        files = get_diff_files(diffset=self.diffset,
+                               filename_patterns=['*.txt'])
+        manifest = filter_diff_file_manifest(
+            get_diff_file_manifest(self.diffset), ['*.txt'])
+
+        self.assertEqual(
+            [(entry['filediff_id'], entry['index']) for entry in manifest],
+            [(f['filediff'].pk, f['index']) for f in files])
+
+    def test_get_diff_files_from_manifest(self):
+        """Testing get_diff_files_from_manifest"""
+        files = get_diff_files(diffset=self.diffset)
+        manifest = get_diff_file_manifest(self.diffset)
+
+        with self.assertNumQueries(1):
+            manifest_files = get_diff_files_from_manifest(
+                self.diffset, None, manifest[1:])
+
+        self.assertEqual(len(manifest_files), 2)
+
+        for f, manifest_file in zip(files[1:], manifest_files):
+            self.assertEqual(manifest_file['filediff'], f['filediff'])
+            self.assertEqual(manifest_file['depot_filename'],
+                             f['depot_filename'])
+            self.assertEqual(manifest_file['dest_filename'],
+                             f['dest_filename'])
+            self.assertEqual(manifest_file['revision'], f['revision'])
+            self.assertEqual(manifest_file['index'], f['index'])
+
+
 class GetMatchedInterdiffFilesTests(TestCase):
     """Unit tests for get_matched_interdiff_files."""
 
@@ -2925,6 +3003,141 @@ class DiffExpansionHeaderTests(TestCase):
                          lines[header['left']['line'] - 1][2])
 
 
+class ChunkLineIndexTests(TestCase):
+    """Unit tests for reviewboard.diffviewer.diffutils.ChunkLineIndex."""
+
+    def setUp(self):
+        super(ChunkLineIndexTests, self).setUp()
+
+        # See diffviewer.diffutils.get_chunks_in_range for a description of
+        # chunks. We only need elements 0, 1, and 4 of each line.
+        self.chunks = []
+        line_num = 1
+
+        for i in range(10):
+            lines = []
+
+            for j in range(10):
+                lines.append([line_num, line_num, '', [], line_num, '', [],
+                              False])
+                line_num += 1
+
+            self.chunks.append({
+                'change': 'equal',
+                'meta': {
+                    'left_headers': [(line_num - 8, 'left %d' % i)],
+                    'right_headers': [(line_num - 5, 'right %d' % i)],
+                },
+                'lines': lines,
+                'numlines': len(lines),
+            })
+
+        self.index = ChunkLineIndex(self.chunks)
+
+    def test_get_chunks_in_range(self):
+        """Testing ChunkLineIndex.get_chunks_in_range"""
+        for first_line, num_lines in ((1, 5), (15, 20), (50, 1), (95, 6),
+                                      (100, 1)):
+            self.assertEqual(
+                list(self.index.get_chunks_in_range(first_line, num_lines)),
+                list(get_chunks_in_range(self.chunks, first_line,
+                                         num_lines)))
+
+    def test_get_chunks_in_range_spanning_chunks(self):
+        """Testing ChunkLineIndex.get_chunks_in_range with a range spanning
+        chunks
+        """
+        chunks = list(self.index.get_chunks_in_range(18, 15))
+
+        self.assertEqual([chunk['index'] for chunk in chunks], [1, 2, 3])
+        self.assertEqual(chunks[0]['lines'][0][0], 18)
+        self.assertEqual(chunks[-1]['lines'][-1][0], 32)
+        self.assertEqual(sum(chunk['numlines'] for chunk in chunks), 15)
+
+    def test_get_last_header_before_line(self):
+        """Testing ChunkLineIndex.get_last_header_before_line"""
+        self.assertEqual(
+            self.index.get_last_header_before_line(1),
+            {
+                'left': None,
+                'right': None,
+            })
+        self.assertEqual(
+            self.index.get_last_header_before_line(4),
+            {
+                'left': {
+                    'line': 3,
+                    'text': 'left 0',
+                },
+                'right': None,
+            })
+        self.assertEqual(
+            self.index.get_last_header_before_line(51),
+            {
+                'left': {
+                    'line': 43,
+                    'text': 'left 4',
+                },
+                'right': {
+                    'line': 46,
+                    'text': 'right 4',
+                },
+            })
+        self.assertEqual(
+            self.index.get_last_header_before_line(55),
+            {
+                'left': {
+                    'line': 53,
+                    'text': 'left 5',
+                },
+                'right': {
+                    'line': 46,
+                    'text': 'right 4',
+                },
+            })
+
+    @add_fixtures(['test_users', 'test_scmtools'])
+    def test_reused_for_file(self):
+        """Testing get_file_chunks_in_range and get_last_header_before_line
+        reuse the index for a file
+        """
+        diff = (b"diff --git a/tests.py b/tests.py\n"
+                b"index a4fc53e..ba7d34b 100644\n"
+                b"--- a/tests.py\n"
+                b"+++ b/tests.py\n"
+                b"@@ -47,9 +47,6 @@ class BaseWebAPITestCase(TestCase, "
+                b"EmailTestHelper);\n"
+                b"\n"
+                b"         yourself.base_url = 'http;//testserver'\n"
+                b"\n"
+                b"-    def tearDown(yourself);\n"
+                b"-        yourself.client.logout()\n"
+                b"-\n"
+                b"     def api_func_wrapper(yourself, api_func, path, query, "
+                b"expected_status,\n")
+
+        repository = self.create_repository(tool_name='Git')
+        review_request = self.create_review_request(repository=repository)
+        diffset = self.create_diffset(review_request=review_request)
+
+        filediff = self.create_filediff(
+            diffset=diffset, source_file='tests.py', dest_file='tests.py',
+            source_revision='a4fc53e08863f5341effb5204b77504c120166ae',
+            diff=diff)
+
+        context = {'user': review_request.submitter}
+        get_last_header_before_line(context, filediff, None, 50)
+
+        f = get_file_from_filediff(context, filediff, None)
+        index = f['chunk_line_index']
+        self.assertIs(index.chunks, f['chunks'])
+
+        list(get_file_chunks_in_range(context, filediff, None, 40, 20))
+        get_last_header_before_line(context, filediff, None, 55)
+
+        self.assertIs(f['chunk_line_index'], index)
+
+
 class PatchTests(TestCase):
     """Unit tests for patch."""
 
@@ -3153,6 +3366,45 @@ class PatchTests(TestCase):
         self.assertEqual(patched, new)
 
 
+class PatchCachedTests(SpyAgency, TestCase):
+    """Unit tests for patch_cached."""
+
+    def setUp(self):
+        super(PatchCachedTests, self).setUp()
+
+        cache.clear()
+
+    def test_patch_cached(self):
+        """Testing patch_cached only patches a file once"""
+        old = b'int\nmain()\n'
+        diff = (b'--- foo.c\t2007-01-24 02:11:31.000000000 -0800\n'
+                b'+++ foo.c\t2007-01-24 02:14:42.000000000 -0800\n'
+                b'@@ -1,2 +1,3 @@\n'
+                b'+#include <stdio.h>\n'
+                b' int\n'
+                b' main()\n')
+        new = b'#include <stdio.h>\nint\nmain()\n'
+
+        self.spy_on(patch)
+
+        self.assertEqual(patch_cached(diff, old, 'foo.c'), new)
+        self.assertEqual(patch_cached(diff, old, 'bar.c'), new)
+        self.assertEqual(len(patch.spy.calls), 1)
+
+    def test_patch_cached_with_error(self):
+        """Testing patch_cached does not cache errors"""
+        def _patch(diff, orig_file, filename, request=None):
+            raise PatchError(filename, 'error', orig_file, None, diff, None)
+
+        self.spy_on(patch, call_fake=_patch)
+
+        for i in range(2):
+            with self.assertRaises(PatchError):
+                patch_cached(b'--- foo.c\n', b'int\n', 'foo.c')
+
+        self.assertEqual(len(patch.spy.calls), 2)
+
+
 class GetOriginalFileTests(BaseFileDiffAncestorTests):
     """Unit tests for get_original_file."""
 
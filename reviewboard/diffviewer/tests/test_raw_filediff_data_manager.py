@@ -1,7 +1,9 @@
 from __future__ import unicode_literals
 
 import bz2
+import zlib
 
+from reviewboard.diffviewer.compression import diff_compressor_registry
 from reviewboard.diffviewer.models import RawFileDiffData
 from reviewboard.testing import TestCase
 
@@ -55,3 +57,43 @@ class RawFileDiffDataManagerTests(TestCase):
 
         self.assertEqual(data, bz2.compress(self.large_diff, 9))
         self.assertEqual(compression, RawFileDiffData.COMPRESSION_BZIP2)
+
+    def test_process_diff_data_with_zlib_siteconfig(self):
+        """Testing RawFileDiffDataManager.process_diff_data with zlib
+        compression configured results in zlib-compressed storage
+        """
+        with self.siteconfig_settings({'diffviewer_compression': 'zlib',
+                                       'diffviewer_compression_level': 1}):
+            data, compression = \
+                RawFileDiffData.objects.process_diff_data(self.large_diff)
+
+        self.assertEqual(data, zlib.compress(self.large_diff, 1))
+        self.assertEqual(compression, RawFileDiffData.COMPRESSION_ZLIB)
+
+    def test_process_diff_data_with_unavailable_compression(self):
+        """Testing RawFileDiffDataManager.process_diff_data with unknown
+        compression configured falls back to bzip2
+        """
+        with self.siteconfig_settings({'diffviewer_compression': 'foo'}):
+            data, compression = \
+                RawFileDiffData.objects.process_diff_data(self.large_diff)
+
+        self.assertEqual(data, bz2.compress(self.large_diff, 9))
+        self.assertEqual(compression, RawFileDiffData.COMPRESSION_BZIP2)
+
+    def test_recompress(self):
+        """Testing RawFileDiffData.recompress"""
+        raw_file_diff_data = \
+            RawFileDiffData.objects.get_or_create_from_data(self.large_diff)[0]
+        self.assertEqual(raw_file_diff_data.compression,
+                         RawFileDiffData.COMPRESSION_BZIP2)
+
+        compressor = diff_compressor_registry.get_compressor('zlib')
+        self.assertTrue(raw_file_diff_data.recompress(compressor))
+        self.assertFalse(raw_file_diff_data.recompress(compressor))
+
+        raw_file_diff_data = RawFileDiffData.objects.get(
+            pk=raw_file_diff_data.pk)
+        self.assertEqual(raw_file_diff_data.compression,
+                         RawFileDiffData.COMPRESSION_ZLIB)
+        self.assertEqual(raw_file_diff_data.content, self.large_diff)
@@ -30,7 +30,10 @@ from pygments.lexers import get_lexer_by_name
 
 from reviewboard.diffviewer.commit_utils import (diff_histories,
                                                  get_base_and_tip_commits)
-from reviewboard.diffviewer.diffutils import (get_diff_files,
+from reviewboard.diffviewer.diffutils import (filter_diff_file_manifest,
+                                              get_diff_file_manifest,
+                                              get_diff_files,
+                                              get_diff_files_from_manifest,
                                               get_enable_highlighting)
 from reviewboard.diffviewer.errors import PatchError, UserVisibleError
 from reviewboard.diffviewer.models import DiffCommit, DiffSet, FileDiff
@@ -226,17 +229,20 @@ class DiffViewerView(TemplateView):
                     tip_commit_id,
                     commits=commits_by_diffset_id[diffset.pk])
 
-        files = get_diff_files(diffset=diffset,
-                               interdiffset=interdiffset,
-                               request=self.request,
-                               filename_patterns=filename_patterns,
-                               base_commit=base_commit,
-                               tip_commit=tip_commit)
+        # Only the files shown on the requested page are loaded. The rest are
+        # represented by a cached manifest of the files in the diff.
+        manifest = filter_diff_file_manifest(
+            get_diff_file_manifest(diffset=diffset,
+                                   interdiffset=interdiffset,
+                                   base_commit=base_commit,
+                                   tip_commit=tip_commit,
+                                   request=self.request),
+            filename_patterns)
 
         # Break the list of files into pages
         siteconfig = SiteConfiguration.objects.get_current()
 
-        paginator = Paginator(files,
+        paginator = Paginator(manifest,
                               siteconfig.get('diffviewer_paginate_by'),
                               siteconfig.get('diffviewer_paginate_orphans'))
 
@@ -245,8 +251,8 @@ class DiffViewerView(TemplateView):
         if self.request.GET.get('file', False):
             file_id = int(self.request.GET['file'])
 
-            for i, f in enumerate(files):
-                if f['filediff'].pk == file_id:
+            for i, entry in enumerate(manifest):
+                if entry['filediff_id'] == file_id:
                     page_num = i // paginator.per_page + 1
 
                     if page_num > paginator.num_pages:
@@ -313,7 +319,8 @@ class DiffViewerView(TemplateView):
             'diffset': diffset,
             'interdiffset': interdiffset,
             'diffset_pair': (diffset, interdiffset),
-            'files': page.object_list,
+            'files': get_diff_files_from_manifest(diffset, interdiffset,
+                                                  page.object_list),
             'collapseall': self.collapse_diffs,
         }, **extra_context)
 
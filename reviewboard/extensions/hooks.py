@@ -770,6 +770,12 @@ class FileAttachmentThumbnailHook(ExtensionHook):
     * Define how to generate a thumbnail of that mimetype by overriding
       the instance function ``def get_thumbnail(self):``
 
+    Mimetype handlers that perform expensive work to build a thumbnail can
+    also override ``def generate_thumbnail(self):``, which is called in a
+    background worker when a file attachment is created, along with
+    ``def has_generated_thumbnail(self):``, which checks whether the
+    generated results have been stored.
+
     These mimetype handlers are registered when the hook is created. Likewise,
     it unregisters the same list of mimetype handlers when the extension is
     disabled.
@@ -9,9 +9,10 @@ def connect_signals(**kwargs):
     connect their signals. This is done so as to guarantee that django
     is loaded first.
     """
-    from reviewboard.notifications import email, webhooks
+    from reviewboard.notifications import email, push, webhooks
 
     email.connect_signals()
+    push.connect_signals()
     webhooks.connect_signals()
 
 
@@ -1,16 +1,19 @@
 from __future__ import unicode_literals
 
 from django.contrib import admin
+from django.core.urlresolvers import reverse
+from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
 
 from reviewboard.notifications.forms import WebHookTargetForm
-from reviewboard.notifications.models import WebHookTarget
+from reviewboard.notifications.models import (QueuedEmail, WebHookDelivery,
+                                              WebHookTarget)
 
 
 class WebHookTargetAdmin(admin.ModelAdmin):
     form = WebHookTargetForm
 
-    list_display = ('url', 'enabled')
+    list_display = ('url', 'enabled', 'delivery_log')
     filter_horizontal = ('repositories',)
     fieldsets = (
         (_('General Information'), {
@@ -30,6 +33,12 @@ class WebHookTargetAdmin(admin.ModelAdmin):
                 'secret',
             ),
         }),
+        (_('Delivery'), {
+            'fields': (
+                'timeout',
+                'max_concurrent_deliveries',
+            ),
+        }),
         (_('Advanced'), {
             'fields': (
                 'local_site',
@@ -39,5 +48,43 @@ class WebHookTargetAdmin(admin.ModelAdmin):
         }),
     )
 
+    def delivery_log(self, webhook_target):
+        return format_html(
+            '<a href="{0}?target__id__exact={1}">{2}</a>',
+            reverse('admin:notifications_webhookdelivery_changelist'),
+            webhook_target.pk,
+            _('View deliveries'))
+    delivery_log.allow_tags = True
+    delivery_log.short_description = _('Delivery log')
+
+
+class WebHookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('event', 'target', 'status', 'attempts', 'timestamp',
+                    'last_attempt_time', 'response_status')
+    list_filter = ('status', 'event', 'target')
+    list_select_related = ('target',)
+    date_hierarchy = 'timestamp'
+    readonly_fields = ('target', 'event', 'body', 'status', 'attempts',
+                       'timestamp', 'next_attempt_time', 'last_attempt_time',
+                       'response_status', 'last_error')
+
+    def has_add_permission(self, request):
+        return False
+
+
+class QueuedEmailAdmin(admin.ModelAdmin):
+    list_display = ('email_type', 'status', 'attempts', 'timestamp',
+                    'last_attempt_time')
+    list_filter = ('status', 'email_type')
+    date_hierarchy = 'timestamp'
+    readonly_fields = ('email_type', 'params', 'status', 'attempts',
+                       'timestamp', 'next_attempt_time', 'last_attempt_time',
+                       'last_error')
+
+    def has_add_permission(self, request):
+        return False
+
 
 admin.site.register(WebHookTarget, WebHookTargetAdmin)
+admin.site.register(WebHookDelivery, WebHookDeliveryAdmin)
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
@@ -4,9 +4,12 @@ from __future__ import absolute_import, unicode_literals
 
 import email
 
+from django.conf import settings
 from django.db.models.signals import post_delete
 from djblets.auth.signals import user_registered
 
+from reviewboard.background import register_periodic_task
+from reviewboard.notifications.email.outbox import schedule_due_emails
 from reviewboard.notifications.email.signal_handlers import (
     send_reply_published_mail,
     send_review_published_mail,
@@ -43,6 +46,9 @@ def connect_signals():
     for signal, handler, sender in signal_table:
         signal.connect(handler, sender=sender)
 
+    register_periodic_task('email', schedule_due_emails,
+                           settings.EMAIL_POLL_INTERVAL)
+
 
 # Fixes bug #3613
 _old_header_init = email.header.Header.__init__
@@ -0,0 +1,103 @@
+"""E-mail backends."""
+
+from __future__ import unicode_literals
+
+import os
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.base import BaseEmailBackend
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+
+
+class FileEmailBackend(BaseEmailBackend):
+    """An e-mail backend that writes each message to its own file.
+
+    This can stand in for an SMTP server when testing or developing. Each
+    message is written as a :file:`.eml` file to the directory specified by
+    the ``file_path`` argument, or by :django:setting:`EMAIL_FILE_PATH`.
+    These can be read back using :py:func:`email.message_from_file`.
+
+    Connections are opened and closed just like an SMTP connection, so code
+    that reuses connections can be tested against this backend.
+    """
+
+    def __init__(self, file_path=None, **kwargs):
+        """Initialize the backend.
+
+        Args:
+            file_path (unicode, optional):
+                The directory to write messages to.
+
+            **kwargs (dict):
+                Keyword arguments to pass to the parent class.
+
+        Raises:
+            django.core.exceptions.ImproperlyConfigured:
+                No directory was provided or configured.
+        """
+        super(FileEmailBackend, self).__init__(**kwargs)
+
+        self.file_path = (file_path or
+                          getattr(settings, 'EMAIL_FILE_PATH', None))
+
+        if not self.file_path:
+            raise ImproperlyConfigured(
+                'EMAIL_FILE_PATH must be set to use FileEmailBackend.')
+
+        if not os.path.isdir(self.file_path):
+            os.makedirs(self.file_path)
+
+        self.is_open = False
+
+    def open(self):
+        """Open the connection.
+
+        Returns:
+            bool:
+            ``True`` if a new connection was opened.
+        """
+        if self.is_open:
+            return False
+
+        self.is_open = True
+
+        return True
+
+    def close(self):
+        """Close the connection."""
+        self.is_open = False
+
+    def send_messages(self, email_messages):
+        """Write messages to files.
+
+        Args:
+            email_messages (list of django.core.mail.EmailMessage):
+                The messages to write.
+
+        Returns:
+            int:
+            The number of messages written.
+        """
+        if not email_messages:
+            return 0
+
+        new_connection = self.open()
+
+        try:
+            for email_message in email_messages:
+                message = email_message.message()
+                as_bytes = getattr(message, 'as_bytes', message.as_string)
+                filename = '%s-%s.eml' % (
+                    timezone.now().strftime('%Y%m%d-%H%M%S'),
+                    uuid.uuid4().hex)
+
+                with open(os.path.join(self.file_path, filename), 'wb') as fp:
+                    fp.write(force_bytes(as_bytes()))
+        finally:
+            if new_connection:
+                self.close()
+
+        return len(email_messages)
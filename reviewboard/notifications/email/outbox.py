@@ -0,0 +1,486 @@
+"""Background sending of e-mail messages.
+
+Building an e-mail (which involves resolving all the recipients) and talking
+to the SMTP server can take a long time for review requests with many
+reviewers. Rather than making the user who triggered the e-mail wait, e-mails
+are queued using :py:func:`queue_email` and then built and sent by
+background workers.
+
+Queued e-mails are stored in the database as
+:py:class:`~reviewboard.notifications.models.QueuedEmail` entries, so they
+aren't lost when a process exits. Each entry records a registered e-mail
+type and its arguments. Model instances are stored by ID and fetched again
+when the e-mail is built, so the e-mail reflects the latest state of the
+objects (such as the Message-ID of an earlier e-mail in the thread).
+
+Workers send all due e-mails in a batch over the same connection. Messages
+that fail to send due to temporary errors are retried later. Each web server
+process checks for due e-mails (including retries, and e-mails left behind
+by a process that exited) every ``EMAIL_POLL_INTERVAL`` seconds. The
+:command:`send-queued-email` management command sends them when no server
+is running, and prunes old entries.
+
+When background tasks are run inline (such as in the test suite), e-mails are
+built and sent immediately instead.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+import smtplib
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.mail import get_connection
+from django.db.models import Model
+from django.utils import six, timezone
+
+from reviewboard.background import get_task_queue, should_run_tasks_inline
+from reviewboard.notifications.email.utils import send_email
+from reviewboard.notifications.models import QueuedEmail
+
+
+#: The maximum number of attempts made to send a message.
+EMAIL_MAX_SEND_ATTEMPTS = 5
+
+#: The number of seconds to wait before retrying a message.
+#:
+#: This doubles for each subsequent retry.
+EMAIL_RETRY_DELAY = 30
+
+#: The number of messages sent over a connection before it's reopened.
+#:
+#: Many mail servers limit this.
+EMAIL_MAX_MESSAGES_PER_CONNECTION = 100
+
+
+_email_types = {}
+
+
+def register_email_type(email_type, email_builder, on_sent=None):
+    """Register a type of e-mail that can be queued.
+
+    Args:
+        email_type (unicode):
+            The unique name of the e-mail type.
+
+        email_builder (callable):
+            A function that generates an
+            :py:class:`~reviewboard.notifications.email.message.EmailMessage`
+            from the keyword arguments passed to :py:func:`queue_email`. It
+            may return ``None`` if no e-mail should be sent.
+
+        on_sent (callable, optional):
+            A function to call once the e-mail has been sent. This takes the
+            message, along with the keyword arguments passed to
+            :py:func:`queue_email`.
+
+    Raises:
+        KeyError:
+            An e-mail type with this name was already registered.
+    """
+    if email_type in _email_types:
+        raise KeyError('E-mail type "%s" is already registered'
+                       % email_type)
+
+    _email_types[email_type] = (email_builder, on_sent)
+
+
+def unregister_email_type(email_type):
+    """Unregister a type of e-mail.
+
+    Args:
+        email_type (unicode):
+            The name of the e-mail type.
+
+    Raises:
+        KeyError:
+            The e-mail type was not registered.
+    """
+    del _email_types[email_type]
+
+
+def queue_email(email_type, **kwargs):
+    """Queue an e-mail to be built and sent in the background.
+
+    If background tasks are configured to run inline (see
+    :py:func:`~reviewboard.background.should_run_tasks_inline`), the e-mail
+    will be built and sent immediately instead.
+
+    Args:
+        email_type (unicode):
+            The name of a registered e-mail type.
+
+        **kwargs (dict):
+            Keyword arguments to provide to the e-mail builder. Each value
+            must either be a saved model instance (which will be fetched
+            again when the e-mail is built), or be JSON-serializable.
+
+    Returns:
+        reviewboard.notifications.models.QueuedEmail:
+        The queued e-mail, or ``None`` if it was sent immediately.
+
+    Raises:
+        KeyError:
+            The e-mail type was not registered.
+
+        TypeError:
+            One of the keyword arguments couldn't be stored.
+    """
+    email_builder, on_sent = _email_types[email_type]
+
+    if should_run_tasks_inline():
+        message, sent = send_email(email_builder, **kwargs)
+
+        if sent and on_sent is not None:
+            on_sent(message, **kwargs)
+
+        return None
+
+    queued_email = QueuedEmail.objects.create(
+        email_type=email_type,
+        params={
+            key: _serialize_value(value)
+            for key, value in six.iteritems(kwargs)
+        })
+    _schedule_email_sending()
+
+    return queued_email
+
+
+def schedule_due_emails():
+    """Schedule sending if any queued e-mails are due.
+
+    This runs periodically in each web server process, picking up retries
+    and e-mails that couldn't be sent when they were queued (for instance,
+    because the transaction queuing them hadn't been committed yet, or the
+    process exited).
+    """
+    if (QueuedEmail.objects
+        .filter(status=QueuedEmail.STATUS_PENDING,
+                next_attempt_time__lte=timezone.now())
+        .exists()):
+        _schedule_email_sending()
+
+
+def process_pending_emails(stale_after=None):
+    """Send all queued e-mails that are due.
+
+    E-mails are sent in the order they were queued, reusing a connection to
+    the mail server. Each e-mail is claimed before being sent, so it will
+    only be sent once even if several workers (or processes) try to send it.
+
+    Args:
+        stale_after (datetime.timedelta, optional):
+            If provided, e-mails that have been marked as being sent for
+            longer than this will be assumed to have been interrupted, and
+            will be queued again.
+
+    Returns:
+        int:
+        The number of e-mails attempted.
+    """
+    if stale_after is not None:
+        (QueuedEmail.objects
+         .filter(status=QueuedEmail.STATUS_SENDING,
+                 last_attempt_time__lt=timezone.now() - stale_after)
+         .update(status=QueuedEmail.STATUS_PENDING))
+
+    connection = None
+    sent_count = 0
+    attempted_count = 0
+
+    try:
+        while True:
+            queued_emails = list(
+                QueuedEmail.objects
+                .filter(status=QueuedEmail.STATUS_PENDING,
+                        next_attempt_time__lte=timezone.now())
+                .order_by('pk')[:EMAIL_MAX_MESSAGES_PER_CONNECTION])
+
+            if not queued_emails:
+                break
+
+            for queued_email in queued_emails:
+                now = timezone.now()
+                claimed = (
+                    QueuedEmail.objects
+                    .filter(pk=queued_email.pk,
+                            status=QueuedEmail.STATUS_PENDING)
+                    .update(status=QueuedEmail.STATUS_SENDING,
+                            last_attempt_time=now)
+                )
+
+                if not claimed:
+                    continue
+
+                if sent_count >= EMAIL_MAX_MESSAGES_PER_CONNECTION:
+                    connection = _close_connection(connection)
+
+                if connection is None:
+                    sent_count = 0
+
+                queued_email.last_attempt_time = now
+                connection = _send_queued_email(queued_email, connection)
+                sent_count += 1
+                attempted_count += 1
+    finally:
+        _close_connection(connection)
+
+    return attempted_count
+
+
+def _send_queued_email(queued_email, connection):
+    """Build and send a queued e-mail.
+
+    The result is recorded on the queued e-mail. Temporary failures are
+    left pending, to be retried by :py:func:`schedule_due_emails` once due.
+
+    Args:
+        queued_email (reviewboard.notifications.models.QueuedEmail):
+            The claimed e-mail to send.
+
+        connection (django.core.mail.backends.base.BaseEmailBackend):
+            The open connection to send over, or ``None`` if one needs to be
+            opened.
+
+    Returns:
+        django.core.mail.backends.base.BaseEmailBackend:
+        The connection to use for the next message, or ``None`` if it was
+        closed.
+    """
+    queued_email.attempts += 1
+
+    try:
+        email_builder, on_sent = _email_types[queued_email.email_type]
+        kwargs = {
+            key: _deserialize_value(value)
+            for key, value in six.iteritems(queued_email.params)
+        }
+        message = email_builder(**kwargs)
+    except Exception as e:
+        logging.exception('Unable to build queued e-mail %s of type "%s": %s',
+                          queued_email.pk, queued_email.email_type, e)
+        _save_queued_email(queued_email, QueuedEmail.STATUS_FAILED,
+                           six.text_type(e))
+
+        return connection
+
+    if message is None:
+        # There was nothing to send (for instance, no recipients).
+        queued_email.delete()
+
+        return connection
+
+    try:
+        if connection is None:
+            connection = get_connection()
+            connection.open()
+
+        message.connection = connection
+        message.send()
+    except Exception as e:
+        # The connection may no longer be usable.
+        connection = _close_connection(connection)
+
+        if (queued_email.attempts < EMAIL_MAX_SEND_ATTEMPTS and
+            _is_temporary_error(e)):
+            logging.warning('Error sending e-mail message with subject "%s" '
+                            '(attempt %d); retrying later: %s',
+                            message.subject, queued_email.attempts, e)
+            queued_email.next_attempt_time = (
+                timezone.now() +
+                timedelta(seconds=EMAIL_RETRY_DELAY *
+                          (2 ** (queued_email.attempts - 1))))
+            status = QueuedEmail.STATUS_PENDING
+        else:
+            logging.exception(
+                'Could not send e-mail message with subject "%s" from "%s" '
+                'to "%s"',
+                message.subject,
+                message.from_email,
+                message.to + (message.cc or []))
+            status = QueuedEmail.STATUS_FAILED
+
+        _save_queued_email(queued_email, status, six.text_type(e))
+
+        return connection
+
+    _save_queued_email(queued_email, QueuedEmail.STATUS_SENT)
+
+    if on_sent is not None:
+        try:
+            on_sent(message, **kwargs)
+        except Exception as e:
+            logging.exception('Error handling sent e-mail %s of type "%s": '
+                              '%s',
+                              queued_email.pk, queued_email.email_type, e)
+
+    return connection
+
+
+def _save_queued_email(queued_email, status, error=''):
+    """Save the result of an attempt to send a queued e-mail.
+
+    Args:
+        queued_email (reviewboard.notifications.models.QueuedEmail):
+            The queued e-mail.
+
+        status (unicode):
+            The new status of the e-mail.
+
+        error (unicode, optional):
+            The error from the attempt, if any.
+    """
+    queued_email.status = status
+    queued_email.last_error = error
+    queued_email.save(update_fields=('status', 'attempts',
+                                     'last_attempt_time',
+                                     'next_attempt_time', 'last_error'))
+
+
+def _serialize_value(value):
+    """Return a keyword argument for an e-mail in a storable form.
+
+    Args:
+        value (object):
+            The keyword argument value.
+
+    Returns:
+        object:
+        The JSON-serializable value.
+
+    Raises:
+        TypeError:
+            The value is a model instance that hasn't been saved.
+    """
+    if isinstance(value, Model):
+        if value.pk is None:
+            raise TypeError('Unsaved %r instances cannot be queued for '
+                            'e-mails' % type(value))
+
+        opts = value._meta
+
+        return {
+            '__model__': '%s.%s' % (opts.app_label, opts.model_name),
+            'pk': value.pk,
+        }
+
+    return value
+
+
+def _deserialize_value(value):
+    """Return a stored keyword argument for an e-mail.
+
+    Model instances are fetched from the database.
+
+    Args:
+        value (object):
+            The stored value.
+
+    Returns:
+        object:
+        The keyword argument value.
+
+    Raises:
+        django.core.exceptions.ObjectDoesNotExist:
+            A referenced model instance no longer exists.
+    """
+    if isinstance(value, dict) and '__model__' in value:
+        app_label, model_name = value['__model__'].split('.', 1)
+        content_type = ContentType.objects.get_by_natural_key(app_label,
+                                                              model_name)
+
+        return content_type.get_object_for_this_type(pk=value['pk'])
+
+    return value
+
+
+def _is_temporary_error(e):
+    """Return whether an error sending e-mail may go away on retry.
+
+    Args:
+        e (Exception):
+            The error raised when sending.
+
+    Returns:
+        bool:
+        ``False`` if the mail server permanently rejected the message.
+        ``True`` for anything else (such as connection problems or
+        temporary SMTP failures).
+    """
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        return False
+
+    smtp_code = getattr(e, 'smtp_code', None)
+
+    return smtp_code is None or smtp_code < 500
+
+
+def _close_connection(connection):
+    """Close a connection, ignoring any errors.
+
+    Args:
+        connection (django.core.mail.backends.base.BaseEmailBackend):
+            The connection to close. This may be ``None``.
+
+    Returns:
+        None:
+        This always returns ``None``, for assignment back to the connection
+        variable.
+    """
+    if connection is not None:
+        try:
+            connection.close()
+        except Exception as e:
+            logging.debug('Error closing e-mail connection: %s', e)
+
+    return None
+
+
+_send_scheduled = False
+_send_scheduled_lock = threading.Lock()
+
+
+def _schedule_email_sending():
+    """Schedule queued e-mails to be sent by a background worker.
+
+    Only one send is waiting for a worker at a time, since each one sends
+    all e-mails that are due. When background tasks are run inline, e-mails
+    are sent immediately.
+    """
+    global _send_scheduled
+
+    if should_run_tasks_inline():
+        process_pending_emails()
+        return
+
+    with _send_scheduled_lock:
+        if _send_scheduled:
+            return
+
+        _send_scheduled = True
+
+    _get_email_task_queue().add(_send_scheduled_emails)
+
+
+def _send_scheduled_emails():
+    """Send e-mails scheduled by :py:func:`_schedule_email_sending`."""
+    global _send_scheduled
+
+    with _send_scheduled_lock:
+        _send_scheduled = False
+
+    process_pending_emails()
+
+
+def _get_email_task_queue():
+    """Return the background task queue used for sending e-mails.
+
+    Returns:
+        reviewboard.background.BackgroundTaskQueue:
+        The task queue.
+    """
+    return get_task_queue('email', num_workers=settings.EMAIL_WORKERS)
@@ -12,8 +12,10 @@ from reviewboard.notifications.email.message import (
     prepare_review_request_mail,
     prepare_user_registered_mail,
     prepare_webapi_token_mail)
-from reviewboard.notifications.email.utils import send_email
+from reviewboard.notifications.email.outbox import (queue_email,
+                                                    register_email_type)
 from reviewboard.reviews.models import ReviewRequest
+from reviewboard.webapi.models import WebAPIToken
 
 
 def _update_email_info(obj, message_id):
@@ -35,6 +37,63 @@ def _update_email_info(obj, message_id):
     obj.save(update_fields=('email_message_id', 'time_emailed'))
 
 
+def _make_email_info_updater(key):
+    """Return a callback for updating e-mail information once sent.
+
+    E-mails are sent in the background, so the message ID is only known
+    once the message has been sent.
+
+    Args:
+        key (unicode):
+            The name of the e-mail's keyword argument containing the object
+            for which e-mail information will be updated.
+
+    Returns:
+        callable:
+        A function that takes the sent message and the e-mail's keyword
+        arguments, and calls :py:func:`_update_email_info`.
+    """
+    def _on_sent(message, **kwargs):
+        _update_email_info(kwargs[key], message.message_id)
+
+    return _on_sent
+
+
+def _prepare_deleted_webapi_token_mail(user, token):
+    """Return an e-mail notifying a user that an API token was deleted.
+
+    The token no longer exists by the time the e-mail is built, so it's
+    reconstructed from the stored token string.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user who owned the token.
+
+        token (unicode):
+            The deleted token string.
+
+    Returns:
+        reviewboard.notifications.email.message.EmailMessage:
+        The generated e-mail.
+    """
+    return prepare_webapi_token_mail(
+        webapi_token=WebAPIToken(user=user, token=token),
+        op='deleted')
+
+
+register_email_type('password_changed', prepare_password_changed_mail)
+register_email_type('reply_published', prepare_reply_published_mail,
+                    on_sent=_make_email_info_updater('reply'))
+register_email_type('review_published', prepare_review_published_mail,
+                    on_sent=_make_email_info_updater('review'))
+register_email_type('review_request', prepare_review_request_mail,
+                    on_sent=_make_email_info_updater('review_request'))
+register_email_type('user_registered', prepare_user_registered_mail)
+register_email_type('webapi_token', prepare_webapi_token_mail)
+register_email_type('webapi_token_deleted',
+                    _prepare_deleted_webapi_token_mail)
+
+
 def send_password_changed_mail(user):
     """Send an e-mail when a user's password changes.
 
@@ -49,7 +108,7 @@ def send_password_changed_mail(user):
     siteconfig = SiteConfiguration.objects.get_current()
 
     if siteconfig.get('mail_send_password_changed_mail'):
-        send_email(prepare_password_changed_mail, user=user)
+        queue_email('password_changed', user=user)
 
 
 def send_reply_published_mail(user, reply, trivial, **kwargs):
@@ -85,14 +144,11 @@ def send_reply_published_mail(user, reply, trivial, **kwargs):
 
     review = reply.base_reply_to
 
-    message, sent = send_email(prepare_reply_published_mail,
-                               user=user,
-                               reply=reply,
-                               review=review,
-                               review_request=review_request)
-
-    if sent:
-        _update_email_info(reply, message.message_id)
+    queue_email('reply_published',
+                user=user,
+                reply=reply,
+                review=review,
+                review_request=review_request)
 
 
 def send_review_published_mail(user, review, request, to_owner_only,
@@ -130,15 +186,14 @@ def send_review_published_mail(user, review, request, to_owner_only,
     if not review_request.public:
         return
 
-    message, sent = send_email(prepare_review_published_mail,
-                               user=user,
-                               review=review,
-                               review_request=review_request,
-                               request=request,
-                               to_owner_only=to_owner_only)
-
-    if sent:
-        _update_email_info(review, message.message_id)
+    # The HTTP request can't be stored with a queued e-mail, and isn't
+    # needed to build it.
+    queue_email('review_published',
+                user=user,
+                review=review,
+                review_request=review_request,
+                request=None,
+                to_owner_only=to_owner_only)
 
 
 def send_review_request_closed_mail(user, review_request, close_type,
@@ -169,13 +224,10 @@ def send_review_request_closed_mail(user, review_request, close_type,
             review_request.public):
         return
 
-    message, sent = send_email(prepare_review_request_mail,
-                               user=user,
-                               review_request=review_request,
-                               close_type=close_type)
-
-    if sent:
-        _update_email_info(review_request, message.message_id)
+    queue_email('review_request',
+                user=user,
+                review_request=review_request,
+                close_type=close_type)
 
 
 def send_review_request_published_mail(user, review_request, trivial,
@@ -215,13 +267,10 @@ def send_review_request_published_mail(user, review_request, trivial,
         review_request.status == ReviewRequest.DISCARDED):
         return
 
-    message, sent = send_email(prepare_review_request_mail,
-                               user=user,
-                               review_request=review_request,
-                               changedesc=changedesc)
-
-    if sent:
-        _update_email_info(review_request, message.message_id)
+    queue_email('review_request',
+                user=user,
+                review_request=review_request,
+                changedesc=changedesc)
 
 
 def send_user_registered_mail(user, **kwargs):
@@ -243,8 +292,8 @@ def send_user_registered_mail(user, **kwargs):
     if not siteconfig.get('mail_send_new_user_mail'):
         return
 
-    send_email(prepare_user_registered_mail,
-               user=user)
+    queue_email('user_registered',
+                user=user)
 
 
 def send_webapi_token_created_mail(instance, auto_generated=False, **kwargs):
@@ -261,9 +310,9 @@ def send_webapi_token_created_mail(instance, auto_generated=False, **kwargs):
             Unused keyword arguments provided by the signal.
     """
     if not auto_generated:
-        send_email(prepare_webapi_token_mail,
-                   webapi_token=instance,
-                   op='created')
+        queue_email('webapi_token',
+                    webapi_token=instance,
+                    op='created')
 
 
 def send_webapi_token_updated_mail(instance, **kwargs):
@@ -276,9 +325,9 @@ def send_webapi_token_updated_mail(instance, **kwargs):
         **kwargs (dict):
             Unused keyword arguments provided by the signal.
     """
-    send_email(prepare_webapi_token_mail,
-               webapi_token=instance,
-               op='updated')
+    queue_email('webapi_token',
+                webapi_token=instance,
+                op='updated')
 
 
 def send_webapi_token_deleted_mail(instance, **kwargs):
@@ -286,11 +335,11 @@ def send_webapi_token_deleted_mail(instance, **kwargs):
 
     Args:
         instance (reviewboard.webapi.models.WebAPIToken):
-            The token that has been created or updated.
+            The token that has been deleted.
 
         **kwargs (dict):
             Unused keyword arguments provided by the signal.
     """
-    send_email(prepare_webapi_token_mail,
-               webapi_token=instance,
-               op='deleted')
+    queue_email('webapi_token_deleted',
+                user=instance.user,
+                token=instance.token)
@@ -1,4 +1,5 @@
 SEQUENCE = [
     'webhooktarget_extra_state',
     'webhooktarget_extra_data_null',
+    'webhooktarget_delivery_settings',
 ]
@@ -0,0 +1,12 @@
+from __future__ import unicode_literals
+
+from django.db import models
+from django_evolution.mutations import AddField
+
+
+MUTATIONS = [
+    AddField('WebHookTarget', 'timeout', models.PositiveIntegerField,
+             initial=10),
+    AddField('WebHookTarget', 'max_concurrent_deliveries',
+             models.PositiveIntegerField, initial=2),
+]
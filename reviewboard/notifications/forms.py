@@ -19,6 +19,25 @@ class WebHookTargetForm(forms.ModelForm):
         widget=forms.widgets.URLInput(attrs={'size': 100})
     )
 
+    #: Fields that fall back on their default values if not provided.
+    OPTIONAL_DELIVERY_FIELDS = ('timeout', 'max_concurrent_deliveries')
+
+    def __init__(self, *args, **kwargs):
+        """Initialize the form.
+
+        Args:
+            *args (tuple):
+                Positional arguments to pass to the parent constructor.
+
+            **kwargs (dict):
+                Keyword arguments to pass to the parent constructor.
+        """
+        super(WebHookTargetForm, self).__init__(*args, **kwargs)
+
+        for field_name in self.OPTIONAL_DELIVERY_FIELDS:
+            if field_name in self.fields:
+                self.fields[field_name].required = False
+
     def clean_extra_data(self):
         """Ensure that extra_data is a valid value.
 
@@ -44,6 +63,12 @@ class WebHookTargetForm(forms.ModelForm):
         """
         super(WebHookTargetForm, self).clean()
 
+        for field_name in self.OPTIONAL_DELIVERY_FIELDS:
+            if (field_name in self.fields and
+                self.cleaned_data.get(field_name) is None):
+                self.cleaned_data[field_name] = \
+                    WebHookTarget._meta.get_field(field_name).default
+
         custom_content = self.cleaned_data.get('custom_content', '')
         self.cleaned_data['use_custom_content'] = len(custom_content) > 0
 
@@ -0,0 +1,64 @@
+from __future__ import unicode_literals
+
+from datetime import timedelta
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.translation import ugettext as _
+
+from reviewboard.notifications.email.outbox import process_pending_emails
+from reviewboard.notifications.models import QueuedEmail
+
+
+class Command(BaseCommand):
+    help = _('Sends any queued e-mails that are due, and prunes old entries '
+             'from the queue. This can be run periodically to send e-mails '
+             'left behind when the server was restarted.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--stale-minutes',
+                    type='int',
+                    default=30,
+                    dest='stale_minutes',
+                    help=_('The number of minutes after which an e-mail '
+                           'still marked as being sent is assumed to have '
+                           'been interrupted, and is queued again.')),
+        make_option('--prune-days',
+                    type='int',
+                    default=None,
+                    dest='prune_days',
+                    help=_('If set, sent and failed e-mails older than this '
+                           'number of days will be removed from the queue.')),
+    )
+
+    def handle(self, *args, **options):
+        stale_minutes = options['stale_minutes']
+        prune_days = options['prune_days']
+
+        if stale_minutes < 1:
+            raise CommandError(_('--stale-minutes must be a positive '
+                                 'number.'))
+
+        if prune_days is not None and prune_days < 1:
+            raise CommandError(_('--prune-days must be a positive number.'))
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        count = process_pending_emails(
+            stale_after=timedelta(minutes=stale_minutes))
+
+        self.stdout.write(_('Attempted to send %d e-mails.') % count)
+
+        if prune_days is not None:
+            queryset = QueuedEmail.objects.filter(
+                status__in=(QueuedEmail.STATUS_SENT,
+                            QueuedEmail.STATUS_FAILED),
+                timestamp__lt=timezone.now() - timedelta(days=prune_days))
+            pruned_count = queryset.count()
+            queryset.delete()
+
+            self.stdout.write(_('Removed %d old queued e-mails.')
+                              % pruned_count)
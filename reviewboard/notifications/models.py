@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 
+from django.core.validators import MinValueValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 from djblets.db.fields import JSONField
@@ -122,6 +124,22 @@ class WebHookTarget(models.Model):
         related_name='webhooks',
         help_text=_('If set, this Webhook will be limited to this site.'))
 
+    # Delivery
+    timeout = models.PositiveIntegerField(
+        _('timeout'),
+        default=10,
+        validators=[MinValueValidator(1)],
+        help_text=_('The number of seconds to wait for the URL to respond '
+                    'before the delivery is considered failed and retried '
+                    'later.'))
+
+    max_concurrent_deliveries = models.PositiveIntegerField(
+        _('maximum concurrent deliveries'),
+        default=2,
+        validators=[MinValueValidator(1)],
+        help_text=_('The maximum number of requests that will be made '
+                    'against the URL at the same time.'))
+
     extra_data = JSONField(
         null=True,
         help_text=_('Extra JSON data that can be tied to this Webhook '
@@ -174,3 +192,130 @@ class WebHookTarget(models.Model):
         db_table = 'notifications_webhooktarget'
         verbose_name = _('Webhook')
         verbose_name_plural = _('Webhooks')
+
+
+@python_2_unicode_compatible
+class WebHookDelivery(models.Model):
+    """A queued or attempted delivery of a WebHook event.
+
+    Each event sent to a :py:class:`WebHookTarget` is stored as a delivery
+    before being sent, so that failed requests can be retried later. The
+    deliveries also serve as a log of what was sent to each target.
+    """
+
+    STATUS_PENDING = 'P'
+    STATUS_DELIVERING = 'D'
+    STATUS_SUCCEEDED = 'S'
+    STATUS_FAILED = 'F'
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_DELIVERING, _('Delivering')),
+        (STATUS_SUCCEEDED, _('Succeeded')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    target = models.ForeignKey(
+        WebHookTarget,
+        related_name='deliveries')
+
+    event = models.CharField(_('event'), max_length=64)
+
+    body = models.TextField(_('body'), blank=True)
+
+    status = models.CharField(
+        _('status'),
+        max_length=1,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True)
+
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+
+    timestamp = models.DateTimeField(_('timestamp'), default=timezone.now)
+
+    next_attempt_time = models.DateTimeField(
+        _('next attempt time'),
+        default=timezone.now,
+        db_index=True)
+
+    last_attempt_time = models.DateTimeField(
+        _('last attempt time'),
+        null=True,
+        blank=True)
+
+    response_status = models.PositiveIntegerField(
+        _('response status'),
+        null=True,
+        blank=True,
+        help_text=_('The HTTP status code of the last response.'))
+
+    last_error = models.TextField(_('last error'), blank=True)
+
+    def __str__(self):
+        return '%s: %s' % (self.event, self.target.url)
+
+    class Meta:
+        db_table = 'notifications_webhookdelivery'
+        ordering = ['-timestamp']
+        verbose_name = _('Webhook delivery')
+        verbose_name_plural = _('Webhook deliveries')
+
+
+@python_2_unicode_compatible
+class QueuedEmail(models.Model):
+    """An e-mail waiting to be built and sent.
+
+    E-mails are stored before being built, so that they survive process
+    restarts and can be retried if the mail server is unavailable. Only the
+    type of e-mail and the IDs of the objects it's about are stored. The
+    objects are fetched again when the e-mail is built.
+    """
+
+    STATUS_PENDING = 'P'
+    STATUS_SENDING = 'S'
+    STATUS_SENT = 'D'
+    STATUS_FAILED = 'F'
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, _('Pending')),
+        (STATUS_SENDING, _('Sending')),
+        (STATUS_SENT, _('Sent')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    email_type = models.CharField(_('e-mail type'), max_length=64)
+
+    params = JSONField(_('parameters'), default=dict)
+
+    status = models.CharField(
+        _('status'),
+        max_length=1,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        db_index=True)
+
+    attempts = models.PositiveIntegerField(_('attempts'), default=0)
+
+    timestamp = models.DateTimeField(_('timestamp'), default=timezone.now)
+
+    next_attempt_time = models.DateTimeField(
+        _('next attempt time'),
+        default=timezone.now,
+        db_index=True)
+
+    last_attempt_time = models.DateTimeField(
+        _('last attempt time'),
+        null=True,
+        blank=True)
+
+    last_error = models.TextField(_('last error'), blank=True)
+
+    def __str__(self):
+        return '%s (%s)' % (self.email_type, self.get_status_display())
+
+    class Meta:
+        db_table = 'notifications_queuedemail'
+        ordering = ['-timestamp']
+        verbose_name = _('queued e-mail')
+        verbose_name_plural = _('queued e-mails')
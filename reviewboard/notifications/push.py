@@ -0,0 +1,817 @@
+"""Push notifications for review request and dashboard updates.
+
+Rather than polling for updates on a timer, the review request page (and
+other clients, such as IDE integrations) can hold open a Server-Sent Events
+stream, which announces when something has changed. Clients then fetch the
+updated content only when notified.
+
+Events are published to named channels, and delivered through a pluggable
+fan-out backend. The backend is configured by setting
+``PUSH_NOTIFICATIONS_BACKEND`` in :file:`settings_local.py` to the import
+path of a :py:class:`BasePushBackend` subclass.
+
+Each open stream holds a connection (and, on a synchronous WSGI server, a
+worker) for as long as it's open, so push notifications are off by default.
+Administrators can turn them on with the ``push_notifications_enabled``
+site configuration setting.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import six
+from djblets.cache.backend import make_cache_key
+from djblets.siteconfig.models import SiteConfiguration
+
+from reviewboard.background import run_in_background
+from reviewboard.reviews.models import Review, ReviewRequest
+from reviewboard.reviews.signals import (reply_published,
+                                         review_published,
+                                         review_request_closed,
+                                         review_request_published,
+                                         review_request_reopened)
+
+
+#: The default push notification backend.
+DEFAULT_PUSH_BACKEND = 'reviewboard.notifications.push.CachePushBackend'
+
+
+def is_push_enabled():
+    """Return whether push notifications are enabled.
+
+    Returns:
+        bool:
+        ``True`` if the administrator has enabled push notifications.
+    """
+    siteconfig = SiteConfiguration.objects.get_current()
+
+    return siteconfig.get('push_notifications_enabled')
+
+
+def get_review_request_channel(review_request_id, local_site_id=None):
+    """Return the channel name for a review request's events.
+
+    Args:
+        review_request_id (int):
+            The ID of the review request.
+
+        local_site_id (int, optional):
+            The ID of the Local Site the review request is on, if any.
+
+    Returns:
+        unicode:
+        The channel name.
+    """
+    return 'review-request:%s:%s' % (local_site_id or '', review_request_id)
+
+
+def get_user_channel(user_id, local_site_id=None):
+    """Return the channel name for events for a user's dashboard.
+
+    Args:
+        user_id (int):
+            The ID of the user.
+
+        local_site_id (int, optional):
+            The ID of the Local Site the dashboard is on, if any.
+
+    Returns:
+        unicode:
+        The channel name.
+    """
+    return 'user:%s:%s' % (local_site_id or '', user_id)
+
+
+def get_dashboard_channels(user, local_site=None):
+    """Return the channels relevant to a user's dashboard.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user viewing the dashboard.
+
+        local_site (reviewboard.site.models.LocalSite, optional):
+            The Local Site the dashboard is on, if any.
+
+    Returns:
+        list of unicode:
+        The list of channel names.
+    """
+    if local_site:
+        local_site_id = local_site.pk
+    else:
+        local_site_id = None
+
+    return [get_user_channel(user.pk, local_site_id)]
+
+
+class BasePushBackend(object):
+    """Base class for a push notification fan-out backend.
+
+    Backends store recently-published events for each channel, and provide
+    subscribers with the events published after a given position.
+
+    A subscriber tracks its position using a cursor, which is a dictionary
+    mapping channel names to the position of the last event it has seen on
+    that channel.
+    """
+
+    #: How often :py:meth:`wait` checks for new events, in seconds.
+    #:
+    #: This is used by the default implementation of :py:meth:`wait`.
+    poll_interval = 1
+
+    def publish(self, channel, event):
+        """Publish an event to a channel.
+
+        Args:
+            channel (unicode):
+                The name of the channel.
+
+            event (dict):
+                The JSON-serializable event data.
+        """
+        raise NotImplementedError
+
+    def get_cursor(self, channels):
+        """Return a cursor pointing at the current end of each channel.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+        Returns:
+            dict:
+            The cursor.
+        """
+        raise NotImplementedError
+
+    def get_events(self, channels, cursor):
+        """Return any events published after the given cursor.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+            cursor (dict):
+                The cursor for the last events seen.
+
+        Returns:
+            tuple:
+            A 2-tuple containing:
+
+            1. A list of new events.
+            2. The updated cursor.
+        """
+        raise NotImplementedError
+
+    def wait(self, channels, cursor, timeout):
+        """Wait for events published after the given cursor.
+
+        By default, this checks for new events every :py:attr:`poll_interval`
+        seconds. Subclasses can override this to block more efficiently.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+            cursor (dict):
+                The cursor for the last events seen.
+
+            timeout (float):
+                The maximum amount of time to wait, in seconds.
+
+        Returns:
+            tuple:
+            A 2-tuple containing:
+
+            1. A list of new events (which will be empty if the wait timed
+               out).
+            2. The updated cursor.
+        """
+        deadline = time.time() + timeout
+
+        while True:
+            events, cursor = self.get_events(channels, cursor)
+            remaining = deadline - time.time()
+
+            if events or remaining <= 0:
+                return events, cursor
+
+            time.sleep(min(self.poll_interval, remaining))
+
+
+class InProcessPushBackend(BasePushBackend):
+    """A push backend that delivers events within a single process.
+
+    This is suitable for tests and for single-process development servers.
+    Events aren't shared between processes.
+    """
+
+    #: The maximum number of events stored for each channel.
+    max_events = 100
+
+    def __init__(self):
+        """Initialize the backend."""
+        self._condition = threading.Condition()
+        self._channels = {}
+        self._positions = {}
+
+    def publish(self, channel, event):
+        """Publish an event to a channel.
+
+        Args:
+            channel (unicode):
+                The name of the channel.
+
+            event (dict):
+                The JSON-serializable event data.
+        """
+        with self._condition:
+            position = self._positions.get(channel, 0) + 1
+            self._positions[channel] = position
+
+            self._channels.setdefault(
+                channel,
+                deque(maxlen=self.max_events)).append((position, event))
+            self._condition.notify_all()
+
+    def get_cursor(self, channels):
+        """Return a cursor pointing at the current end of each channel.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+        Returns:
+            dict:
+            The cursor.
+        """
+        with self._condition:
+            return {
+                channel: self._positions.get(channel, 0)
+                for channel in channels
+            }
+
+    def get_events(self, channels, cursor):
+        """Return any events published after the given cursor.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+            cursor (dict):
+                The cursor for the last events seen.
+
+        Returns:
+            tuple:
+            A 2-tuple containing:
+
+            1. A list of new events.
+            2. The updated cursor.
+        """
+        events = []
+        new_cursor = {}
+
+        with self._condition:
+            for channel in channels:
+                last_seen = cursor.get(channel, 0)
+
+                for position, event in self._channels.get(channel, []):
+                    if position > last_seen:
+                        events.append(event)
+
+                new_cursor[channel] = self._positions.get(channel, 0)
+
+        return events, new_cursor
+
+    def wait(self, channels, cursor, timeout):
+        """Wait for events published after the given cursor.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+            cursor (dict):
+                The cursor for the last events seen.
+
+            timeout (float):
+                The maximum amount of time to wait, in seconds.
+
+        Returns:
+            tuple:
+            A 2-tuple containing:
+
+            1. A list of new events (which will be empty if the wait timed
+               out).
+            2. The updated cursor.
+        """
+        deadline = time.time() + timeout
+
+        with self._condition:
+            while True:
+                events, new_cursor = self.get_events(channels, cursor)
+                remaining = deadline - time.time()
+
+                if events or remaining <= 0:
+                    return events, new_cursor
+
+                self._condition.wait(remaining)
+
+
+class CachePushBackend(BasePushBackend):
+    """A push backend that shares events between processes using the cache.
+
+    Each channel has a position counter in the cache, which is atomically
+    incremented when an event is published. Events are stored under their
+    own keys for a short time. Subscribers check the counters for their
+    channels, which is a cheap cache lookup rather than a database query.
+    """
+
+    #: The maximum number of events returned for a channel at once.
+    max_events = 100
+
+    #: How often each open stream checks the cache for new events, in
+    #: seconds.
+    #:
+    #: Events only prompt clients to check for updates, so a few seconds of
+    #: latency is fine, and keeps the cache traffic per stream low.
+    poll_interval = 5
+
+    #: How long published events are kept in the cache, in seconds.
+    event_expiration = 5 * 60
+
+    def publish(self, channel, event):
+        """Publish an event to a channel.
+
+        Args:
+            channel (unicode):
+                The name of the channel.
+
+            event (dict):
+                The JSON-serializable event data.
+        """
+        position_key = self._make_position_key(channel)
+        cache.add(position_key, 0)
+
+        try:
+            position = cache.incr(position_key)
+        except ValueError:
+            # The counter was evicted between the add and the increment.
+            cache.add(position_key, 1)
+            position = 1
+
+        cache.set(self._make_event_key(channel, position), event,
+                  self.event_expiration)
+
+    def get_cursor(self, channels):
+        """Return a cursor pointing at the current end of each channel.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+        Returns:
+            dict:
+            The cursor.
+        """
+        return self._get_positions(channels)
+
+    def get_events(self, channels, cursor):
+        """Return any events published after the given cursor.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+            cursor (dict):
+                The cursor for the last events seen.
+
+        Returns:
+            tuple:
+            A 2-tuple containing:
+
+            1. A list of new events.
+            2. The updated cursor.
+        """
+        positions = self._get_positions(channels)
+        event_keys = []
+
+        for channel in channels:
+            last_seen = cursor.get(channel, 0)
+            position = positions[channel]
+
+            if position < last_seen:
+                # The counter was reset (likely evicted), so start over.
+                last_seen = 0
+
+            first = max(last_seen + 1, position - self.max_events + 1)
+            event_keys += [
+                self._make_event_key(channel, i)
+                for i in range(first, position + 1)
+            ]
+
+        if event_keys:
+            stored_events = cache.get_many(event_keys)
+            events = [
+                stored_events[key]
+                for key in event_keys
+                if key in stored_events
+            ]
+        else:
+            events = []
+
+        return events, positions
+
+    def _get_positions(self, channels):
+        """Return the current positions for the given channels.
+
+        Args:
+            channels (list of unicode):
+                The names of the channels.
+
+        Returns:
+            dict:
+            A mapping of channel names to positions.
+        """
+        keys = {
+            channel: self._make_position_key(channel)
+            for channel in channels
+        }
+        values = cache.get_many(list(six.itervalues(keys)))
+
+        return {
+            channel: values.get(key) or 0
+            for channel, key in six.iteritems(keys)
+        }
+
+    def _make_position_key(self, channel):
+        """Return the cache key for a channel's position counter.
+
+        Args:
+            channel (unicode):
+                The name of the channel.
+
+        Returns:
+            unicode:
+            The cache key.
+        """
+        return make_cache_key('push-channel-position:%s' % channel)
+
+    def _make_event_key(self, channel, position):
+        """Return the cache key for an event on a channel.
+
+        Args:
+            channel (unicode):
+                The name of the channel.
+
+            position (int):
+                The position of the event.
+
+        Returns:
+            unicode:
+            The cache key.
+        """
+        return make_cache_key('push-channel-event:%s:%s' % (channel, position))
+
+
+_push_backend = None
+_push_backend_lock = threading.Lock()
+
+
+def get_push_backend():
+    """Return the configured push notification backend.
+
+    Returns:
+        BasePushBackend:
+        The push notification backend.
+
+    Raises:
+        django.core.exceptions.ImproperlyConfigured:
+            The configured backend could not be loaded.
+    """
+    global _push_backend
+
+    if _push_backend is None:
+        with _push_backend_lock:
+            if _push_backend is None:
+                path = getattr(settings, 'PUSH_NOTIFICATIONS_BACKEND',
+                               DEFAULT_PUSH_BACKEND)
+                i = path.rfind('.')
+                module, class_name = path[:i], path[i + 1:]
+
+                try:
+                    mod = __import__(module, {}, {}, [class_name])
+                    _push_backend = getattr(mod, class_name)()
+                except Exception as e:
+                    msg = ('Error loading push notification backend %s: "%s"'
+                           % (path, e))
+                    logging.critical(msg)
+                    raise ImproperlyConfigured(msg)
+
+    return _push_backend
+
+
+def publish_event(channels, event_type, review_request, **data):
+    """Publish an event about a review request.
+
+    Errors are logged, rather than raised, so that they don't impact the
+    operation that triggered the event.
+
+    Args:
+        channels (list of unicode):
+            The names of the channels to publish to.
+
+        event_type (unicode):
+            The type of event.
+
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request the event is about.
+
+        **data (dict):
+            Additional data to include in the event.
+    """
+    event = dict({
+        'type': event_type,
+        'review_request_id': review_request.display_id,
+        'timestamp': time.time(),
+    }, **data)
+
+    try:
+        backend = get_push_backend()
+
+        for channel in channels:
+            backend.publish(channel, event)
+    except Exception as e:
+        logging.exception('Unable to publish push notification event %r: %s',
+                          event, e)
+
+
+def _get_review_request_channels(review_request):
+    """Return all channels that should be notified about a review request.
+
+    This includes the review request's own channel, and the dashboard
+    channels for the submitter, target people and members of target groups
+    who can access the review request.
+
+    Args:
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request.
+
+    Returns:
+        list of unicode:
+        The list of channel names.
+    """
+    local_site = review_request.local_site
+    local_site_id = review_request.local_site_id
+
+    users = (
+        User.objects
+        .filter(Q(pk=review_request.submitter_id) |
+                Q(directed_review_requests=review_request) |
+                Q(review_groups__review_requests=review_request))
+        .distinct()
+    )
+
+    return [get_review_request_channel(review_request.pk, local_site_id)] + [
+        get_user_channel(user.pk, local_site_id)
+        for user in users
+        if review_request.is_accessible_by(user, local_site=local_site,
+                                           silent=True)
+    ]
+
+
+def _publish_review_request_event_to_channels(event_type, review_request,
+                                              data):
+    """Publish an event to all channels interested in a review request.
+
+    This checks which users can access the review request, so it's run in
+    the background by :py:func:`_publish_review_request_event`.
+
+    Args:
+        event_type (unicode):
+            The type of event.
+
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request the event is about.
+
+        data (dict):
+            Additional data to include in the event.
+    """
+    publish_event(_get_review_request_channels(review_request),
+                  event_type, review_request, **data)
+
+
+def _publish_review_request_event(event_type, review_request, **data):
+    """Publish an event to all channels interested in a review request.
+
+    This does nothing unless push notifications are enabled. The event is
+    published from a background worker, since determining the channels
+    requires an access check for each interested user.
+
+    Args:
+        event_type (unicode):
+            The type of event.
+
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request the event is about.
+
+        **data (dict):
+            Additional data to include in the event.
+    """
+    if is_push_enabled():
+        run_in_background(_publish_review_request_event_to_channels,
+                          event_type, review_request, data)
+
+
+def iter_event_stream(channels, last_event_id=None, max_duration=60,
+                      keepalive_interval=15):
+    """Yield a Server-Sent Events stream for the given channels.
+
+    The stream ends after ``max_duration`` seconds, at which point the
+    client will reconnect and resume from the last event it received (using
+    the ``Last-Event-ID`` header).
+
+    Args:
+        channels (list of unicode):
+            The names of the channels to stream.
+
+        last_event_id (unicode, optional):
+            The ID of the last event the client received, if resuming.
+
+        max_duration (float, optional):
+            The maximum amount of time to keep the stream open, in seconds.
+
+        keepalive_interval (float, optional):
+            How often to send a keep-alive comment when there are no events,
+            in seconds.
+
+    Yields:
+        bytes:
+        Each chunk of the stream.
+    """
+    backend = get_push_backend()
+    cursor = None
+
+    if last_event_id:
+        try:
+            cursor = {
+                channel: int(position)
+                for channel, position in json.loads(last_event_id).items()
+                if channel in channels
+            }
+        except (ValueError, AttributeError, TypeError):
+            cursor = None
+
+    if cursor is None:
+        cursor = backend.get_cursor(channels)
+
+    # Ask the client to wait a few seconds before reconnecting.
+    yield b'retry: 5000\n\n'
+
+    deadline = time.time() + max_duration
+
+    while True:
+        remaining = deadline - time.time()
+
+        if remaining <= 0:
+            break
+
+        events, cursor = backend.wait(channels, cursor,
+                                      min(keepalive_interval, remaining))
+
+        if events:
+            event_id = json.dumps(cursor, sort_keys=True,
+                                  separators=(',', ':'))
+
+            for event in events:
+                yield ('id: %s\ndata: %s\n\n'
+                       % (event_id, json.dumps(event))).encode('utf-8')
+        else:
+            yield b': keep-alive\n\n'
+
+
+def build_event_stream_response(request, channels):
+    """Return an HTTP response streaming events for the given channels.
+
+    Args:
+        request (django.http.HttpRequest):
+            The HTTP request from the client.
+
+        channels (list of unicode):
+            The names of the channels to stream.
+
+    Returns:
+        django.http.StreamingHttpResponse:
+        The streaming response.
+    """
+    response = StreamingHttpResponse(
+        iter_event_stream(channels,
+                          last_event_id=request.META.get(
+                              'HTTP_LAST_EVENT_ID')),
+        content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+
+    # Prevent proxies (such as nginx) from buffering the stream.
+    response['X-Accel-Buffering'] = 'no'
+
+    return response
+
+
+def _on_review_request_published(review_request, **kwargs):
+    """Publish an event when a review request is published.
+
+    Args:
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request that was published.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    _publish_review_request_event('review_request_published', review_request)
+
+
+def _on_review_request_closed(review_request, **kwargs):
+    """Publish an event when a review request is closed.
+
+    Args:
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request that was closed.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    _publish_review_request_event('review_request_closed', review_request)
+
+
+def _on_review_request_reopened(review_request, **kwargs):
+    """Publish an event when a review request is reopened.
+
+    Args:
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request that was reopened.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    _publish_review_request_event('review_request_reopened', review_request)
+
+
+def _on_review_published(review, **kwargs):
+    """Publish an event when a review is published.
+
+    Args:
+        review (reviewboard.reviews.models.review.Review):
+            The review that was published.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    review_request = review.review_request
+    _publish_review_request_event('review_published', review_request,
+                                  review_id=review.pk)
+
+
+def _on_reply_published(reply, **kwargs):
+    """Publish an event when a reply is published.
+
+    Args:
+        reply (reviewboard.reviews.models.review.Review):
+            The reply that was published.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    review_request = reply.review_request
+    _publish_review_request_event('reply_published', review_request,
+                                  review_id=reply.base_reply_to_id,
+                                  reply_id=reply.pk)
+
+
+def connect_signals():
+    """Connect the signal handlers that publish push notification events."""
+    review_request_published.connect(_on_review_request_published,
+                                     sender=ReviewRequest)
+    review_request_closed.connect(_on_review_request_closed,
+                                  sender=ReviewRequest)
+    review_request_reopened.connect(_on_review_request_reopened,
+                                    sender=ReviewRequest)
+    review_published.connect(_on_review_published, sender=Review)
+    reply_published.connect(_on_reply_published, sender=Review)
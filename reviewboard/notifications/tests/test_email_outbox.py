@@ -0,0 +1,307 @@
+"""Unit tests for reviewboard.notifications.email.outbox."""
+
+from __future__ import unicode_literals
+
+import email
+import os
+import shutil
+import smtplib
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.test.utils import override_settings
+from django.utils import timezone
+from kgb import SpyAgency
+
+import reviewboard.notifications.email.outbox as outbox_module
+from reviewboard.notifications.email.backends import FileEmailBackend
+from reviewboard.notifications.email.outbox import (process_pending_emails,
+                                                    queue_email,
+                                                    register_email_type,
+                                                    schedule_due_emails,
+                                                    unregister_email_type)
+from reviewboard.notifications.models import QueuedEmail
+from reviewboard.testing import TestCase
+
+
+def _build_message(subject):
+    return EmailMessage(subject=subject,
+                        body='Test body',
+                        from_email='noreply@example.com',
+                        to=['doc@example.com'])
+
+
+def _build_user_message(user):
+    return _build_message(user.get_full_name())
+
+
+class EmailOutboxTests(SpyAgency, TestCase):
+    """Unit tests for the queued e-mail outbox."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(EmailOutboxTests, self).setUp()
+
+        self.tempdir = tempfile.mkdtemp(prefix='rb-tests-email-')
+
+        self.settings_override = override_settings(
+            EMAIL_BACKEND=('reviewboard.notifications.email.backends.'
+                           'FileEmailBackend'),
+            EMAIL_FILE_PATH=self.tempdir,
+            RUN_BACKGROUND_TASKS_INLINE=False)
+        self.settings_override.enable()
+
+        self.sent = []
+
+        def _on_sent(message, **kwargs):
+            self.sent.append(message)
+
+        register_email_type('test', _build_message, on_sent=_on_sent)
+        register_email_type('test-user', _build_user_message,
+                            on_sent=_on_sent)
+
+        # E-mails are sent explicitly by the tests.
+        self.spy_on(outbox_module._schedule_email_sending,
+                    call_fake=lambda *args, **kwargs: None)
+
+    def tearDown(self):
+        unregister_email_type('test')
+        unregister_email_type('test-user')
+
+        self.settings_override.disable()
+        shutil.rmtree(self.tempdir)
+
+        super(EmailOutboxTests, self).tearDown()
+
+    def test_queue_email(self):
+        """Testing queue_email stores the e-mail with object IDs"""
+        user = User.objects.get(username='doc')
+        queued_email = queue_email('test-user', user=user)
+
+        queued_email = QueuedEmail.objects.get(pk=queued_email.pk)
+        self.assertEqual(queued_email.email_type, 'test-user')
+        self.assertEqual(queued_email.status, QueuedEmail.STATUS_PENDING)
+        self.assertEqual(queued_email.params, {
+            'user': {
+                '__model__': 'auth.user',
+                'pk': user.pk,
+            },
+        })
+        self.assertTrue(outbox_module._schedule_email_sending.called)
+        self.assertEqual(self.sent, [])
+
+    def test_queue_email_unsaved_object(self):
+        """Testing queue_email with an unsaved object"""
+        with self.assertRaises(TypeError):
+            queue_email('test-user', user=User(username='unsaved'))
+
+        self.assertFalse(QueuedEmail.objects.exists())
+
+    def test_builds_from_current_objects(self):
+        """Testing process_pending_emails builds e-mails from the current
+        state of objects
+        """
+        user = User.objects.get(username='doc')
+        queue_email('test-user', user=user)
+
+        User.objects.filter(pk=user.pk).update(first_name='Updated',
+                                               last_name='Name')
+
+        self.assertEqual(process_pending_emails(), 1)
+        self.assertEqual([message.subject for message in self.sent],
+                         ['Updated Name'])
+
+    def test_reuses_connection(self):
+        """Testing process_pending_emails sends consecutive messages over one
+        connection
+        """
+        self.spy_on(FileEmailBackend.open)
+
+        for i in range(3):
+            queue_email('test', subject='Message %d' % i)
+
+        self.assertEqual(process_pending_emails(), 3)
+
+        self.assertEqual(len(os.listdir(self.tempdir)), 3)
+        self.assertEqual([message.subject for message in self.sent],
+                         ['Message 0', 'Message 1', 'Message 2'])
+        self.assertFalse(QueuedEmail.objects.exclude(
+            status=QueuedEmail.STATUS_SENT).exists())
+
+        # Only one of the calls should have opened a new connection.
+        self.assertEqual(
+            [call.return_value for call in FileEmailBackend.open.spy.calls
+             ].count(True),
+            1)
+
+    def test_retries_temporary_errors(self):
+        """Testing process_pending_emails retries messages after temporary
+        errors
+        """
+        state = {'failed': False}
+
+        def _send_messages(backend, email_messages):
+            if not state['failed']:
+                state['failed'] = True
+                raise smtplib.SMTPServerDisconnected('Connection lost')
+
+            return FileEmailBackend.send_messages.spy.call_original(
+                backend, email_messages)
+
+        self.spy_on(FileEmailBackend.send_messages, call_fake=_send_messages)
+
+        queued_email = queue_email('test', subject='Retried')
+        process_pending_emails()
+
+        queued_email = QueuedEmail.objects.get(pk=queued_email.pk)
+        self.assertEqual(queued_email.status, QueuedEmail.STATUS_PENDING)
+        self.assertEqual(queued_email.attempts, 1)
+        self.assertGreater(queued_email.next_attempt_time, timezone.now())
+        self.assertEqual(self.sent, [])
+
+        # The retry shouldn't be sent until it's due.
+        self.assertEqual(process_pending_emails(), 0)
+
+        queued_email.next_attempt_time = timezone.now()
+        queued_email.save(update_fields=('next_attempt_time',))
+        self.assertEqual(process_pending_emails(), 1)
+
+        queued_email = QueuedEmail.objects.get(pk=queued_email.pk)
+        self.assertEqual(queued_email.status, QueuedEmail.STATUS_SENT)
+        self.assertEqual(queued_email.attempts, 2)
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(len(os.listdir(self.tempdir)), 1)
+
+    def test_permanent_errors_not_retried(self):
+        """Testing process_pending_emails doesn't retry messages the server
+        rejected
+        """
+        def _send_messages(backend, email_messages):
+            raise smtplib.SMTPRecipientsRefused({
+                'doc@example.com': (550, 'No such user'),
+            })
+
+        self.spy_on(FileEmailBackend.send_messages, call_fake=_send_messages)
+
+        queued_email = queue_email('test', subject='Rejected')
+        process_pending_emails()
+
+        queued_email = QueuedEmail.objects.get(pk=queued_email.pk)
+        self.assertEqual(queued_email.status, QueuedEmail.STATUS_FAILED)
+        self.assertEqual(len(FileEmailBackend.send_messages.spy.calls), 1)
+        self.assertEqual(self.sent, [])
+
+    def test_missing_object(self):
+        """Testing process_pending_emails when an object no longer exists"""
+        user = User.objects.create_user(username='temp',
+                                        email='temp@example.com')
+        queued_email = queue_email('test-user', user=user)
+        user.delete()
+
+        process_pending_emails()
+
+        queued_email = QueuedEmail.objects.get(pk=queued_email.pk)
+        self.assertEqual(queued_email.status, QueuedEmail.STATUS_FAILED)
+        self.assertEqual(self.sent, [])
+
+    def test_builder_returns_none(self):
+        """Testing process_pending_emails when the builder doesn't generate a
+        message
+        """
+        register_email_type('test-none', lambda: None)
+
+        try:
+            queue_email('test-none')
+            process_pending_emails()
+        finally:
+            unregister_email_type('test-none')
+
+        self.assertFalse(QueuedEmail.objects.exists())
+        self.assertEqual(os.listdir(self.tempdir), [])
+
+    def test_stale_emails(self):
+        """Testing process_pending_emails with e-mails left being sent"""
+        queued_email = queue_email('test', subject='Interrupted')
+        QueuedEmail.objects.filter(pk=queued_email.pk).update(
+            status=QueuedEmail.STATUS_SENDING,
+            last_attempt_time=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(process_pending_emails(), 0)
+        self.assertEqual(
+            process_pending_emails(stale_after=timedelta(minutes=30)),
+            1)
+        self.assertEqual(len(self.sent), 1)
+
+    def test_schedule_due_emails(self):
+        """Testing schedule_due_emails only schedules sending when e-mails
+        are due
+        """
+        queued_email = queue_email('test', subject='Retried')
+        QueuedEmail.objects.filter(pk=queued_email.pk).update(
+            next_attempt_time=timezone.now() + timedelta(minutes=5))
+
+        schedule_due_emails()
+        self.assertEqual(
+            len(outbox_module._schedule_email_sending.spy.calls), 1)
+
+        QueuedEmail.objects.filter(pk=queued_email.pk).update(
+            next_attempt_time=timezone.now())
+
+        schedule_due_emails()
+        self.assertEqual(
+            len(outbox_module._schedule_email_sending.spy.calls), 2)
+
+
+class FileEmailBackendTests(TestCase):
+    """Unit tests for FileEmailBackend."""
+
+    def test_send_messages(self):
+        """Testing FileEmailBackend.send_messages writes each message to a
+        file
+        """
+        tempdir = tempfile.mkdtemp(prefix='rb-tests-email-')
+
+        try:
+            backend = FileEmailBackend(file_path=tempdir)
+            count = backend.send_messages([_build_message('Message 1'),
+                                           _build_message('Message 2')])
+
+            self.assertEqual(count, 2)
+
+            subjects = []
+
+            for filename in os.listdir(tempdir):
+                self.assertTrue(filename.endswith('.eml'))
+
+                with open(os.path.join(tempdir, filename), 'r') as fp:
+                    subjects.append(email.message_from_file(fp)['Subject'])
+
+            self.assertEqual(sorted(subjects), ['Message 1', 'Message 2'])
+        finally:
+            shutil.rmtree(tempdir)
+
+
+class QueueEmailTests(TestCase):
+    """Unit tests for queue_email."""
+
+    def test_inline(self):
+        """Testing queue_email sends immediately when running tasks inline"""
+        sent = []
+
+        def _on_sent(message, **kwargs):
+            sent.append((message, kwargs))
+
+        register_email_type('test', _build_message, on_sent=_on_sent)
+
+        try:
+            self.assertIsNone(queue_email('test', subject='Inline'))
+        finally:
+            unregister_email_type('test')
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(sent, [(mail.outbox[0], {'subject': 'Inline'})])
+        self.assertFalse(QueuedEmail.objects.exists())
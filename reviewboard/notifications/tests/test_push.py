@@ -0,0 +1,267 @@
+"""Unit tests for reviewboard.notifications.push."""
+
+from __future__ import unicode_literals
+
+import json
+import threading
+
+from django.contrib.auth.models import User
+from djblets.siteconfig.models import SiteConfiguration
+from djblets.testing.decorators import add_fixtures
+
+from reviewboard.notifications.push import (CachePushBackend,
+                                            InProcessPushBackend,
+                                            get_dashboard_channels,
+                                            get_push_backend,
+                                            get_review_request_channel,
+                                            get_user_channel,
+                                            iter_event_stream)
+from reviewboard.testing import TestCase
+
+
+class PushBackendTestsMixin(object):
+    """Mixin for unit tests common to all push backends."""
+
+    def test_get_events(self):
+        """Testing get_events returns events published after the cursor"""
+        backend = self.backend
+        backend.publish('channel1', {'n': 1})
+
+        cursor = backend.get_cursor(['channel1', 'channel2'])
+
+        backend.publish('channel1', {'n': 2})
+        backend.publish('channel2', {'n': 3})
+        backend.publish('channel3', {'n': 4})
+
+        events, cursor = backend.get_events(['channel1', 'channel2'], cursor)
+        self.assertEqual(
+            sorted(event['n'] for event in events),
+            [2, 3])
+
+        events, cursor = backend.get_events(['channel1', 'channel2'], cursor)
+        self.assertEqual(events, [])
+
+    def test_wait_timeout(self):
+        """Testing wait with no new events"""
+        backend = self.backend
+        cursor = backend.get_cursor(['channel1'])
+
+        events, new_cursor = backend.wait(['channel1'], cursor, timeout=0)
+
+        self.assertEqual(events, [])
+        self.assertEqual(new_cursor, cursor)
+
+
+class InProcessPushBackendTests(PushBackendTestsMixin, TestCase):
+    """Unit tests for InProcessPushBackend."""
+
+    def setUp(self):
+        super(InProcessPushBackendTests, self).setUp()
+
+        self.backend = InProcessPushBackend()
+
+    def test_wait_wakes_on_publish(self):
+        """Testing InProcessPushBackend.wait wakes when an event is published
+        """
+        backend = self.backend
+        cursor = backend.get_cursor(['channel1'])
+
+        timer = threading.Timer(0.1, backend.publish,
+                                args=('channel1', {'n': 1}))
+        timer.start()
+
+        try:
+            events, cursor = backend.wait(['channel1'], cursor, timeout=10)
+        finally:
+            timer.cancel()
+
+        self.assertEqual(events, [{'n': 1}])
+
+
+class CachePushBackendTests(PushBackendTestsMixin, TestCase):
+    """Unit tests for CachePushBackend."""
+
+    def setUp(self):
+        super(CachePushBackendTests, self).setUp()
+
+        self.backend = CachePushBackend()
+
+
+class PushEventTests(TestCase):
+    """Unit tests for publishing and streaming push events."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(PushEventTests, self).setUp()
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('push_notifications_enabled', True)
+        siteconfig.save()
+
+    def tearDown(self):
+        super(PushEventTests, self).tearDown()
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('push_notifications_enabled', False)
+        siteconfig.save()
+
+    def test_review_published(self):
+        """Testing push events are published when a review is published"""
+        review_request = self.create_review_request(publish=True)
+        group = self.create_review_group()
+        group.users.add(User.objects.get(username='grumpy'))
+        review_request.target_groups.add(group)
+
+        channels = [
+            get_review_request_channel(review_request.pk),
+            get_user_channel(review_request.submitter_id),
+            get_user_channel(User.objects.get(username='grumpy').pk),
+        ]
+
+        backend = get_push_backend()
+        cursor = backend.get_cursor(channels)
+
+        review = self.create_review(review_request)
+        review.publish()
+
+        events, cursor = backend.get_events(channels, cursor)
+
+        self.assertEqual(len(events), 3)
+
+        for event in events:
+            self.assertEqual(event['type'], 'review_published')
+            self.assertEqual(event['review_request_id'],
+                             review_request.display_id)
+            self.assertEqual(event['review_id'], review.pk)
+
+    def test_review_published_inaccessible(self):
+        """Testing push events aren't published to users who can't access
+        the review request
+        """
+        repository = self.create_repository(public=False)
+        review_request = self.create_review_request(repository=repository,
+                                                    publish=True)
+        group = self.create_review_group()
+        group.users.add(User.objects.get(username='grumpy'))
+        review_request.target_groups.add(group)
+
+        channels = [get_user_channel(User.objects.get(username='grumpy').pk)]
+
+        backend = get_push_backend()
+        cursor = backend.get_cursor(channels)
+
+        self.create_review(review_request).publish()
+
+        events, cursor = backend.get_events(channels, cursor)
+        self.assertEqual(events, [])
+
+    @add_fixtures(['test_site'])
+    def test_review_published_local_site(self):
+        """Testing push events are published to channels scoped to the
+        review request's Local Site
+        """
+        review_request = self.create_review_request(with_local_site=True,
+                                                    publish=True)
+        local_site_id = review_request.local_site_id
+
+        channels = [
+            get_review_request_channel(review_request.pk),
+            get_user_channel(review_request.submitter_id),
+        ]
+        local_site_channels = [
+            get_review_request_channel(review_request.pk, local_site_id),
+            get_user_channel(review_request.submitter_id, local_site_id),
+        ]
+
+        backend = get_push_backend()
+        cursor = backend.get_cursor(channels + local_site_channels)
+
+        self.create_review(review_request).publish()
+
+        events, new_cursor = backend.get_events(channels, cursor)
+        self.assertEqual(events, [])
+
+        events, new_cursor = backend.get_events(local_site_channels, cursor)
+        self.assertEqual(len(events), 2)
+
+    def test_disabled(self):
+        """Testing push events aren't published when push notifications are
+        disabled
+        """
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('push_notifications_enabled', False)
+        siteconfig.save()
+
+        review_request = self.create_review_request(publish=True)
+        channels = [get_review_request_channel(review_request.pk)]
+
+        backend = get_push_backend()
+        cursor = backend.get_cursor(channels)
+
+        self.create_review(review_request).publish()
+
+        events, cursor = backend.get_events(channels, cursor)
+        self.assertEqual(events, [])
+
+    def test_events_view_disabled(self):
+        """Testing the review request events view returns 404 when push
+        notifications are disabled
+        """
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('push_notifications_enabled', False)
+        siteconfig.save()
+
+        review_request = self.create_review_request(publish=True)
+        response = self.client.get('%s_events/'
+                                   % review_request.get_absolute_url())
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_dashboard_channels(self):
+        """Testing get_dashboard_channels"""
+        user = User.objects.get(username='doc')
+
+        self.assertEqual(get_dashboard_channels(user),
+                         [get_user_channel(user.pk)])
+
+    def test_iter_event_stream_with_invalid_last_event_id(self):
+        """Testing iter_event_stream with an invalid Last-Event-ID"""
+        review_request = self.create_review_request()
+        channel = get_review_request_channel(review_request.pk)
+
+        for last_event_id in ('invalid', '[]', '{"%s": null}' % channel):
+            stream = iter_event_stream([channel],
+                                       last_event_id=last_event_id,
+                                       max_duration=10,
+                                       keepalive_interval=0)
+            self.assertEqual(next(stream), b'retry: 5000\n\n')
+            self.assertEqual(next(stream), b': keep-alive\n\n')
+
+    def test_iter_event_stream(self):
+        """Testing iter_event_stream"""
+        review_request = self.create_review_request()
+        channel = get_review_request_channel(review_request.pk)
+
+        stream = iter_event_stream([channel], max_duration=10,
+                                   keepalive_interval=0)
+
+        self.assertEqual(next(stream), b'retry: 5000\n\n')
+        self.assertEqual(next(stream), b': keep-alive\n\n')
+
+        review_request.publish(review_request.submitter)
+
+        chunk = next(stream).decode('utf-8')
+        lines = chunk.splitlines()
+
+        self.assertTrue(lines[0].startswith('id: '))
+        self.assertEqual(json.loads(lines[1][len('data: '):])['type'],
+                         'review_request_published')
+
+        # Resuming from the event ID shouldn't repeat the event.
+        stream = iter_event_stream([channel],
+                                   last_event_id=lines[0][len('id: '):],
+                                   max_duration=10,
+                                   keepalive_interval=0)
+        self.assertEqual(next(stream), b'retry: 5000\n\n')
+        self.assertEqual(next(stream), b': keep-alive\n\n')
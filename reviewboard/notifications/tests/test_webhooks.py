@@ -1,20 +1,29 @@
 from __future__ import unicode_literals
 
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from django.contrib.auth.models import User
 from django.template import TemplateSyntaxError
-from django.utils import six
+from django.utils import six, timezone
+from django.utils.six.moves.urllib.error import HTTPError
 from django.utils.six.moves.urllib.request import OpenerDirector
 from djblets.testing.decorators import add_fixtures
 from kgb import SpyAgency
 
-from reviewboard.notifications.models import WebHookTarget
-from reviewboard.notifications.webhooks import (FakeHTTPRequest,
-                                                dispatch_webhook_event,
-                                                normalize_webhook_payload,
-                                                render_custom_content)
+from reviewboard.background import BackgroundTaskQueue
+from reviewboard.notifications import webhooks
+from reviewboard.notifications.models import WebHookDelivery, WebHookTarget
+from reviewboard.notifications.webhooks import (
+    WEBHOOK_MAX_DELIVERY_ATTEMPTS,
+    WEBHOOK_RETRY_MAX_DELAY,
+    FakeHTTPRequest,
+    deliver_webhook,
+    dispatch_webhook_event,
+    get_webhook_retry_delay,
+    normalize_webhook_payload,
+    process_pending_webhook_deliveries,
+    render_custom_content)
 from reviewboard.reviews.models import ReviewRequestDraft
 from reviewboard.site.models import LocalSite
 from reviewboard.testing import TestCase
@@ -854,3 +863,174 @@ class WebHookSignalDispatchTests(SpyAgency, TestCase):
         elif type(payload) is list:
             for i in payload:
                 self._check_webhook_payload(i)
+
+
+class WebHookDeliveryTests(SpyAgency, TestCase):
+    """Unit tests for queued WebHook deliveries."""
+
+    ENDPOINT_URL = 'http://example.com/endpoint/'
+
+    def setUp(self):
+        super(WebHookDeliveryTests, self).setUp()
+
+        self.webhook_target = WebHookTarget.objects.create(
+            url=self.ENDPOINT_URL,
+            events='my-event',
+            timeout=5)
+
+    def test_delivery_logged(self):
+        """Testing dispatch_webhook_event logs successful deliveries"""
+        self.spy_on(OpenerDirector.open, call_original=False)
+
+        dispatch_webhook_event(FakeHTTPRequest(None), [self.webhook_target],
+                               'my-event', {'n': 1})
+
+        self.assertEqual(len(OpenerDirector.open.spy.calls), 1)
+        self.assertEqual(OpenerDirector.open.last_call.kwargs['timeout'], 5)
+
+        delivery = WebHookDelivery.objects.get()
+        self.assertEqual(delivery.target, self.webhook_target)
+        self.assertEqual(delivery.event, 'my-event')
+        self.assertEqual(delivery.status, WebHookDelivery.STATUS_SUCCEEDED)
+        self.assertEqual(delivery.attempts, 1)
+        self.assertEqual(
+            OpenerDirector.open.last_call.args[0].data,
+            delivery.body.encode('utf-8'))
+
+    def test_failed_delivery_retried(self):
+        """Testing dispatch_webhook_event retries failed deliveries later"""
+        def _urlopen(opener, *args, **kwargs):
+            raise IOError('Connection refused')
+
+        self.spy_on(logging.exception)
+        self.spy_on(OpenerDirector.open, call_fake=_urlopen)
+
+        dispatch_webhook_event(FakeHTTPRequest(None), [self.webhook_target],
+                               'my-event', {'n': 1})
+
+        delivery = WebHookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebHookDelivery.STATUS_PENDING)
+        self.assertEqual(delivery.attempts, 1)
+        self.assertEqual(delivery.last_error, 'Connection refused')
+        self.assertGreater(delivery.next_attempt_time, timezone.now())
+
+        # The retry isn't due yet.
+        self.assertEqual(process_pending_webhook_deliveries(), 0)
+
+        delivery.next_attempt_time = timezone.now() - timedelta(seconds=1)
+        delivery.save(update_fields=('next_attempt_time',))
+
+        OpenerDirector.open.unspy()
+        self.spy_on(OpenerDirector.open, call_original=False)
+
+        self.assertEqual(process_pending_webhook_deliveries(), 1)
+
+        delivery = WebHookDelivery.objects.get(pk=delivery.pk)
+        self.assertEqual(delivery.status, WebHookDelivery.STATUS_SUCCEEDED)
+        self.assertEqual(delivery.attempts, 2)
+        self.assertEqual(delivery.last_error, '')
+
+    def test_failed_delivery_max_attempts(self):
+        """Testing dispatch_webhook_event gives up after the maximum number
+        of attempts
+        """
+        def _urlopen(opener, *args, **kwargs):
+            raise IOError('Connection refused')
+
+        self.spy_on(logging.exception)
+        self.spy_on(OpenerDirector.open, call_fake=_urlopen)
+
+        delivery = WebHookDelivery.objects.create(
+            target=self.webhook_target,
+            event='my-event',
+            attempts=WEBHOOK_MAX_DELIVERY_ATTEMPTS - 1)
+
+        self.assertEqual(process_pending_webhook_deliveries(), 1)
+
+        delivery = WebHookDelivery.objects.get(pk=delivery.pk)
+        self.assertEqual(delivery.status, WebHookDelivery.STATUS_FAILED)
+        self.assertEqual(delivery.attempts, WEBHOOK_MAX_DELIVERY_ATTEMPTS)
+
+    def test_client_error_not_retried(self):
+        """Testing dispatch_webhook_event doesn't retry deliveries rejected
+        by the server
+        """
+        def _urlopen(opener, *args, **kwargs):
+            raise HTTPError(self.ENDPOINT_URL, 404, 'Not Found', {}, None)
+
+        self.spy_on(logging.exception)
+        self.spy_on(OpenerDirector.open, call_fake=_urlopen)
+
+        dispatch_webhook_event(FakeHTTPRequest(None), [self.webhook_target],
+                               'my-event', {'n': 1})
+
+        delivery = WebHookDelivery.objects.get()
+        self.assertEqual(delivery.status, WebHookDelivery.STATUS_FAILED)
+        self.assertEqual(delivery.response_status, 404)
+        self.assertEqual(delivery.attempts, 1)
+
+    def test_stale_delivery_requeued(self):
+        """Testing process_pending_webhook_deliveries with interrupted
+        deliveries
+        """
+        self.spy_on(OpenerDirector.open, call_original=False)
+
+        delivery = WebHookDelivery.objects.create(
+            target=self.webhook_target,
+            event='my-event',
+            status=WebHookDelivery.STATUS_DELIVERING,
+            attempts=1,
+            last_attempt_time=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(process_pending_webhook_deliveries(), 0)
+        self.assertEqual(
+            process_pending_webhook_deliveries(
+                stale_after=timedelta(minutes=30)),
+            1)
+
+        delivery = WebHookDelivery.objects.get(pk=delivery.pk)
+        self.assertEqual(delivery.status, WebHookDelivery.STATUS_SUCCEEDED)
+        self.assertEqual(delivery.attempts, 2)
+
+    def test_missing_delivery(self):
+        """Testing deliver_webhook with a delivery that isn't visible yet"""
+        self.spy_on(webhooks._schedule_webhook_delivery, call_original=False)
+
+        self.assertFalse(deliver_webhook(12345))
+        self.assertFalse(webhooks._schedule_webhook_delivery.called)
+
+    def test_poll_webhook_deliveries(self):
+        """Testing the WebHook delivery poller schedules due deliveries once
+        """
+        self.spy_on(BackgroundTaskQueue.add, call_original=False)
+
+        due_delivery = WebHookDelivery.objects.create(
+            target=self.webhook_target,
+            event='my-event',
+            attempts=1)
+        WebHookDelivery.objects.create(
+            target=self.webhook_target,
+            event='my-event',
+            attempts=1,
+            next_attempt_time=timezone.now() + timedelta(minutes=5))
+
+        with self.settings(RUN_BACKGROUND_TASKS_INLINE=False):
+            try:
+                webhooks._poll_webhook_deliveries()
+                webhooks._poll_webhook_deliveries()
+            finally:
+                webhooks._scheduled_delivery_ids.clear()
+
+        self.assertEqual(len(BackgroundTaskQueue.add.spy.calls), 1)
+        self.assertEqual(BackgroundTaskQueue.add.last_call.args,
+                         (webhooks._run_scheduled_webhook_delivery,
+                          due_delivery.pk))
+
+    def test_get_webhook_retry_delay(self):
+        """Testing get_webhook_retry_delay uses an exponential backoff"""
+        self.assertEqual(get_webhook_retry_delay(2),
+                         2 * get_webhook_retry_delay(1))
+        self.assertEqual(get_webhook_retry_delay(3),
+                         2 * get_webhook_retry_delay(2))
+        self.assertEqual(get_webhook_retry_delay(100),
+                         timedelta(seconds=WEBHOOK_RETRY_MAX_DELAY))
@@ -3,13 +3,16 @@ from __future__ import unicode_literals
 import hashlib
 import hmac
 import logging
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 
+from django.conf import settings
 from django.contrib.sites.models import Site
 from django.db.models import Model
 from django.db.models.query import QuerySet
 from django.http.request import HttpRequest
-from django.utils import six
+from django.utils import six, timezone
+from django.utils.encoding import force_text
 from django.utils.safestring import SafeText
 from django.utils.six.moves.urllib.parse import (urlencode, urlsplit,
                                                  urlunsplit)
@@ -26,7 +29,10 @@ from djblets.webapi.encoders import (BasicAPIEncoder, JSONEncoderAdapter,
                                      ResourceAPIEncoder, XMLEncoderAdapter)
 
 from reviewboard import get_package_version
-from reviewboard.notifications.models import WebHookTarget
+from reviewboard.background import (get_task_queue,
+                                    register_periodic_task,
+                                    should_run_tasks_inline)
+from reviewboard.notifications.models import WebHookDelivery, WebHookTarget
 from reviewboard.reviews.models import Review, ReviewRequest
 from reviewboard.reviews.signals import (review_request_closed,
                                          review_request_published,
@@ -35,6 +41,18 @@ from reviewboard.reviews.signals import (review_request_closed,
                                          reply_published)
 
 
+#: The maximum number of attempts made to deliver a WebHook event.
+WEBHOOK_MAX_DELIVERY_ATTEMPTS = 6
+
+#: The number of seconds to wait before the first retry of a delivery.
+#:
+#: This doubles for each subsequent retry.
+WEBHOOK_RETRY_BASE_DELAY = 30
+
+#: The maximum number of seconds to wait between delivery attempts.
+WEBHOOK_RETRY_MAX_DELAY = 60 * 60
+
+
 class FakeHTTPRequest(HttpRequest):
     """A fake HttpRequest implementation.
 
@@ -266,46 +284,392 @@ def dispatch_webhook_event(request, webhook_targets, event, payload):
             else:
                 body = bodies[encoding]
 
-        headers = {
-            b'X-ReviewBoard-Event': event.encode('utf-8'),
-            b'Content-Type': webhook_target.encoding.encode('utf-8'),
-            b'Content-Length': len(body),
-            b'User-Agent':
-                ('ReviewBoard-WebHook/%s' % get_package_version())
-                .encode('utf-8'),
-        }
+        queue_webhook_delivery(webhook_target, event, body)
 
-        if webhook_target.secret:
-            signer = hmac.new(webhook_target.secret.encode('utf-8'), body,
-                              hashlib.sha1)
-            headers[b'X-Hub-Signature'] = \
-                ('sha1=%s' % signer.hexdigest()).encode('utf-8')
 
+def queue_webhook_delivery(webhook_target, event, body):
+    """Queue the delivery of an event's payload to a WebHook target.
+
+    The delivery is stored in the database and then sent by a background
+    worker, so that slow or unreachable URLs don't hold up the caller.
+    Failed deliveries are retried with an exponential backoff. Deliveries
+    that are due (including retries, and deliveries left behind by a
+    process that exited) are picked up by each web server process every
+    ``WEBHOOK_DELIVERY_POLL_INTERVAL`` seconds.
+
+    Targets that have not been saved (for instance, when testing a
+    configuration) can't be logged, and are sent immediately instead.
+
+    Args:
+        webhook_target (reviewboard.notifications.models.WebHookTarget):
+            The WebHook target to deliver to.
+
+        event (unicode):
+            The name of the event being dispatched.
+
+        body (bytes):
+            The encoded payload.
+
+    Returns:
+        reviewboard.notifications.models.WebHookDelivery:
+        The queued delivery, or ``None`` if the payload was sent immediately.
+    """
+    if webhook_target.pk is None:
         logging.info('Dispatching webhook for event %s to %s',
                      event, webhook_target.url)
+
         try:
-            url = webhook_target.url
-            url_parts = urlsplit(url)
-
-            if url_parts.username or url_parts.password:
-                netloc = url_parts.netloc.split('@', 1)[1]
-                url = urlunsplit(
-                    (url_parts.scheme, netloc, url_parts.path,
-                     url_parts.params, url_parts.query))
-
-                password_mgr = HTTPPasswordMgrWithDefaultRealm()
-                password_mgr.add_password(
-                    None, url, url_parts.username, url_parts.password)
-                handler = HTTPBasicAuthHandler(password_mgr)
-                opener = build_opener(handler)
-            else:
-                opener = build_opener()
+            send_webhook_request(webhook_target, event, body)
+        except Exception as e:
+            logging.exception('Could not dispatch WebHook to %s: %s',
+                              webhook_target.url, e)
+
+        return None
+
+    delivery = WebHookDelivery.objects.create(target=webhook_target,
+                                              event=event,
+                                              body=force_text(body))
+    _schedule_webhook_delivery(delivery.pk)
+
+    return delivery
+
+
+def send_webhook_request(webhook_target, event, body):
+    """Send an HTTP request for an event to a WebHook target.
+
+    Args:
+        webhook_target (reviewboard.notifications.models.WebHookTarget):
+            The WebHook target to send to.
+
+        event (unicode):
+            The name of the event being dispatched.
+
+        body (bytes):
+            The encoded payload.
+
+    Returns:
+        int:
+        The HTTP status code of the response, if known.
+
+    Raises:
+        Exception:
+            The request failed. For HTTP error responses, this will be a
+            :py:class:`~urllib2.HTTPError`.
+    """
+    headers = {
+        b'X-ReviewBoard-Event': event.encode('utf-8'),
+        b'Content-Type': webhook_target.encoding.encode('utf-8'),
+        b'Content-Length': len(body),
+        b'User-Agent':
+            ('ReviewBoard-WebHook/%s' % get_package_version())
+            .encode('utf-8'),
+    }
+
+    if webhook_target.secret:
+        signer = hmac.new(webhook_target.secret.encode('utf-8'), body,
+                          hashlib.sha1)
+        headers[b'X-Hub-Signature'] = \
+            ('sha1=%s' % signer.hexdigest()).encode('utf-8')
+
+    url = webhook_target.url
+    url_parts = urlsplit(url)
+
+    if url_parts.username or url_parts.password:
+        netloc = url_parts.netloc.split('@', 1)[1]
+        url = urlunsplit(
+            (url_parts.scheme, netloc, url_parts.path,
+             url_parts.params, url_parts.query))
+
+        password_mgr = HTTPPasswordMgrWithDefaultRealm()
+        password_mgr.add_password(
+            None, url, url_parts.username, url_parts.password)
+        handler = HTTPBasicAuthHandler(password_mgr)
+        opener = build_opener(handler)
+    else:
+        opener = build_opener()
+
+    response = opener.open(Request(url.encode('utf-8'), body, headers),
+                           timeout=webhook_target.timeout)
+
+    if response is None:
+        return None
+
+    return response.getcode()
+
+
+def get_webhook_retry_delay(attempts):
+    """Return the delay before retrying a failed delivery.
+
+    Args:
+        attempts (int):
+            The number of attempts made so far.
+
+    Returns:
+        datetime.timedelta:
+        The delay before the next attempt.
+    """
+    return timedelta(seconds=min(
+        WEBHOOK_RETRY_BASE_DELAY * (2 ** (attempts - 1)),
+        WEBHOOK_RETRY_MAX_DELAY))
+
+
+def deliver_webhook(delivery_id):
+    """Attempt to send a queued WebHook delivery.
+
+    The delivery is claimed before being sent, so a delivery will only be
+    sent once even if several workers (or processes) try to send it. If the
+    target is already handling its maximum number of concurrent deliveries
+    in this process, the delivery is left in the queue, to be picked up when
+    one of those finishes.
+
+    If the delivery can't be found, it may have been queued in a
+    transaction that hasn't been committed yet. It will be picked up from
+    the database once it's due and visible.
+
+    Args:
+        delivery_id (int):
+            The ID of the delivery to send.
+
+    Returns:
+        bool:
+        ``True`` if the delivery was attempted. ``False`` if it wasn't due,
+        was claimed elsewhere, or had to wait for another delivery.
+    """
+    try:
+        delivery = (
+            WebHookDelivery.objects
+            .select_related('target')
+            .get(pk=delivery_id))
+    except WebHookDelivery.DoesNotExist:
+        logging.debug('WebHook delivery %s is not visible yet. It will be '
+                      'sent once it has been committed.',
+                      delivery_id)
+
+        return False
+
+    webhook_target = delivery.target
+    semaphore = _get_target_semaphore(webhook_target)
+
+    if not semaphore.acquire(False):
+        return False
+
+    try:
+        now = timezone.now()
+        claimed = (
+            WebHookDelivery.objects
+            .filter(pk=delivery.pk,
+                    status=WebHookDelivery.STATUS_PENDING,
+                    next_attempt_time__lte=now)
+            .update(status=WebHookDelivery.STATUS_DELIVERING,
+                    last_attempt_time=now)
+        )
+
+        if not claimed:
+            return False
+
+        delivery.attempts += 1
+        delivery.last_attempt_time = now
 
-            opener.open(Request(url.encode('utf-8'), body, headers))
+        logging.info('Dispatching webhook for event %s to %s (attempt %d)',
+                     delivery.event, webhook_target.url, delivery.attempts)
+
+        try:
+            delivery.response_status = send_webhook_request(
+                webhook_target, delivery.event,
+                delivery.body.encode('utf-8'))
+            delivery.status = WebHookDelivery.STATUS_SUCCEEDED
+            delivery.last_error = ''
         except Exception as e:
             logging.exception('Could not dispatch WebHook to %s: %s',
                               webhook_target.url, e)
 
+            delivery.response_status = getattr(e, 'code', None)
+            delivery.last_error = six.text_type(e)
+
+            # Client errors other than timeouts and rate limiting won't be
+            # fixed by trying again.
+            status = delivery.response_status
+            retryable = (status is None or status >= 500 or
+                         status in (408, 429))
+
+            if (retryable and
+                delivery.attempts < WEBHOOK_MAX_DELIVERY_ATTEMPTS):
+                delivery.status = WebHookDelivery.STATUS_PENDING
+                delivery.next_attempt_time = \
+                    now + get_webhook_retry_delay(delivery.attempts)
+            else:
+                delivery.status = WebHookDelivery.STATUS_FAILED
+
+        delivery.save(update_fields=('status', 'attempts',
+                                     'last_attempt_time',
+                                     'next_attempt_time', 'response_status',
+                                     'last_error'))
+    finally:
+        semaphore.release()
+
+    # Retries are picked up by _poll_webhook_deliveries once they're due.
+    _schedule_next_webhook_delivery(webhook_target.pk)
+
+    return True
+
+
+def process_pending_webhook_deliveries(stale_after=None):
+    """Send all queued WebHook deliveries that are due.
+
+    This is used by the :command:`deliver-webhooks` management command to
+    send due deliveries when no web server process is running, and to
+    recover deliveries interrupted when a process exited.
+
+    Args:
+        stale_after (datetime.timedelta, optional):
+            If provided, deliveries that have been marked as being delivered
+            for longer than this will be assumed to have been interrupted,
+            and will be queued again.
+
+    Returns:
+        int:
+        The number of deliveries attempted.
+    """
+    if stale_after is not None:
+        (WebHookDelivery.objects
+         .filter(status=WebHookDelivery.STATUS_DELIVERING,
+                 last_attempt_time__lt=timezone.now() - stale_after)
+         .update(status=WebHookDelivery.STATUS_PENDING))
+
+    delivery_ids = list(
+        WebHookDelivery.objects
+        .filter(status=WebHookDelivery.STATUS_PENDING,
+                next_attempt_time__lte=timezone.now())
+        .order_by('next_attempt_time', 'pk')
+        .values_list('pk', flat=True))
+
+    return sum(
+        deliver_webhook(delivery_id)
+        for delivery_id in delivery_ids
+    )
+
+
+_target_semaphores = {}
+_target_semaphores_lock = threading.Lock()
+
+
+def _get_target_semaphore(webhook_target):
+    """Return the semaphore limiting concurrent deliveries to a target.
+
+    Args:
+        webhook_target (reviewboard.notifications.models.WebHookTarget):
+            The WebHook target.
+
+    Returns:
+        threading.BoundedSemaphore:
+        The semaphore for the target.
+    """
+    key = (webhook_target.pk, webhook_target.max_concurrent_deliveries)
+
+    with _target_semaphores_lock:
+        try:
+            return _target_semaphores[key]
+        except KeyError:
+            semaphore = threading.BoundedSemaphore(
+                max(webhook_target.max_concurrent_deliveries, 1))
+            _target_semaphores[key] = semaphore
+
+            return semaphore
+
+
+_scheduled_delivery_ids = set()
+_scheduled_delivery_ids_lock = threading.Lock()
+
+
+def _schedule_webhook_delivery(delivery_id):
+    """Schedule a delivery to be sent by a background worker.
+
+    A delivery that's already waiting for a worker in this process won't be
+    scheduled again. When background tasks are run inline, the delivery is
+    sent immediately.
+
+    Args:
+        delivery_id (int):
+            The ID of the delivery to send.
+    """
+    if should_run_tasks_inline():
+        deliver_webhook(delivery_id)
+        return
+
+    with _scheduled_delivery_ids_lock:
+        if delivery_id in _scheduled_delivery_ids:
+            return
+
+        _scheduled_delivery_ids.add(delivery_id)
+
+    _get_webhook_task_queue().add(_run_scheduled_webhook_delivery,
+                                  delivery_id)
+
+
+def _run_scheduled_webhook_delivery(delivery_id):
+    """Send a delivery scheduled by :py:func:`_schedule_webhook_delivery`.
+
+    Args:
+        delivery_id (int):
+            The ID of the delivery to send.
+    """
+    with _scheduled_delivery_ids_lock:
+        _scheduled_delivery_ids.discard(delivery_id)
+
+    deliver_webhook(delivery_id)
+
+
+def _poll_webhook_deliveries():
+    """Schedule all deliveries that are due.
+
+    This runs periodically in each web server process, picking up retries
+    and deliveries that couldn't be sent when they were queued.
+    """
+    delivery_ids = (
+        WebHookDelivery.objects
+        .filter(status=WebHookDelivery.STATUS_PENDING,
+                next_attempt_time__lte=timezone.now())
+        .order_by('next_attempt_time', 'pk')
+        .values_list('pk', flat=True)
+    )
+
+    for delivery_id in delivery_ids:
+        _schedule_webhook_delivery(delivery_id)
+
+
+def _schedule_next_webhook_delivery(webhook_target_id):
+    """Schedule the next due delivery for a target, if any.
+
+    This picks up deliveries that had to wait for a free slot for the
+    target.
+
+    Args:
+        webhook_target_id (int):
+            The ID of the WebHook target.
+    """
+    delivery_ids = (
+        WebHookDelivery.objects
+        .filter(target=webhook_target_id,
+                status=WebHookDelivery.STATUS_PENDING,
+                next_attempt_time__lte=timezone.now())
+        .order_by('next_attempt_time', 'pk')
+        .values_list('pk', flat=True)[:1]
+    )
+
+    for delivery_id in delivery_ids:
+        _schedule_webhook_delivery(delivery_id)
+
+
+def _get_webhook_task_queue():
+    """Return the background task queue used for WebHook deliveries.
+
+    Returns:
+        reviewboard.background.BackgroundTaskQueue:
+        The task queue.
+    """
+    return get_task_queue('webhooks',
+                          num_workers=settings.WEBHOOK_DELIVERY_WORKERS)
+
 
 def _serialize_review(review, request):
     return {
@@ -481,3 +845,6 @@ def connect_signals():
 
     review_published.connect(review_published_cb, sender=Review)
     reply_published.connect(reply_published_cb, sender=Review)
+
+    register_periodic_task('webhooks', _poll_webhook_deliveries,
+                           settings.WEBHOOK_DELIVERY_POLL_INTERVAL)
@@ -0,0 +1,51 @@
+"""OAuth2 request validation for Review Board."""
+
+from __future__ import unicode_literals
+
+from oauth2_provider.oauth2_validators import \
+    OAuth2Validator as BaseOAuth2Validator
+
+from reviewboard.webapi.token_cache import get_oauth2_access_token
+
+
+class OAuth2Validator(BaseOAuth2Validator):
+    """Validates OAuth2 requests, using cached access tokens.
+
+    This behaves like the django-oauth-toolkit validator, except that access
+    tokens sent to the API are looked up through
+    :py:mod:`reviewboard.webapi.token_cache`, so that repeated requests with
+    the same token don't need to query the database.
+    """
+
+    def validate_bearer_token(self, token, scopes, request):
+        """Return whether a bearer token is valid for a request.
+
+        Args:
+            token (unicode):
+                The access token sent by the client.
+
+            scopes (list of unicode):
+                The scopes required for the request.
+
+            request (oauthlib.common.Request):
+                The OAuth request. If the token is valid, this will be
+                updated with the token, its application and its user.
+
+        Returns:
+            bool:
+            Whether the token exists, hasn't expired and allows the scopes.
+        """
+        if not token:
+            return False
+
+        access_token = get_oauth2_access_token(token)
+
+        if access_token is None or not access_token.is_valid(scopes):
+            return False
+
+        request.client = access_token.application
+        request.user = access_token.user
+        request.scopes = scopes
+        request.access_token = access_token
+
+        return True
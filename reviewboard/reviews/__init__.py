@@ -0,0 +1,15 @@
+from __future__ import unicode_literals
+
+from reviewboard.signals import initializing
+
+
+def _connect_signals(**kwargs):
+    """Connect signal handlers for the review caches."""
+    from reviewboard.reviews import access, activity, fragments
+
+    access.connect_signals()
+    activity.connect_signals()
+    fragments.connect_signals()
+
+
+initializing.connect(_connect_signals)
@@ -0,0 +1,423 @@
+"""Cached snapshots of the repositories and groups users can access.
+
+Determining which review requests a user can see requires knowing which
+private repositories and invite-only review groups they have access to.
+Rather than querying for these on every list query and permission check,
+they're computed once into an :py:class:`AccessControlSnapshot` for each
+user and Local Site, which is stored in the cache.
+
+Snapshots are keyed by two versions: a global version, which is incremented
+when repositories or groups are changed in a way that may affect many users
+(such as a group becoming invite-only), and a per-user version, which is
+incremented when a user's memberships or permissions change. Any change
+results in a new cache key, so stale snapshots aren't used.
+
+Versions are incremented from signal handlers, which run before the change
+is committed. A concurrent request may still compute a snapshot from the old
+data and cache it under the new key. To handle this, the versions are
+incremented again once the transaction is committed, where the database
+layer supports it, and snapshots are only cached for
+``settings.ACCESS_SNAPSHOT_CACHE_SECONDS``, which limits how long such a
+snapshot can be used.
+
+Versions are initialized from the current time (in microseconds) if evicted
+from the cache, which keeps them increasing across evictions.
+"""
+
+from __future__ import unicode_literals
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group as AuthGroup, User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from djblets.cache.backend import make_cache_key
+
+
+_GLOBAL_VERSION_KEY = 'acl-snapshot-global-version'
+
+
+class AccessControlSnapshot(object):
+    """The private repositories and groups a user can access.
+
+    Public repositories and non-invite-only groups are accessible by
+    everyone, so only the private ones are recorded. The IDs are stored as
+    sets, allowing for fast membership checks.
+
+    Attributes:
+        private_repository_ids (frozenset of int):
+            The IDs of the non-public repositories the user can access, either
+            directly or through a review group.
+
+        private_group_ids (frozenset of int):
+            The IDs of the invite-only review groups the user is a member of.
+
+        can_view_invite_only_groups (bool):
+            Whether the user has permission to see all invite-only groups.
+    """
+
+    def __init__(self, private_repository_ids=(), private_group_ids=(),
+                 can_view_invite_only_groups=False):
+        """Initialize the snapshot.
+
+        Args:
+            private_repository_ids (iterable of int, optional):
+                The IDs of the accessible non-public repositories.
+
+            private_group_ids (iterable of int, optional):
+                The IDs of the accessible invite-only review groups.
+
+            can_view_invite_only_groups (bool, optional):
+                Whether the user has permission to see all invite-only
+                groups.
+        """
+        self.private_repository_ids = frozenset(private_repository_ids)
+        self.private_group_ids = frozenset(private_group_ids)
+        self.can_view_invite_only_groups = can_view_invite_only_groups
+
+    def can_access_repository(self, repository):
+        """Return whether the user can access a repository.
+
+        This does not check whether the repository's Local Site is
+        accessible.
+
+        Args:
+            repository (reviewboard.scmtools.models.Repository):
+                The repository to check.
+
+        Returns:
+            bool:
+            Whether the repository is accessible.
+        """
+        return (repository.public or
+                repository.pk in self.private_repository_ids)
+
+    def can_access_group(self, group):
+        """Return whether the user can access a review group.
+
+        This does not check whether the group's Local Site is accessible.
+
+        Args:
+            group (reviewboard.reviews.models.group.Group):
+                The group to check.
+
+        Returns:
+            bool:
+            Whether the group is accessible.
+        """
+        return not group.invite_only or group.pk in self.private_group_ids
+
+    def to_cache(self):
+        """Return a representation of the snapshot for the cache.
+
+        Returns:
+            dict:
+            The data to store.
+        """
+        return {
+            'repository_ids': sorted(self.private_repository_ids),
+            'group_ids': sorted(self.private_group_ids),
+            'can_view_invite_only_groups': self.can_view_invite_only_groups,
+        }
+
+    @classmethod
+    def from_cache(cls, data):
+        """Return a snapshot from its cached representation.
+
+        Args:
+            data (dict):
+                The data stored by :py:meth:`to_cache`.
+
+        Returns:
+            AccessControlSnapshot:
+            The snapshot.
+        """
+        return cls(
+            private_repository_ids=data['repository_ids'],
+            private_group_ids=data['group_ids'],
+            can_view_invite_only_groups=data['can_view_invite_only_groups'])
+
+
+def _get_initial_version():
+    """Return a starting version based on the current time.
+
+    Returns:
+        int:
+        The version.
+    """
+    return int(time.time() * 1000000)
+
+
+def _make_user_version_key(user_id):
+    """Return the cache key for a user's snapshot version.
+
+    Args:
+        user_id (int):
+            The ID of the user.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('acl-snapshot-user-version-%s' % user_id)
+
+
+def _get_versions(user_id):
+    """Return the global and per-user snapshot versions.
+
+    Args:
+        user_id (int):
+            The ID of the user.
+
+    Returns:
+        tuple:
+        A 2-tuple of the global version and the user's version.
+    """
+    global_key = make_cache_key(_GLOBAL_VERSION_KEY)
+    user_key = _make_user_version_key(user_id)
+    versions = cache.get_many([global_key, user_key])
+
+    for key in (global_key, user_key):
+        if versions.get(key) is None:
+            cache.add(key, _get_initial_version())
+            versions[key] = cache.get(key)
+
+    return versions[global_key], versions[user_key]
+
+
+def _increment_version(cache_key):
+    """Increment a snapshot version.
+
+    Args:
+        cache_key (unicode):
+            The cache key of the version.
+    """
+    try:
+        cache.incr(cache_key)
+    except ValueError:
+        # The key wasn't in the cache. Start from a new time-based value,
+        # which will be newer than any version handed out before.
+        cache.set(cache_key, _get_initial_version())
+
+
+def _increment_versions(user_ids):
+    """Increment the snapshot versions for users, or the global version.
+
+    Args:
+        user_ids (list of int):
+            The IDs of the users whose versions should be incremented, or
+            ``None`` to increment the global version.
+    """
+    if user_ids is None:
+        _increment_version(make_cache_key(_GLOBAL_VERSION_KEY))
+    else:
+        for user_id in user_ids:
+            _increment_version(_make_user_version_key(user_id))
+
+
+def invalidate_access_snapshots(user_ids=None):
+    """Invalidate cached access control snapshots.
+
+    The versions are incremented immediately. If this is called inside a
+    transaction, they're incremented again once it's committed (on versions
+    of Django supporting ``transaction.on_commit``), so that snapshots
+    cached by concurrent requests before the commit aren't used.
+
+    Args:
+        user_ids (iterable of int, optional):
+            The IDs of the users whose snapshots should be invalidated. If
+            not provided, all snapshots will be invalidated.
+    """
+    if user_ids is not None:
+        user_ids = list(user_ids)
+
+    _increment_versions(user_ids)
+
+    on_commit = getattr(transaction, 'on_commit', None)
+
+    if (on_commit is not None and
+        transaction.get_connection().in_atomic_block):
+        on_commit(lambda: _increment_versions(user_ids))
+
+
+def _build_access_snapshot(user, local_site_id):
+    """Compute an access control snapshot from the database.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user to compute the snapshot for.
+
+        local_site_id (int):
+            The ID of the Local Site, or ``None``.
+
+    Returns:
+        AccessControlSnapshot:
+        The snapshot.
+    """
+    from reviewboard.reviews.models import Group
+    from reviewboard.scmtools.models import Repository
+
+    repository_ids = (
+        Repository.objects
+        .filter(Q(users=user.pk) | Q(review_groups__users=user.pk),
+                public=False,
+                local_site=local_site_id)
+        .values_list('pk', flat=True)
+        .distinct()
+    )
+    group_ids = (
+        Group.objects
+        .filter(users=user.pk,
+                invite_only=True,
+                local_site=local_site_id)
+        .values_list('pk', flat=True)
+    )
+
+    return AccessControlSnapshot(
+        private_repository_ids=repository_ids,
+        private_group_ids=group_ids,
+        can_view_invite_only_groups=user.has_perm(
+            'reviews.can_view_invite_only_groups'))
+
+
+def get_access_snapshot(user, local_site=None):
+    """Return the access control snapshot for a user.
+
+    The snapshot is loaded from the cache, if it's up-to-date. Otherwise it's
+    computed and cached for ``settings.ACCESS_SNAPSHOT_CACHE_SECONDS``.
+
+    Anonymous users always receive an empty snapshot.
+
+    Args:
+        user (django.contrib.auth.models.User):
+            The user to return the snapshot for.
+
+        local_site (reviewboard.site.models.LocalSite, optional):
+            The Local Site to return the snapshot for.
+
+    Returns:
+        AccessControlSnapshot:
+        The snapshot.
+    """
+    if not user.is_authenticated():
+        return AccessControlSnapshot()
+
+    if local_site is None:
+        local_site_id = None
+    else:
+        local_site_id = local_site.pk
+
+    global_version, user_version = _get_versions(user.pk)
+    cache_key = make_cache_key('acl-snapshot-%s-%s-%s-%s' % (
+        global_version, user_version, user.pk, local_site_id or 0))
+    data = cache.get(cache_key)
+
+    if data is not None:
+        return AccessControlSnapshot.from_cache(data)
+
+    snapshot = _build_access_snapshot(user, local_site_id)
+    cache.set(cache_key, snapshot.to_cache(),
+              settings.ACCESS_SNAPSHOT_CACHE_SECONDS)
+
+    return snapshot
+
+
+def _on_access_model_changed(**kwargs):
+    """Invalidate all snapshots when a repository or group changes.
+
+    This handles saves and deletions of repositories and review groups,
+    which may change their visibility, and permission changes on
+    authentication groups.
+
+    Args:
+        **kwargs (dict):
+            Keyword arguments passed by the signal.
+    """
+    invalidate_access_snapshots()
+
+
+def _on_user_changed(instance, **kwargs):
+    """Invalidate a user's snapshots when the user is saved.
+
+    Args:
+        instance (django.contrib.auth.models.User):
+            The user that was saved.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    invalidate_access_snapshots([instance.pk])
+
+
+def _on_user_relation_changed(instance, action, model, pk_set, **kwargs):
+    """Invalidate snapshots when a relation involving users changes.
+
+    This handles changes to repository and group memberships, and to users'
+    permissions and authentication groups. Only the affected users'
+    snapshots are invalidated, when they're known.
+
+    Args:
+        instance (django.db.models.Model):
+            The object whose relation changed.
+
+        action (unicode):
+            The type of change.
+
+        model (type):
+            The model of the objects added or removed.
+
+        pk_set (set of int):
+            The IDs of the objects added or removed.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if isinstance(instance, User):
+        invalidate_access_snapshots([instance.pk])
+    elif model is User and pk_set:
+        invalidate_access_snapshots(pk_set)
+    else:
+        # This is a clear, which doesn't tell us which users were affected.
+        invalidate_access_snapshots()
+
+
+def _on_relation_changed(action, **kwargs):
+    """Invalidate all snapshots when a repository's groups change.
+
+    Args:
+        action (unicode):
+            The type of change.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_access_snapshots()
+
+
+def connect_signals():
+    """Connect the signal handlers that invalidate access snapshots."""
+    from reviewboard.reviews.models import Group
+    from reviewboard.scmtools.models import Repository
+
+    for model in (Group, Repository):
+        post_save.connect(_on_access_model_changed, sender=model)
+        post_delete.connect(_on_access_model_changed, sender=model)
+
+    post_save.connect(_on_user_changed, sender=User)
+
+    for through in (Group.users.through,
+                    Repository.users.through,
+                    User.user_permissions.through,
+                    User.groups.through):
+        m2m_changed.connect(_on_user_relation_changed, sender=through)
+
+    for through in (Repository.review_groups.through,
+                    AuthGroup.permissions.through):
+        m2m_changed.connect(_on_relation_changed, sender=through)
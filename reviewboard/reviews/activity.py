@@ -0,0 +1,170 @@
+"""Tracking of cheap, per-review request activity versions.
+
+Clients frequently poll review requests for updates. Computing a full ETag
+for those polls requires loading all the reviews, change descriptions, diffs
+and status updates on a review request. Instead, each review request has an
+activity version, which is incremented any time something changes that
+could affect what the review request page displays. Conditional requests can
+compare against this version without querying any of that data.
+
+The version is stored in the cache. If it's evicted, it's re-initialized
+from the current time (in microseconds), which keeps it increasing across
+evictions.
+"""
+
+from __future__ import unicode_literals
+
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from djblets.cache.backend import make_cache_key
+
+
+def _make_activity_version_cache_key(review_request_id):
+    """Return the cache key for a review request's activity version.
+
+    Args:
+        review_request_id (int):
+            The ID of the review request.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('review-request-activity-version-%s'
+                          % review_request_id)
+
+
+def _get_initial_activity_version():
+    """Return a starting activity version based on the current time.
+
+    Returns:
+        int:
+        The activity version.
+    """
+    return int(time.time() * 1000000)
+
+
+def get_activity_version(review_request_id):
+    """Return the current activity version for a review request.
+
+    Args:
+        review_request_id (int):
+            The ID of the review request.
+
+    Returns:
+        int:
+        The activity version.
+    """
+    cache_key = _make_activity_version_cache_key(review_request_id)
+    version = cache.get(cache_key)
+
+    if version is None:
+        cache.add(cache_key, _get_initial_activity_version())
+        version = cache.get(cache_key)
+
+    return version
+
+
+def increment_activity_version(review_request_id):
+    """Increment the activity version for a review request.
+
+    This should be called whenever the public state of a review request (or
+    anything shown on its page) changes.
+
+    Args:
+        review_request_id (int):
+            The ID of the review request.
+    """
+    cache_key = _make_activity_version_cache_key(review_request_id)
+
+    try:
+        cache.incr(cache_key)
+    except ValueError:
+        # The key wasn't in the cache. Start from a new time-based value,
+        # which will be newer than any version handed out before.
+        cache.set(cache_key, _get_initial_activity_version())
+
+
+def _on_review_request_changed(review_request, **kwargs):
+    """Increment the activity version when a review request changes.
+
+    This handles the review request publish, close and reopen signals.
+
+    Args:
+        review_request (reviewboard.reviews.models.review_request.
+                        ReviewRequest):
+            The review request that changed.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    increment_activity_version(review_request.pk)
+
+
+def _on_review_changed(review=None, reply=None, instance=None, **kwargs):
+    """Increment the activity version when a review or reply changes.
+
+    This handles the review and reply publish and Ship It revocation
+    signals, along with saves and deletions of reviews (which occur when
+    comments are added to a draft).
+
+    Args:
+        review (reviewboard.reviews.models.review.Review, optional):
+            The review that changed.
+
+        reply (reviewboard.reviews.models.review.Review, optional):
+            The reply that changed.
+
+        instance (reviewboard.reviews.models.review.Review, optional):
+            The review that was saved or deleted.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    review = review or reply or instance
+
+    if review is not None and review.review_request_id:
+        increment_activity_version(review.review_request_id)
+
+
+def _on_status_update_changed(instance, **kwargs):
+    """Increment the activity version when a status update changes.
+
+    Args:
+        instance (reviewboard.reviews.models.status_update.StatusUpdate):
+            The status update that was saved or deleted.
+
+        **kwargs (dict):
+            Additional keyword arguments passed by the signal.
+    """
+    if instance.review_request_id:
+        increment_activity_version(instance.review_request_id)
+
+
+def connect_signals():
+    """Connect the signal handlers that increment activity versions."""
+    from reviewboard.reviews.models import (ReviewRequest, Review,
+                                            StatusUpdate)
+    from reviewboard.reviews.signals import (reply_published,
+                                             review_published,
+                                             review_request_closed,
+                                             review_request_published,
+                                             review_request_reopened,
+                                             review_ship_it_revoked)
+
+    for signal in (review_request_published,
+                   review_request_closed,
+                   review_request_reopened):
+        signal.connect(_on_review_request_changed, sender=ReviewRequest)
+
+    for signal in (review_published,
+                   reply_published,
+                   review_ship_it_revoked,
+                   post_save,
+                   post_delete):
+        signal.connect(_on_review_changed, sender=Review)
+
+    post_save.connect(_on_status_update_changed, sender=StatusUpdate)
+    post_delete.connect(_on_status_update_changed, sender=StatusUpdate)
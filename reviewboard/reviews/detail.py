@@ -95,6 +95,11 @@ class ReviewRequestPageData(object):
         draft (reviewboard.reviews.models.ReviewRequestDraft):
             The active draft of the review request, if any. May be ``None``.
 
+        filediffs_by_id (dict):
+            A mapping from ID to
+            :py:class:`~reviewboard.diffviewer.models.filediff.FileDiff` for
+            all files in :py:attr:`diffsets`.
+
         active file_attachments (list of reviewboard.attachments.models.
                                  FileAttachment):
             All the active file attachments associated with the review request.
@@ -222,6 +227,7 @@ class ReviewRequestPageData(object):
         self.body_top_replies = defaultdict(list)
         self.body_bottom_replies = defaultdict(list)
         self.review_request_details = None
+        self.filediffs_by_id = {}
         self.active_file_attachments = []
         self.all_file_attachments = []
         self.file_attachments_by_id = {}
@@ -298,7 +304,9 @@ class ReviewRequestPageData(object):
         # Get all the public ChangeDescriptions.
         if self._needs_changedescs:
             self.changedescs = list(
-                self.review_request.changedescs.filter(public=True))
+                self.review_request.changedescs
+                .filter(public=True)
+                .select_related('user'))
 
         if self.changedescs:
             self.latest_changedesc_timestamp = self.changedescs[0].timestamp
@@ -382,6 +390,10 @@ class ReviewRequestPageData(object):
             if not hasattr(review, '_status_update_cache'):
                 review._status_update_cache = None
 
+            # Entries check permissions against the review request, so make
+            # sure that doesn't result in a query per review.
+            review.review_request = self.review_request
+
         # Link up all the review body replies.
         for reply_id, replies in six.iteritems(self.body_top_replies):
             self.reviews_by_id[reply_id]._body_top_replies = reversed(replies)
@@ -421,6 +433,14 @@ class ReviewRequestPageData(object):
             for screenshot in self.all_screenshots:
                 screenshot._comments = []
 
+        # Map out all the FileDiffs we've already fetched (through the
+        # diffsets' prefetched files), so that diff comments don't need to
+        # query for their FileDiffs and interdiff FileDiffs one at a time.
+        for diffset in self.diffsets:
+            for filediff in diffset.files.all():
+                filediff.diffset = diffset
+                self.filediffs_by_id[filediff.pk] = filediff
+
         if self.reviews:
             review_ids = self.reviews_by_id.keys()
 
@@ -438,13 +458,17 @@ class ReviewRequestPageData(object):
                 #
                 # The solution to this is to not query the comment objects, but
                 # rather the through table. This will let us grab the review
-                # and comment in one go, using select_related.
+                # ID and comment in one go, using select_related.
+                #
+                # We only join against the comment. Everything the comment
+                # references (reviews, file attachments, screenshots, and
+                # FileDiffs) has already been fetched, and is attached below.
                 related_field = model.review.related.field
                 comment_field_name = related_field.m2m_reverse_field_name()
                 through = related_field.rel.through
                 q = (
                     through.objects.filter(review__in=review_ids)
-                    .select_related()
+                    .select_related(comment_field_name)
                 )
 
                 if ordering:
@@ -495,6 +519,21 @@ class ReviewRequestPageData(object):
                             self.screenshots_by_id[comment.screenshot_id]
                         comment.screenshot = screenshot
                         screenshot._comments.append(comment)
+                    elif isinstance(comment, Comment):
+                        filediff = self.filediffs_by_id.get(
+                            comment.filediff_id)
+
+                        if filediff is not None:
+                            comment.filediff = filediff
+
+                        interfilediff_id = comment.interfilediff_id
+
+                        if interfilediff_id is not None:
+                            interfilediff = \
+                                self.filediffs_by_id.get(interfilediff_id)
+
+                            if interfilediff is not None:
+                                comment.interfilediff = interfilediff
 
                     # We've hit legacy database cases where there were entries
                     # that weren't a reply, and were just orphaned. Check and
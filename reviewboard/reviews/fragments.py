@@ -0,0 +1,166 @@
+"""Caching of rendered diff comment fragments.
+
+Each diff comment on the review request page, and in e-mails about reviews
+and replies, is shown along with the part of the diff it applies to. Building
+one of these fragments means loading the diff's chunks and rendering a
+template, and the same fragments are otherwise rebuilt for every page load
+and every e-mail.
+
+The rendered HTML for each fragment is cached, keyed by everything that
+affects its contents. When a review or reply containing diff comments is
+published, the fragments shown on the review request page and in the e-mail
+are rendered ahead of time by a background worker, so that those only need
+to assemble the cached HTML.
+"""
+
+from __future__ import unicode_literals
+
+import logging
+
+from django.conf import settings
+from django.utils.translation import get_language
+
+from reviewboard.admin.server import build_server_url
+from reviewboard.background import get_task_queue, should_run_tasks_inline
+
+
+def make_diff_comment_fragment_cache_key(comment, template_name,
+                                         lines_of_context, show_controls,
+                                         enable_highlighting):
+    """Return the cache key for a rendered diff comment fragment.
+
+    Args:
+        comment (reviewboard.reviews.models.diff_comment.Comment):
+            The comment the fragment is for.
+
+        template_name (unicode):
+            The name of the template used to render the fragment.
+
+        lines_of_context (list of int):
+            The number of lines of context shown before and after the
+            commented lines.
+
+        show_controls (bool):
+            Whether controls for expanding the fragment are shown.
+
+        enable_highlighting (bool):
+            Whether syntax highlighting is enabled.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    key = 'diff-comment-fragment-%s-%s-%s-%s-%s-%s' % (
+        comment.pk,
+        comment.timestamp.isoformat(),
+        template_name,
+        lines_of_context[0],
+        lines_of_context[1],
+        comment.filediff_id)
+
+    if comment.interfilediff_id:
+        key += '-interdiff-%s' % comment.interfilediff_id
+
+    if show_controls:
+        key += '-controls'
+
+    if enable_highlighting:
+        key += '-highlighting'
+
+    key += '-%s-%s' % (get_language(), settings.TEMPLATE_SERIAL)
+
+    return key
+
+
+def prerender_diff_comment_fragments(review_id):
+    """Render and cache the diff comment fragments for a review.
+
+    This renders the fragments shown for each of the review's diff comments
+    on the review request page and in e-mails, using the default lines of
+    context.
+
+    Args:
+        review_id (int):
+            The ID of the review or reply.
+    """
+    from reviewboard.reviews.models import Review
+    from reviewboard.reviews.views import (CommentDiffFragmentsView,
+                                           build_diff_comment_fragments)
+
+    try:
+        review = Review.objects.get(pk=review_id)
+    except Review.DoesNotExist:
+        return
+
+    comments = list(review.comments.order_by('filediff', 'first_line'))
+
+    if not comments:
+        return
+
+    context = {
+        'user': review.user,
+        'site_url': build_server_url('/')[:-1],
+    }
+
+    for template_name, show_controls in (
+            (CommentDiffFragmentsView.comment_template_name, True),
+            ('notifications/email_diff_comment_fragment.html', False)):
+        had_error = build_diff_comment_fragments(
+            comments, context,
+            comment_template_name=template_name,
+            show_controls=show_controls)[0]
+
+        if had_error:
+            logging.warning('Unable to pre-render one or more diff comment '
+                            'fragments in %s for review %s',
+                            template_name, review_id)
+
+
+def _schedule_prerender(review):
+    """Schedule a review's diff comment fragments to be pre-rendered.
+
+    When background tasks are run inline, nothing is pre-rendered, and the
+    fragments are instead cached the first time they're rendered.
+
+    Args:
+        review (reviewboard.reviews.models.review.Review):
+            The review or reply that was published.
+    """
+    if not should_run_tasks_inline():
+        get_task_queue('diff-comment-fragments', num_workers=1).add(
+            prerender_diff_comment_fragments, review.pk)
+
+
+def _on_review_published(review, **kwargs):
+    """Handle a review being published.
+
+    Args:
+        review (reviewboard.reviews.models.review.Review):
+            The review that was published.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    _schedule_prerender(review)
+
+
+def _on_reply_published(reply, **kwargs):
+    """Handle a reply being published.
+
+    Args:
+        reply (reviewboard.reviews.models.review.Review):
+            The reply that was published.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    _schedule_prerender(reply)
+
+
+def connect_signals():
+    """Connect the signal handlers that pre-render fragments."""
+    from reviewboard.reviews.models import Review
+    from reviewboard.reviews.signals import reply_published, review_published
+
+    review_published.connect(_on_review_published, sender=Review)
+    reply_published.connect(_on_reply_published, sender=Review)
@@ -0,0 +1,241 @@
+"""Verification of review request issue counters.
+
+Review requests store the number of issues in each state (open, resolved,
+dropped, and waiting for verification) in counter fields. These are updated
+as issues are published, change status, or are deleted, so that they never
+have to be recomputed when a review request is loaded.
+
+:py:func:`verify_issue_counts` compares the stored counters against the
+issues actually filed on each review request, optionally correcting any that
+are wrong. Review requests are checked in batches of consecutive IDs, with
+one grouped query per type of comment for each batch, and batches can be
+spread across several worker processes.
+"""
+
+from __future__ import unicode_literals
+
+import multiprocessing
+
+from django.db import (close_old_connections, connections as db_connections,
+                       transaction)
+from django.db.models import Max, Min
+from django.utils import six
+
+from reviewboard.reviews.models import ReviewRequest
+from reviewboard.reviews.models.review_request import \
+    fetch_issue_counts_for_review_requests
+
+
+#: The default number of review request IDs covered by each batch.
+DEFAULT_BATCH_SIZE = 500
+
+
+#: The names of the issue counter fields, in a stable order.
+_COUNTER_FIELD_NAMES = sorted(set(
+    six.itervalues(ReviewRequest.ISSUE_COUNTER_FIELDS)))
+
+
+def verify_issue_counts(review_request_ids=None, fix=False, num_workers=1,
+                        batch_size=DEFAULT_BATCH_SIZE):
+    """Compare the issue counters of review requests against their issues.
+
+    Args:
+        review_request_ids (list of int, optional):
+            The IDs of the review requests to check. If not provided, all
+            review requests are checked.
+
+        fix (bool, optional):
+            Whether to correct any counters that are wrong.
+
+        num_workers (int, optional):
+            The number of processes to check batches with.
+
+        batch_size (int, optional):
+            The number of review request IDs covered by each batch.
+
+    Returns:
+        tuple:
+        A 2-tuple containing:
+
+        1. The number of review requests checked (:py:class:`int`).
+        2. A list of the review requests with incorrect counters, sorted by
+           ID. Each is a 3-tuple of the review request ID, a dictionary of the
+           stored counter values, and a dictionary of the correct counter
+           values.
+    """
+    tasks = [
+        (start_pk, end_pk, ids, fix)
+        for start_pk, end_pk, ids in _get_batches(review_request_ids,
+                                                  batch_size)
+    ]
+
+    if num_workers > 1 and len(tasks) > 1:
+        # The workers are forked, and mustn't share the database connections
+        # of this process.
+        for db_connection in db_connections.all():
+            db_connection.close()
+
+        pool = multiprocessing.Pool(processes=num_workers)
+
+        try:
+            results = list(pool.imap_unordered(_verify_batch_task, tasks))
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+    else:
+        results = [
+            _verify_batch_task(task)
+            for task in tasks
+        ]
+
+    num_checked = 0
+    mismatches = []
+
+    for batch_num_checked, batch_mismatches in results:
+        num_checked += batch_num_checked
+        mismatches += batch_mismatches
+
+    mismatches.sort(key=lambda mismatch: mismatch[0])
+
+    return num_checked, mismatches
+
+
+def _get_batches(review_request_ids, batch_size):
+    """Return the batches of review requests to check.
+
+    Args:
+        review_request_ids (list of int):
+            The IDs of the review requests to check, or ``None`` to check all
+            review requests.
+
+        batch_size (int):
+            The number of review request IDs covered by each batch.
+
+    Returns:
+        list of tuple:
+        A list of 3-tuples, each containing the first ID in the batch, the ID
+        following the last one in the batch, and the list of IDs to check (or
+        ``None`` to check every review request in the range).
+    """
+    if review_request_ids is not None:
+        ids = sorted(set(review_request_ids))
+
+        return [
+            (batch_ids[0], batch_ids[-1] + 1, batch_ids)
+            for batch_ids in (ids[i:i + batch_size]
+                              for i in range(0, len(ids), batch_size))
+        ]
+
+    pk_range = (
+        ReviewRequest.objects
+        .order_by()
+        .aggregate(min_pk=Min('pk'), max_pk=Max('pk'))
+    )
+
+    if pk_range['min_pk'] is None:
+        return []
+
+    return [
+        (start_pk, start_pk + batch_size, None)
+        for start_pk in range(pk_range['min_pk'], pk_range['max_pk'] + 1,
+                              batch_size)
+    ]
+
+
+def _get_mismatches(review_request_ids):
+    """Return the review requests with incorrect issue counters.
+
+    Args:
+        review_request_ids (list of int):
+            The IDs of the review requests to check.
+
+    Returns:
+        list of tuple:
+        A list of 3-tuples, each containing the review request ID, a
+        dictionary of the stored counter values, and a dictionary of the
+        correct counter values.
+    """
+    # The counters are fetched as values, rather than by loading the review
+    # requests, so that any unset counters aren't initialized on load.
+    stored_rows = (
+        ReviewRequest.objects
+        .filter(pk__in=review_request_ids)
+        .values_list('pk', *_COUNTER_FIELD_NAMES)
+    )
+    all_issue_counts = \
+        fetch_issue_counts_for_review_requests(review_request_ids)
+    mismatches = []
+
+    for row in stored_rows:
+        review_request_id = row[0]
+        stored_values = dict(zip(_COUNTER_FIELD_NAMES, row[1:]))
+        expected_values = ReviewRequest.get_issue_counter_values(
+            all_issue_counts[review_request_id])
+
+        if stored_values != expected_values:
+            mismatches.append((review_request_id, stored_values,
+                               expected_values))
+
+    return mismatches
+
+
+def _verify_batch_task(task):
+    """Check the issue counters for a batch of review requests.
+
+    This is run in the worker processes.
+
+    Args:
+        task (tuple):
+            A tuple containing the first ID in the batch, the ID following the
+            last one in the batch, the list of IDs to check (or ``None`` to
+            check every review request in the range), and whether to correct
+            any incorrect counters.
+
+    Returns:
+        tuple:
+        A 2-tuple containing the number of review requests checked, and the
+        list of review requests with incorrect counters (in the form returned
+        by :py:func:`verify_issue_counts`).
+    """
+    start_pk, end_pk, review_request_ids, fix = task
+
+    try:
+        if review_request_ids is None:
+            review_request_ids = list(
+                ReviewRequest.objects
+                .filter(pk__gte=start_pk, pk__lt=end_pk)
+                .values_list('pk', flat=True))
+
+        if not review_request_ids:
+            return 0, []
+
+        mismatches = _get_mismatches(review_request_ids)
+
+        if mismatches and fix:
+            with transaction.atomic():
+                # Lock the review requests and check them again. Issues that
+                # changed since the first check are accounted for, and any
+                # that change while the locks are held will update the
+                # corrected counters once they're released.
+                mismatched_ids = list(
+                    ReviewRequest.objects
+                    .select_for_update()
+                    .filter(pk__in=[
+                        mismatch[0]
+                        for mismatch in mismatches
+                    ])
+                    .values_list('pk', flat=True))
+                mismatches = _get_mismatches(mismatched_ids)
+
+                for review_request_id, stored_values, expected_values in \
+                        mismatches:
+                    (ReviewRequest.objects
+                     .filter(pk=review_request_id)
+                     .update(**expected_values))
+    finally:
+        close_old_connections()
+
+    return len(review_request_ids), mismatches
@@ -0,0 +1,208 @@
+from __future__ import unicode_literals
+
+import os
+import re
+import shutil
+import tempfile
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _
+from haystack import connections
+from haystack.query import SearchQuerySet
+
+from reviewboard.reviews.models import ReviewRequest
+from reviewboard.search.forms import RBSearchForm
+from reviewboard.search.indexer import SearchIndexer
+from reviewboard.search.search_backends.sqlite import SQLiteBackend
+from reviewboard.search.search_backends.whoosh import WhooshBackend
+
+
+class Command(BaseCommand):
+    help = _('Compares the indexing time and query latency of the Whoosh and '
+             'SQLite search backends, using the data in this database. The '
+             'indexes are built in a temporary directory, and the configured '
+             'search index is not modified.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--query',
+                    action='append',
+                    dest='queries',
+                    default=[],
+                    help=_('A query to time. This can be specified multiple '
+                           'times. By default, words from recent review '
+                           'request summaries and usernames are used.')),
+        make_option('--iterations',
+                    type='int',
+                    default=20,
+                    dest='iterations',
+                    help=_('The number of times to run each query.')),
+        make_option('--results',
+                    type='int',
+                    default=20,
+                    dest='results',
+                    help=_('The number of results to fetch for each query.')),
+    )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        num_results = options['results']
+
+        if iterations < 1:
+            raise CommandError(_('--iterations must be a positive number.'))
+
+        if num_results < 1:
+            raise CommandError(_('--results must be a positive number.'))
+
+        queries = options['queries'] or self._get_default_queries()
+
+        if not queries:
+            raise CommandError(_('There is no data to build queries from. '
+                                 'Specify queries using --query.'))
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        tempdir = tempfile.mkdtemp(prefix='rb-search-benchmark-')
+        backends = [
+            (WhooshBackend, os.path.join(tempdir, 'whoosh')),
+            (SQLiteBackend, os.path.join(tempdir, 'sqlite', 'index.sqlite3')),
+        ]
+
+        try:
+            for backend, path in backends:
+                using = 'benchmark-%s' % backend.search_backend_id
+                connections.connections_info[using] = {
+                    'ENGINE': backend.haystack_backend_name,
+                    'PATH': path,
+                }
+
+                try:
+                    self._benchmark_backend(backend, using, queries,
+                                            iterations, num_results)
+                finally:
+                    del connections.connections_info[using]
+                    connections._connections.pop(using, None)
+        finally:
+            shutil.rmtree(tempdir)
+
+    def _benchmark_backend(self, backend, using, queries, iterations,
+                           num_results):
+        """Build an index and time queries for a search backend.
+
+        Args:
+            backend (type):
+                The search backend class.
+
+            using (unicode):
+                The name of the Haystack connection for the backend.
+
+            queries (list of unicode):
+                The queries to time.
+
+            iterations (int):
+                The number of times to run each query.
+
+            num_results (int):
+                The number of results to fetch for each query.
+        """
+        self.stdout.write('%s' % backend.name)
+        self.stdout.write('=' * len(backend.name))
+
+        count, elapsed = SearchIndexer(using=using).run(rebuild=True)
+        self.stdout.write(
+            _('Indexed %(count)d objects in %(elapsed).2f seconds.')
+            % {
+                'count': count,
+                'elapsed': elapsed,
+            })
+        self.stdout.write('')
+
+        self.stdout.write('%-30s %10s %10s %10s %8s'
+                          % (_('Query'), _('Median'), _('95th %'), _('Max'),
+                             _('Hits')))
+
+        all_timings = []
+
+        for query in queries:
+            timings = []
+            hits = 0
+
+            for i in range(iterations):
+                form = RBSearchForm(user=AnonymousUser(),
+                                    data={'q': query},
+                                    searchqueryset=SearchQuerySet(using=using))
+
+                start_time = time.time()
+                sqs = form.search()
+                list(sqs[:num_results])
+                hits = sqs.count()
+                timings.append((time.time() - start_time) * 1000)
+
+            all_timings += timings
+            self._write_timings(query, timings, hits)
+
+        self._write_timings(_('(all queries)'), all_timings, None)
+        self.stdout.write('')
+
+    def _write_timings(self, label, timings, hits):
+        """Write a row of query timings.
+
+        Args:
+            label (unicode):
+                The label for the row.
+
+            timings (list of float):
+                The timings, in milliseconds.
+
+            hits (int):
+                The number of results for the query, or ``None`` if not
+                applicable.
+        """
+        timings = sorted(timings)
+
+        self.stdout.write(
+            '%-30s %8.2fms %8.2fms %8.2fms %8s'
+            % (label[:30],
+               timings[len(timings) // 2],
+               timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+               timings[-1],
+               '' if hits is None else hits))
+
+    def _get_default_queries(self):
+        """Return queries based on the data in the database.
+
+        Returns:
+            list of unicode:
+            A word from each of several recent review request summaries, and
+            several usernames.
+        """
+        queries = []
+
+        summaries = (
+            ReviewRequest.objects
+            .order_by('-pk')
+            .values_list('summary', flat=True)[:5]
+        )
+
+        for summary in summaries:
+            words = [
+                word
+                for word in re.findall(r'\w+', summary)
+                if len(word) > 3
+            ]
+
+            if words and words[0] not in queries:
+                queries.append(words[0])
+
+        queries += list(
+            User.objects
+            .filter(is_active=True)
+            .order_by('-pk')
+            .values_list('username', flat=True)[:2]
+        )
+
+        return queries
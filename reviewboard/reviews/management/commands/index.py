@@ -1,7 +1,15 @@
+from __future__ import unicode_literals
+
 import optparse
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _
 
-from django.core.management import call_command
-from django.core.management.base import BaseCommand
+from reviewboard.search.indexer import (DEFAULT_BATCH_SIZE,
+                                        DEFAULT_PARTITION_SIZE,
+                                        SearchIndexer)
 
 
 class Command(BaseCommand):
@@ -9,13 +17,67 @@ class Command(BaseCommand):
         optparse.make_option('--full', action='store_true',
                              dest='rebuild', default=False,
                              help='Rebuild the database index'),
+        optparse.make_option('--workers', type='int',
+                             dest='workers', default=1,
+                             help='The number of processes to index with. '
+                                  'This is only used for search backends '
+                                  'that support parallel indexing.'),
+        optparse.make_option('--partition-size', type='int',
+                             dest='partition_size',
+                             default=DEFAULT_PARTITION_SIZE,
+                             help='The number of IDs in each range of '
+                                  'objects handed to a worker.'),
+        optparse.make_option('--batch-size', type='int',
+                             dest='batch_size', default=DEFAULT_BATCH_SIZE,
+                             help='The number of objects to load and index '
+                                  'at a time.'),
+        optparse.make_option('--checkpoint-file',
+                             dest='checkpoint_file', default=None,
+                             help='The file used to record indexing '
+                                  'progress. Defaults to '
+                                  'search-index-checkpoint.json in the site '
+                                  'data directory.'),
+        optparse.make_option('--resume', action='store_true',
+                             dest='resume', default=False,
+                             help='Resume an interrupted indexing run from '
+                                  'the checkpoint file.'),
     )
     help = "Creates a search index of review requests"
     requires_model_validation = True
 
     def handle(self, *args, **options):
-        # Call the appropriate Haystack command to refresh the search index.
-        if options['rebuild']:
-            call_command('rebuild_index', interactive=False)
-        else:
-            call_command('update_index')
+        for option in ('workers', 'partition_size', 'batch_size'):
+            if options[option] < 1:
+                raise CommandError(
+                    _('--%s must be a positive number.')
+                    % option.replace('_', '-'))
+
+        checkpoint_file = (
+            options['checkpoint_file'] or
+            os.path.join(settings.SITE_DATA_DIR,
+                         'search-index-checkpoint.json'))
+
+        if options['resume'] and not os.path.exists(checkpoint_file):
+            raise CommandError(_('There is no checkpoint file at %s to '
+                                 'resume from.')
+                               % checkpoint_file)
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        indexer = SearchIndexer(num_workers=options['workers'],
+                                partition_size=options['partition_size'],
+                                batch_size=options['batch_size'],
+                                progress_callback=self.stdout.write)
+        count, elapsed = indexer.run(rebuild=options['rebuild'],
+                                     checkpoint_path=checkpoint_file,
+                                     resume=options['resume'])
+
+        self.stdout.write(
+            _('Indexed %(count)d objects in %(elapsed).1f seconds '
+              '(%(rate).1f objects/second).')
+            % {
+                'count': count,
+                'elapsed': elapsed,
+                'rate': count / elapsed if elapsed else 0,
+            })
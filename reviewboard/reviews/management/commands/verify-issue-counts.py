@@ -0,0 +1,93 @@
+from __future__ import unicode_literals
+
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import ugettext as _
+
+from reviewboard.reviews.issue_counts import (DEFAULT_BATCH_SIZE,
+                                              verify_issue_counts)
+
+
+class Command(BaseCommand):
+    help = _('Compares the issue counts stored on review requests against '
+             'their issues, and optionally corrects them. By default, all '
+             'review requests are checked. Specific review request IDs can '
+             'be passed instead.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--fix',
+                    action='store_true',
+                    default=False,
+                    dest='fix',
+                    help=_('Correct any issue counts that are wrong.')),
+        make_option('--workers',
+                    type='int',
+                    default=1,
+                    dest='workers',
+                    help=_('The number of processes to check review '
+                           'requests with.')),
+        make_option('--batch-size',
+                    type='int',
+                    default=DEFAULT_BATCH_SIZE,
+                    dest='batch_size',
+                    help=_('The number of review request IDs to check at '
+                           'a time.')),
+    )
+
+    def handle(self, *args, **options):
+        for option in ('workers', 'batch_size'):
+            if options[option] < 1:
+                raise CommandError(
+                    _('--%s must be a positive number.')
+                    % option.replace('_', '-'))
+
+        if args:
+            review_request_ids = []
+
+            for arg in args:
+                try:
+                    review_request_ids.append(int(arg))
+                except ValueError:
+                    raise CommandError(
+                        _('%s is not a valid review request ID') % arg)
+        else:
+            review_request_ids = None
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        fix = options['fix']
+        num_checked, mismatches = verify_issue_counts(
+            review_request_ids=review_request_ids,
+            fix=fix,
+            num_workers=options['workers'],
+            batch_size=options['batch_size'])
+
+        for review_request_id, stored_values, expected_values in mismatches:
+            self.stdout.write(
+                _('Review request %(id)s: %(counts)s')
+                % {
+                    'id': review_request_id,
+                    'counts': ', '.join(
+                        '%s is %s, expected %s' % (field_name,
+                                                   stored_values[field_name],
+                                                   expected_values[field_name])
+                        for field_name in sorted(expected_values)
+                        if (stored_values[field_name] !=
+                            expected_values[field_name])
+                    ),
+                })
+
+        if fix:
+            message = _('Checked %(num_checked)d review requests. Corrected '
+                        'the issue counts for %(num_mismatches)d.')
+        else:
+            message = _('Checked %(num_checked)d review requests. The issue '
+                        'counts for %(num_mismatches)d are wrong.')
+
+        self.stdout.write(message % {
+            'num_checked': num_checked,
+            'num_mismatches': len(mismatches),
+        })
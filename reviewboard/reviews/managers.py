@@ -11,8 +11,8 @@ from django.utils import six
 from djblets.db.managers import ConcurrencyManager
 
 from reviewboard.diffviewer.models import DiffSetHistory
+from reviewboard.reviews.access import get_access_snapshot
 from reviewboard.scmtools.errors import ChangeNumberInUseError
-from reviewboard.scmtools.models import Repository
 
 
 class DefaultReviewerManager(Manager):
@@ -40,19 +40,28 @@ class ReviewGroupManager(Manager):
         """Returns groups that are accessible by the given user."""
         if user.is_superuser:
             qs = self.all()
-        else:
+        elif visible_only:
             q = Q()
 
             if not user.has_perm('reviews.can_view_invite_only_groups'):
                 q = Q(invite_only=False)
 
-            if visible_only:
-                q = q & Q(visible=True)
+            q = q & Q(visible=True)
 
             if user.is_authenticated():
                 q = q | Q(users__pk=user.pk)
 
             qs = self.filter(q).distinct()
+        else:
+            snapshot = get_access_snapshot(user, local_site)
+
+            if snapshot.can_view_invite_only_groups:
+                qs = self.all()
+            elif snapshot.private_group_ids:
+                qs = self.filter(Q(invite_only=False) |
+                                 Q(pk__in=snapshot.private_group_ids))
+            else:
+                qs = self.filter(invite_only=False)
 
         return qs.filter(local_site=local_site)
 
@@ -71,7 +80,34 @@ class ReviewRequestQuerySet(QuerySet):
         queryset = self
 
         if user and user.is_authenticated():
+            from reviewboard.accounts.models import ReviewRequestVisit
+            from reviewboard.accounts.visits import get_buffered_visits
+
             select_dict = {}
+            select_params = []
+
+            # Visits that haven't been written to the database yet take
+            # precedence over the stored timestamps.
+            buffered_visits = get_buffered_visits(user)
+
+            if buffered_visits:
+                connection = connections[self.db]
+                timestamp_field = \
+                    ReviewRequestVisit._meta.get_field('timestamp')
+                visit_timestamp = (
+                    'CASE reviews_reviewrequest.id %s'
+                    '  ELSE accounts_reviewrequestvisit.timestamp END'
+                    % ' '.join(['WHEN %s THEN %s'] * len(buffered_visits)))
+
+                for review_request_id, timestamp in \
+                    sorted(six.iteritems(buffered_visits)):
+                    select_params += [
+                        review_request_id,
+                        timestamp_field.get_db_prep_value(timestamp,
+                                                          connection),
+                    ]
+            else:
+                visit_timestamp = 'accounts_reviewrequestvisit.timestamp'
 
             select_dict['new_review_count'] = """
                 SELECT COUNT(*)
@@ -82,14 +118,15 @@ class ReviewRequestQuerySet(QuerySet):
                     AND accounts_reviewrequestvisit.review_request_id =
                         reviews_reviewrequest.id
                     AND accounts_reviewrequestvisit.user_id = %(user_id)s
-                    AND reviews_review.timestamp >
-                        accounts_reviewrequestvisit.timestamp
+                    AND reviews_review.timestamp > %(visit_timestamp)s
                     AND reviews_review.user_id != %(user_id)s
             """ % {
-                'user_id': six.text_type(user.id)
+                'user_id': six.text_type(user.id),
+                'visit_timestamp': visit_timestamp,
             }
 
-            queryset = self.extra(select=select_dict)
+            queryset = self.extra(select=select_dict,
+                                  select_params=select_params)
 
         return queryset
 
@@ -427,8 +464,6 @@ class ReviewRequestManager(ConcurrencyManager):
                extra_query=None, local_site=None, filter_private=False,
                show_inactive=False, show_all_unpublished=False,
                show_all_local_sites=False):
-        from reviewboard.reviews.models import Group
-
         is_authenticated = (user is not None and user.is_authenticated())
 
         if show_all_unpublished:
@@ -455,26 +490,29 @@ class ReviewRequestManager(ConcurrencyManager):
 
         if filter_private and (not user or not user.is_superuser):
             # This must always be kept in sync with RBSearchForm.search.
-            repo_query = Q(repository=None)
+            repo_query = Q(repository=None) | Q(repository__public=True)
             group_query = Q(target_groups=None)
 
             if is_authenticated:
-                accessible_repo_ids = \
-                    Repository.objects.accessible_ids(user, visible_only=False,
-                                                      local_site=local_site)
-                accessible_group_ids = \
-                    Group.objects.accessible(user, visible_only=False,
-                                             local_site=local_site)
-
-                repo_query = repo_query | Q(repository__in=accessible_repo_ids)
-                group_query = (group_query |
-                               Q(target_groups__in=accessible_group_ids))
-
-                query = query & (Q(submitter=user) |
-                                 (repo_query &
-                                  (Q(target_people=user) | group_query)))
+                snapshot = get_access_snapshot(user, local_site)
+
+                if snapshot.private_repository_ids:
+                    repo_query |= Q(
+                        repository__in=snapshot.private_repository_ids)
+
+                if snapshot.can_view_invite_only_groups:
+                    query = query & (Q(submitter=user) | repo_query)
+                else:
+                    group_query |= Q(target_groups__invite_only=False)
+
+                    if snapshot.private_group_ids:
+                        group_query |= Q(
+                            target_groups__in=snapshot.private_group_ids)
+
+                    query = query & (Q(submitter=user) |
+                                     (repo_query &
+                                      (Q(target_people=user) | group_query)))
             else:
-                repo_query |= Q(repository__public=True)
                 group_query |= Q(target_groups__invite_only=False)
 
                 query = query & repo_query & group_query
@@ -628,8 +666,6 @@ class ReviewManager(ConcurrencyManager):
             django.db.models.query.QuerySet:
             A queryset for the given conditions.
         """
-        from reviewboard.reviews.models import Group
-
         query = Q(public=public) & Q(base_reply_to=base_reply_to)
 
         if status:
@@ -646,23 +682,24 @@ class ReviewManager(ConcurrencyManager):
             group_query = (Q(review_request__target_groups=None) |
                            Q(review_request__target_groups__invite_only=False))
 
-            # TODO: should be consolidated with queries in ReviewRequestManager
             if user and user.is_authenticated():
-                accessible_repo_ids = Repository.objects.filter(
-                    Q(users=user) |
-                    Q(review_groups__users=user)).values_list('pk', flat=True)
-                accessible_group_ids = Group.objects.filter(
-                    users=user).values_list('pk', flat=True)
-
-                repo_query |= \
-                    Q(review_request__repository__in=accessible_repo_ids)
-                group_query |= \
-                    Q(review_request__target_groups__in=accessible_group_ids)
-
-                query = query & (Q(user=user) |
-                                 (repo_query &
-                                  (Q(review_request__target_people=user) |
-                                   group_query)))
+                snapshot = get_access_snapshot(user, local_site)
+
+                if snapshot.private_repository_ids:
+                    repo_query |= Q(review_request__repository__in=(
+                        snapshot.private_repository_ids))
+
+                if snapshot.can_view_invite_only_groups:
+                    query = query & (Q(user=user) | repo_query)
+                else:
+                    if snapshot.private_group_ids:
+                        group_query |= Q(review_request__target_groups__in=(
+                            snapshot.private_group_ids))
+
+                    query = query & (Q(user=user) |
+                                     (repo_query &
+                                      (Q(review_request__target_people=user) |
+                                       group_query)))
             else:
                 query = query & repo_query & group_query
 
@@ -1,12 +1,19 @@
 from __future__ import unicode_literals
 
+import hashlib
+import json
 import warnings
 
+import djblets
+import markdown as markdown_module
+import pymdownx
 import pymdownx.emoji
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Model
+from django.utils.encoding import force_bytes
 from django.utils.html import escape
 from djblets import markdown as djblets_markdown
+from djblets.cache.backend import cache_memoize
 from djblets.siteconfig.models import SiteConfiguration
 from markdown import markdown
 
@@ -47,6 +54,12 @@ MARKDOWN_KWARGS = {
 }
 
 
+#: The key prefix used for cached rendered Markdown.
+MARKDOWN_CACHE_KEY_PREFIX = 'rendered-markdown'
+
+_markdown_renderer_fingerprint = None
+
+
 def markdown_escape(text):
     """Escapes text for use in Markdown.
 
@@ -221,16 +234,103 @@ def sanitize_illegal_chars_for_xml(s):
     return djblets_markdown.sanitize_illegal_chars_for_xml(s)
 
 
-def render_markdown(text):
+def get_markdown_renderer_fingerprint():
+    """Return a fingerprint for the current Markdown rendering setup.
+
+    The fingerprint covers the versions of the Markdown libraries and the
+    set of extensions and options in :py:data:`MARKDOWN_KWARGS`. Any change
+    to these produces a new fingerprint, which invalidates all previously
+    cached rendered Markdown.
+
+    Returns:
+        unicode:
+        The fingerprint for the renderer.
+    """
+    global _markdown_renderer_fingerprint
+
+    if _markdown_renderer_fingerprint is None:
+        versions = [
+            getattr(module, '__version__', None) or
+            getattr(module, 'version', None) or
+            ''
+            for module in (markdown_module, pymdownx, djblets)
+        ]
+
+        # Callables (such as the emoji index) are represented by name, so
+        # that the fingerprint is stable across processes.
+        data = json.dumps([versions, MARKDOWN_KWARGS],
+                          sort_keys=True,
+                          default=lambda o: '%s.%s' % (
+                              getattr(o, '__module__', ''),
+                              getattr(o, '__name__', type(o).__name__)))
+        _markdown_renderer_fingerprint = \
+            hashlib.sha1(data.encode('utf-8')).hexdigest()[:12]
+
+    return _markdown_renderer_fingerprint
+
+
+def _get_text_hash(text):
+    """Return a content hash for Markdown text.
+
+    Args:
+        text (unicode):
+            The Markdown text.
+
+    Returns:
+        unicode:
+        The SHA-256 hash of the text.
+    """
+    return hashlib.sha256(force_bytes(text)).hexdigest()
+
+
+def _render_markdown_uncached(text):
+    """Render Markdown text to HTML without consulting the cache.
+
+    Args:
+        text (unicode):
+            The Markdown text to render.
+
+    Returns:
+        unicode:
+        The rendered HTML.
+    """
+    return markdown(text, **MARKDOWN_KWARGS)
+
+
+def render_markdown(text, use_cache=True):
     """Renders Markdown text to HTML.
 
     The Markdown text will be sanitized to prevent injecting custom HTML.
     It will also enable a few plugins for code highlighting and sane lists.
+
+    Rendered results are cached, keyed on a hash of the text and the
+    fingerprint of the Markdown renderer (see
+    :py:func:`get_markdown_renderer_fingerprint`). This cache is shared by
+    the templates, review request fields and the API.
+
+    Args:
+        text (unicode or bytes):
+            The Markdown text to render.
+
+        use_cache (bool, optional):
+            Whether to use the rendered Markdown cache.
+
+    Returns:
+        unicode:
+        The rendered HTML.
     """
     if isinstance(text, bytes):
         text = text.decode('utf-8')
 
-    return markdown(text, **MARKDOWN_KWARGS)
+    if not text or not use_cache:
+        return _render_markdown_uncached(text)
+
+    return cache_memoize(
+        '%s:%s:%s' % (MARKDOWN_CACHE_KEY_PREFIX,
+                      get_markdown_renderer_fingerprint(),
+                      _get_text_hash(text)),
+        lambda: _render_markdown_uncached(text),
+        large_data=True)
 
 
 def render_markdown_from_file(f):
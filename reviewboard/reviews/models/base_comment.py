@@ -1,7 +1,7 @@
 from __future__ import unicode_literals
 
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
 from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
@@ -10,6 +10,7 @@ from djblets.db.fields import CounterField, JSONField
 from djblets.db.managers import ConcurrencyManager
 
 from reviewboard.admin.read_only import is_site_read_only_for
+from reviewboard.reviews.activity import increment_activity_version
 
 
 @python_2_unicode_compatible
@@ -114,22 +115,6 @@ class BaseComment(models.Model):
         _get_require_verification, _set_require_verification,
         doc='Whether this comment requires verification before closing.')
 
-    def __init__(self, *args, **kwargs):
-        """Initialize the comment.
-
-        Args:
-            *args (tuple):
-                Positional arguments to pass through to the model
-                initialization.
-
-            **kwargs (dict):
-                Keyword arguments to pass through to the model
-                initialization.
-        """
-        super(BaseComment, self).__init__(*args, **kwargs)
-
-        self._loaded_issue_status = self.issue_status
-
     def get_review_request(self):
         """Return this comment's review request.
 
@@ -272,48 +257,136 @@ class BaseComment(models.Model):
     def save(self, **kwargs):
         """Save the comment.
 
+        If this changes the status of an issue on a published review, the
+        review request's issue counters are updated in the same transaction.
+
         Args:
             **kwargs (dict):
                 Keyword arguments passed to the method (unused).
         """
-        from reviewboard.reviews.models.review_request import ReviewRequest
-
         self.timestamp = timezone.now()
 
-        super(BaseComment, self).save()
+        with transaction.atomic():
+            review = None
+            issue_status_changes = None
 
-        try:
-            # Update the review timestamp, but only if it's a draft.
-            # Otherwise, resolving an issue will change the timestamp of
-            # the review.
-            review = self.get_review()
-
-            if not review.public:
-                review.timestamp = self.timestamp
-                review.save()
+            if self.pk is not None:
+                try:
+                    review = self.get_review()
+                except ObjectDoesNotExist:
+                    pass
+                else:
+                    if review.public and not self.is_reply():
+                        old_issue_status = self._get_locked_issue_status()
+
+                        if self.issue_opened:
+                            new_issue_status = self.issue_status
+                        else:
+                            new_issue_status = None
+
+                        if old_issue_status != new_issue_status:
+                            issue_status_changes = {
+                                old_issue_status: -1,
+                                new_issue_status: 1,
+                            }
+
+            super(BaseComment, self).save()
+
+            if review is None:
+                try:
+                    review = self.get_review()
+                except ObjectDoesNotExist:
+                    pass
+
+            if review is not None:
+                self._update_review(review, issue_status_changes)
+
+    def delete(self, **kwargs):
+        """Delete the comment.
+
+        If this comment has an issue on a published review, the review
+        request's issue counters are updated in the same transaction.
+
+        Args:
+            **kwargs (dict):
+                Keyword arguments passed to the parent method.
+        """
+        with transaction.atomic():
+            try:
+                review = self.get_review()
+            except ObjectDoesNotExist:
+                review = None
+
+            if review is not None and review.public and not self.is_reply():
+                issue_status = self._get_locked_issue_status()
             else:
-                if (not self.is_reply() and
-                    self.issue_opened and
-                    self._loaded_issue_status != self.issue_status):
-                    # The user has toggled the issue status of this comment,
-                    # so update the issue counts for the review request.
-                    old_field = ReviewRequest.ISSUE_COUNTER_FIELDS[
-                        self._loaded_issue_status]
-                    new_field = ReviewRequest.ISSUE_COUNTER_FIELDS[
-                        self.issue_status]
-
-                    if old_field != new_field:
-                        CounterField.increment_many(
-                            self.get_review_request(),
-                            {
-                                old_field: -1,
-                                new_field: 1,
-                            })
-
-                q = ReviewRequest.objects.filter(pk=review.review_request_id)
-                q.update(last_review_activity_timestamp=self.timestamp)
-        except ObjectDoesNotExist:
-            pass
+                issue_status = None
+
+            super(BaseComment, self).delete(**kwargs)
+
+            if issue_status:
+                review_request = review.review_request
+                CounterField.increment_many(
+                    review_request,
+                    review_request.get_issue_counter_values({
+                        issue_status: -1,
+                    }))
+
+    def _get_locked_issue_status(self):
+        """Lock the comment and return its stored issue status.
+
+        The comment's row is locked until the end of the current transaction.
+
+        The stored issue status may differ from the one that was loaded, if
+        another request has changed it since. Basing changes to the issue
+        counters on the stored status, while holding the lock, ensures that
+        they stay correct when several requests change the same issue at
+        once.
+
+        Returns:
+            unicode:
+            The stored issue status, or ``None`` if the comment doesn't have
+            an issue opened.
+        """
+        return (
+            type(self).objects
+            .select_for_update()
+            .filter(pk=self.pk, issue_opened=True)
+            .values_list('issue_status', flat=True)
+            .first()
+        )
+
+    def _update_review(self, review, issue_status_changes):
+        """Update the review and review request after saving the comment.
+
+        Args:
+            review (reviewboard.reviews.models.review.Review):
+                The review containing this comment.
+
+            issue_status_changes (dict):
+                The changes to the number of issues with each status, if the
+                issue status of a comment on a published review has changed.
+        """
+        from reviewboard.reviews.models.review_request import ReviewRequest
+
+        # Update the review timestamp, but only if it's a draft.
+        # Otherwise, resolving an issue will change the timestamp of
+        # the review.
+        if not review.public:
+            review.timestamp = self.timestamp
+            review.save()
+        else:
+            if issue_status_changes:
+                # The user has toggled the issue status of this comment,
+                # so update the issue counts for the review request.
+                CounterField.increment_many(
+                    review.review_request,
+                    ReviewRequest.get_issue_counter_values(
+                        issue_status_changes))
+
+            q = ReviewRequest.objects.filter(pk=review.review_request_id)
+            q.update(last_review_activity_timestamp=self.timestamp)
+            increment_activity_version(review.review_request_id)
 
     def __str__(self):
         """Return a string representation of the comment.
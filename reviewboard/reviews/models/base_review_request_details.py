@@ -115,7 +115,12 @@ class BaseReviewRequestDetails(models.Model):
             The active file attachments on the review request or draft.
         """
         def get_attachments(review_request):
-            for file_attachment in self.file_attachments.all():
+            # The histories are needed for sorting, so fetch them along with
+            # the attachments rather than one at a time.
+            file_attachments = \
+                self.file_attachments.select_related('attachment_history')
+
+            for file_attachment in file_attachments:
                 file_attachment._review_request = review_request
 
                 # Handle legacy entries which don't have an associated
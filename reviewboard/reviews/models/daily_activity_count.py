@@ -0,0 +1,31 @@
+from __future__ import unicode_literals
+
+from django.db import models
+from django.utils.encoding import python_2_unicode_compatible
+from django.utils.translation import ugettext_lazy as _
+
+
+@python_2_unicode_compatible
+class DailyActivityCount(models.Model):
+    """The number of objects of a given type created on a given day.
+
+    These rows are pre-aggregated versions of counts that would otherwise
+    require grouping large tables by date, and are used for the activity
+    widgets in the administration dashboard and the activity stats API.
+
+    They're maintained by :py:mod:`reviewboard.admin.activity_stats`.
+    """
+
+    object_type = models.CharField(_('object type'), max_length=32)
+    date = models.DateField(_('date'))
+    count = models.IntegerField(_('count'), default=0)
+
+    def __str__(self):
+        return '%s on %s: %s' % (self.object_type, self.date, self.count)
+
+    class Meta:
+        app_label = 'reviews'
+        db_table = 'reviews_dailyactivitycount'
+        unique_together = (('object_type', 'date'),)
+        verbose_name = _('Daily Activity Count')
+        verbose_name_plural = _('Daily Activity Counts')
@@ -9,6 +9,7 @@ from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 from djblets.db.fields import CounterField, JSONField
 
+from reviewboard.reviews.access import get_access_snapshot
 from reviewboard.reviews.managers import ReviewGroupManager
 from reviewboard.site.models import LocalSite
 from reviewboard.site.urlresolvers import local_site_reverse
@@ -93,7 +94,7 @@ class Group(models.Model):
         if not self.invite_only or user.is_superuser:
             return True
 
-        if user.is_authenticated() and self.users.filter(pk=user.pk).exists():
+        if get_access_snapshot(user, self.local_site).can_access_group(self):
             return True
 
         if not silent:
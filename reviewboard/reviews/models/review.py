@@ -3,9 +3,9 @@ from __future__ import unicode_literals
 import logging
 
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import Q
-from django.utils import timezone
+from django.db import models, router, transaction
+from django.db.models import Max, Q
+from django.utils import six, timezone
 from django.utils.functional import cached_property
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
@@ -23,7 +23,8 @@ from reviewboard.reviews.models.general_comment import GeneralComment
 from reviewboard.reviews.models.review_request import (ReviewRequest,
                                                        fetch_issue_counts)
 from reviewboard.reviews.models.screenshot_comment import ScreenshotComment
-from reviewboard.reviews.signals import (reply_publishing, reply_published,
+from reviewboard.reviews.signals import (comments_bulk_created,
+                                         reply_publishing, reply_published,
                                          review_publishing, review_published,
                                          review_ship_it_revoking,
                                          review_ship_it_revoked)
@@ -40,6 +41,14 @@ class Review(models.Model):
     REVOKED_SHIP_IT_TEXT = '~~Ship It!~~'
     FIX_IT_THEN_SHIP_IT_TEXT = 'Fix it, then Ship it!'
 
+    # The names of the comment relations for each type of comment.
+    _COMMENT_FIELDS = {
+        Comment: 'comments',
+        FileAttachmentComment: 'file_attachment_comments',
+        GeneralComment: 'general_comments',
+        ScreenshotComment: 'screenshot_comments',
+    }
+
     review_request = models.ForeignKey(ReviewRequest,
                                        related_name="reviews",
                                        verbose_name=_("review request"))
@@ -328,11 +337,31 @@ class Review(models.Model):
         super(Review, self).save(**kwargs)
 
     def publish(self, user=None, trivial=False, to_owner_only=False,
-                request=None):
+                request=None, open_issue_count=None):
         """Publishes this review.
 
         This will make the review public and update the timestamps of all
         contained comments.
+
+        Args:
+            user (django.contrib.auth.models.User, optional):
+                The user publishing the review. This defaults to the owner
+                of the review.
+
+            trivial (bool, optional):
+                Whether the publish is trivial. This only applies to replies.
+
+            to_owner_only (bool, optional):
+                Whether the review e-mail should only be sent to the owner
+                of the review request.
+
+            request (django.http.HttpRequest, optional):
+                The HTTP request publishing the review, if any.
+
+            open_issue_count (int, optional):
+                The number of issues opened by comments in the review, if
+                already known by the caller. If not provided, this will be
+                computed from the review's comments.
         """
         if not user:
             user = self.user
@@ -345,66 +374,172 @@ class Review(models.Model):
             review_publishing.send(sender=self.__class__, user=user,
                                    review=self)
 
-        self.save()
-
-        self.comments.update(timestamp=self.timestamp)
-        self.screenshot_comments.update(timestamp=self.timestamp)
-        self.file_attachment_comments.update(timestamp=self.timestamp)
-        self.general_comments.update(timestamp=self.timestamp)
-
-        # Update the last_updated timestamp and the last review activity
-        # timestamp on the review request.
-        self.review_request.last_review_activity_timestamp = self.timestamp
-        self.review_request.last_updated = self.timestamp
-        self.review_request.save(update_fields=(
-            'last_review_activity_timestamp', 'last_updated'))
+        with transaction.atomic():
+            self.save()
+
+            self.comments.update(timestamp=self.timestamp)
+            self.screenshot_comments.update(timestamp=self.timestamp)
+            self.file_attachment_comments.update(timestamp=self.timestamp)
+            self.general_comments.update(timestamp=self.timestamp)
+
+            # Update the last_updated timestamp and the last review activity
+            # timestamp on the review request.
+            review_request = self.review_request
+            review_request.last_review_activity_timestamp = self.timestamp
+            review_request.last_updated = self.timestamp
+            review_request.save(update_fields=(
+                'last_review_activity_timestamp', 'last_updated'))
+
+            if not self.is_reply():
+                if open_issue_count is None:
+                    # The issues in this review are now counted, using the
+                    # status they were filed with (normally open).
+                    issue_counts = fetch_issue_counts(review_request,
+                                                      Q(pk=self.pk))
+                else:
+                    issue_counts = {
+                        BaseComment.OPEN: open_issue_count,
+                    }
+
+                counter_values = \
+                    review_request.get_issue_counter_values(issue_counts)
+
+                if self.ship_it:
+                    counter_values['shipit_count'] = 1
+
+                # Atomically update the issue counts and Ship It count.
+                CounterField.increment_many(review_request, counter_values)
 
         if self.is_reply():
             reply_published.send(sender=self.__class__,
                                  user=user, reply=self, trivial=trivial)
         else:
-            issue_counts = fetch_issue_counts(self.review_request,
-                                              Q(pk=self.pk))
-
-            # Since we're publishing the review, all filed issues should be
-            # open.
-            assert issue_counts[BaseComment.RESOLVED] == 0
-            assert issue_counts[BaseComment.DROPPED] == 0
-            assert issue_counts[BaseComment.VERIFYING_RESOLVED] == 0
-            assert issue_counts[BaseComment.VERIFYING_DROPPED] == 0
-
-            if self.ship_it:
-                ship_it_value = 1
-            else:
-                ship_it_value = 0
-
-            # Atomically update the issue count and Ship It count.
-            CounterField.increment_many(
-                self.review_request,
-                {
-                    'issue_open_count': issue_counts[BaseComment.OPEN],
-                    'issue_dropped_count': 0,
-                    'issue_resolved_count': 0,
-                    'issue_verifying_count': 0,
-                    'shipit_count': ship_it_value,
-                })
-
             review_published.send(sender=self.__class__,
                                   user=user, review=self,
                                   to_owner_only=to_owner_only,
                                   request=request)
 
+    def add_comments(self, comments, user=None):
+        """Add new comments to this draft review in bulk.
+
+        The comments of each type are inserted with a single bulk insert,
+        rather than saving each comment (which would also save the review
+        each time). Django 1.6 can't return the IDs of rows inserted in bulk,
+        so they're then looked up with one query per comment type, matching
+        the new, unlinked rows with the comments' timestamp. This happens in
+        a transaction holding a lock on the review's row.
+
+        Instead of emitting :py:data:`~django.db.models.signals.post_save`
+        for each comment,
+        :py:data:`~reviewboard.reviews.signals.comments_bulk_created` is
+        emitted once for the batch.
+
+        Args:
+            comments (list of reviewboard.reviews.models.BaseComment):
+                The new, unsaved comments to add. These may be of any comment
+                type.
+
+            user (django.contrib.auth.models.User, optional):
+                The user adding the comments. This defaults to the owner of
+                the review.
+        """
+        assert not self.public
+
+        if not comments:
+            return
+
+        if not user:
+            user = self.user
+
+        timestamp = timezone.now()
+        comments_by_field = {}
+
+        for comment in comments:
+            comment.timestamp = timestamp
+            comments_by_field.setdefault(
+                self._COMMENT_FIELDS[type(comment)], []).append(comment)
+
+        with transaction.atomic():
+            # Lock the review's row, so that comments can't be added to it
+            # concurrently while the new IDs are looked up.
+            list(Review.objects.select_for_update()
+                 .filter(pk=self.pk)
+                 .values_list('pk', flat=True))
+
+            for field_name, field_comments in six.iteritems(
+                    comments_by_field):
+                model = type(field_comments[0])
+                using = router.db_for_write(model)
+                queryset = model.objects.using(using)
+                last_pk = queryset.aggregate(last_pk=Max('pk'))['last_pk']
+
+                queryset.bulk_create(field_comments)
+
+                if field_comments[0].pk is None:
+                    # The database didn't report the new IDs. The rows were
+                    # inserted in order, after any existing rows, and aren't
+                    # yet in any review.
+                    new_rows = queryset.filter(timestamp=timestamp,
+                                               review__isnull=True)
+
+                    if last_pk is not None:
+                        new_rows = new_rows.filter(pk__gt=last_pk)
+
+                    pks = list(new_rows
+                               .order_by('pk')
+                               .values_list('pk', flat=True)
+                               [:len(field_comments)])
+                    assert len(pks) == len(field_comments)
+
+                    for comment, pk in zip(field_comments, pks):
+                        comment.pk = pk
+
+                for comment in field_comments:
+                    comment._state.adding = False
+                    comment._state.db = using
+
+                getattr(self, field_name).add(*field_comments)
+
+            self.timestamp = timestamp
+            self.save(update_fields=('timestamp',))
+
+        comments_bulk_created.send(sender=self.__class__,
+                                   user=user,
+                                   review=self,
+                                   comments=comments)
+
     def delete(self):
         """Deletes this review.
 
-        This will enforce that all contained comments are also deleted.
+        This will enforce that all contained comments are also deleted. If
+        the review is published, its issues are removed from the review
+        request's issue counters in the same transaction.
         """
-        self.comments.all().delete()
-        self.screenshot_comments.all().delete()
-        self.file_attachment_comments.all().delete()
-        self.general_comments.all().delete()
+        with transaction.atomic():
+            if self.public and not self.is_reply():
+                # Lock the review request's row while the comments are
+                # counted and deleted, so that the counters can't change
+                # in the meantime.
+                review_request = (
+                    ReviewRequest.objects
+                    .select_for_update()
+                    .get(pk=self.review_request_id))
+                issue_counts = fetch_issue_counts(review_request,
+                                                  Q(pk=self.pk))
+            else:
+                issue_counts = None
+
+            self.comments.all().delete()
+            self.screenshot_comments.all().delete()
+            self.file_attachment_comments.all().delete()
+            self.general_comments.all().delete()
+
+            if issue_counts is not None:
+                CounterField.decrement_many(
+                    review_request,
+                    review_request.get_issue_counter_values(issue_counts))
 
-        super(Review, self).delete()
+            super(Review, self).delete()
 
     def get_absolute_url(self):
         return "%s#review%s" % (self.review_request.get_absolute_url(),
@@ -104,11 +104,67 @@ def fetch_issue_counts(review_request, extra_query=None):
     return issue_counts
 
 
+def fetch_issue_counts_for_review_requests(review_request_ids):
+    """Fetch all issue counts for several review requests at once.
+
+    This computes the same counts as :py:func:`fetch_issue_counts`, but
+    performs one grouped query per type of comment for the entire list of
+    review requests, rather than loading every comment for each one.
+
+    Args:
+        review_request_ids (list of int):
+            The IDs of the review requests.
+
+    Returns:
+        dict:
+        A dictionary mapping each review request ID to a dictionary of issue
+        counts, in the form returned by :py:func:`fetch_issue_counts`.
+    """
+    from reviewboard.reviews.models.review import Review
+
+    all_issue_counts = {
+        review_request_id: {
+            BaseComment.OPEN: 0,
+            BaseComment.RESOLVED: 0,
+            BaseComment.DROPPED: 0,
+            BaseComment.VERIFYING_RESOLVED: 0,
+            BaseComment.VERIFYING_DROPPED: 0,
+        }
+        for review_request_id in review_request_ids
+    }
+
+    reviews = Review.objects.filter(review_request__in=review_request_ids,
+                                    public=True,
+                                    base_reply_to__isnull=True)
+
+    for key in ('comments', 'file_attachment_comments', 'general_comments',
+                'screenshot_comments'):
+        rows = (
+            reviews
+            .filter(**{key + '__issue_opened': True})
+            .values_list('review_request', key + '__issue_status')
+            .annotate(count=Count(key))
+            .order_by()
+        )
+
+        for review_request_id, issue_status, count in rows:
+            if issue_status:
+                all_issue_counts[review_request_id][issue_status] += count
+
+    return all_issue_counts
+
+
 def _initialize_issue_counts(review_request):
     """Initializes the issue counter fields for a review request.
 
     This will fetch all the issue counts and populate the counter fields.
 
+    Once populated, the counters are kept up-to-date as issues are published,
+    change status, or are deleted, so this only runs for review requests
+    created before the counters existed or whose counters have been reset.
+    The ``verify-issue-counts`` management command can be used to correct
+    counters without resetting them.
+
     Due to the way that CounterField works, this will only be called once
     per review request, instead of once per field, due to all the fields
     being set at once. This will also take care of the actual saving of
@@ -347,6 +403,34 @@ class ReviewRequest(BaseReviewRequestDetails):
         else:
             raise ValueError('Invalid status string "%s"' % status)
 
+    @classmethod
+    def get_issue_counter_values(cls, issue_counts):
+        """Return values for the issue counter fields from issue counts.
+
+        The counts can either be totals (such as those returned by
+        :py:func:`fetch_issue_counts`), or changes to apply to the counters
+        when issues are added, removed, or change status.
+
+        Args:
+            issue_counts (dict):
+                A dictionary mapping issue statuses to counts. Any count with
+                an issue status of ``None`` is ignored.
+
+        Returns:
+            dict:
+            A dictionary mapping each issue counter field name to a value,
+            suitable for saving or for passing to
+            :py:meth:`CounterField.increment_many()
+            <djblets.db.fields.CounterField.increment_many>`.
+        """
+        values = dict.fromkeys(six.itervalues(cls.ISSUE_COUNTER_FIELDS), 0)
+
+        for issue_status, count in six.iteritems(issue_counts):
+            if issue_status:
+                values[cls.ISSUE_COUNTER_FIELDS[issue_status]] += count
+
+        return values
+
     def get_commit(self):
         if self.commit_id is not None:
             return self.commit_id
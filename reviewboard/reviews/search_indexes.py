@@ -4,6 +4,7 @@ from django.contrib.auth.models import AnonymousUser
 from django.db.models import Q
 from haystack import indexes
 
+from reviewboard.diffviewer.models import FileDiff
 from reviewboard.reviews.models import ReviewRequest
 from reviewboard.search.indexes import BaseSearchIndex
 
@@ -54,17 +55,60 @@ class ReviewRequestIndex(BaseSearchIndex, indexes.Indexable):
                             'repository',
                             'submitter',
                             'submitter__profile')
-            .prefetch_related('diffset_history__diffsets__files',
-                              'target_groups',
+            .prefetch_related('target_groups',
                               'target_people')
         )
 
+    def prefetch_batch(self, review_requests):
+        """Load the file paths for a batch of review requests.
+
+        Only the source and destination paths are fetched, rather than
+        full :py:class:`~reviewboard.diffviewer.models.filediff.FileDiff`
+        objects (which include the diff data).
+
+        Args:
+            review_requests (list of reviewboard.reviews.models.
+                             review_request.ReviewRequest):
+                The review requests being indexed.
+        """
+        files_by_history_id = {}
+
+        for review_request in review_requests:
+            files = set()
+            review_request._search_index_files = files
+            files_by_history_id[review_request.diffset_history_id] = files
+
+        filediffs = (
+            FileDiff.objects
+            .filter(diffset__history__in=list(files_by_history_id))
+            .values_list('diffset__history', 'source_file', 'dest_file')
+        )
+
+        for history_id, source_file, dest_file in filediffs:
+            files_by_history_id[history_id].add((source_file, dest_file))
+
     def prepare_file(self, obj):
-        return set([
-            (filediff.source_file, filediff.dest_file)
-            for diffset in obj.diffset_history.diffsets.all()
-            for filediff in diffset.files.all()
-        ])
+        """Prepare the list of files modified by the review request.
+
+        Args:
+            obj (reviewboard.reviews.models.review_request.ReviewRequest):
+                The review request being indexed.
+
+        Returns:
+            set of tuple:
+            The source and destination paths of each file in the review
+            request's diffs.
+        """
+        if not hasattr(obj, '_search_index_files'):
+            self.prefetch_batch([obj])
+
+        files = obj._search_index_files
+
+        # The files are only loaded for the current indexing pass. The same
+        # instance may be indexed again after its diffs have changed.
+        del obj._search_index_files
+
+        return files
 
     def prepare_private(self, review_request):
         """Prepare the private flag for the index.
@@ -213,3 +213,21 @@ reply_publishing = Signal(providing_args=['user', 'reply'])
 #:     trivial (bool):
 #:         Whether the reply was considered trivial.
 reply_published = Signal(providing_args=['user', 'reply', 'trivial'])
+
+
+#: Emitted when comments have been added to a draft review in bulk.
+#:
+#: Comments added in bulk are inserted together, without emitting
+#: :py:data:`~django.db.models.signals.post_save` for each one. This is
+#: emitted once for the whole batch instead.
+#:
+#: Args:
+#:     user (django.contrib.auth.models.User):
+#:         The user who added the comments.
+#:
+#:     review (reviewboard.reviews.models.Review):
+#:         The review the comments were added to.
+#:
+#:     comments (list of reviewboard.reviews.models.BaseComment):
+#:         The comments that were added. These may be of any comment type.
+comments_bulk_created = Signal(providing_args=['user', 'review', 'comments'])
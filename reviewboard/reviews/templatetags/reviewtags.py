@@ -21,6 +21,7 @@ from reviewboard.accounts.trophies import UnknownTrophy
 from reviewboard.admin.read_only import is_site_read_only_for
 from reviewboard.deprecation import RemovedInReviewBoard40Warning
 from reviewboard.diffviewer.diffutils import get_displayed_diff_line_ranges
+from reviewboard.notifications.push import is_push_enabled
 from reviewboard.reviews.actions import get_top_level_actions
 from reviewboard.reviews.fields import (get_review_request_field,
                                         get_review_request_fieldset,
@@ -1110,6 +1111,7 @@ def reviewable_page_model_data(context):
     # so it can be injected correctly.
     return json_dumps_items({
         'checkForUpdates': True,
+        'pushUpdatesEnabled': is_push_enabled(),
         'reviewRequestData': review_request_data,
         'extraReviewRequestDraftData': extra_review_request_draft_data,
         'editorData': editor_data,
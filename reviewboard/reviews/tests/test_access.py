@@ -0,0 +1,236 @@
+"""Unit tests for reviewboard.reviews.access."""
+
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, Permission, User
+from django.core.cache import cache
+from kgb import SpyAgency
+
+from reviewboard.reviews import access
+from reviewboard.reviews.access import (get_access_snapshot,
+                                        invalidate_access_snapshots)
+from reviewboard.reviews.models import ReviewRequest
+from reviewboard.testing import TestCase
+
+
+class AccessControlSnapshotTests(SpyAgency, TestCase):
+    """Unit tests for cached access control snapshots."""
+
+    fixtures = ['test_users', 'test_scmtools', 'test_site']
+
+    def setUp(self):
+        super(AccessControlSnapshotTests, self).setUp()
+
+        self.user = User.objects.get(username='doc')
+
+    def test_anonymous(self):
+        """Testing get_access_snapshot with an anonymous user"""
+        self.create_repository(public=False)
+        self.create_review_group(invite_only=True)
+
+        snapshot = get_access_snapshot(AnonymousUser())
+
+        self.assertEqual(snapshot.private_repository_ids, set())
+        self.assertEqual(snapshot.private_group_ids, set())
+        self.assertFalse(snapshot.can_view_invite_only_groups)
+
+    def test_private_ids(self):
+        """Testing get_access_snapshot contains only accessible private
+        repositories and groups
+        """
+        group = self.create_review_group(name='group1', invite_only=True)
+        group.users.add(self.user)
+        self.create_review_group(name='group2', invite_only=True)
+        self.create_review_group(name='group3')
+
+        repository1 = self.create_repository(name='repo1', public=False)
+        repository1.users.add(self.user)
+        repository2 = self.create_repository(name='repo2', public=False)
+        repository2.review_groups.add(group)
+        self.create_repository(name='repo3', public=False)
+        self.create_repository(name='repo4')
+
+        snapshot = get_access_snapshot(self.user)
+
+        self.assertEqual(snapshot.private_repository_ids,
+                         {repository1.pk, repository2.pk})
+        self.assertEqual(snapshot.private_group_ids, {group.pk})
+
+    def test_local_site(self):
+        """Testing get_access_snapshot is scoped to a Local Site"""
+        repository1 = self.create_repository(name='repo1', public=False)
+        repository1.users.add(self.user)
+        repository2 = self.create_repository(name='repo2', public=False,
+                                             with_local_site=True)
+        repository2.users.add(self.user)
+
+        self.assertEqual(get_access_snapshot(self.user).private_repository_ids,
+                         {repository1.pk})
+        self.assertEqual(
+            get_access_snapshot(self.user, repository2.local_site)
+            .private_repository_ids,
+            {repository2.pk})
+
+    def test_cached(self):
+        """Testing get_access_snapshot caches the snapshot"""
+        get_access_snapshot(self.user)
+
+        with self.assertNumQueries(0):
+            get_access_snapshot(self.user)
+
+    def test_after_eviction(self):
+        """Testing get_access_snapshot after the cache is cleared"""
+        repository = self.create_repository(public=False)
+        repository.users.add(self.user)
+        get_access_snapshot(self.user)
+
+        cache.clear()
+
+        self.assertEqual(get_access_snapshot(self.user).private_repository_ids,
+                         {repository.pk})
+
+    def test_invalidated_on_repository_membership(self):
+        """Testing get_access_snapshot is invalidated when repository users
+        change
+        """
+        repository = self.create_repository(public=False)
+        self.assertEqual(get_access_snapshot(self.user).private_repository_ids,
+                         set())
+
+        repository.users.add(self.user)
+        self.assertEqual(get_access_snapshot(self.user).private_repository_ids,
+                         {repository.pk})
+
+        repository.users.remove(self.user)
+        self.assertEqual(get_access_snapshot(self.user).private_repository_ids,
+                         set())
+
+    def test_revoked_with_concurrent_snapshot(self):
+        """Testing get_access_snapshot with a snapshot cached by a concurrent
+        request while access is revoked
+        """
+        repository = self.create_repository(public=False)
+        repository.users.add(self.user)
+        stale_snapshot = get_access_snapshot(self.user)
+
+        repository.users.remove(self.user)
+        self.assertEqual(get_access_snapshot(self.user).private_repository_ids,
+                         set())
+
+        # Simulate a concurrent request that read the memberships before the
+        # revocation was committed, but after the versions were incremented.
+        invalidate_access_snapshots([self.user.pk])
+        self.spy_on(access._build_access_snapshot,
+                    call_fake=lambda *args: stale_snapshot)
+        self.spy_on(cache.set)
+
+        self.assertEqual(get_access_snapshot(self.user).private_repository_ids,
+                         {repository.pk})
+        self.assertEqual(cache.set.last_call.args[2],
+                         settings.ACCESS_SNAPSHOT_CACHE_SECONDS)
+
+        # The versions are incremented again once the revocation is
+        # committed.
+        access._build_access_snapshot.unspy()
+        invalidate_access_snapshots([self.user.pk])
+
+        self.assertEqual(get_access_snapshot(self.user).private_repository_ids,
+                         set())
+
+    def test_invalidated_on_group_membership(self):
+        """Testing get_access_snapshot is invalidated when group users change
+        """
+        group = self.create_review_group(invite_only=True)
+        repository = self.create_repository(public=False)
+        repository.review_groups.add(group)
+
+        snapshot = get_access_snapshot(self.user)
+        self.assertEqual(snapshot.private_repository_ids, set())
+        self.assertEqual(snapshot.private_group_ids, set())
+
+        self.user.review_groups.add(group)
+
+        snapshot = get_access_snapshot(self.user)
+        self.assertEqual(snapshot.private_repository_ids, {repository.pk})
+        self.assertEqual(snapshot.private_group_ids, {group.pk})
+
+        group.users.clear()
+
+        snapshot = get_access_snapshot(self.user)
+        self.assertEqual(snapshot.private_repository_ids, set())
+        self.assertEqual(snapshot.private_group_ids, set())
+
+    def test_invalidated_on_visibility_change(self):
+        """Testing get_access_snapshot is invalidated when a repository or
+        group becomes private
+        """
+        group = self.create_review_group()
+        group.users.add(self.user)
+        repository = self.create_repository()
+        repository.users.add(self.user)
+
+        snapshot = get_access_snapshot(self.user)
+        self.assertEqual(snapshot.private_repository_ids, set())
+        self.assertEqual(snapshot.private_group_ids, set())
+
+        group.invite_only = True
+        group.save(update_fields=('invite_only',))
+        repository.public = False
+        repository.save(update_fields=('public',))
+
+        snapshot = get_access_snapshot(self.user)
+        self.assertEqual(snapshot.private_repository_ids, {repository.pk})
+        self.assertEqual(snapshot.private_group_ids, {group.pk})
+
+    def test_invalidated_on_permission_change(self):
+        """Testing get_access_snapshot is invalidated when user permissions
+        change
+        """
+        self.assertFalse(
+            get_access_snapshot(self.user).can_view_invite_only_groups)
+
+        self.user.user_permissions.add(
+            Permission.objects.get(codename='can_view_invite_only_groups'))
+
+        # Permissions are cached on the user object.
+        user = User.objects.get(pk=self.user.pk)
+        self.assertTrue(get_access_snapshot(user).can_view_invite_only_groups)
+
+    def test_is_accessible_by_queries(self):
+        """Testing Repository.is_accessible_by and Group.is_accessible_by
+        use the cached snapshot
+        """
+        group = self.create_review_group(invite_only=True)
+        group.users.add(self.user)
+        repository = self.create_repository(public=False)
+        repository.users.add(self.user)
+
+        get_access_snapshot(self.user)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(repository.is_accessible_by(self.user))
+            self.assertTrue(group.is_accessible_by(self.user))
+
+    def test_review_request_query(self):
+        """Testing ReviewRequest.objects.public with private repositories and
+        groups from the snapshot
+        """
+        user = User.objects.get(username='grumpy')
+        group = self.create_review_group(invite_only=True)
+        repository = self.create_repository(public=False)
+
+        review_request = self.create_review_request(repository=repository,
+                                                    publish=True)
+        review_request.target_groups.add(group)
+
+        self.assertNotIn(review_request,
+                         ReviewRequest.objects.public(user=user))
+
+        repository.users.add(user)
+        self.assertNotIn(review_request,
+                         ReviewRequest.objects.public(user=user))
+
+        group.users.add(user)
+        self.assertIn(review_request,
+                      ReviewRequest.objects.public(user=user))
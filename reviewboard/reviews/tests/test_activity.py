@@ -0,0 +1,85 @@
+"""Unit tests for reviewboard.reviews.activity."""
+
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+
+from reviewboard.reviews.activity import (get_activity_version,
+                                          increment_activity_version)
+from reviewboard.reviews.models import ReviewRequest
+from reviewboard.testing import TestCase
+
+
+class ActivityVersionTests(TestCase):
+    """Unit tests for review request activity versions."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(ActivityVersionTests, self).setUp()
+
+        self.review_request = self.create_review_request(publish=True)
+        self.version = get_activity_version(self.review_request.pk)
+
+    def test_get_activity_version_stable(self):
+        """Testing get_activity_version returns the same version without
+        activity
+        """
+        self.assertEqual(get_activity_version(self.review_request.pk),
+                         self.version)
+
+    def test_increment_activity_version(self):
+        """Testing increment_activity_version"""
+        increment_activity_version(self.review_request.pk)
+
+        self.assertGreater(get_activity_version(self.review_request.pk),
+                           self.version)
+
+    def test_increment_activity_version_after_eviction(self):
+        """Testing increment_activity_version after the version is evicted
+        from the cache
+        """
+        cache.clear()
+        increment_activity_version(self.review_request.pk)
+
+        self.assertGreater(get_activity_version(self.review_request.pk),
+                           self.version)
+
+    def test_review_request_closed(self):
+        """Testing activity version changes when a review request is closed
+        """
+        self.review_request.close(ReviewRequest.SUBMITTED)
+
+        self.assertGreater(get_activity_version(self.review_request.pk),
+                           self.version)
+
+    def test_review_published(self):
+        """Testing activity version changes when a review is published"""
+        review = self.create_review(self.review_request)
+        version = get_activity_version(self.review_request.pk)
+
+        review.publish()
+
+        self.assertGreater(get_activity_version(self.review_request.pk),
+                           version)
+
+    def test_issue_status_changed(self):
+        """Testing activity version changes when an issue status changes"""
+        review = self.create_review(self.review_request)
+        comment = self.create_general_comment(review, issue_opened=True)
+        review.publish()
+
+        version = get_activity_version(self.review_request.pk)
+
+        comment.issue_status = comment.RESOLVED
+        comment.save()
+
+        self.assertGreater(get_activity_version(self.review_request.pk),
+                           version)
+
+    def test_status_update_saved(self):
+        """Testing activity version changes when a status update is saved"""
+        self.create_status_update(self.review_request)
+
+        self.assertGreater(get_activity_version(self.review_request.pk),
+                           self.version)
@@ -2,10 +2,19 @@
 
 from __future__ import unicode_literals
 
+import gzip
+import io
+
+from django.test.utils import override_settings
+from kgb import SpyAgency
+
+from reviewboard.diffviewer.compression import diff_compressor_registry
+from reviewboard.diffviewer.parser import DiffParser
+from reviewboard.scmtools.git import GitTool
 from reviewboard.testing import TestCase
 
 
-class DownloadRawDiffViewTests(TestCase):
+class DownloadRawDiffViewTests(SpyAgency, TestCase):
     """Unit tests for reviewboard.reviews.views.DownloadRawDiffView."""
 
     fixtures = ['test_users', 'test_scmtools']
@@ -36,3 +45,77 @@ class DownloadRawDiffViewTests(TestCase):
         content_disposition = response['Content-Disposition']
         filename = content_disposition[len('attachment; filename='):]
         self.assertFalse(',' in filename)
+
+    def test_streams_diff(self):
+        """Testing DownloadRawDiffView streams the diff of every file"""
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request=review_request)
+        filediffs = [
+            self.create_filediff(diffset,
+                                 source_file='/test-file-%d' % i,
+                                 dest_file='/test-file-%d' % i)
+            for i in range(3)
+        ]
+
+        response = self.client.get('/r/%d/diff/raw/' % review_request.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            b''.join(response.streaming_content),
+            b''.join(filediff.diff for filediff in filediffs))
+
+    def test_parser_overrides_raw_diff(self):
+        """Testing DownloadRawDiffView with a parser overriding raw_diff()"""
+        class LegacyDiffParser(DiffParser):
+            def raw_diff(self, collection):
+                return b'legacy diff'
+
+        self.spy_on(GitTool.get_parser,
+                    call_fake=lambda self, data: LegacyDiffParser(data))
+
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request=review_request)
+        self.create_filediff(diffset)
+
+        response = self.client.get('/r/%d/diff/raw/' % review_request.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content),
+                         b'legacy diff')
+
+    @override_settings(SERVE_PRECOMPRESSED_RAW_DIFFS=True)
+    def test_precompressed(self):
+        """Testing DownloadRawDiffView with SERVE_PRECOMPRESSED_RAW_DIFFS
+        and a client accepting gzip
+        """
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request=review_request)
+
+        filediffs = []
+
+        for i, compressor_id in enumerate(('zlib', 'bzip2')):
+            filediff = self.create_filediff(
+                diffset,
+                source_file='/test-file-%d' % i,
+                dest_file='/test-file-%d' % i,
+                diff=b''.join(
+                    b'+line %d-%d\n' % (i, j)
+                    for j in range(100)
+                ))
+            filediff.diff_hash.recompress(
+                diff_compressor_registry.get_compressor(compressor_id))
+            filediffs.append(filediff)
+
+        response = self.client.get('/r/%d/diff/raw/' % review_request.pk,
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+        data = b''.join(response.streaming_content)
+
+        with gzip.GzipFile(fileobj=io.BytesIO(data)) as fp:
+            self.assertEqual(
+                fp.read(),
+                b''.join(filediff.diff for filediff in filediffs))
@@ -0,0 +1,77 @@
+"""Unit tests for reviewboard.reviews.fragments."""
+
+from __future__ import unicode_literals
+
+from kgb import SpyAgency
+
+from reviewboard.reviews import views
+from reviewboard.reviews.fragments import prerender_diff_comment_fragments
+from reviewboard.reviews.views import build_diff_comment_fragments
+from reviewboard.testing import TestCase
+
+
+class DiffCommentFragmentCacheTests(SpyAgency, TestCase):
+    """Unit tests for cached diff comment fragments."""
+
+    fixtures = ['test_users', 'test_scmtools']
+
+    def setUp(self):
+        super(DiffCommentFragmentCacheTests, self).setUp()
+
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(diffset)
+
+        self.review = self.create_review(review_request)
+        self.comment = self.create_diff_comment(self.review, filediff)
+        self.review.publish()
+
+    def test_build_cached(self):
+        """Testing build_diff_comment_fragments caches rendered fragments"""
+        self.spy_on(views._render_diff_comment_fragment)
+
+        had_error, entries1 = build_diff_comment_fragments(
+            [self.comment], {'user': self.review.user})
+        self.assertFalse(had_error)
+
+        had_error, entries2 = build_diff_comment_fragments(
+            [self.comment], {'user': self.review.user})
+        self.assertFalse(had_error)
+
+        self.assertEqual(len(views._render_diff_comment_fragment.spy.calls),
+                         1)
+        self.assertEqual(entries1[0]['html'], entries2[0]['html'])
+        self.assertEqual(entries1[0]['chunks'], entries2[0]['chunks'])
+
+    def test_build_cached_per_lines_of_context(self):
+        """Testing build_diff_comment_fragments caches fragments separately
+        for different lines of context
+        """
+        self.spy_on(views._render_diff_comment_fragment)
+
+        build_diff_comment_fragments([self.comment],
+                                     {'user': self.review.user})
+        build_diff_comment_fragments([self.comment],
+                                     {'user': self.review.user},
+                                     lines_of_context=[5, 5])
+
+        self.assertEqual(len(views._render_diff_comment_fragment.spy.calls),
+                         2)
+
+    def test_prerender(self):
+        """Testing prerender_diff_comment_fragments caches fragments for the
+        review request page and e-mails
+        """
+        prerender_diff_comment_fragments(self.review.pk)
+
+        self.spy_on(views._render_diff_comment_fragment)
+
+        build_diff_comment_fragments(
+            [self.comment], {'user': self.review.user},
+            show_controls=True)
+        build_diff_comment_fragments(
+            [self.comment], {'user': self.review.user},
+            'notifications/email_diff_comment_fragment.html')
+
+        self.assertFalse(views._render_diff_comment_fragment.called)
@@ -0,0 +1,121 @@
+"""Unit tests for reviewboard.reviews.issue_counts."""
+
+from __future__ import unicode_literals
+
+from reviewboard.reviews.issue_counts import verify_issue_counts
+from reviewboard.reviews.models import GeneralComment, ReviewRequest
+from reviewboard.testing import TestCase
+
+
+class VerifyIssueCountsTests(TestCase):
+    """Unit tests for reviewboard.reviews.issue_counts.verify_issue_counts."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(VerifyIssueCountsTests, self).setUp()
+
+        self.review_requests = []
+
+        for i in range(5):
+            review_request = self.create_review_request(publish=True)
+            review = self.create_review(review_request)
+
+            for j in range(i):
+                self.create_general_comment(review, issue_opened=True)
+
+            self.create_general_comment(review, issue_opened=False)
+            review.publish()
+
+            self.review_requests.append(review_request)
+
+        # Change some issue statuses, and add a reply that shouldn't be
+        # counted.
+        comment = GeneralComment.objects.filter(issue_opened=True).first()
+        comment.issue_status = GeneralComment.VERIFYING_DROPPED
+        comment.save()
+
+        review = comment.review.get()
+        reply = self.create_reply(review)
+        self.create_general_comment(reply, reply_to=comment,
+                                    issue_opened=True)
+        reply.publish()
+
+    def test_with_correct_counts(self):
+        """Testing verify_issue_counts with correct issue counts"""
+        num_checked, mismatches = verify_issue_counts(batch_size=2)
+
+        self.assertEqual(num_checked, 5)
+        self.assertEqual(mismatches, [])
+
+    def test_with_incorrect_counts(self):
+        """Testing verify_issue_counts with incorrect issue counts"""
+        review_request = self.review_requests[3]
+        ReviewRequest.objects.filter(pk=review_request.pk).update(
+            issue_open_count=5,
+            issue_dropped_count=1)
+
+        num_checked, mismatches = verify_issue_counts(batch_size=2)
+
+        self.assertEqual(num_checked, 5)
+        self.assertEqual(
+            mismatches,
+            [(
+                review_request.pk,
+                {
+                    'issue_open_count': 5,
+                    'issue_resolved_count': 0,
+                    'issue_dropped_count': 1,
+                    'issue_verifying_count': 0,
+                },
+                {
+                    'issue_open_count': 3,
+                    'issue_resolved_count': 0,
+                    'issue_dropped_count': 0,
+                    'issue_verifying_count': 0,
+                },
+            )])
+
+        # The counts should not have been fixed.
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+        self.assertEqual(review_request.issue_open_count, 5)
+
+    def test_with_fix(self):
+        """Testing verify_issue_counts with fix=True"""
+        review_request = self.review_requests[2]
+        ReviewRequest.objects.filter(pk=review_request.pk).update(
+            issue_open_count=None,
+            issue_resolved_count=None,
+            issue_dropped_count=None,
+            issue_verifying_count=None)
+
+        num_checked, mismatches = verify_issue_counts(fix=True)
+
+        self.assertEqual(num_checked, 5)
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(mismatches[0][0], review_request.pk)
+
+        # The counts should be set, and not need to be initialized when
+        # loading the review request.
+        with self.assertNumQueries(1):
+            review_request = ReviewRequest.objects.get(pk=review_request.pk)
+
+        self.assertEqual(review_request.issue_open_count, 2)
+        self.assertEqual(review_request.issue_resolved_count, 0)
+        self.assertEqual(review_request.issue_dropped_count, 0)
+        self.assertEqual(review_request.issue_verifying_count, 0)
+
+        self.assertEqual(verify_issue_counts(), (5, []))
+
+    def test_with_review_request_ids(self):
+        """Testing verify_issue_counts with specific review request IDs"""
+        ReviewRequest.objects.update(issue_open_count=10)
+
+        num_checked, mismatches = verify_issue_counts(
+            review_request_ids=[self.review_requests[0].pk,
+                                self.review_requests[4].pk])
+
+        self.assertEqual(num_checked, 2)
+        self.assertEqual(
+            [mismatch[0] for mismatch in mismatches],
+            [self.review_requests[0].pk, self.review_requests[4].pk])
@@ -2,14 +2,17 @@ from __future__ import unicode_literals
 
 from django.contrib.auth.models import User
 from django.utils.safestring import SafeText
+from kgb import SpyAgency
 
 from reviewboard.accounts.models import Profile
+from reviewboard.reviews import markdown_utils
 from reviewboard.reviews.markdown_utils import (markdown_render_conditional,
-                                                normalize_text_for_edit)
+                                                normalize_text_for_edit,
+                                                render_markdown)
 from reviewboard.testing import TestCase
 
 
-class MarkdownUtilsTests(TestCase):
+class MarkdownUtilsTests(SpyAgency, TestCase):
     """Unit tests for reviewboard.reviews.markdown_utils."""
 
     def test_normalize_text_for_edit_rich_text_default_rich_text(self):
@@ -98,3 +101,29 @@ class MarkdownUtilsTests(TestCase):
                                            rich_text=False)
         self.assertEqual(text, r'## &lt;script&gt;alert();&lt;/script&gt;')
         self.assertTrue(isinstance(text, SafeText))
+
+    def test_render_markdown_cached(self):
+        """Testing render_markdown caches rendered results"""
+        self.spy_on(markdown_utils._render_markdown_uncached)
+
+        html1 = render_markdown('**Hello** _world_')
+        html2 = render_markdown('**Hello** _world_')
+
+        self.assertEqual(html1, '<p><strong>Hello</strong> <em>world</em></p>')
+        self.assertEqual(html1, html2)
+        self.assertEqual(
+            len(markdown_utils._render_markdown_uncached.spy.calls), 1)
+
+    def test_render_markdown_cache_invalidated_by_fingerprint(self):
+        """Testing render_markdown re-renders when the renderer fingerprint
+        changes
+        """
+        self.spy_on(markdown_utils._render_markdown_uncached)
+        render_markdown('**Hello**')
+
+        self.spy_on(markdown_utils.get_markdown_renderer_fingerprint,
+                    call_fake=lambda: 'new-fingerprint')
+        render_markdown('**Hello**')
+
+        self.assertEqual(
+            len(markdown_utils._render_markdown_uncached.spy.calls), 2)
@@ -4,14 +4,17 @@ from datetime import datetime, timedelta
 import logging
 
 from django.contrib.auth.models import AnonymousUser, User
+from django.db.models.query import QuerySet
 from django.utils import timezone
 from djblets.testing.decorators import add_fixtures
 from djblets.util.dates import get_tz_aware_utcnow
 from kgb import SpyAgency, spy_on
 
 from reviewboard.reviews.errors import RevokeShipItError
-from reviewboard.reviews.models import Review, ReviewRequest
-from reviewboard.reviews.signals import (review_ship_it_revoked,
+from reviewboard.reviews.models import (Comment, GeneralComment, Review,
+                                        ReviewRequest)
+from reviewboard.reviews.signals import (comments_bulk_created,
+                                         review_ship_it_revoked,
                                          review_ship_it_revoking)
 from reviewboard.testing import TestCase
 
@@ -348,3 +351,132 @@ class ReviewTests(SpyAgency, TestCase):
         self.assertEqual(review_request.time_added, creation_timestamp)
         self.assertEqual(review_request.last_updated, review_timestamp)
         self.assertEqual(review.timestamp, review_timestamp)
+
+    def test_add_comments(self):
+        """Testing Review.add_comments"""
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(diffset)
+        review = self.create_review(review_request)
+
+        existing_comment = self.create_diff_comment(review, filediff)
+
+        comments = [
+            Comment(filediff=filediff, first_line=i, num_lines=1,
+                    text='Comment %d' % i)
+            for i in range(1, 11)
+        ]
+        comments.append(GeneralComment(text='General comment',
+                                       issue_opened=True,
+                                       issue_status=GeneralComment.OPEN))
+
+        def _on_comments_bulk_created(**kwargs):
+            self.assertEqual(kwargs['review'], review)
+            self.assertEqual(kwargs['comments'], comments)
+
+        self.spy_on(_on_comments_bulk_created)
+        comments_bulk_created.connect(_on_comments_bulk_created,
+                                      sender=Review)
+
+        try:
+            review.add_comments(comments)
+        finally:
+            comments_bulk_created.disconnect(_on_comments_bulk_created,
+                                             sender=Review)
+
+        self.assertEqual(len(_on_comments_bulk_created.spy.calls), 1)
+
+        diff_comments = list(review.comments.order_by('pk'))
+        self.assertEqual(diff_comments, [existing_comment] + comments[:10])
+        self.assertEqual(
+            [comment.text for comment in diff_comments[1:]],
+            ['Comment %d' % i for i in range(1, 11)])
+        self.assertEqual(list(review.general_comments.all()), comments[10:])
+
+        for comment in comments:
+            self.assertIsNotNone(comment.pk)
+            self.assertEqual(comment.timestamp, review.timestamp)
+
+    def test_add_comments_with_same_timestamp(self):
+        """Testing Review.add_comments with other new comments created at the
+        same time
+        """
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(diffset)
+        review = self.create_review(review_request)
+
+        now = timezone.now()
+        self.spy_on(timezone.now, call_fake=lambda: now)
+
+        # This comment hasn't been added to a review yet.
+        other_comment = Comment.objects.create(filediff=filediff,
+                                               first_line=1,
+                                               num_lines=1,
+                                               text='Other comment')
+
+        comments = [
+            Comment(filediff=filediff, first_line=i, num_lines=1,
+                    text='Comment %d' % i)
+            for i in range(1, 4)
+        ]
+        review.add_comments(comments)
+
+        self.assertEqual(list(review.comments.order_by('pk')), comments)
+        self.assertNotIn(other_comment.pk,
+                         [comment.pk for comment in comments])
+        self.assertEqual(
+            [comment.text for comment in review.comments.order_by('pk')],
+            ['Comment 1', 'Comment 2', 'Comment 3'])
+
+    def test_add_comments_bulk_insert(self):
+        """Testing Review.add_comments inserts each comment type in bulk"""
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(diffset)
+        review = self.create_review(review_request)
+
+        self.spy_on(QuerySet.bulk_create)
+
+        comments = [
+            Comment(filediff=filediff, first_line=i, num_lines=1,
+                    text='Comment %d' % i)
+            for i in range(1, 21)
+        ]
+        comments.append(GeneralComment(text='General comment'))
+        review.add_comments(comments)
+
+        self.assertEqual(len(QuerySet.bulk_create.spy.calls), 2)
+        self.assertEqual(
+            [(comment.pk, comment.text)
+             for comment in review.comments.order_by('pk')],
+            [(comment.pk, comment.text) for comment in comments[:20]])
+        self.assertEqual(list(review.general_comments.all()), comments[20:])
+
+    def test_add_comments_and_publish(self):
+        """Testing Review.add_comments and Review.publish with a known open
+        issue count
+        """
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        filediff = self.create_filediff(diffset)
+        review = self.create_review(review_request)
+
+        review.add_comments([
+            Comment(filediff=filediff, first_line=i, num_lines=1,
+                    text='Comment %d' % i, issue_opened=True,
+                    issue_status=Comment.OPEN)
+            for i in range(1, 4)
+        ])
+        review.publish(open_issue_count=3)
+
+        review_request = ReviewRequest.objects.get(pk=review_request.pk)
+        self.assertEqual(review_request.issue_open_count, 3)
+        self.assertTrue(review.public)
+        self.assertEqual(
+            set(review.comments.values_list('timestamp', flat=True)),
+            {review.timestamp})
@@ -834,6 +834,100 @@ class IssueCounterTests(TestCase):
         self.assertEqual(self.review_request.issue_resolved_count, 0)
         self.assertEqual(self.review_request.issue_dropped_count, 0)
 
+    def test_save_with_stale_issue_status(self):
+        """Testing ReviewRequest issue counters when saving a comment loaded
+        before its issue status was changed elsewhere
+        """
+        review = self.create_review(self.review_request)
+        comment = self.create_general_comment(review, issue_opened=True)
+        review.publish()
+
+        self._reload_object(clear_counters=True)
+        self.assertEqual(self.review_request.issue_open_count, 1)
+
+        stale_comment = type(comment).objects.get(pk=comment.pk)
+
+        comment.issue_status = Comment.RESOLVED
+        comment.save()
+
+        stale_comment.issue_status = Comment.DROPPED
+        stale_comment.save()
+
+        self._reload_object()
+        self.assertEqual(self.review_request.issue_open_count, 0)
+        self.assertEqual(self.review_request.issue_resolved_count, 0)
+        self.assertEqual(self.review_request.issue_dropped_count, 1)
+        self.assertEqual(self.review_request.issue_verifying_count, 0)
+
+    def test_save_twice(self):
+        """Testing ReviewRequest issue counters when changing the issue
+        status of the same comment instance twice
+        """
+        review = self.create_review(self.review_request)
+        comment = self.create_general_comment(review, issue_opened=True)
+        review.publish()
+
+        self._reload_object(clear_counters=True)
+
+        comment.issue_status = Comment.VERIFYING_RESOLVED
+        comment.save()
+
+        comment.issue_status = Comment.RESOLVED
+        comment.save()
+
+        self._reload_object()
+        self.assertEqual(self.review_request.issue_open_count, 0)
+        self.assertEqual(self.review_request.issue_resolved_count, 1)
+        self.assertEqual(self.review_request.issue_dropped_count, 0)
+        self.assertEqual(self.review_request.issue_verifying_count, 0)
+
+    def test_delete_comment(self):
+        """Testing ReviewRequest issue counters when deleting a published
+        comment
+        """
+        review = self.create_review(self.review_request)
+        self.create_general_comment(review, issue_opened=True)
+        comment = self.create_general_comment(review, issue_opened=True)
+        review.publish()
+
+        self._reload_object(clear_counters=True)
+
+        comment.issue_status = Comment.RESOLVED
+        comment.save()
+        comment.delete()
+
+        self._reload_object()
+        self.assertEqual(self.review_request.issue_open_count, 1)
+        self.assertEqual(self.review_request.issue_resolved_count, 0)
+        self.assertEqual(self.review_request.issue_dropped_count, 0)
+        self.assertEqual(self.review_request.issue_verifying_count, 0)
+
+    def test_delete_review(self):
+        """Testing ReviewRequest issue counters when deleting a published
+        review
+        """
+        review = self.create_review(self.review_request)
+        self.create_general_comment(review, issue_opened=True)
+        review.publish()
+
+        review = self.create_review(self.review_request)
+        self.create_general_comment(review, issue_opened=True)
+        comment = self.create_general_comment(review, issue_opened=True)
+        review.publish()
+
+        self._reload_object(clear_counters=True)
+        self.assertEqual(self.review_request.issue_open_count, 3)
+
+        comment.issue_status = Comment.DROPPED
+        comment.save()
+        review.delete()
+
+        self._reload_object()
+        self.assertEqual(self.review_request.issue_open_count, 1)
+        self.assertEqual(self.review_request.issue_resolved_count, 0)
+        self.assertEqual(self.review_request.issue_dropped_count, 0)
+        self.assertEqual(self.review_request.issue_verifying_count, 0)
+
     def _test_issue_counts(self, create_comment_func):
         review = self.create_review(self.review_request)
 
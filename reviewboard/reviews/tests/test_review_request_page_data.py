@@ -2,9 +2,16 @@
 
 from __future__ import unicode_literals
 
+import os
+import sys
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from unittest import skipUnless
 
+from django.db import connection
 from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 from reviewboard.reviews.detail import (ChangeEntry,
@@ -12,7 +19,8 @@ from reviewboard.reviews.detail import (ChangeEntry,
                                         ReviewEntry,
                                         ReviewRequestEntry,
                                         ReviewRequestPageData)
-from reviewboard.reviews.models import BaseComment, ReviewRequestDraft
+from reviewboard.reviews.models import (BaseComment, Comment,
+                                        ReviewRequestDraft)
 from reviewboard.testing import TestCase
 
 
@@ -418,3 +426,220 @@ class ReviewRequestPageDataTests(TestCase):
         # Create some status updates.
         self.status_update1 = self.create_status_update(self.review_request)
         self.status_update2 = self.create_status_update(self.review_request)
+
+
+class QueryBudgetTestsMixin(object):
+    """Mixin for unit tests that enforce query budgets.
+
+    A query budget is the maximum number of queries that an operation may
+    perform. Unlike :py:meth:`~django.test.TestCase.assertNumQueries`, this
+    can also be used to check that the number of queries doesn't grow along
+    with the amount of data being loaded.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        """Assert that the wrapped code stays within a query budget.
+
+        Args:
+            budget (int):
+                The maximum number of queries that may be performed.
+
+        Context:
+            django.test.utils.CaptureQueriesContext:
+            The context capturing the queries.
+
+        Raises:
+            AssertionError:
+                The budget was exceeded. The error will list the queries that
+                were performed.
+        """
+        with CaptureQueriesContext(connection) as context:
+            yield context
+
+        num_queries = len(context)
+
+        if num_queries > budget:
+            self.fail(
+                '%d queries were performed, exceeding the budget of %d:\n%s'
+                % (num_queries, budget,
+                   '\n'.join(
+                       '%d. %s' % (i, query['sql'])
+                       for i, query in enumerate(context.captured_queries,
+                                                 start=1)
+                   )))
+
+    def count_queries(self, func, *args, **kwargs):
+        """Return the number of queries performed by a function.
+
+        Args:
+            func (callable):
+                The function to call.
+
+            *args (tuple):
+                Positional arguments to pass to the function.
+
+            **kwargs (dict):
+                Keyword arguments to pass to the function.
+
+        Returns:
+            int:
+            The number of queries performed.
+        """
+        with CaptureQueriesContext(connection) as context:
+            func(*args, **kwargs)
+
+        return len(context)
+
+
+class ReviewRequestPageDataQueryBudgetTests(QueryBudgetTestsMixin, TestCase):
+    """Query budget tests for ReviewRequestPageData."""
+
+    fixtures = ['test_scmtools', 'test_users']
+
+    def test_queries_independent_of_reviews(self):
+        """Testing ReviewRequestPageData query count doesn't depend on the
+        number of reviews and comments
+        """
+        small_data = self._build_data(num_reviews=1, comments_per_review=4)
+        large_data = self._build_data(num_reviews=10, comments_per_review=20)
+
+        self.assertEqual(self.count_queries(self._load_page, small_data),
+                         self.count_queries(self._load_page, large_data))
+
+    def test_query_data_post_etag_attaches_filediffs(self):
+        """Testing ReviewRequestPageData.query_data_post_etag attaches
+        pre-fetched FileDiffs to diff comments
+        """
+        data = self._build_data(num_reviews=2, comments_per_review=4)
+        data.query_data_pre_etag()
+        data.query_data_post_etag()
+
+        diff_comments = [
+            comment
+            for comment in data.all_comments
+            if isinstance(comment, Comment)
+        ]
+        self.assertEqual(len(diff_comments), 2)
+
+        with self.assertNumQueries(0):
+            for comment in diff_comments:
+                self.assertIn(comment.filediff.pk, data.filediffs_by_id)
+                self.assertEqual(comment.filediff.diffset.revision, 1)
+                self.assertEqual(comment.interfilediff.diffset.revision, 2)
+
+    @skipUnless(os.environ.get('RB_RUN_BENCHMARKS'),
+                'Set RB_RUN_BENCHMARKS=1 to run benchmarks')
+    def test_benchmark(self):
+        """Benchmarking ReviewRequestPageData with 500 reviews and 5,000
+        comments
+        """
+        budget = self.count_queries(
+            self._load_page,
+            self._build_data(num_reviews=1, comments_per_review=4))
+        data = self._build_data(num_reviews=500, comments_per_review=10)
+
+        self.assertEqual(len(data.review_request.reviews.all()), 500)
+
+        start = time.time()
+
+        with self.assertQueryBudget(budget):
+            self._load_page(data)
+
+        sys.stderr.write('\nLoaded review request page data for 500 reviews '
+                         'and %d comments in %.3f seconds\n'
+                         % (len(data.all_comments), time.time() - start))
+
+    def _build_data(self, num_reviews, comments_per_review):
+        """Populate a review request and return page data for it.
+
+        Each review will receive an equal share of general, screenshot, file
+        attachment, and diff comments. Diff comments are made on an interdiff
+        between the review request's two diffsets.
+
+        Args:
+            num_reviews (int):
+                The number of reviews to create.
+
+            comments_per_review (int):
+                The number of comments to create on each review.
+
+        Returns:
+            reviewboard.reviews.detail.ReviewRequestPageData:
+            The page data for the new review request.
+        """
+        now = timezone.now()
+
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+
+        diffset1 = self.create_diffset(review_request)
+        filediff1 = self.create_filediff(diffset1)
+
+        diffset2 = self.create_diffset(review_request, revision=2)
+        filediff2 = self.create_filediff(diffset2)
+
+        file_attachment = self.create_file_attachment(review_request)
+        screenshot = self.create_screenshot(review_request)
+
+        for i in range(2):
+            review_request.changedescs.create(
+                timestamp=now + timedelta(seconds=i),
+                public=True,
+                fields_changed={
+                    'summary': {
+                        'old': ['Summary %d' % i],
+                        'new': ['Summary %d' % (i + 1)],
+                    },
+                })
+
+        for i in range(num_reviews):
+            review = self.create_review(review_request,
+                                        timestamp=now + timedelta(seconds=i),
+                                        publish=True)
+
+            for j in range(comments_per_review):
+                comment_type = j % 4
+
+                if comment_type == 0:
+                    self.create_general_comment(review, issue_opened=True)
+                elif comment_type == 1:
+                    self.create_screenshot_comment(review, screenshot)
+                elif comment_type == 2:
+                    self.create_file_attachment_comment(review,
+                                                        file_attachment)
+                else:
+                    self.create_diff_comment(review, filediff1,
+                                             interfilediff=filediff2)
+
+        # Loading the file attachments for the first time will create
+        # histories for them, which we don't want to count.
+        review_request.get_file_attachments()
+
+        request = RequestFactory().get('/r/%s/' % review_request.display_id)
+        request.user = review_request.submitter
+
+        return ReviewRequestPageData(review_request=review_request,
+                                     request=request)
+
+    def _load_page(self, data):
+        """Load all the data needed for the review request page.
+
+        Args:
+            data (reviewboard.reviews.detail.ReviewRequestPageData):
+                The page data to load.
+        """
+        data.query_data_pre_etag()
+        data.query_data_post_etag()
+
+        entries = data.get_entries()
+
+        for entry in entries['initial'] + entries['main']:
+            entry.get_js_model_data()
+
+        for comment in data.all_comments:
+            comment.get_review_request()
+
+            if isinstance(comment, Comment):
+                comment.filediff.diffset
+                comment.interfilediff.diffset
@@ -324,6 +324,33 @@ class ReviewRequestUpdatesViewTests(TestCase):
         self.assertTrue(html.startswith('<div id="issue-summary"'))
         self.assertTrue(html.endswith('\n</div>'))
 
+    def test_get_not_modified(self):
+        """Testing ReviewRequestUpdatesView GET with matching ETag"""
+        response = self.client.get(self._build_url())
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+
+        response = self.client.get(self._build_url(),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_get_modified_after_review_published(self):
+        """Testing ReviewRequestUpdatesView GET with previous ETag after a
+        review is published
+        """
+        response = self.client.get(self._build_url())
+        self.assertEqual(response.status_code, 200)
+
+        etag = response['ETag']
+
+        self.review3.publish()
+
+        response = self.client.get(self._build_url(),
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_post(self):
         """Testing ReviewRequestUpdatesView POST not allowed"""
         # 1 SQL query for SiteConfiguration in the middleware.
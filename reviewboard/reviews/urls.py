@@ -86,6 +86,10 @@ review_request_urls = [
         views.ReviewRequestUpdatesView.as_view(),
         name='review-request-updates'),
 
+    url(r'^_events/$',
+        views.ReviewRequestEventsView.as_view(),
+        name='review-request-events'),
+
     # Review request diffs
     url(r'^diff/', include(diffviewer_urls)),
 
@@ -28,6 +28,7 @@ from django.utils.timezone import is_aware, localtime, make_aware, utc
 from django.utils.translation import ugettext_lazy as _, ugettext
 from django.views.generic.base import (ContextMixin, RedirectView,
                                        TemplateView, View)
+from djblets.cache.backend import cache_memoize
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.util.dates import get_latest_timestamp
 from djblets.util.http import set_last_modified
@@ -39,18 +40,21 @@ from reviewboard.accounts.mixins import (CheckLoginRequiredViewMixin,
                                          LoginRequiredViewMixin,
                                          UserProfileRequiredViewMixin)
 from reviewboard.accounts.models import ReviewRequestVisit, Profile
+from reviewboard.accounts.visits import get_buffered_visits, record_visit
 from reviewboard.admin.decorators import check_read_only
 from reviewboard.admin.mixins import CheckReadOnlyViewMixin
 from reviewboard.admin.read_only import is_site_read_only_for
 from reviewboard.attachments.models import (FileAttachment,
                                             get_latest_file_attachments)
 from reviewboard.diffviewer.diffutils import (convert_to_unicode,
+                                              get_enable_highlighting,
                                               get_file_chunks_in_range,
                                               get_last_header_before_line,
                                               get_last_line_number_in_diff,
                                               get_original_file,
                                               get_patched_file)
 from reviewboard.diffviewer.models import DiffSet
+from reviewboard.diffviewer.raw_diff import build_raw_diff_response
 from reviewboard.diffviewer.views import (DiffFragmentView,
                                           DiffViewerView,
                                           DownloadPatchErrorBundleView,
@@ -61,13 +65,18 @@ from reviewboard.notifications.email.message import (
     prepare_review_published_mail,
     prepare_review_request_mail)
 from reviewboard.notifications.email.views import BasePreviewEmailView
+from reviewboard.notifications.push import (build_event_stream_response,
+                                            get_review_request_channel,
+                                            is_push_enabled)
 from reviewboard.reviews.ui.screenshot import LegacyScreenshotReviewUI
+from reviewboard.reviews.activity import get_activity_version
 from reviewboard.reviews.context import (comment_counts,
                                          diffsets_with_comments,
                                          has_comments_in_diffsets_excluding,
                                          interdiffs_with_comments,
                                          make_review_request_context)
 from reviewboard.reviews.detail import ReviewRequestPageData, entry_registry
+from reviewboard.reviews.fragments import make_diff_comment_fragment_cache_key
 from reviewboard.reviews.markdown_utils import (is_rich_text_default_for_user,
                                                 render_markdown)
 from reviewboard.reviews.models import (Comment,
@@ -362,6 +371,73 @@ class ReviewRequestViewMixin(CheckRequestMethodViewMixin,
 # Helper functions
 #
 
+def _render_diff_comment_fragment(comment, context, comment_template_name,
+                                  lines_of_context, show_controls, siteconfig):
+    """Render the diff fragment for a comment.
+
+    Args:
+        comment (reviewboard.reviews.models.diff_comment.Comment):
+            The comment to render the fragment for.
+
+        context (dict):
+            The context used for looking up and caching the diff's files.
+
+        comment_template_name (unicode):
+            The name of the template used to render the fragment.
+
+        lines_of_context (list of int):
+            The number of lines of context to show before and after the
+            commented lines.
+
+        show_controls (bool):
+            Whether to show controls for expanding the fragment.
+
+        siteconfig (djblets.siteconfig.models.SiteConfiguration):
+            The site configuration.
+
+    Returns:
+        dict:
+        A dictionary containing the rendered ``html`` and the ``chunks``
+        shown in the fragment.
+    """
+    max_line = get_last_line_number_in_diff(context, comment.filediff,
+                                            comment.interfilediff)
+
+    first_line = max(1, comment.first_line - lines_of_context[0])
+    last_line = min(comment.last_line + lines_of_context[1], max_line)
+    num_lines = last_line - first_line + 1
+
+    chunks = list(get_file_chunks_in_range(context,
+                                           comment.filediff,
+                                           comment.interfilediff,
+                                           first_line,
+                                           num_lines))
+
+    comment_context = Context({
+        'comment': comment,
+        'header': get_last_header_before_line(context,
+                                              comment.filediff,
+                                              comment.interfilediff,
+                                              first_line),
+        'chunks': chunks,
+        'domain': Site.objects.get_current().domain,
+        'domain_method': siteconfig.get('site_domain_method'),
+        'lines_of_context': lines_of_context,
+        'expandable_above': show_controls and first_line != 1,
+        'expandable_below': show_controls and last_line != max_line,
+        'collapsible': lines_of_context != [0, 0],
+        'lines_above': first_line - 1,
+        'lines_below': max_line - last_line,
+        'first_line': first_line,
+    })
+    comment_context.update(context)
+
+    return {
+        'html': render_to_string(comment_template_name, comment_context),
+        'chunks': chunks,
+    }
+
+
 def build_diff_comment_fragments(
     comments, context,
     comment_template_name='reviews/diff_comment_fragment.html',
@@ -376,40 +452,28 @@ def build_diff_comment_fragments(
     if lines_of_context is None:
         lines_of_context = [0, 0]
 
+    # Rendered fragments are cached, so that the review request page and
+    # e-mails don't have to load the diff for each comment again. See
+    # reviewboard.reviews.fragments.
+    enable_highlighting = get_enable_highlighting(context['user'])
+
     for comment in comments:
         try:
-            max_line = get_last_line_number_in_diff(context, comment.filediff,
-                                                    comment.interfilediff)
-
-            first_line = max(1, comment.first_line - lines_of_context[0])
-            last_line = min(comment.last_line + lines_of_context[1], max_line)
-            num_lines = last_line - first_line + 1
-
-            chunks = list(get_file_chunks_in_range(context,
-                                                   comment.filediff,
-                                                   comment.interfilediff,
-                                                   first_line,
-                                                   num_lines))
-
-            comment_context = Context({
-                'comment': comment,
-                'header': get_last_header_before_line(context,
-                                                      comment.filediff,
-                                                      comment.interfilediff,
-                                                      first_line),
-                'chunks': chunks,
-                'domain': Site.objects.get_current().domain,
-                'domain_method': siteconfig.get('site_domain_method'),
-                'lines_of_context': lines_of_context,
-                'expandable_above': show_controls and first_line != 1,
-                'expandable_below': show_controls and last_line != max_line,
-                'collapsible': lines_of_context != [0, 0],
-                'lines_above': first_line - 1,
-                'lines_below': max_line - last_line,
-                'first_line': first_line,
-            })
-            comment_context.update(context)
-            content = render_to_string(comment_template_name, comment_context)
+            fragment = cache_memoize(
+                make_diff_comment_fragment_cache_key(comment,
+                                                     comment_template_name,
+                                                     lines_of_context,
+                                                     show_controls,
+                                                     enable_highlighting),
+                lambda: _render_diff_comment_fragment(comment,
+                                                      context,
+                                                      comment_template_name,
+                                                      lines_of_context,
+                                                      show_controls,
+                                                      siteconfig),
+                large_data=True)
+            content = fragment['html']
+            chunks = fragment['chunks']
         except Exception as e:
             content = exception_traceback_string(
                 None, e, error_template_name, {
@@ -683,6 +747,13 @@ class ReviewRequestDetailView(ReviewRequestViewMixin,
                     ReviewRequestVisit.objects.get_or_create(
                         user=user, review_request=review_request)
                 last_visited = visited.timestamp.replace(tzinfo=utc)
+
+                # A more recent visit may not have been written yet.
+                buffered_timestamp = \
+                    get_buffered_visits(user).get(review_request.pk)
+
+                if buffered_timestamp and buffered_timestamp > last_visited:
+                    last_visited = buffered_timestamp
             except ReviewRequestVisit.DoesNotExist:
                 # Somehow, this visit was seen as created but then not
                 # accessible. We need to log this and then continue on.
@@ -698,7 +769,7 @@ class ReviewRequestDetailView(ReviewRequestViewMixin,
                 review_request.public and
                 review_request.status == review_request.PENDING_REVIEW):
                 visited.timestamp = timezone.now()
-                visited.save()
+                record_visit(user, review_request, visited.timestamp)
 
         return visited, last_visited
 
@@ -888,9 +959,10 @@ class ReviewRequestUpdatesView(ReviewRequestViewMixin, ETagViewMixin,
     def get_etag_data(self, request, *args, **kwargs):
         """Return an ETag for the view.
 
-        This will look up state needed for the request and generate a
-        suitable ETag. Some of the information will be stored for later
-        computation of the payload.
+        The ETag is based on the review request's activity version (see
+        :py:mod:`reviewboard.reviews.activity`), which changes whenever
+        anything shown on the page changes. This allows conditional polls to
+        be answered without querying for any of the page's data.
 
         Args:
             request (django.http.HttpRequest):
@@ -906,26 +978,10 @@ class ReviewRequestUpdatesView(ReviewRequestViewMixin, ETagViewMixin,
             unicode:
             The ETag for the page.
         """
-        review_request = self.review_request
-        data = self.data
-
-        # Build page data only for the entry we care about.
-        data.query_data_pre_etag()
-
-        last_activity_time, updated_object = \
-            review_request.get_last_activity(data.diffsets, data.reviews)
-
-        entry_etags = ':'.join(
-            entry_cls.build_etag_data(data)
-            for entry_cls in entry_registry
-        )
-
         return ':'.join(six.text_type(value) for value in (
             request.user,
-            last_activity_time,
-            data.latest_review_timestamp,
-            review_request.last_review_activity_timestamp,
-            entry_etags,
+            self.review_request.pk,
+            get_activity_version(self.review_request.pk),
             is_rich_text_default_for_user(request.user),
             settings.AJAX_SERIAL,
         ))
@@ -950,8 +1006,9 @@ class ReviewRequestUpdatesView(ReviewRequestViewMixin, ETagViewMixin,
         data = self.data
         since = self.since
 
-        # Finish any querying needed by entries on this page.
-        self.data.query_data_post_etag()
+        # Query all the data needed by entries on this page.
+        data.query_data_pre_etag()
+        data.query_data_post_etag()
 
         # Gather all the entries into a single list.
         entries = chain.from_iterable(
@@ -1356,6 +1413,49 @@ class ReviewsDiffViewerView(ReviewRequestViewMixin,
         return context
 
 
+class ReviewRequestEventsView(ReviewRequestViewMixin, View):
+    """Internal view for streaming update notifications for a review request.
+
+    This streams Server-Sent Events announcing new activity on the review
+    request (such as new reviews, replies or updates). Clients can use these
+    to know when to fetch from :py:class:`ReviewRequestUpdatesView`, rather
+    than polling on a timer.
+
+    This is only available when push notifications are enabled.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """Handle HTTP GET requests for this view.
+
+        Args:
+            request (django.http.HttpRequest):
+                The HTTP request from the client.
+
+            *args (tuple, unused):
+                Positional arguments passed to the handler.
+
+            **kwargs (dict, unused):
+                Keyword arguments passed to the handler.
+
+        Returns:
+            django.http.StreamingHttpResponse:
+            The HTTP response streaming the events.
+
+        Raises:
+            django.http.Http404:
+                Push notifications are disabled.
+        """
+        if not is_push_enabled():
+            raise Http404
+
+        review_request = self.review_request
+
+        return build_event_stream_response(
+            request,
+            [get_review_request_channel(review_request.pk,
+                                        review_request.local_site_id)])
+
+
 class DownloadRawDiffView(ReviewRequestViewMixin, View):
     """View for downloading a raw diff from a review request.
 
@@ -1366,7 +1466,7 @@ class DownloadRawDiffView(ReviewRequestViewMixin, View):
     def get(self, request, revision=None, *args, **kwargs):
         """Handle HTTP GET requests for this view.
 
-        This will generate the raw diff file and send it to the client.
+        This will stream the raw diff file to the client.
 
         Args:
             request (django.http.HttpRequest):
@@ -1383,7 +1483,7 @@ class DownloadRawDiffView(ReviewRequestViewMixin, View):
                 Keyword arguments passed to the handler.
 
         Returns:
-            django.http.HttpResponse:
+            django.http.StreamingHttpResponse:
             The HTTP response to send to the client.
         """
         review_request = self.review_request
@@ -1392,9 +1492,7 @@ class DownloadRawDiffView(ReviewRequestViewMixin, View):
         diffset = self.get_diff(revision, draft)
 
         tool = review_request.repository.get_scmtool()
-        data = tool.get_parser('').raw_diff(diffset)
-
-        resp = HttpResponse(data, content_type='text/x-patch')
+        resp = build_raw_diff_response(request, tool.get_parser(''), diffset)
 
         if diffset.name == 'diff':
             filename = 'rb%d.patch' % review_request.display_id
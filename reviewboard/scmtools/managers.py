@@ -3,6 +3,8 @@ from __future__ import unicode_literals
 from django.db.models import Manager, Q
 from django.db.models.query import QuerySet
 
+from reviewboard.reviews.access import get_access_snapshot
+
 
 _TOOL_CACHE = {}
 
@@ -67,11 +69,22 @@ class RepositoryManager(Manager):
             if visible_only:
                 q = q & Q(visible=True)
 
-            if user.is_authenticated():
-                q = q | (Q(users__pk=user.pk) |
-                         Q(review_groups__users=user.pk))
+                if user.is_authenticated():
+                    q = q | (Q(users__pk=user.pk) |
+                             Q(review_groups__users=user.pk))
+
+                qs = self.filter(q).distinct()
+            else:
+                # Members of hidden public repositories are already covered
+                # by public=True, so the cached set of private repository IDs
+                # is enough here, and avoids joining on the memberships.
+                private_ids = get_access_snapshot(
+                    user, local_site).private_repository_ids
+
+                if private_ids:
+                    q = q | Q(pk__in=private_ids)
 
-            qs = self.filter(q).distinct()
+                qs = self.filter(q)
 
         return qs.filter(local_site=local_site)
 
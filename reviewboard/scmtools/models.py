@@ -24,6 +24,7 @@ from djblets.log import log_timed
 from reviewboard.deprecation import RemovedInReviewBoard40Warning
 from reviewboard.hostingsvcs.models import HostingServiceAccount
 from reviewboard.hostingsvcs.service import get_hosting_service
+from reviewboard.reviews.access import get_access_snapshot
 from reviewboard.scmtools.crypto_utils import (decrypt_password,
                                                encrypt_password)
 from reviewboard.scmtools.managers import RepositoryManager, ToolManager
@@ -509,11 +510,11 @@ class Repository(models.Model):
         if self.local_site and not self.local_site.is_accessible_by(user):
             return False
 
-        return (self.public or
-                user.is_superuser or
-                (user.is_authenticated() and
-                 (self.review_groups.filter(users__pk=user.pk).count() > 0 or
-                  self.users.filter(pk=user.pk).count() > 0)))
+        if self.public or user.is_superuser:
+            return True
+
+        return (get_access_snapshot(user, self.local_site)
+                .can_access_repository(self))
 
     def is_mutable_by(self, user):
         """Returns whether or not the user can modify or delete the repository.
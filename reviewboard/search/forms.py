@@ -12,8 +12,8 @@ from haystack.forms import ModelSearchForm
 from haystack.inputs import Raw
 from haystack.query import SQ
 
-from reviewboard.reviews.models import Group, ReviewRequest
-from reviewboard.scmtools.models import Repository
+from reviewboard.reviews.access import get_access_snapshot
+from reviewboard.reviews.models import ReviewRequest
 from reviewboard.search.indexes import BaseSearchIndex
 
 
@@ -153,29 +153,16 @@ class RBSearchForm(ModelSearchForm):
                 # Note that we are not performing Local Site checks here,
                 # because we're already filtering by Local Sites.
 
-                # Make sure they have access to the repository, if any.
-                accessible_repo_ids = list(Repository.objects.accessible_ids(
-                    user,
-                    visible_only=False,
-                    local_site=self.local_site,
-                ))
-
-                accessible_group_ids = Group.objects.accessible_ids(
-                    user,
-                    visible_only=False,
-                )
+                snapshot = get_access_snapshot(user, self.local_site)
 
+                # Make sure they have access to the repository, if any. Only
+                # private repository IDs are indexed, with 0 used for public
+                # repositories or no repository.
                 repository_sq = SQ(
-                    private_repository_id__in=[0] + accessible_repo_ids
+                    private_repository_id__in=(
+                        [0] + sorted(snapshot.private_repository_ids))
                 )
 
-                # Next, build a query to see if the review request targets any
-                # invite-only groups the user is a member of.
-                target_groups_sq = SQ(private_target_groups__contains=0)
-
-                for pk in accessible_group_ids:
-                    target_groups_sq |= SQ(private_target_groups__contains=pk)
-
                 # Build a query to see if the user is explicitly listed
                 # in the list of reviewers.
                 target_users_sq = SQ(target_users__contains=user.pk)
@@ -184,9 +171,21 @@ class RBSearchForm(ModelSearchForm):
                 #
                 # With that, we'll put the whole query together, in the order
                 # matching ReviewRequest.is_accessible_by.
-                private_sq &= ~(SQ(username=user.username) |
-                                (repository_sq &
-                                 (target_users_sq | target_groups_sq)))
+                if snapshot.can_view_invite_only_groups:
+                    private_sq &= ~(SQ(username=user.username) |
+                                    repository_sq)
+                else:
+                    # Next, build a query to see if the review request targets
+                    # any invite-only groups the user is a member of.
+                    target_groups_sq = SQ(private_target_groups__contains=0)
+
+                    for pk in sorted(snapshot.private_group_ids):
+                        target_groups_sq |= \
+                            SQ(private_target_groups__contains=pk)
+
+                    private_sq &= ~(SQ(username=user.username) |
+                                    (repository_sq &
+                                     (target_users_sq | target_groups_sq)))
 
             sqs = sqs.exclude(private_sq)
 
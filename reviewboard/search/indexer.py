@@ -0,0 +1,464 @@
+"""Parallel, resumable indexing of the search index.
+
+Indexing every object in a large database through a single process can take
+many hours. :py:class:`SearchIndexer` splits each indexed model into
+partitions by primary key range, and indexes those partitions across several
+worker processes. Each partition is read in small batches (using the primary
+key to page through results), so memory use stays bounded regardless of the
+size of the database.
+
+Progress is recorded in a checkpoint file as each partition completes. If
+indexing is interrupted, it can be resumed from that file, skipping any
+partitions that were already indexed.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from django.db import close_old_connections, connections as db_connections
+from django.db.models import Max, Min
+from django.utils import six
+from haystack import connections
+
+from reviewboard.search import search_backend_registry
+
+
+#: The default number of primary keys covered by each partition.
+DEFAULT_PARTITION_SIZE = 10000
+
+#: The default number of objects loaded and sent to the backend at a time.
+DEFAULT_BATCH_SIZE = 250
+
+
+class IndexCheckpoint(object):
+    """Records which partitions have been indexed.
+
+    The checkpoint is stored as a JSON file, which is rewritten atomically
+    each time a partition completes.
+
+    Attributes:
+        path (unicode):
+            The path to the checkpoint file.
+
+        partition_size (int):
+            The partition size used for the indexing run. Resumed runs must
+            use the same partition size so that the recorded partitions line
+            up.
+
+        rebuild (bool):
+            Whether the indexing run is a full rebuild.
+    """
+
+    #: The version of the checkpoint file format.
+    VERSION = 1
+
+    def __init__(self, path, partition_size, rebuild):
+        """Initialize the checkpoint.
+
+        Args:
+            path (unicode):
+                The path to the checkpoint file.
+
+            partition_size (int):
+                The partition size used for the indexing run.
+
+            rebuild (bool):
+                Whether the indexing run is a full rebuild.
+        """
+        self.path = path
+        self.partition_size = partition_size
+        self.rebuild = rebuild
+        self._completed = {}
+
+    @classmethod
+    def load(cls, path):
+        """Load a checkpoint from a file.
+
+        Args:
+            path (unicode):
+                The path to the checkpoint file.
+
+        Returns:
+            IndexCheckpoint:
+            The loaded checkpoint, or ``None`` if the file doesn't exist.
+
+        Raises:
+            ValueError:
+                The checkpoint file could not be parsed.
+        """
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'r') as fp:
+            data = json.load(fp)
+
+        if data.get('version') != cls.VERSION:
+            raise ValueError('Unsupported checkpoint version %r'
+                             % data.get('version'))
+
+        checkpoint = cls(path,
+                         partition_size=data['partition_size'],
+                         rebuild=data['rebuild'])
+        checkpoint._completed = {
+            model_label: set(starts)
+            for model_label, starts in six.iteritems(data['completed'])
+        }
+
+        return checkpoint
+
+    def is_complete(self, model_label, start_pk):
+        """Return whether a partition has already been indexed.
+
+        Args:
+            model_label (unicode):
+                The label of the model (such as ``reviews.ReviewRequest``).
+
+            start_pk (int):
+                The first primary key in the partition.
+
+        Returns:
+            bool:
+            Whether the partition has been indexed.
+        """
+        return start_pk in self._completed.get(model_label, ())
+
+    def mark_complete(self, model_label, start_pk):
+        """Record a partition as indexed and save the checkpoint.
+
+        Args:
+            model_label (unicode):
+                The label of the model.
+
+            start_pk (int):
+                The first primary key in the partition.
+        """
+        self._completed.setdefault(model_label, set()).add(start_pk)
+        self.save()
+
+    def save(self):
+        """Write the checkpoint to its file."""
+        tmp_path = '%s.tmp' % self.path
+
+        with open(tmp_path, 'w') as fp:
+            json.dump(
+                {
+                    'version': self.VERSION,
+                    'partition_size': self.partition_size,
+                    'rebuild': self.rebuild,
+                    'completed': {
+                        model_label: sorted(starts)
+                        for model_label, starts in
+                        six.iteritems(self._completed)
+                    },
+                },
+                fp)
+
+        os.rename(tmp_path, self.path)
+
+    def delete(self):
+        """Delete the checkpoint file, if it exists."""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class SearchIndexer(object):
+    """Indexes all searchable objects in parallel.
+
+    Attributes:
+        using (unicode):
+            The name of the Haystack connection to index into.
+
+        num_workers (int):
+            The number of worker processes used.
+
+        partition_size (int):
+            The number of primary keys covered by each partition.
+
+        batch_size (int):
+            The number of objects loaded and sent to the backend at a time.
+    """
+
+    def __init__(self, using='default', num_workers=1,
+                 partition_size=DEFAULT_PARTITION_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, progress_callback=None):
+        """Initialize the indexer.
+
+        Args:
+            using (unicode, optional):
+                The name of the Haystack connection to index into.
+
+            num_workers (int, optional):
+                The number of worker processes to use. If the search backend
+                doesn't support writes from several processes at once, only
+                one will be used.
+
+            partition_size (int, optional):
+                The number of primary keys covered by each partition.
+
+            batch_size (int, optional):
+                The number of objects to load and send to the backend at a
+                time.
+
+            progress_callback (callable, optional):
+                A function to call with a progress message each time a
+                partition is indexed.
+        """
+        backend = search_backend_registry.current_backend
+
+        if (num_workers > 1 and
+            (backend is None or not backend.supports_parallel_indexing)):
+            logging.warning('The configured search backend does not support '
+                            'indexing from multiple processes. Only one '
+                            'worker will be used.')
+            num_workers = 1
+
+        self.using = using
+        self.num_workers = num_workers
+        self.partition_size = partition_size
+        self.batch_size = batch_size
+        self._progress_callback = progress_callback
+
+    def run(self, rebuild=False, checkpoint_path=None, resume=False):
+        """Index all searchable objects.
+
+        Args:
+            rebuild (bool, optional):
+                Whether to clear the search index before indexing.
+
+            checkpoint_path (unicode, optional):
+                The path to a file used to record progress. If not provided,
+                progress will not be recorded.
+
+            resume (bool, optional):
+                Whether to resume from an existing checkpoint file. Any
+                partitions recorded in it will be skipped.
+
+        Returns:
+            tuple:
+            A 2-tuple containing:
+
+            1. The number of objects indexed (:py:class:`int`).
+            2. The number of seconds spent indexing (:py:class:`float`).
+        """
+        checkpoint = None
+
+        if checkpoint_path and resume:
+            checkpoint = IndexCheckpoint.load(checkpoint_path)
+
+            if checkpoint is not None:
+                # The partitions must line up with the ones recorded.
+                self.partition_size = checkpoint.partition_size
+                rebuild = checkpoint.rebuild
+
+        if checkpoint is None:
+            if rebuild:
+                connections[self.using].get_backend().clear()
+
+            if checkpoint_path:
+                checkpoint = IndexCheckpoint(
+                    checkpoint_path,
+                    partition_size=self.partition_size,
+                    rebuild=rebuild)
+                checkpoint.save()
+
+        tasks = [
+            (model_label, start_pk, end_pk, self.using, self.batch_size)
+            for model_label, start_pk, end_pk in self.get_partitions()
+            if (checkpoint is None or
+                not checkpoint.is_complete(model_label, start_pk))
+        ]
+
+        start_time = time.time()
+        total_count = 0
+
+        if self.num_workers > 1 and len(tasks) > 1:
+            # The workers are forked, and mustn't share the database
+            # connections of this process.
+            for db_connection in db_connections.all():
+                db_connection.close()
+
+            pool = multiprocessing.Pool(processes=self.num_workers,
+                                        initializer=_init_worker,
+                                        initargs=(self.using,))
+
+            try:
+                results = pool.imap_unordered(_index_partition_task, tasks)
+
+                for result in results:
+                    total_count += self._on_partition_done(checkpoint,
+                                                           *result)
+
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+        else:
+            for task in tasks:
+                total_count += self._on_partition_done(
+                    checkpoint, *_index_partition_task(task))
+
+        if checkpoint is not None:
+            checkpoint.delete()
+
+        return total_count, time.time() - start_time
+
+    def get_partitions(self):
+        """Return the partitions for each indexed model.
+
+        Returns:
+            list of tuple:
+            A list of 3-tuples, each containing the model label, the first
+            primary key in the partition, and the primary key following the
+            last one in the partition.
+        """
+        unified_index = connections[self.using].get_unified_index()
+        partitions = []
+
+        for model in unified_index.get_indexed_models():
+            index = unified_index.get_index(model)
+            pk_range = (
+                index.index_queryset(using=self.using)
+                .order_by()
+                .aggregate(min_pk=Min('pk'), max_pk=Max('pk'))
+            )
+
+            if pk_range['min_pk'] is None:
+                continue
+
+            model_label = _get_model_label(model)
+
+            # Align the partitions to multiples of the partition size, so
+            # that they're the same from one run to the next.
+            start_pk = (pk_range['min_pk'] // self.partition_size *
+                        self.partition_size)
+
+            while start_pk <= pk_range['max_pk']:
+                end_pk = start_pk + self.partition_size
+                partitions.append((model_label, start_pk, end_pk))
+                start_pk = end_pk
+
+        return partitions
+
+    def _on_partition_done(self, checkpoint, model_label, start_pk, end_pk,
+                           count, elapsed):
+        """Record and report a completed partition.
+
+        Args:
+            checkpoint (IndexCheckpoint):
+                The checkpoint to record progress in, if any.
+
+            model_label (unicode):
+                The label of the model indexed.
+
+            start_pk (int):
+                The first primary key in the partition.
+
+            end_pk (int):
+                The primary key following the last one in the partition.
+
+            count (int):
+                The number of objects indexed.
+
+            elapsed (float):
+                The number of seconds spent indexing the partition.
+
+        Returns:
+            int:
+            The number of objects indexed.
+        """
+        if checkpoint is not None:
+            checkpoint.mark_complete(model_label, start_pk)
+
+        if self._progress_callback is not None:
+            self._progress_callback(
+                'Indexed %d %s objects (IDs %d-%d) in %.1f seconds '
+                '(%.1f objects/second)'
+                % (count, model_label, start_pk, end_pk - 1, elapsed,
+                   count / elapsed if elapsed else 0))
+
+        return count
+
+
+def _get_model_label(model):
+    """Return the label used to identify a model in a checkpoint.
+
+    Args:
+        model (type):
+            The model class.
+
+    Returns:
+        unicode:
+        The label, in the form of ``app_label.ModelName``.
+    """
+    return '%s.%s' % (model._meta.app_label, model._meta.object_name)
+
+
+def _init_worker(using):
+    """Prepare a worker process for indexing.
+
+    Args:
+        using (unicode):
+            The name of the Haystack connection to index into.
+    """
+    connections[using].reset_sessions()
+
+
+def _index_partition_task(task):
+    """Index all objects in a partition.
+
+    This is run in the worker processes.
+
+    Args:
+        task (tuple):
+            A tuple containing the model label, the first primary key in the
+            partition, the primary key following the last one in the
+            partition, the Haystack connection name, and the batch size.
+
+    Returns:
+        tuple:
+        A tuple containing the model label, the partition's primary key
+        range, the number of objects indexed, and the number of seconds spent
+        indexing.
+    """
+    model_label, start_pk, end_pk, using, batch_size = task
+
+    connection = connections[using]
+    unified_index = connection.get_unified_index()
+    model = next(
+        model
+        for model in unified_index.get_indexed_models()
+        if _get_model_label(model) == model_label
+    )
+    index = unified_index.get_index(model)
+    backend = connection.get_backend()
+
+    start_time = time.time()
+    count = 0
+    next_pk = start_pk
+
+    try:
+        queryset = index.index_queryset(using=using).order_by('pk')
+
+        while next_pk < end_pk:
+            objs = list(queryset.filter(pk__gte=next_pk, pk__lt=end_pk)
+                        [:batch_size])
+
+            if not objs:
+                break
+
+            index.prefetch_batch(objs)
+            backend.update(index, objs)
+
+            count += len(objs)
+            next_pk = objs[-1].pk + 1
+    finally:
+        close_old_connections()
+
+    return model_label, start_pk, end_pk, count, time.time() - start_time
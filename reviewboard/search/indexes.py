@@ -30,6 +30,19 @@ class BaseSearchIndex(indexes.SearchIndex):
         """Return the model for this index."""
         return self.model
 
+    def prefetch_batch(self, objs):
+        """Load related data for a batch of objects about to be indexed.
+
+        This is called before a batch of objects is sent to the search
+        backend, allowing subclasses to fetch data needed by their
+        ``prepare_*`` methods in bulk, rather than once per object.
+
+        Args:
+            objs (list of django.db.models.Model):
+                The objects being indexed.
+        """
+        pass
+
     def prepare_local_sites(self, obj):
         """Prepare the list of local sites for the search index.
 
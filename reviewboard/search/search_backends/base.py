@@ -53,6 +53,12 @@ class SearchBackend(object):
     #: A mapping of search engine settings to form fields.
     form_field_map = {}
 
+    #: Whether several processes can write to the index at once.
+    #:
+    #: If ``False``, the :command:`index` management command will only use a
+    #: single worker process.
+    supports_parallel_indexing = False
+
     @property
     def configuration(self):
         """The configuration for the search engine.
@@ -42,6 +42,7 @@ class ElasticsearchBackend(SearchBackend):
         'url': 'URL',
         'index_name': 'INDEX_NAME',
     }
+    supports_parallel_indexing = True
 
     def validate(self):
         """Ensure that the elasticsearch Python module is installed.
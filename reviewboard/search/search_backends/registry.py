@@ -7,6 +7,7 @@ from djblets.siteconfig.models import SiteConfiguration
 from reviewboard.registries.registry import Registry
 from reviewboard.search.search_backends.elasticsearch import \
     ElasticsearchBackend
+from reviewboard.search.search_backends.sqlite import SQLiteBackend
 from reviewboard.search.search_backends.whoosh import WhooshBackend
 
 
@@ -44,6 +45,7 @@ class SearchBackendRegistry(Registry):
         return [
             WhooshBackend(),
             ElasticsearchBackend(),
+            SQLiteBackend(),
         ]
 
     @property
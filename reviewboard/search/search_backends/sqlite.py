@@ -0,0 +1,853 @@
+"""A search backend using SQLite's FTS5 full-text search.
+
+This stores the search index in a local SQLite database file, and requires no
+external services or additional Python modules. It's well-suited to small
+installs, or to ones where a search service such as Elasticsearch can't be
+run.
+
+Each indexed object is stored as a row in a documents table, with its
+prepared fields serialized as JSON. The object's document text is stored in
+an FTS5 table sharing the same row ID. Full-text queries are performed
+against the FTS5 table, and filters on other fields (such as the
+access-control fields used when searching) are performed against the JSON
+data.
+"""
+
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.utils import six
+from django.utils.translation import ugettext, ugettext_lazy as _
+from haystack import connections
+from haystack.backends import BaseEngine, BaseSearchBackend, BaseSearchQuery
+from haystack.constants import DJANGO_CT, DJANGO_ID, ID
+from haystack.exceptions import SkipDocument
+from haystack.inputs import BaseInput
+from haystack.models import SearchResult
+from haystack.utils import get_identifier, get_model_ct
+
+from reviewboard.search.search_backends.base import (SearchBackend,
+                                                     SearchBackendForm)
+
+
+#: The name of the table storing the indexed documents.
+DOCUMENTS_TABLE = 'rb_search_documents'
+
+#: The name of the FTS5 table storing the document text.
+FTS_TABLE = 'rb_search_fts'
+
+
+_FIELD_NAME_RE = re.compile(r'^\w+$')
+_QUERY_TOKEN_RE = re.compile(r'(-?)"([^"]*)"|(\S+)')
+
+
+def build_match_query(query):
+    """Build an FTS5 match expression from a user's search query.
+
+    Each term or quoted phrase in the query is quoted for FTS5, so that
+    punctuation in the query (which is common in file paths, e-mail
+    addresses, and so on) is never interpreted as FTS5 syntax. All terms
+    must match, unless separated by ``OR``. Terms prefixed with ``-`` must
+    not match, and terms ending in ``*`` match any word beginning with the
+    term.
+
+    Args:
+        query (unicode):
+            The search query.
+
+    Returns:
+        unicode:
+        The FTS5 match expression. This will be empty if the query has no
+        terms that can match.
+    """
+    terms = []
+    excluded_terms = []
+    pending_or = False
+
+    for m in _QUERY_TOKEN_RE.finditer(query):
+        negated, phrase, word = m.groups()
+
+        if phrase is None:
+            if word in ('AND', 'OR'):
+                pending_or = (word == 'OR' and bool(terms))
+                continue
+
+            if word.startswith('-') and len(word) > 1:
+                negated = True
+                word = word[1:]
+
+            phrase = word
+
+        is_prefix = phrase.endswith('*')
+        phrase = phrase.rstrip('*').strip()
+
+        if not phrase:
+            continue
+
+        term = '"%s"' % phrase.replace('"', '""')
+
+        if is_prefix:
+            term += ' *'
+
+        if negated:
+            excluded_terms.append(term)
+        else:
+            if pending_or:
+                terms.append('OR')
+
+            terms.append(term)
+
+        pending_or = False
+
+    if not terms:
+        return ''
+
+    match_query = ' '.join(terms)
+
+    if excluded_terms:
+        match_query = '(%s) NOT %s' % (match_query,
+                                       ' NOT '.join(excluded_terms))
+
+    return match_query
+
+
+def _serialize_value(value):
+    """Convert a prepared field value for storage as JSON.
+
+    Args:
+        value (object):
+            The value prepared by the search index.
+
+    Returns:
+        object:
+        The value to store.
+    """
+    if isinstance(value, (list, set, tuple)):
+        # These are stored as strings, matching how other backends return
+        # multi-value fields.
+        return [six.text_type(item) for item in value]
+    elif isinstance(value, (date, datetime)):
+        return value.isoformat()
+    elif value is None or isinstance(value, (bool, float) + six.integer_types):
+        return value
+    else:
+        return six.text_type(value)
+
+
+def _serialize_filter_value(value):
+    """Convert a filter value for comparison against stored values.
+
+    Args:
+        value (object):
+            The value being filtered on.
+
+    Returns:
+        unicode:
+        The value as text, as it compares to the stored value.
+    """
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    elif isinstance(value, (date, datetime)):
+        return value.isoformat()
+    else:
+        return six.text_type(value)
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """A Haystack search backend storing the index in SQLite.
+
+    This supports full-text queries against the document field, filters on
+    all other fields, sorting, and pagination. Faceting, highlighting,
+    spelling suggestions, and "more like this" queries are not supported.
+    """
+
+    def __init__(self, connection_alias, **connection_options):
+        """Initialize the backend.
+
+        Args:
+            connection_alias (unicode):
+                The name of the Haystack connection.
+
+            **connection_options (dict):
+                The connection options. ``PATH`` must be set to the path of
+                the SQLite database file.
+
+        Raises:
+            django.core.exceptions.ImproperlyConfigured:
+                The ``PATH`` option was not provided.
+        """
+        super(SQLiteSearchBackend, self).__init__(connection_alias,
+                                                  **connection_options)
+
+        self.path = connection_options.get('PATH')
+
+        if not self.path:
+            raise ImproperlyConfigured(
+                'You must specify a PATH in your settings for connection '
+                '"%s".'
+                % connection_alias)
+
+        self.setup_complete = False
+
+    def setup(self):
+        """Create the search index database, if it doesn't exist."""
+        index_dir = os.path.dirname(self.path)
+
+        if index_dir and not os.path.exists(index_dir):
+            os.makedirs(index_dir)
+
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+
+        try:
+            # This allows searches to be performed while the index is being
+            # written to.
+            conn.execute('PRAGMA journal_mode=WAL')
+
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS %s ('
+                    ' rowid INTEGER PRIMARY KEY,'
+                    ' id TEXT NOT NULL UNIQUE,'
+                    ' django_ct TEXT NOT NULL,'
+                    ' django_id TEXT NOT NULL,'
+                    ' data TEXT NOT NULL)'
+                    % DOCUMENTS_TABLE)
+                conn.execute(
+                    'CREATE INDEX IF NOT EXISTS %s_django_ct ON %s (django_ct)'
+                    % (DOCUMENTS_TABLE, DOCUMENTS_TABLE))
+                conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS %s"
+                    " USING fts5(text, tokenize='porter unicode61')"
+                    % FTS_TABLE)
+        finally:
+            conn.close()
+
+        self.setup_complete = True
+
+    def update(self, index, iterable, commit=True):
+        """Add or update objects in the search index.
+
+        Args:
+            index (haystack.indexes.SearchIndex):
+                The search index for the objects.
+
+            iterable (iterable of django.db.models.Model):
+                The objects to index.
+
+            commit (bool, optional):
+                Unused. Changes are always committed.
+        """
+        content_field = index.get_content_field()
+        rows = []
+
+        for obj in iterable:
+            try:
+                doc = index.full_prepare(obj)
+            except SkipDocument:
+                logging.debug('Indexing for object %r skipped', obj)
+                continue
+
+            text = doc.pop(content_field, None) or ''
+            data = {
+                key: _serialize_value(value)
+                for key, value in six.iteritems(doc)
+            }
+
+            rows.append((doc[ID],
+                         doc[DJANGO_CT],
+                         six.text_type(doc[DJANGO_ID]),
+                         json.dumps(data),
+                         text))
+
+        if not rows:
+            return
+
+        try:
+            with self._connect() as conn:
+                for doc_id, django_ct, django_id, data, text in rows:
+                    self._delete_documents(conn, 'id = ?', [doc_id])
+
+                    cursor = conn.execute(
+                        'INSERT INTO %s (id, django_ct, django_id, data)'
+                        ' VALUES (?, ?, ?, ?)'
+                        % DOCUMENTS_TABLE,
+                        (doc_id, django_ct, django_id, data))
+                    conn.execute(
+                        'INSERT INTO %s (rowid, text) VALUES (?, ?)'
+                        % FTS_TABLE,
+                        (cursor.lastrowid, text))
+        except sqlite3.Error as e:
+            if not self.silently_fail:
+                raise
+
+            logging.exception('Failed to update the SQLite search index '
+                              'for %s: %s',
+                              index.get_model().__name__, e)
+
+    def remove(self, obj_or_string, commit=True):
+        """Remove an object from the search index.
+
+        Args:
+            obj_or_string (django.db.models.Model or unicode):
+                The object, or its identifier in the search index.
+
+            commit (bool, optional):
+                Unused. Changes are always committed.
+        """
+        identifier = get_identifier(obj_or_string)
+
+        try:
+            with self._connect() as conn:
+                self._delete_documents(conn, 'id = ?', [identifier])
+        except sqlite3.Error as e:
+            if not self.silently_fail:
+                raise
+
+            logging.exception('Failed to remove "%s" from the SQLite search '
+                              'index: %s',
+                              identifier, e)
+
+    def clear(self, models=None, commit=True):
+        """Remove objects from the search index.
+
+        Args:
+            models (list of type, optional):
+                The models to remove objects for. If not provided, all
+                objects will be removed.
+
+            commit (bool, optional):
+                Unused. Changes are always committed.
+        """
+        try:
+            with self._connect() as conn:
+                if models:
+                    model_cts = [get_model_ct(model) for model in models]
+                    self._delete_documents(
+                        conn,
+                        'django_ct IN (%s)' % ', '.join('?' * len(model_cts)),
+                        model_cts)
+                else:
+                    conn.execute('DELETE FROM %s' % FTS_TABLE)
+                    conn.execute('DELETE FROM %s' % DOCUMENTS_TABLE)
+        except sqlite3.Error as e:
+            if not self.silently_fail:
+                raise
+
+            logging.exception('Failed to clear the SQLite search index: %s',
+                              e)
+
+    def search(self, query_string, sort_by=None, start_offset=0,
+               end_offset=None, models=None, limit_to_registered_models=None,
+               result_class=None, **kwargs):
+        """Search the index.
+
+        Args:
+            query_string (tuple or unicode):
+                The query to perform. This is either a tuple of an SQL
+                condition and its parameters, as built by
+                :py:class:`SQLiteSearchQuery`, or a full-text search query.
+
+            sort_by (list of unicode, optional):
+                The fields to sort by. Fields prefixed with ``-`` are sorted
+                in descending order.
+
+            start_offset (int, optional):
+                The offset of the first result to return.
+
+            end_offset (int, optional):
+                The offset following the last result to return.
+
+            models (list of type, optional):
+                The models to limit results to.
+
+            limit_to_registered_models (bool, optional):
+                Whether to limit results to models with a registered search
+                index, if ``models`` is not provided.
+
+            result_class (type, optional):
+                The class used for results.
+
+            **kwargs (dict):
+                Additional search options, which are not supported by this
+                backend.
+
+        Returns:
+            dict:
+            The search results, in the form Haystack expects.
+        """
+        if isinstance(query_string, tuple):
+            where, params = query_string
+            params = list(params)
+        elif query_string and query_string != '*':
+            where = ('rowid IN (SELECT rowid FROM %s WHERE %s MATCH ?)'
+                     % (FTS_TABLE, FTS_TABLE))
+            params = [build_match_query(query_string)]
+        else:
+            where = ''
+            params = []
+
+        unified_index = connections[self.connection_alias].get_unified_index()
+
+        if limit_to_registered_models is None:
+            limit_to_registered_models = getattr(
+                settings, 'HAYSTACK_LIMIT_TO_REGISTERED_MODELS', True)
+
+        if not models and limit_to_registered_models:
+            models = unified_index.get_indexed_models()
+
+        conditions = []
+
+        if where:
+            conditions.append(where)
+
+        if models:
+            model_cts = [get_model_ct(model) for model in models]
+            conditions.append('django_ct IN (%s)'
+                              % ', '.join('?' * len(model_cts)))
+            params += model_cts
+
+        if conditions:
+            where_sql = ' WHERE %s' % ' AND '.join(
+                '(%s)' % condition
+                for condition in conditions
+            )
+        else:
+            where_sql = ''
+
+        order_by = []
+
+        for field in sort_by or []:
+            descending = field.startswith('-')
+            field = field.lstrip('-')
+
+            if not _FIELD_NAME_RE.match(field):
+                raise ValueError('Invalid field name "%s"' % field)
+
+            # Objects without the field (such as users, when sorting by
+            # review request fields) sort before those with the field in
+            # descending order, and after them in ascending order.
+            order_by.append(
+                "json_type(data, '$.%(field)s') IS NULL %(dir)s,"
+                " json_extract(data, '$.%(field)s') %(dir)s"
+                % {
+                    'field': field,
+                    'dir': 'DESC' if descending else 'ASC',
+                })
+
+        order_by.append('rowid')
+
+        if end_offset is None:
+            limit = -1
+        else:
+            limit = max(end_offset - start_offset, 0)
+
+        try:
+            with self._connect() as conn:
+                hits = conn.execute(
+                    'SELECT COUNT(*) FROM %s%s' % (DOCUMENTS_TABLE, where_sql),
+                    params).fetchone()[0]
+                rows = conn.execute(
+                    'SELECT django_ct, django_id, data FROM %s%s'
+                    ' ORDER BY %s LIMIT ? OFFSET ?'
+                    % (DOCUMENTS_TABLE, where_sql, ', '.join(order_by)),
+                    params + [limit, start_offset]).fetchall()
+        except sqlite3.Error as e:
+            if not self.silently_fail:
+                raise
+
+            logging.exception('Failed to search the SQLite search index: %s',
+                              e)
+
+            return {
+                'results': [],
+                'hits': 0,
+            }
+
+        return {
+            'results': self._process_results(rows, unified_index,
+                                             result_class or SearchResult),
+            'hits': hits,
+            'facets': {},
+            'spelling_suggestion': None,
+        }
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection to the search index database.
+
+        The connection is committed and closed when the context exits, or
+        rolled back if an exception is raised.
+
+        Context:
+            sqlite3.Connection:
+            The database connection.
+        """
+        if not self.setup_complete:
+            self.setup()
+
+        conn = sqlite3.connect(self.path, timeout=self.timeout)
+
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _delete_documents(self, conn, where, params):
+        """Delete matching documents from the index.
+
+        Args:
+            conn (sqlite3.Connection):
+                The database connection.
+
+            where (unicode):
+                The SQL condition matching the documents to delete.
+
+            params (list):
+                The parameters for the condition.
+        """
+        conn.execute(
+            'DELETE FROM %s WHERE rowid IN (SELECT rowid FROM %s WHERE %s)'
+            % (FTS_TABLE, DOCUMENTS_TABLE, where),
+            params)
+        conn.execute('DELETE FROM %s WHERE %s' % (DOCUMENTS_TABLE, where),
+                     params)
+
+    def _process_results(self, rows, unified_index, result_class):
+        """Convert rows from the index into search results.
+
+        Args:
+            rows (list of tuple):
+                The rows from the documents table.
+
+            unified_index (haystack.utils.loading.UnifiedIndex):
+                The unified index for the connection.
+
+            result_class (type):
+                The class used for results.
+
+        Returns:
+            list of haystack.models.SearchResult:
+            The search results.
+        """
+        models = {
+            get_model_ct(model): model
+            for model in unified_index.get_indexed_models()
+        }
+        results = []
+
+        for django_ct, django_id, data in rows:
+            model = models.get(django_ct)
+
+            if model is None:
+                continue
+
+            index = unified_index.get_index(model)
+            fields = {}
+
+            for key, value in six.iteritems(json.loads(data)):
+                if key in (DJANGO_CT, DJANGO_ID):
+                    continue
+
+                field = index.fields.get(key)
+
+                if field is not None:
+                    value = field.convert(value)
+
+                fields[str(key)] = value
+
+            app_label, model_name = django_ct.split('.')
+            results.append(result_class(app_label, model_name, django_id, 0,
+                                        **fields))
+
+        return results
+
+
+class SQLiteSearchQuery(BaseSearchQuery):
+    """A Haystack search query for the SQLite search backend.
+
+    Rather than building a query string, this compiles the query's filters
+    into an SQL condition on the documents table.
+    """
+
+    def build_query(self):
+        """Build the query for the backend.
+
+        Returns:
+            tuple:
+            A 2-tuple containing the SQL condition and its parameters.
+        """
+        return self._build_condition(self.query_filter)
+
+    def build_query_fragment(self, field, filter_type, value):
+        """Build the SQL condition for a single filter.
+
+        Args:
+            field (unicode):
+                The name of the field being filtered on.
+
+            filter_type (unicode):
+                The type of filter.
+
+            value (object):
+                The value to filter on.
+
+        Returns:
+            unicode:
+            The SQL condition.
+        """
+        return self._build_filter(field, filter_type, value)[0]
+
+    def run(self, spelling_query=None, **kwargs):
+        """Run the query, storing the results.
+
+        Args:
+            spelling_query (unicode, optional):
+                Unused. Spelling suggestions are not supported.
+
+            **kwargs (dict):
+                Additional keyword arguments for the backend's
+                :py:meth:`~SQLiteSearchBackend.search` method.
+        """
+        search_kwargs = {
+            'start_offset': self.start_offset,
+            'end_offset': self.end_offset,
+            'result_class': self.result_class,
+        }
+
+        if self.order_by:
+            search_kwargs['sort_by'] = self.order_by
+
+        if self.models:
+            search_kwargs['models'] = self.models
+
+        search_kwargs.update(kwargs)
+
+        results = self.backend.search(self.build_query(), **search_kwargs)
+        self._results = results.get('results', [])
+        self._hit_count = results.get('hits', 0)
+        self._facet_counts = {}
+        self._spelling_suggestion = None
+
+    def _build_condition(self, node):
+        """Build the SQL condition for a node in the query's filter tree.
+
+        Args:
+            node (haystack.backends.SearchNode):
+                The node to build the condition for.
+
+        Returns:
+            tuple:
+            A 2-tuple containing the SQL condition (which is empty if there
+            are no filters) and its parameters.
+        """
+        conditions = []
+        params = []
+
+        for child in node.children:
+            if hasattr(child, 'children'):
+                condition, child_params = self._build_condition(child)
+            else:
+                expression, value = child
+                field, filter_type = node.split_expression(expression)
+                condition, child_params = self._build_filter(
+                    field, filter_type, value)
+
+            if condition:
+                conditions.append(condition)
+                params += child_params
+
+        if not conditions:
+            return '', []
+
+        condition = (' %s ' % node.connector).join(conditions)
+
+        if node.negated:
+            condition = 'NOT (%s)' % condition
+        elif len(conditions) > 1:
+            condition = '(%s)' % condition
+
+        return condition, params
+
+    def _build_filter(self, field, filter_type, value):
+        """Build the SQL condition for a single filter.
+
+        Args:
+            field (unicode):
+                The name of the field being filtered on.
+
+            filter_type (unicode):
+                The type of filter.
+
+            value (object):
+                The value to filter on.
+
+        Returns:
+            tuple:
+            A 2-tuple containing the SQL condition and its parameters.
+
+        Raises:
+            ValueError:
+                The field name or filter type is not supported.
+        """
+        if isinstance(value, BaseInput):
+            value = value.query_string
+
+        if not _FIELD_NAME_RE.match(field):
+            raise ValueError('Invalid field name "%s"' % field)
+
+        if field == 'content':
+            match_query = build_match_query(six.text_type(value))
+
+            if not match_query:
+                return '0', []
+
+            return (
+                'rowid IN (SELECT rowid FROM %s WHERE %s MATCH ?)'
+                % (FTS_TABLE, FTS_TABLE),
+                [match_query])
+        elif field == ID:
+            # This matches either the full identifier or the object's ID.
+            return '(id = ? OR django_id = ?)', [six.text_type(value)] * 2
+
+        if filter_type in ('content', 'contains', 'exact'):
+            condition = 'CAST(value AS TEXT) = ?'
+            params = [_serialize_filter_value(value)]
+        elif filter_type == 'in':
+            params = [_serialize_filter_value(item) for item in value]
+
+            if not params:
+                return '0', []
+
+            condition = ('CAST(value AS TEXT) IN (%s)'
+                         % ', '.join('?' * len(params)))
+        elif filter_type == 'startswith':
+            condition = "CAST(value AS TEXT) LIKE ? ESCAPE '\\'"
+            params = ['%s%%' % re.sub(r'([\\%_])', r'\\\1',
+                                      _serialize_filter_value(value))]
+        elif filter_type in ('gt', 'gte', 'lt', 'lte'):
+            condition = 'value %s ?' % {
+                'gt': '>',
+                'gte': '>=',
+                'lt': '<',
+                'lte': '<=',
+            }[filter_type]
+            params = [value]
+        elif filter_type == 'range':
+            condition = 'value BETWEEN ? AND ?'
+            params = list(value)
+        else:
+            raise ValueError('Unsupported filter type "%s"' % filter_type)
+
+        if filter_type in ('gt', 'gte', 'lt', 'lte', 'range'):
+            params = [
+                _serialize_filter_value(param)
+                if isinstance(param, (date, datetime))
+                else param
+                for param in params
+            ]
+
+        # json_each() produces a row for each item in a multi-value field,
+        # or a single row for any other field.
+        return (
+            'EXISTS (SELECT 1 FROM json_each(data, ?) WHERE %s)' % condition,
+            ['$.%s' % field] + params)
+
+
+class SQLiteEngine(BaseEngine):
+    """The Haystack search engine for SQLite."""
+
+    backend = SQLiteSearchBackend
+    query = SQLiteSearchQuery
+
+
+class SQLiteConfigForm(SearchBackendForm):
+    """A form for configuring the SQLite search backend."""
+
+    search_index_file = forms.CharField(
+        label=_('Search index file'),
+        help_text=_('The path to the SQLite database file that the search '
+                    'index should be stored in.'),
+        widget=forms.TextInput(attrs={'size': '80'}))
+
+    def clean_search_index_file(self):
+        """Clean the search_index_file field.
+
+        This ensures the value is an absolute path and is writable.
+
+        Returns:
+            unicode:
+            The cleaned path.
+        """
+        index_file = self.cleaned_data['search_index_file'].strip()
+
+        if index_file:
+            if not os.path.isabs(index_file):
+                raise ValidationError(
+                    _('The search index path must be absolute.'))
+
+            if os.path.exists(index_file):
+                writable_path = index_file
+            else:
+                writable_path = os.path.dirname(index_file)
+
+            if (os.path.exists(writable_path) and
+                not os.access(writable_path, os.W_OK)):
+                raise ValidationError(
+                    _('The search index path is not writable. Make sure the '
+                      'web server has write access to it and its parent '
+                      'directory.'))
+
+        return index_file
+
+
+class SQLiteBackend(SearchBackend):
+    """A search backend storing the index in a local SQLite database.
+
+    This requires a version of SQLite with the FTS5 and JSON1 extensions,
+    which are included in most modern builds.
+    """
+
+    search_backend_id = 'sqlite'
+    name = _('SQLite')
+    haystack_backend_name = ('reviewboard.search.search_backends.sqlite.'
+                             'SQLiteEngine')
+    config_form_class = SQLiteConfigForm
+    default_settings = {
+        'PATH': os.path.join(settings.SITE_DATA_DIR, 'search-index.sqlite3'),
+    }
+    form_field_map = {
+        'search_index_file': 'PATH',
+    }
+
+    def validate(self):
+        """Ensure that SQLite supports full-text search.
+
+        Raises:
+            django.core.exceptions.ValidationError:
+                The installed version of SQLite doesn't support the FTS5 or
+                JSON1 extensions.
+        """
+        conn = sqlite3.connect(':memory:')
+
+        try:
+            conn.execute('CREATE VIRTUAL TABLE test USING fts5(text)')
+            conn.execute("SELECT json_extract('{}', '$.a')")
+        except sqlite3.Error:
+            raise ValidationError(
+                ugettext('The version of SQLite used by Python (%s) does not '
+                         'support the FTS5 and JSON1 extensions, which are '
+                         'required for searching.')
+                % sqlite3.sqlite_version)
+        finally:
+            conn.close()
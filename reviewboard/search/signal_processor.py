@@ -2,26 +2,107 @@
 
 from __future__ import unicode_literals
 
+import logging
 import threading
 from functools import partial
 
 from django.contrib.auth.models import User
 from django.db.models.signals import post_delete, post_save, m2m_changed
 from django.utils import six
+from haystack.exceptions import NotHandled
 from haystack.signals import BaseSignalProcessor
 
 from reviewboard.accounts.models import Profile
+from reviewboard.background import (DelayedBatchBuffer,
+                                    should_run_tasks_inline)
 from reviewboard.reviews.models import Group, ReviewRequest
 from reviewboard.reviews.signals import review_request_published
 from reviewboard.search import search_backend_registry
 
 
+#: The number of seconds to collect index updates before applying them.
+SEARCH_INDEX_UPDATE_DELAY = 2
+
+#: The maximum number of objects sent to the search backend at a time.
+SEARCH_INDEX_UPDATE_BATCH_SIZE = 100
+
+
+class SearchIndexUpdateQueue(DelayedBatchBuffer):
+    """Collects search index updates and applies them in batches.
+
+    Updates are recorded as model classes and primary keys, so several
+    updates to the same object (for instance, from several signals during
+    one request) only result in the object being indexed once. Shortly after
+    the first update is queued, all pending updates are applied from a
+    background worker.
+    """
+
+    queue_name = 'search-index'
+
+    def __init__(self, signal_processor, delay=SEARCH_INDEX_UPDATE_DELAY):
+        """Initialize the queue.
+
+        Args:
+            signal_processor (SignalProcessor):
+                The signal processor that will apply the updates.
+
+            delay (float, optional):
+                The number of seconds to collect updates before applying
+                them.
+        """
+        super(SearchIndexUpdateQueue, self).__init__(delay)
+
+        self.signal_processor = signal_processor
+
+    def add(self, model, pks):
+        """Queue objects to be indexed.
+
+        Args:
+            model (type):
+                The model class of the objects.
+
+            pks (iterable of int):
+                The primary keys of the objects.
+        """
+        self.add_item(model, set(pks))
+
+    def combine(self, old_pks, new_pks):
+        """Return the combination of two sets of objects to index.
+
+        Args:
+            old_pks (set of int):
+                The primary keys already queued.
+
+            new_pks (set of int):
+                The primary keys being queued.
+
+        Returns:
+            set of int:
+            The combined primary keys.
+        """
+        return old_pks | new_pks
+
+    def process(self, items):
+        """Apply a batch of updates to the search index.
+
+        Args:
+            items (dict):
+                A dictionary mapping model classes to sets of primary keys.
+        """
+        for model, pks in six.iteritems(items):
+            self.signal_processor.update_objects(model, pks)
+
+
 class SignalProcessor(BaseSignalProcessor):
     """"Listens for signals and updates the search index.
 
     This will listen for any signals that would affect the search index, and
-    invokes a suitable Haystack callback to immediately update the data stored
-    in the index.
+    update the data stored in the index.
+
+    Updates are normally queued in a :py:class:`SearchIndexUpdateQueue` and
+    applied in batches shortly afterward. When background tasks are run
+    inline (such as in the test suite), the index is instead updated
+    immediately through a suitable Haystack callback.
 
     This only updates the search index if:
 
@@ -53,6 +134,7 @@ class SignalProcessor(BaseSignalProcessor):
         self.is_setup = False
         self._handlers = {}
         self._pending_user_changes = threading.local()
+        self.update_queue = SearchIndexUpdateQueue(self)
 
         super(SignalProcessor, self).__init__(*args, **kwargs)
 
@@ -110,7 +192,10 @@ class SignalProcessor(BaseSignalProcessor):
                 kwargs['sender'] = User
                 instance = instance.user
 
-            self.handle_save(instance=instance, **kwargs)
+            if should_run_tasks_inline():
+                self.handle_save(instance=instance, **kwargs)
+            else:
+                self.update_queue.add(kwargs['sender'], [instance.pk])
 
     def check_handle_delete(self, **kwargs):
         """Conditionally update the search index when an object is deleted.
@@ -185,15 +270,11 @@ class SignalProcessor(BaseSignalProcessor):
             if reverse:
                 # When using the reverse relation, the instance is the User and
                 # the pk_set is the PKs of the groups being added or removed.
-                users = [instance]
+                self._update_users([instance.pk])
             else:
                 # Otherwise the instance is the Group and the pk_set is the set
                 # of User primary keys.
-                users = User.objects.filter(pk__in=pk_set)
-
-            for user in users:
-                self.handle_save(instance=user, instance_kwarg='instance',
-                                 sender=User)
+                self._update_users(pk_set)
         elif action == 'pre_clear':
             # When ``reverse`` is ``True``, a User is having their groups
             # cleared so we don't need to worry about storing any state in the
@@ -210,13 +291,74 @@ class SignalProcessor(BaseSignalProcessor):
             if reverse:
                 # When ``reverse`` is ``True``, we just have to reindex a
                 # single user.
-                self.handle_save(instance=instance, instance_kwarg='instance',
-                                 sender=User)
+                self._update_users([instance.pk])
             else:
                 # Here, we are reindexing every user that got removed from the
                 # group via clearing.
-                pks = self._pending_user_changes.data.pop(instance.pk)
+                self._update_users(
+                    self._pending_user_changes.data.pop(instance.pk))
+
+    def update_objects(self, model, pks):
+        """Update the search index for a set of objects.
+
+        The objects are loaded through each search index's queryset and sent
+        to the search backend in batches. Objects that are no longer part of
+        the index's queryset (for instance, deactivated users) are removed
+        from the index.
+
+        Args:
+            model (type):
+                The model class of the objects.
+
+            pks (set of int):
+                The primary keys of the objects.
+        """
+        pks = sorted(pks)
 
-                for user in User.objects.filter(pk__in=pks):
-                    self.handle_save(instance=user, instance_kwarg='instance',
-                                     sender=User)
+        for using in self.connection_router.for_write():
+            connection = self.connections[using]
+
+            try:
+                index = connection.get_unified_index().get_index(model)
+            except NotHandled:
+                continue
+
+            backend = connection.get_backend()
+
+            for i in range(0, len(pks), SEARCH_INDEX_UPDATE_BATCH_SIZE):
+                batch_pks = pks[i:i + SEARCH_INDEX_UPDATE_BATCH_SIZE]
+
+                try:
+                    objs = list(index.index_queryset(using=using)
+                                .filter(pk__in=batch_pks))
+
+                    if objs:
+                        index.prefetch_batch(objs)
+                        backend.update(index, objs)
+
+                    found_pks = set(obj.pk for obj in objs)
+
+                    for pk in batch_pks:
+                        if pk not in found_pks:
+                            backend.remove('%s.%s.%s' % (
+                                model._meta.app_label,
+                                model._meta.model_name,
+                                pk))
+                except Exception as e:
+                    logging.exception('Error updating the search index for '
+                                      '%s objects %r: %s',
+                                      model.__name__, batch_pks, e)
+
+    def _update_users(self, pks):
+        """Update the search index for a set of users.
+
+        Args:
+            pks (iterable of int):
+                The primary keys of the users.
+        """
+        if should_run_tasks_inline():
+            for user in User.objects.filter(pk__in=pks):
+                self.handle_save(instance=user, instance_kwarg='instance',
+                                 sender=User)
+        else:
+            self.update_queue.add(User, pks)
@@ -1,19 +1,28 @@
 from __future__ import unicode_literals
 
+import json
+import os
+import shutil
+import tempfile
+
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
 from django.utils import six
 from django.utils.six.moves.urllib.parse import urlencode
 from djblets.siteconfig.models import SiteConfiguration
 from djblets.testing.decorators import add_fixtures
-from haystack import signal_processor
+from haystack import connections, signal_processor
 from kgb import SpyAgency
 
 from reviewboard.admin.server import build_server_url
 from reviewboard.admin.siteconfig import load_site_config
-from reviewboard.reviews.models import ReviewRequestDraft
-from reviewboard.search.testing import reindex_search
+from reviewboard.reviews.models import ReviewRequest, ReviewRequestDraft
+from reviewboard.reviews.search_indexes import ReviewRequestIndex
+from reviewboard.search.indexer import SearchIndexer
+from reviewboard.search.search_backends.sqlite import build_match_query
+from reviewboard.search.testing import reindex_search, search_enabled
 from reviewboard.site.urlresolvers import local_site_reverse
 from reviewboard.testing.testcase import TestCase
 
@@ -490,6 +499,58 @@ class SearchTests(SpyAgency, TestCase):
         self.assertEqual(result.username, 'doc')
         self.assertEqual(result.full_name, '')
 
+    @override_settings(RUN_BACKGROUND_TASKS_INLINE=False)
+    def test_on_the_fly_indexing_deferred(self):
+        """Testing on-the-fly indexing with deferred, batched updates"""
+        reindex_search()
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('search_on_the_fly_indexing', True)
+        siteconfig.save()
+
+        update_queue = signal_processor.update_queue
+        self.spy_on(update_queue._schedule_flush, call_original=False)
+
+        try:
+            self.spy_on(signal_processor.handle_save)
+            self.spy_on(signal_processor.update_objects)
+
+            user = User.objects.get(username='doc')
+            user.first_name = 'Deferred'
+            user.save()
+
+            profile = user.get_profile()
+            profile.save()
+
+            group = self.create_review_group()
+            group.users = [user]
+
+            # Nothing should be indexed until the queue is flushed.
+            self.assertFalse(signal_processor.handle_save.spy.called)
+            self.assertEqual(self.search('Deferred').context['hits_returned'],
+                             0)
+
+            update_queue.flush()
+
+            rsp = self.search('Deferred')
+        finally:
+            siteconfig = SiteConfiguration.objects.get_current()
+            siteconfig.set('search_on_the_fly_indexing', False)
+            siteconfig.save()
+
+        # The scheduling only happens for the first queued update, and all
+        # the updates for the user are coalesced into one.
+        self.assertEqual(len(update_queue._schedule_flush.spy.calls), 1)
+        self.assertEqual(len(signal_processor.update_objects.spy.calls), 1)
+        self.assertTrue(signal_processor.update_objects.spy.last_called_with(
+            User, {user.pk}))
+        self.assertFalse(signal_processor.handle_save.spy.called)
+
+        self.assertEqual(rsp.context['hits_returned'], 1)
+        result = rsp.context['result']
+        self.assertEqual(result.username, 'doc')
+        self.assertEqual(result.groups, 'test-group')
+
     def test_search_by_full_name_public_profile(self):
         """Testing searching by full name for users with public profiles"""
         user = User.objects.get(username='doc')
@@ -704,3 +765,263 @@ class ViewTests(TestCase):
             '<title>Indexed search not enabled',
             rsp.content)
         self.assertNotIn('<form', rsp.content)
+
+
+class SearchIndexerTests(TestCase):
+    """Unit tests for reviewboard.search.indexer.SearchIndexer."""
+
+    fixtures = ['test_users', 'test_scmtools']
+
+    def setUp(self):
+        super(SearchIndexerTests, self).setUp()
+
+        self.tempdir = tempfile.mkdtemp(prefix='rb-tests-search-')
+        self.checkpoint_path = os.path.join(self.tempdir, 'checkpoint.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+        super(SearchIndexerTests, self).tearDown()
+
+    def test_run_with_partitions(self):
+        """Testing SearchIndexer.run indexes every partition"""
+        review_requests = [
+            self.create_review_request(summary='Indexed %d' % i,
+                                       publish=True)
+            for i in range(5)
+        ]
+
+        with search_enabled():
+            indexer = SearchIndexer(partition_size=2, batch_size=1)
+            count, elapsed = indexer.run(rebuild=True,
+                                         checkpoint_path=self.checkpoint_path)
+            rsp = self.client.get(local_site_reverse('search'),
+                                  {'q': 'Indexed',
+                                   'model_filter': 'reviewrequests'})
+
+        self.assertEqual(count,
+                         len(review_requests) +
+                         User.objects.filter(is_active=True).count())
+        self.assertEqual(rsp.context['hits_returned'], len(review_requests))
+
+        # The checkpoint is removed once indexing has finished.
+        self.assertFalse(os.path.exists(self.checkpoint_path))
+
+    def test_run_resume(self):
+        """Testing SearchIndexer.run with resume skips partitions recorded
+        in the checkpoint
+        """
+        with search_enabled():
+            reindex_search()
+
+            self.create_review_request(summary='Skipped', publish=True)
+
+            indexer = SearchIndexer(partition_size=1000)
+            review_request_partitions = [
+                start_pk
+                for model_label, start_pk, end_pk in indexer.get_partitions()
+                if model_label == 'reviews.ReviewRequest'
+            ]
+
+            with open(self.checkpoint_path, 'w') as fp:
+                json.dump(
+                    {
+                        'version': 1,
+                        'partition_size': 1000,
+                        'rebuild': False,
+                        'completed': {
+                            'reviews.ReviewRequest':
+                                review_request_partitions,
+                        },
+                    },
+                    fp)
+
+            count, elapsed = indexer.run(checkpoint_path=self.checkpoint_path,
+                                         resume=True)
+            rsp = self.client.get(local_site_reverse('search'),
+                                  {'q': 'Skipped',
+                                   'model_filter': 'reviewrequests'})
+
+        # Only the users should have been indexed.
+        self.assertEqual(count, User.objects.filter(is_active=True).count())
+        self.assertEqual(rsp.context['hits_returned'], 0)
+
+    def test_review_request_files(self):
+        """Testing ReviewRequestIndex.prefetch_batch loads files in one query
+        """
+        review_request1 = self.create_review_request(create_repository=True,
+                                                     publish=True)
+        diffset = self.create_diffset(review_request1)
+        self.create_filediff(diffset, source_file='/foo', dest_file='/bar')
+        self.create_filediff(diffset, source_file='/baz', dest_file='/baz')
+
+        review_request2 = self.create_review_request(publish=True)
+
+        review_requests = list(ReviewRequest.objects.filter(
+            pk__in=[review_request1.pk, review_request2.pk]).order_by('pk'))
+        index = ReviewRequestIndex()
+
+        with self.assertNumQueries(1):
+            index.prefetch_batch(review_requests)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(index.prepare_file(review_requests[0]),
+                             {('/foo', '/bar'), ('/baz', '/baz')})
+            self.assertEqual(index.prepare_file(review_requests[1]), set())
+
+    def test_review_request_files_reindexed(self):
+        """Testing ReviewRequestIndex.prepare_file reloads files when the
+        same review request is indexed again
+        """
+        review_request = self.create_review_request(create_repository=True,
+                                                    publish=True)
+        diffset = self.create_diffset(review_request)
+        self.create_filediff(diffset, source_file='/foo', dest_file='/bar')
+
+        index = ReviewRequestIndex()
+        self.assertEqual(index.prepare_file(review_request),
+                         {('/foo', '/bar')})
+
+        diffset = self.create_diffset(review_request, revision=2)
+        self.create_filediff(diffset, source_file='/baz', dest_file='/baz')
+
+        self.assertEqual(index.prepare_file(review_request),
+                         {('/foo', '/bar'), ('/baz', '/baz')})
+
+
+class SQLiteSearchBackendTests(TestCase):
+    """Unit tests for reviewboard.search.search_backends.sqlite."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(SQLiteSearchBackendTests, self).setUp()
+
+        self.tempdir = tempfile.mkdtemp(prefix='rb-tests-search-')
+
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('search_enable', True)
+        siteconfig.set('search_backend_id', 'sqlite')
+        siteconfig.set('search_backend_settings', {
+            'sqlite': {
+                'PATH': os.path.join(self.tempdir, 'index.sqlite3'),
+            },
+        })
+        siteconfig.save()
+
+        load_site_config()
+
+    def tearDown(self):
+        siteconfig = SiteConfiguration.objects.get_current()
+        siteconfig.set('search_enable', False)
+        siteconfig.set('search_backend_id', 'whoosh')
+        siteconfig.set('search_backend_settings', {})
+        siteconfig.save()
+
+        load_site_config()
+
+        shutil.rmtree(self.tempdir)
+
+        super(SQLiteSearchBackendTests, self).tearDown()
+
+    def test_search(self):
+        """Testing SQLite search backend with review requests and users"""
+        grumpy = User.objects.get(username='grumpy')
+        review_request = self.create_review_request(
+            summary='Frobnicate the widgets',
+            submitter='doc',
+            target_people=[grumpy],
+            publish=True)
+        reindex_search()
+
+        rsp = self.search('frobnicated')
+        self.assertEqual(rsp.context['hits_returned'], 1)
+
+        result = rsp.context['result']
+        self.assertEqual(result.content_type(), 'reviews.reviewrequest')
+        self.assertEqual(result.summary, review_request.summary)
+        self.assertEqual(result.target_users, [six.text_type(grumpy.pk)])
+        self.assertEqual(result.username, 'doc')
+        self.assertFalse(result.private)
+
+        rsp = self.search('doc')
+        self.assertEqual(
+            {
+                result.id
+                for result in rsp.context['page_obj']
+            },
+            {
+                'auth.user.2',
+                'reviews.reviewrequest.%s' % review_request.pk,
+            })
+
+    @add_fixtures(['test_scmtools'])
+    def test_search_private_repository(self):
+        """Testing SQLite search backend with private review requests"""
+        self.client.login(username='grumpy', password='grumpy')
+        user = User.objects.get(username='grumpy')
+
+        repository = self.create_repository(public=False)
+        review_request = self.create_review_request(repository=repository,
+                                                    summary='Frobnicate',
+                                                    publish=True)
+        reindex_search()
+
+        rsp = self.search('Frobnicate')
+        self.assertEqual(rsp.context['hits_returned'], 0)
+
+        repository.users.add(user)
+
+        rsp = self.search('Frobnicate')
+        self.assertEqual(rsp.context['hits_returned'], 1)
+        self.assertEqual(rsp.context['result'].summary,
+                         review_request.summary)
+
+    def test_update_and_remove(self):
+        """Testing SQLite search backend with incremental updates"""
+        review_request = self.create_review_request(summary='Frobnicate',
+                                                    publish=True)
+        reindex_search()
+
+        backend = connections['default'].get_backend()
+        index = ReviewRequestIndex()
+
+        review_request.summary = 'Defenestrate'
+        review_request.save()
+        backend.update(index, [review_request])
+
+        self.assertEqual(self.search('Frobnicate').context['hits_returned'],
+                         0)
+        self.assertEqual(self.search('Defenestrate').context['hits_returned'],
+                         1)
+
+        backend.remove(review_request)
+
+        self.assertEqual(self.search('Defenestrate').context['hits_returned'],
+                         0)
+
+    def test_build_match_query(self):
+        """Testing SQLite search backend query parsing"""
+        self.assertEqual(build_match_query('foo bar'), '"foo" "bar"')
+        self.assertEqual(build_match_query('foo OR bar'), '"foo" OR "bar"')
+        self.assertEqual(build_match_query('"foo bar" baz*'),
+                         '"foo bar" "baz" *')
+        self.assertEqual(build_match_query('foo -bar -"baz"'),
+                         '("foo") NOT "bar" NOT "baz"')
+        self.assertEqual(build_match_query('doc@example.com'),
+                         '"doc@example.com"')
+        self.assertEqual(build_match_query('say "hi'), '"say" """hi"')
+        self.assertEqual(build_match_query('-foo'), '')
+
+    def search(self, q):
+        """Perform a search with the given query.
+
+        Args:
+            q (unicode):
+                The search query.
+
+        Returns:
+            django.http.HttpResponse:
+            The search results page.
+        """
+        return self.client.get(local_site_reverse('search'), {'q': q})
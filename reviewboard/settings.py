@@ -234,6 +234,93 @@ TEST_RUNNER = 'reviewboard.test.RBTestRunner'
 
 RUNNING_TEST = (os.environ.get(str('RB_RUNNING_TESTS')) == str('1'))
 
+# Whether tasks handed off to background workers (see
+# reviewboard.background) should instead run immediately in the calling
+# thread. This keeps the test suite deterministic.
+RUN_BACKGROUND_TASKS_INLINE = RUNNING_TEST
+
+# The backend used to fan out push notification events to clients. See
+# reviewboard.notifications.push.
+if RUNNING_TEST:
+    PUSH_NOTIFICATIONS_BACKEND = \
+        'reviewboard.notifications.push.InProcessPushBackend'
+else:
+    PUSH_NOTIFICATIONS_BACKEND = \
+        'reviewboard.notifications.push.CachePushBackend'
+
+# Whether raw diff downloads may be sent to clients accepting gzip as a
+# series of gzip members built from the stored diff data, rather than being
+# compressed as a whole. This saves compression time for large diffs, but
+# some clients only read the first member of a gzip stream. See
+# reviewboard.diffviewer.raw_diff.
+SERVE_PRECOMPRESSED_RAW_DIFFS = False
+
+# The number of worker threads used to deliver queued WebHook requests. See
+# reviewboard.notifications.webhooks.
+WEBHOOK_DELIVERY_WORKERS = 4
+
+# The number of seconds between checks for queued WebHook deliveries that
+# are due, such as retries. See reviewboard.notifications.webhooks.
+WEBHOOK_DELIVERY_POLL_INTERVAL = 15
+
+# The number of worker threads used to build and send queued e-mails. See
+# reviewboard.notifications.email.outbox. Queued e-mails are stored in the
+# database until sent. A single worker sends e-mails in the order they were
+# queued, which keeps Message-ID threading intact.
+EMAIL_WORKERS = 1
+
+# The number of seconds between checks for queued e-mails that are due, such
+# as retries. See reviewboard.notifications.email.outbox.
+EMAIL_POLL_INTERVAL = 15
+
+# The number of seconds that review request visit times are buffered before
+# being written to the database in a batch. See reviewboard.accounts.visits.
+REVIEW_REQUEST_VISIT_FLUSH_DELAY = 30
+
+# The maximum number of idle connections kept open to each LDAP or Active
+# Directory server for reuse by later logins. See
+# reviewboard.accounts.backends.ldap_pool. Tests replace the LDAP connection
+# for each test, so connections aren't kept there.
+if RUNNING_TEST:
+    LDAP_CONNECTION_POOL_SIZE = 0
+else:
+    LDAP_CONNECTION_POOL_SIZE = 4
+
+# The number of seconds that a successful LDAP or Active Directory login is
+# remembered, so that repeated logins (such as API requests using HTTP Basic
+# authentication) don't need to contact the server. A value of 0 turns this
+# off. See reviewboard.accounts.backends.credential_cache.
+LDAP_AUTH_CACHE_SECONDS = 60
+
+# The number of seconds that a user's access control snapshot (the private
+# repositories and invite-only groups they can access) is cached. Snapshots
+# are invalidated when access changes, so this only limits how long a
+# snapshot computed by a concurrent request before the change was committed
+# can be used. See reviewboard.reviews.access.
+ACCESS_SNAPSHOT_CACHE_SECONDS = 60
+
+# Whether the daily activity counts shown in the administration dashboard are
+# updated as objects are created and deleted. They're otherwise only updated
+# by the update-activity-stats management command. This is turned off for
+# tests, so that creating objects doesn't perform extra queries. See
+# reviewboard.admin.activity_stats.
+TRACK_ACTIVITY_STATS = not RUNNING_TEST
+
+# The number of seconds that changes to the daily activity counts are
+# buffered before being written to the database in a batch. See
+# reviewboard.admin.activity_stats.
+ACTIVITY_STATS_FLUSH_DELAY = 30
+
+# The number of seconds that API tokens and OAuth2 access tokens are cached
+# after being used to authenticate, so that repeated API requests with the
+# same token don't need to look it up in the database. A value of 0 turns
+# this off. See reviewboard.webapi.token_cache. This is turned off for
+# tests, so that query counts don't depend on earlier requests.
+if RUNNING_TEST:
+    WEBAPI_TOKEN_CACHE_SECONDS = 0
+else:
+    WEBAPI_TOKEN_CACHE_SECONDS = 300
+
 
 LOCAL_ROOT = None
 PRODUCTION = True
@@ -484,6 +571,7 @@ FEATURE_CHECKER = 'reviewboard.features.checkers.RBFeatureChecker'
 OAUTH2_PROVIDER = {
     'APPLICATION_MODEL': 'oauth.Application',
     'DEFAULT_SCOPES': 'root:read',
+    'OAUTH2_VALIDATOR_CLASS': 'reviewboard.oauth.validators.OAuth2Validator',
     'SCOPES': {},
 }
 
@@ -0,0 +1,702 @@
+"""Connection multiplexing for rbssh.
+
+Every SSH operation performed through :command:`rbssh` normally starts a
+new process, initializes Review Board, loads keys, and performs a full SSH
+handshake and authentication before running a command. For tools like Git,
+Mercurial, and Bazaar, which may run many commands in quick succession,
+this adds a lot of overhead.
+
+In control master mode, the first :command:`rbssh` invocation for a given
+host, port, user, and Local Site starts a long-lived control master process.
+This holds an authenticated SSH transport and listens on a Unix domain
+socket. Later invocations connect to that socket and ask the control master
+to open a new channel on the existing transport, relaying their standard
+input, output, and error over the socket. The control master exits after it
+has been idle for a while, or when its transport disconnects.
+
+The client side of this module only uses the standard library, so that
+:command:`rbssh` doesn't need to initialize Django (or load paramiko) to use
+an existing control master.
+"""
+
+from __future__ import unicode_literals
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import select
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+
+#: The default number of seconds a control master stays alive when idle.
+DEFAULT_IDLE_TIMEOUT = 5 * 60
+
+#: The number of seconds to wait for a new control master to start.
+MASTER_START_TIMEOUT = 15
+
+#: The maximum amount of data read or sent at a time.
+BUFFER_SIZE = 32 * 1024
+
+#: Sent by a client to open a channel. The payload is a JSON object.
+FRAME_OPEN = b'O'
+
+#: Sent by the control master when a channel was opened.
+FRAME_OPENED = b'K'
+
+#: Sent by the control master when a channel couldn't be opened.
+FRAME_FAILED = b'F'
+
+#: Data for the channel's standard input.
+FRAME_STDIN = b'I'
+
+#: Sent by a client when its standard input has been closed.
+FRAME_STDIN_EOF = b'E'
+
+#: Data from the channel's standard output.
+FRAME_STDOUT = b'1'
+
+#: Data from the channel's standard error.
+FRAME_STDERR = b'2'
+
+#: Sent by the control master with the command's exit status.
+FRAME_EXIT = b'X'
+
+_frame_header = struct.Struct(str('!cI'))
+_exit_status = struct.Struct(str('!i'))
+
+
+class MultiplexerUnavailable(Exception):
+    """A control master could not be used.
+
+    Callers should fall back on connecting directly.
+    """
+
+
+def is_supported():
+    """Return whether control master mode is supported on this platform.
+
+    Returns:
+        bool:
+        ``True`` if Unix domain sockets are available.
+    """
+    return (hasattr(socket, 'AF_UNIX') and
+            sys.platform not in ('cygwin', 'win32'))
+
+
+def get_control_dir():
+    """Return the directory containing control master sockets.
+
+    This can be set through the :envvar:`RBSSH_CONTROL_DIR` environment
+    variable. The directory will be created if needed, and must only be
+    accessible by the current user.
+
+    Returns:
+        unicode:
+        The path to the directory.
+
+    Raises:
+        MultiplexerUnavailable:
+            The directory could not be created, or is accessible by other
+            users.
+    """
+    control_dir = os.getenv(str('RBSSH_CONTROL_DIR'))
+
+    if not control_dir:
+        control_dir = os.path.join(tempfile.gettempdir(),
+                                   'rbssh-%s' % os.getuid())
+
+    try:
+        os.mkdir(control_dir, 0o700)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise MultiplexerUnavailable(
+                'Unable to create control directory %s: %s'
+                % (control_dir, e))
+
+    st = os.stat(control_dir)
+
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise MultiplexerUnavailable(
+            'Control directory %s must be owned by the current user and '
+            'not be accessible by other users'
+            % control_dir)
+
+    return control_dir
+
+
+def get_control_socket_path(hostname, port, username, local_site_name=None,
+                            control_dir=None):
+    """Return the path to the control socket for a connection.
+
+    There's one control master for each combination of host, port, user,
+    and Local Site (which determines the SSH keys used).
+
+    Args:
+        hostname (unicode):
+            The host being connected to.
+
+        port (int):
+            The port being connected to.
+
+        username (unicode):
+            The user logging in on the remote host.
+
+        local_site_name (unicode, optional):
+            The name of the Local Site whose keys are used.
+
+        control_dir (unicode, optional):
+            The directory containing the sockets. Defaults to the result of
+            :py:func:`get_control_dir`.
+
+    Returns:
+        unicode:
+        The path to the control socket.
+    """
+    if control_dir is None:
+        control_dir = get_control_dir()
+
+    key = json.dumps([hostname, port, username, local_site_name])
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    return os.path.join(control_dir, 'rbssh-%s.sock' % digest[:20])
+
+
+def send_frame(sock, frame_type, payload=b''):
+    """Send a frame over a socket.
+
+    Args:
+        sock (socket.socket):
+            The socket to send on.
+
+        frame_type (bytes):
+            The type of frame.
+
+        payload (bytes, optional):
+            The payload for the frame.
+    """
+    sock.sendall(_frame_header.pack(frame_type, len(payload)) + payload)
+
+
+def recv_frame(sock):
+    """Receive a frame from a socket.
+
+    Args:
+        sock (socket.socket):
+            The socket to receive from.
+
+    Returns:
+        tuple:
+        A 2-tuple of the frame type and payload, or ``None`` if the socket
+        was closed.
+    """
+    header = _recv_exact(sock, _frame_header.size)
+
+    if header is None:
+        return None
+
+    frame_type, length = _frame_header.unpack(header)
+
+    if length:
+        payload = _recv_exact(sock, length)
+
+        if payload is None:
+            return None
+    else:
+        payload = b''
+
+    return frame_type, payload
+
+
+def _recv_exact(sock, length):
+    """Receive an exact amount of data from a socket.
+
+    Args:
+        sock (socket.socket):
+            The socket to receive from.
+
+        length (int):
+            The number of bytes to receive.
+
+    Returns:
+        bytes:
+        The data, or ``None`` if the socket was closed first.
+    """
+    chunks = []
+
+    while length > 0:
+        chunk = sock.recv(min(length, BUFFER_SIZE))
+
+        if not chunk:
+            return None
+
+        chunks.append(chunk)
+        length -= len(chunk)
+
+    return b''.join(chunks)
+
+
+def connect_to_master(socket_path):
+    """Connect to a running control master.
+
+    Args:
+        socket_path (unicode):
+            The path to the control socket.
+
+    Returns:
+        socket.socket:
+        The connected socket, or ``None`` if no control master is listening.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        sock.connect(socket_path)
+    except socket.error:
+        sock.close()
+        return None
+
+    return sock
+
+
+def run_client(sock, command=None, subsystem=None, stdin=None, stdout=None,
+               stderr=None):
+    """Run a command through a control master.
+
+    This asks the control master to open a channel for the command (or
+    subsystem), and relays data between the channel and the standard
+    streams until the command exits.
+
+    Args:
+        sock (socket.socket):
+            The socket connected to the control master.
+
+        command (unicode, optional):
+            The command to execute.
+
+        subsystem (unicode, optional):
+            The subsystem to invoke, instead of a command.
+
+        stdin (file, optional):
+            The file to read input from. Defaults to :py:data:`sys.stdin`.
+
+        stdout (file, optional):
+            The file to write output to. Defaults to :py:data:`sys.stdout`.
+
+        stderr (file, optional):
+            The file to write errors to. Defaults to :py:data:`sys.stderr`.
+
+    Returns:
+        int:
+        The exit status of the command.
+
+    Raises:
+        MultiplexerUnavailable:
+            The control master could not open a channel. Nothing has been
+            sent or received on the standard streams at this point.
+    """
+    stdin_fd = (stdin or sys.stdin).fileno()
+    stdout = _get_binary_file(stdout or sys.stdout)
+    stderr = _get_binary_file(stderr or sys.stderr)
+
+    try:
+        send_frame(sock, FRAME_OPEN, json.dumps({
+            'command': command,
+            'subsystem': subsystem,
+        }).encode('utf-8'))
+
+        frame = recv_frame(sock)
+    except socket.error as e:
+        raise MultiplexerUnavailable(
+            'Lost connection to the control master: %s' % e)
+
+    if frame is None:
+        raise MultiplexerUnavailable('Lost connection to the control master')
+
+    frame_type, payload = frame
+
+    if frame_type != FRAME_OPENED:
+        raise MultiplexerUnavailable(payload.decode('utf-8', 'replace'))
+
+    stdin_open = True
+
+    while True:
+        if stdin_open:
+            read_fds = [sock, stdin_fd]
+        else:
+            read_fds = [sock]
+
+        ready = select.select(read_fds, [], [])[0]
+
+        if sock in ready:
+            frame = recv_frame(sock)
+
+            if frame is None:
+                logging.error('Lost connection to the control master')
+                return 255
+
+            frame_type, payload = frame
+
+            if frame_type == FRAME_STDOUT:
+                stdout.write(payload)
+                stdout.flush()
+            elif frame_type == FRAME_STDERR:
+                stderr.write(payload)
+                stderr.flush()
+            elif frame_type == FRAME_EXIT:
+                return _exit_status.unpack(payload)[0]
+
+        if stdin_open and stdin_fd in ready:
+            try:
+                data = os.read(stdin_fd, BUFFER_SIZE)
+            except OSError:
+                data = None
+
+            if data:
+                send_frame(sock, FRAME_STDIN, data)
+            else:
+                send_frame(sock, FRAME_STDIN_EOF)
+                stdin_open = False
+
+
+def _get_binary_file(fp):
+    """Return a version of a standard stream that accepts bytes.
+
+    Args:
+        fp (file):
+            The standard stream.
+
+    Returns:
+        file:
+        The file to write bytes to.
+    """
+    return getattr(fp, 'buffer', fp)
+
+
+def run_multiplexed(hostname, port, username, local_site_name,
+                    master_args, command=None, subsystem=None):
+    """Run a command through a control master, starting one if needed.
+
+    Args:
+        hostname (unicode):
+            The host being connected to.
+
+        port (int):
+            The port being connected to.
+
+        username (unicode):
+            The user logging in on the remote host.
+
+        local_site_name (unicode):
+            The name of the Local Site whose keys are used.
+
+        master_args (list of unicode):
+            The command line used to start a control master, if one isn't
+            already running.
+
+        command (unicode, optional):
+            The command to execute.
+
+        subsystem (unicode, optional):
+            The subsystem to invoke, instead of a command.
+
+    Returns:
+        int:
+        The exit status of the command, or ``None`` if a control master
+        couldn't be used. In that case, the caller should connect directly.
+    """
+    try:
+        socket_path = get_control_socket_path(hostname, port, username,
+                                              local_site_name)
+    except MultiplexerUnavailable as e:
+        logging.debug('Not using a control master: %s', e)
+        return None
+
+    sock = connect_to_master(socket_path)
+
+    if sock is None:
+        sock = _start_master(socket_path, master_args)
+
+        if sock is None:
+            return None
+
+    try:
+        return run_client(sock, command=command, subsystem=subsystem)
+    except MultiplexerUnavailable as e:
+        logging.debug('Unable to use the control master: %s', e)
+        return None
+    finally:
+        sock.close()
+
+
+def _start_master(socket_path, master_args):
+    """Start a control master and connect to it.
+
+    Args:
+        socket_path (unicode):
+            The path to the control socket.
+
+        master_args (list of unicode):
+            The command line used to start the control master.
+
+    Returns:
+        socket.socket:
+        The socket connected to the new control master, or ``None`` if it
+        failed to start.
+    """
+    logging.debug('Starting control master for %s', socket_path)
+
+    with open(os.devnull, 'r+') as devnull:
+        process = subprocess.Popen(master_args,
+                                   stdin=devnull,
+                                   stdout=devnull,
+                                   stderr=devnull,
+                                   close_fds=True,
+                                   preexec_fn=os.setsid)
+
+    deadline = time.time() + MASTER_START_TIMEOUT
+
+    while time.time() < deadline:
+        sock = connect_to_master(socket_path)
+
+        if sock is not None:
+            return sock
+
+        if process.poll() is not None:
+            # The master exited. Another process may have started one at
+            # the same time, so try one last time before giving up.
+            return connect_to_master(socket_path)
+
+        time.sleep(0.05)
+
+    logging.debug('Timed out waiting for the control master for %s',
+                  socket_path)
+
+    return None
+
+
+class ControlMaster(object):
+    """A control master holding an authenticated SSH transport.
+
+    This listens on a control socket, opening a channel on the transport for
+    each client that connects.
+    """
+
+    #: How often the idle timeout and transport are checked, in seconds.
+    poll_interval = 1
+
+    def __init__(self, transport, socket_path,
+                 idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        """Initialize the control master.
+
+        Args:
+            transport (paramiko.Transport):
+                The authenticated transport.
+
+            socket_path (unicode):
+                The path to the control socket.
+
+            idle_timeout (int, optional):
+                The number of seconds to keep running without any sessions.
+        """
+        self.transport = transport
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+
+        self._lock = threading.Lock()
+        self._active_sessions = 0
+        self._last_activity = time.time()
+
+    def serve(self):
+        """Serve clients until idle or disconnected.
+
+        If another control master is already serving on the socket, this
+        will return immediately.
+
+        Returns:
+            bool:
+            ``True`` if this control master served on the socket. ``False``
+            if another one was already running.
+        """
+        # The lock file ensures only one control master runs per socket,
+        # even if several clients try to start one at once. Whoever holds it
+        # can safely replace any stale socket file.
+        import fcntl
+
+        lock_fp = open('%s.lock' % self.socket_path, 'w')
+
+        try:
+            fcntl.flock(lock_fp, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            lock_fp.close()
+            return False
+
+        try:
+            self._remove_socket()
+
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            old_umask = os.umask(0o177)
+
+            try:
+                listener.bind(self.socket_path)
+            finally:
+                os.umask(old_umask)
+
+            listener.listen(16)
+            listener.settimeout(self.poll_interval)
+
+            try:
+                self._accept_loop(listener)
+            finally:
+                listener.close()
+                self._remove_socket()
+        finally:
+            lock_fp.close()
+
+        return True
+
+    def _accept_loop(self, listener):
+        """Accept clients until the control master should stop.
+
+        Args:
+            listener (socket.socket):
+                The listening control socket.
+        """
+        while self._should_run():
+            try:
+                conn = listener.accept()[0]
+            except socket.timeout:
+                continue
+
+            conn.setblocking(True)
+
+            with self._lock:
+                self._active_sessions += 1
+
+            thread = threading.Thread(target=self._run_session, args=(conn,))
+            thread.daemon = True
+            thread.start()
+
+    def _should_run(self):
+        """Return whether the control master should keep running.
+
+        Returns:
+            bool:
+            ``True`` if the transport is active and either there are active
+            sessions or the idle timeout hasn't yet been reached.
+        """
+        if not self.transport.is_active():
+            logging.debug('Control master transport disconnected')
+            return False
+
+        with self._lock:
+            return (self._active_sessions > 0 or
+                    time.time() - self._last_activity < self.idle_timeout)
+
+    def _remove_socket(self):
+        """Remove the control socket, if it exists."""
+        try:
+            os.unlink(self.socket_path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    def _run_session(self, conn):
+        """Run a session for a client.
+
+        Args:
+            conn (socket.socket):
+                The socket connected to the client.
+        """
+        try:
+            frame = recv_frame(conn)
+
+            if frame is None or frame[0] != FRAME_OPEN:
+                return
+
+            request = json.loads(frame[1].decode('utf-8'))
+
+            try:
+                channel = self.transport.open_session()
+
+                if request.get('subsystem'):
+                    channel.invoke_subsystem(request['subsystem'])
+                else:
+                    channel.exec_command(request['command'])
+            except Exception as e:
+                logging.debug('Unable to open channel: %s', e)
+                send_frame(conn, FRAME_FAILED,
+                           ('%s' % e).encode('utf-8'))
+                return
+
+            send_frame(conn, FRAME_OPENED)
+
+            try:
+                self._relay(conn, channel)
+            finally:
+                channel.close()
+        except Exception as e:
+            logging.exception('Unexpected error in control master '
+                              'session: %s',
+                              e)
+        finally:
+            conn.close()
+
+            with self._lock:
+                self._active_sessions -= 1
+                self._last_activity = time.time()
+
+    def _relay(self, conn, channel):
+        """Relay data between a client and a channel.
+
+        Args:
+            conn (socket.socket):
+                The socket connected to the client.
+
+            channel (paramiko.Channel):
+                The channel running the client's command.
+        """
+        while True:
+            # paramiko only signals standard output through select(), so a
+            # timeout is used to make sure standard error and channel
+            # closure are noticed.
+            ready = select.select([conn, channel], [], [], 0.1)[0]
+
+            while channel.recv_ready():
+                send_frame(conn, FRAME_STDOUT, channel.recv(BUFFER_SIZE))
+
+            while channel.recv_stderr_ready():
+                send_frame(conn, FRAME_STDERR,
+                           channel.recv_stderr(BUFFER_SIZE))
+
+            if (channel.closed or
+                (channel.eof_received and channel.exit_status_ready())):
+                if not channel.recv_ready() and \
+                   not channel.recv_stderr_ready():
+                    status = channel.recv_exit_status()
+
+                    if status < 0:
+                        status = 255
+
+                    send_frame(conn, FRAME_EXIT, _exit_status.pack(status))
+                    return
+
+            if conn in ready:
+                frame = recv_frame(conn)
+
+                if frame is None:
+                    # The client went away.
+                    return
+
+                frame_type, payload = frame
+
+                if frame_type == FRAME_STDIN:
+                    channel.sendall(payload)
+                elif frame_type == FRAME_STDIN_EOF:
+                    channel.shutdown_write()
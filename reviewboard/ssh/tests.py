@@ -1,14 +1,25 @@
 from __future__ import unicode_literals
 
+import io
 import os
 import shutil
+import socket
+import struct
 import tempfile
+import threading
 
 import paramiko
 from django.utils.encoding import force_str
 
 from reviewboard.ssh.client import SSHClient
 from reviewboard.ssh.errors import UnsupportedSSHKeyError
+from reviewboard.ssh.multiplexer import (FRAME_EXIT, FRAME_FAILED,
+                                         FRAME_OPEN, FRAME_OPENED,
+                                         FRAME_STDERR, FRAME_STDIN,
+                                         FRAME_STDIN_EOF, FRAME_STDOUT,
+                                         MultiplexerUnavailable,
+                                         get_control_socket_path,
+                                         recv_frame, run_client, send_frame)
 from reviewboard.ssh.storage import FileSSHStorage
 from reviewboard.testing.testcase import TestCase
 
@@ -240,3 +251,124 @@ class SSHClientTests(SSHTestCase):
     def test_import_user_key_with_localsite(self):
         """Testing SSHClient.import_user_key with localsite"""
         self.test_import_user_key('site-1')
+
+
+class MultiplexerTests(TestCase):
+    """Unit tests for reviewboard.ssh.multiplexer."""
+
+    def test_get_control_socket_path(self):
+        """Testing get_control_socket_path"""
+        path = get_control_socket_path('example.com', 22, 'user',
+                                       control_dir='/tmp/rbssh')
+
+        self.assertTrue(path.startswith('/tmp/rbssh/rbssh-'))
+        self.assertEqual(
+            path,
+            get_control_socket_path('example.com', 22, 'user',
+                                    control_dir='/tmp/rbssh'))
+        self.assertNotEqual(
+            path,
+            get_control_socket_path('example.com', 22, 'user', 'site-1',
+                                    control_dir='/tmp/rbssh'))
+        self.assertNotEqual(
+            path,
+            get_control_socket_path('example.com', 2222, 'user',
+                                    control_dir='/tmp/rbssh'))
+
+    def test_frames(self):
+        """Testing send_frame and recv_frame"""
+        sock1, sock2 = socket.socketpair()
+
+        try:
+            send_frame(sock1, FRAME_STDIN, b'x' * 100000)
+            send_frame(sock1, FRAME_STDIN_EOF)
+
+            self.assertEqual(recv_frame(sock2), (FRAME_STDIN, b'x' * 100000))
+            self.assertEqual(recv_frame(sock2), (FRAME_STDIN_EOF, b''))
+
+            sock1.close()
+            self.assertIsNone(recv_frame(sock2))
+        finally:
+            sock1.close()
+            sock2.close()
+
+    def test_run_client(self):
+        """Testing run_client relays output and the exit status"""
+        received = []
+
+        def _serve(sock):
+            received.append(recv_frame(sock))
+            send_frame(sock, FRAME_OPENED)
+            send_frame(sock, FRAME_STDOUT, b'output')
+            send_frame(sock, FRAME_STDERR, b'error')
+
+            while True:
+                frame = recv_frame(sock)
+                received.append(frame)
+
+                if frame[0] == FRAME_STDIN_EOF:
+                    break
+
+            send_frame(sock, FRAME_EXIT, struct.pack(str('!i'), 3))
+
+        stdout = io.BytesIO()
+        stderr = io.BytesIO()
+        status = self._run_client(_serve, stdout=stdout, stderr=stderr,
+                                  stdin_data=b'input')
+
+        self.assertEqual(status, 3)
+        self.assertEqual(stdout.getvalue(), b'output')
+        self.assertEqual(stderr.getvalue(), b'error')
+        self.assertEqual(received[0][0], FRAME_OPEN)
+        self.assertEqual(received[1:],
+                         [(FRAME_STDIN, b'input'), (FRAME_STDIN_EOF, b'')])
+
+    def test_run_client_with_failed_channel(self):
+        """Testing run_client when the control master can't open a channel
+        """
+        def _serve(sock):
+            recv_frame(sock)
+            send_frame(sock, FRAME_FAILED, b'Channel refused')
+
+        with self.assertRaisesMessage(MultiplexerUnavailable,
+                                      'Channel refused'):
+            self._run_client(_serve, stdout=io.BytesIO(),
+                             stderr=io.BytesIO())
+
+    def _run_client(self, serve_func, stdout, stderr, stdin_data=b''):
+        """Run a command using a fake control master.
+
+        Args:
+            serve_func (callable):
+                The function implementing the control master's side of the
+                session.
+
+            stdout (io.BytesIO):
+                The buffer to write output to.
+
+            stderr (io.BytesIO):
+                The buffer to write errors to.
+
+            stdin_data (bytes, optional):
+                The data to provide on standard input.
+
+        Returns:
+            int:
+            The exit status returned by :py:func:`run_client`.
+        """
+        client_sock, master_sock = socket.socketpair()
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, stdin_data)
+        os.close(write_fd)
+
+        thread = threading.Thread(target=serve_func, args=(master_sock,))
+        thread.start()
+
+        try:
+            with os.fdopen(read_fd, 'rb') as stdin:
+                return run_client(client_sock, command='echo',
+                                  stdin=stdin, stdout=stdout, stderr=stderr)
+        finally:
+            thread.join()
+            client_sock.close()
+            master_sock.close()
@@ -30,6 +30,10 @@
  *         A string-encoded timestamp representing the last time there was
  *         known activity on the review request.
  *
+ *     pushUpdatesEnabled (boolean):
+ *         Whether the server can push notifications of updates to the page,
+ *         instead of the page checking periodically.
+ *
  *     pendingReview (RB.Review):
  *         The pending review (which may or may not yet have a server-side
  *         representation) used for any new review content.
@@ -43,6 +47,7 @@ RB.ReviewablePage = RB.Page.extend({
         checkUpdatesType: null,
         lastActivityTimestamp: null,
         pendingReview: null,
+        pushUpdatesEnabled: false,
         reviewRequest: null,
     }, RB.Page.prototype.defaults),
 
@@ -165,6 +170,7 @@ RB.ReviewablePage = RB.Page.extend({
             lastActivityTimestamp: rsp.lastActivityTimestamp,
             checkForUpdates: rsp.checkForUpdates,
             checkUpdatesType: rsp.checkUpdatesType,
+            pushUpdatesEnabled: rsp.pushUpdatesEnabled,
         };
     },
 
@@ -180,6 +186,7 @@ RB.ReviewablePage = RB.Page.extend({
     _registerForUpdates() {
         this.get('reviewRequest').beginCheckForUpdates(
             this.get('checkUpdatesType'),
-            this.get('lastActivityTimestamp'));
+            this.get('lastActivityTimestamp'),
+            this.get('pushUpdatesEnabled'));
     },
 });
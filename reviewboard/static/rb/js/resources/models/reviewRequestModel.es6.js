@@ -404,25 +404,73 @@ RB.ReviewRequest = RB.BaseResource.extend({
      *
      *     lastUpdateTimestamp (string):
      *         The timestamp of the last known update.
+     *
+     *     pushUpdatesEnabled (boolean, optional):
+     *         Whether the server can push notifications of updates. If not,
+     *         updates will be checked for periodically.
      */
-    beginCheckForUpdates(type, lastUpdateTimestamp) {
+    beginCheckForUpdates(type, lastUpdateTimestamp, pushUpdatesEnabled=false) {
         this._checkUpdatesType = type;
         this._lastUpdateTimestamp = lastUpdateTimestamp;
 
         this.ready({
-            ready: () => setTimeout(this._checkForUpdates.bind(this),
-                                    RB.ReviewRequest.CHECK_UPDATES_MSECS)
+            ready: () => {
+                if (pushUpdatesEnabled &&
+                    window.EventSource &&
+                    this.get('reviewURL')) {
+                    this._listenForUpdates();
+                } else {
+                    this._scheduleCheckForUpdates();
+                }
+            }
         });
     },
 
+    /**
+     * Listen for update notifications pushed from the server.
+     *
+     * This opens a Server-Sent Events stream for the review request, and
+     * checks for updates only when the server announces new activity. If the
+     * stream can't be used, this falls back to polling.
+     */
+    _listenForUpdates() {
+        const eventSource = new EventSource(
+            `${this.get('reviewURL')}_events/`);
+
+        eventSource.onmessage = () => this._checkForUpdates(false);
+        eventSource.onerror = () => {
+            if (eventSource.readyState === EventSource.CLOSED) {
+                /*
+                 * The browser has given up reconnecting to the stream, so
+                 * go back to polling.
+                 */
+                this._scheduleCheckForUpdates();
+            }
+        };
+    },
+
+    /**
+     * Schedule the next periodic check for updates.
+     */
+    _scheduleCheckForUpdates() {
+        setTimeout(this._checkForUpdates.bind(this),
+                   RB.ReviewRequest.CHECK_UPDATES_MSECS);
+    },
+
     /**
      * Check for updates.
      *
      * This is called periodically after an initial call to
-     * beginCheckForUpdates. It will see if there's a new update yet on the
-     * server, and if there is, trigger the 'updated' event.
+     * beginCheckForUpdates, or when the server notifies us of new activity.
+     * It will see if there's a new update yet on the server, and if there is,
+     * trigger the 'updated' event.
+     *
+     * Args:
+     *     reschedule (boolean, optional):
+     *         Whether to schedule another check afterward. This defaults to
+     *         ``true``.
      */
-    _checkForUpdates() {
+    _checkForUpdates(reschedule=true) {
         RB.apiCall({
             type: 'GET',
             prefix: this.get('sitePrefix'),
@@ -439,8 +487,9 @@ RB.ReviewRequest = RB.BaseResource.extend({
 
                 this._lastUpdateTimestamp = lastUpdate.timestamp;
 
-                setTimeout(this._checkForUpdates.bind(this),
-                           RB.ReviewRequest.CHECK_UPDATES_MSECS);
+                if (reschedule) {
+                    this._scheduleCheckForUpdates();
+                }
             }
         });
     },
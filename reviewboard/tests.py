@@ -3,12 +3,16 @@
 from __future__ import unicode_literals
 
 import os
+import threading
 
 from django.utils import six
 from djblets.staticbundles import (
     PIPELINE_JAVASCRIPT as DJBLETS_PIPELINE_JAVASCRIPT,
     PIPELINE_STYLESHEETS as DJBLETS_PIPELINE_STYLESHEETS)
+from kgb import SpyAgency
 
+from reviewboard.background import (BackgroundTaskQueue, DelayedBatchBuffer,
+                                    PeriodicTask, run_in_background)
 from reviewboard.staticbundles import PIPELINE_JAVASCRIPT, PIPELINE_STYLESHEETS
 from reviewboard.testing import TestCase
 
@@ -49,3 +53,87 @@ class StaticBundlesTests(TestCase):
         """Testing that all static stylesheet files exist"""
         self._check_file_groups(PIPELINE_STYLESHEETS,
                                 DJBLETS_PIPELINE_STYLESHEETS.keys())
+
+
+class BackgroundTaskQueueTests(SpyAgency, TestCase):
+    """Unit tests for reviewboard.background."""
+
+    def test_add(self):
+        """Testing BackgroundTaskQueue.add runs tasks in worker threads"""
+        results = []
+        task_queue = BackgroundTaskQueue('test')
+
+        for i in range(5):
+            task_queue.add(results.append, i)
+
+        task_queue.join()
+
+        self.assertEqual(sorted(results), [0, 1, 2, 3, 4])
+
+    def test_add_with_error(self):
+        """Testing BackgroundTaskQueue.add continues after a task fails"""
+        results = []
+        task_queue = BackgroundTaskQueue('test', num_workers=1)
+
+        task_queue.add(lambda: 1 / 0)
+        task_queue.add(results.append, 1)
+        task_queue.join()
+
+        self.assertEqual(results, [1])
+
+    def test_run_in_background_inline(self):
+        """Testing run_in_background with RUN_BACKGROUND_TASKS_INLINE"""
+        results = []
+
+        with self.settings(RUN_BACKGROUND_TASKS_INLINE=True):
+            run_in_background(results.append, 1)
+
+        self.assertEqual(results, [1])
+
+    def test_periodic_task(self):
+        """Testing PeriodicTask runs when started and when woken"""
+        ran = threading.Event()
+        results = []
+
+        def _func():
+            results.append(len(results))
+            ran.set()
+
+        task = PeriodicTask('test', _func, interval=3600)
+        task.start()
+
+        self.assertTrue(ran.wait(5))
+        ran.clear()
+
+        task.wake()
+
+        self.assertTrue(ran.wait(5))
+        self.assertEqual(results, [0, 1])
+
+    def test_delayed_batch_buffer(self):
+        """Testing DelayedBatchBuffer combines items into one batch"""
+        batches = []
+
+        class SumBuffer(DelayedBatchBuffer):
+            queue_name = 'test'
+
+            def combine(self, old_value, new_value):
+                return old_value + new_value
+
+            def process(self, items):
+                batches.append(items)
+
+        buffer = SumBuffer(delay=30)
+        self.spy_on(buffer._schedule_flush, call_original=False)
+
+        buffer.add_item('a', 1)
+        buffer.add_item('b', 2)
+        buffer.add_item('a', 3)
+
+        self.assertEqual(len(buffer._schedule_flush.spy.calls), 1)
+        self.assertEqual(batches, [])
+
+        buffer.flush()
+        buffer.flush()
+
+        self.assertEqual(batches, [{'a': 4, 'b': 2}])
@@ -0,0 +1,13 @@
+from __future__ import unicode_literals
+
+from reviewboard.signals import initializing
+
+
+def _connect_signals(**kwargs):
+    """Connect signal handlers for the API token cache."""
+    from reviewboard.webapi import token_cache
+
+    token_cache.connect_signals()
+
+
+initializing.connect(_connect_signals)
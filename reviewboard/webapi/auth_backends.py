@@ -8,6 +8,7 @@ from djblets.webapi.auth.backends.oauth2_tokens import OAuth2TokenBackendMixin
 
 from reviewboard.accounts.backends import AuthBackend
 from reviewboard.webapi.models import WebAPIToken
+from reviewboard.webapi.token_cache import get_webapi_token
 
 
 class TokenAuthBackend(TokenAuthBackendMixin, AuthBackend):
@@ -16,10 +17,47 @@ class TokenAuthBackend(TokenAuthBackendMixin, AuthBackend):
     This will handle authenticating users and their API tokens for API
     requests. It's only used for API requests that specify a username and a
     token.
+
+    Tokens are looked up through :py:mod:`reviewboard.webapi.token_cache`,
+    so that repeated requests with the same token don't need to query the
+    database.
     """
 
     api_token_model = WebAPIToken
 
+    def authenticate(self, token=None, **kwargs):
+        """Authenticate a user, given a token.
+
+        Args:
+            token (unicode, optional):
+                The API token to authenticate with.
+
+            **kwargs (dict):
+                Other credentials, which are ignored.
+
+        Returns:
+            django.contrib.auth.models.User:
+            The user owning the token, if a token matched and the user is
+            active. Otherwise, ``None`` is returned.
+        """
+        if not token:
+            return None
+
+        webapi_token = get_webapi_token(token)
+
+        if webapi_token is None:
+            return None
+
+        user = webapi_token.user
+
+        if not user.is_active:
+            return None
+
+        # This is used to store the token in the session after logging in.
+        user._webapi_token = webapi_token
+
+        return user
+
 
 class OAuth2TokenAuthBackend(OAuth2TokenBackendMixin, AuthBackend):
     """An OAuth2 token authentication backend that handles local sites.
@@ -4,6 +4,7 @@ import copy
 import json
 import logging
 
+from django.contrib import auth
 from django.utils import six
 from django.utils.encoding import force_text
 from django.utils.six.moves.urllib.parse import quote as urllib_quote
@@ -128,6 +129,82 @@ class RBResourceMixin(APIQueryUtilsMixin, ResourceAPITokenMixin,
     #: enabled, the resource will return a 403 Forbidden error.
     required_features = []
 
+    def call_method_view(self, request, method, view, *args, **kwargs):
+        """Check token access policies and call the API method handler.
+
+        This replaces the policy checks from
+        :py:class:`~djblets.webapi.resources.mixins.api_tokens.
+        ResourceAPITokenMixin`, checking against the token's compiled
+        policy (see :py:mod:`reviewboard.webapi.token_policy`) instead of
+        interpreting the policy on every request. The results are the same.
+
+        Args:
+            request (django.http.HttpRequest):
+                The current HTTP request.
+
+            method (unicode):
+                The HTTP method.
+
+            view (callable):
+                The view.
+
+            *args (tuple):
+                Additional positional arguments.
+
+            **kwargs (dict):
+                Additional keyword arguments.
+
+        Returns:
+            WebAPIError or tuple:
+            Either a 403 Forbidden error or the result of calling the method
+            view.
+        """
+        webapi_token = self._get_api_token_for_request(request)
+
+        if webapi_token:
+            if not self.api_token_access_allowed:
+                return PERMISSION_DENIED
+
+            if not webapi_token.compiled_policy.is_resource_method_allowed(
+                    self.policy_id, method, kwargs.get(self.uri_object_key)):
+                # The token's policies disallow access to this resource.
+                return PERMISSION_DENIED
+
+        # The token has already been checked, so skip past
+        # ResourceAPITokenMixin.
+        return super(ResourceAPITokenMixin, self).call_method_view(
+            request, method, view, *args, **kwargs)
+
+    def _get_api_token_for_request(self, request):
+        """Return the API token used to authenticate the request.
+
+        Args:
+            request (django.http.HttpRequest):
+                The current HTTP request.
+
+        Returns:
+            reviewboard.webapi.models.WebAPIToken:
+            The API token, or ``None`` if the request wasn't authenticated
+            with an API token.
+        """
+        webapi_token = getattr(request, '_webapi_token', None)
+
+        if not webapi_token:
+            webapi_token_id = request.session.get('webapi_token_id')
+
+            if webapi_token_id:
+                try:
+                    webapi_token = self.api_token_model.objects.get(
+                        pk=webapi_token_id,
+                        user=request.user)
+                except self.api_token_model.DoesNotExist:
+                    # This token is no longer valid. Log the user out.
+                    auth.logout(request)
+
+                request._webapi_token = webapi_token
+
+        return webapi_token
+
 
 class WebAPIResource(RBResourceMixin, DjbletsWebAPIResource):
     """A specialization of the Djblets WebAPIResource for Review Board."""
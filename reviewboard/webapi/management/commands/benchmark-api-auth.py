@@ -0,0 +1,144 @@
+from __future__ import unicode_literals
+
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.client import Client
+from django.test.utils import override_settings
+from django.utils.translation import ugettext as _
+from oauth2_provider.models import AccessToken
+
+from reviewboard.webapi.models import WebAPIToken
+from reviewboard.webapi.token_cache import (get_oauth2_access_token,
+                                            get_webapi_token,
+                                            invalidate_tokens)
+
+
+class Command(BaseCommand):
+    help = _('Measures the time spent authenticating API requests made with '
+             'an API token or OAuth2 access token, with and without token '
+             'caching. By default, the most recently created token is used.')
+
+    option_list = BaseCommand.option_list + (
+        make_option('--token',
+                    dest='token',
+                    default=None,
+                    help=_('The token to authenticate with.')),
+        make_option('--oauth2',
+                    action='store_true',
+                    default=False,
+                    dest='oauth2',
+                    help=_('Use an OAuth2 access token instead of an API '
+                           'token.')),
+        make_option('--iterations',
+                    type='int',
+                    default=200,
+                    dest='iterations',
+                    help=_('The number of times to authenticate.')),
+    )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        use_oauth2 = options['oauth2']
+
+        if iterations < 1:
+            raise CommandError(_('--iterations must be a positive number.'))
+
+        if use_oauth2:
+            token_type = 'oauth2'
+            token_model = AccessToken
+            get_token = get_oauth2_access_token
+            auth_header = 'Bearer %s'
+        else:
+            token_type = 'api'
+            token_model = WebAPIToken
+            get_token = get_webapi_token
+            auth_header = 'token %s'
+
+        token = options['token']
+
+        if token is None:
+            try:
+                token = token_model.objects.latest('pk').token
+            except token_model.DoesNotExist:
+                raise CommandError(_('There are no tokens to authenticate '
+                                     'with. Specify one using --token.'))
+
+        if get_token(token) is None:
+            raise CommandError(_('The token was not found.'))
+
+        # Don't allow queries to be stored.
+        settings.DEBUG = False
+
+        client = Client(HTTP_AUTHORIZATION=auth_header % token)
+
+        def _lookup():
+            get_token(token)
+
+        def _request():
+            client.logout()
+            response = client.get('/api/')
+
+            if response.status_code != 200:
+                raise CommandError(
+                    _('The API request failed with HTTP %d.')
+                    % response.status_code)
+
+        self.stdout.write('%-30s %10s %10s %10s'
+                          % (_('Operation'), _('Median'), _('95th %'),
+                             _('Max')))
+
+        for label, func in ((_('Token lookup'), _lookup),
+                            (_('API request'), _request)):
+            invalidate_tokens(token_type, [token])
+
+            with override_settings(WEBAPI_TOKEN_CACHE_SECONDS=0):
+                self._write_timings(_('%s (uncached)') % label,
+                                    self._time(func, iterations))
+
+            self._write_timings(_('%s (cached)') % label,
+                                self._time(func, iterations))
+
+    def _time(self, func, iterations):
+        """Time a function.
+
+        Args:
+            func (callable):
+                The function to time.
+
+            iterations (int):
+                The number of times to call the function.
+
+        Returns:
+            list of float:
+            The time taken by each call, in milliseconds.
+        """
+        timings = []
+
+        for i in range(iterations):
+            start_time = time.time()
+            func()
+            timings.append((time.time() - start_time) * 1000)
+
+        return timings
+
+    def _write_timings(self, label, timings):
+        """Write a row of timings.
+
+        Args:
+            label (unicode):
+                The label for the row.
+
+            timings (list of float):
+                The timings, in milliseconds.
+        """
+        timings = sorted(timings)
+
+        self.stdout.write(
+            '%-30s %8.2fms %8.2fms %8.2fms'
+            % (label[:30],
+               timings[len(timings) // 2],
+               timings[min(int(len(timings) * 0.95), len(timings) - 1)],
+               timings[-1]))
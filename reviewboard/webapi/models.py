@@ -5,6 +5,7 @@ from django.utils.translation import ugettext_lazy as _
 from djblets.webapi.models import BaseWebAPIToken
 
 from reviewboard.site.models import LocalSite
+from reviewboard.webapi.token_policy import CompiledTokenPolicy
 
 
 class WebAPIToken(BaseWebAPIToken):
@@ -21,6 +22,26 @@ class WebAPIToken(BaseWebAPIToken):
     local_site = models.ForeignKey(LocalSite, related_name='webapi_tokens',
                                    blank=True, null=True)
 
+    @property
+    def compiled_policy(self):
+        """The token's policy, compiled for fast access checks.
+
+        The policy is compiled the first time this is accessed, and again
+        whenever a new policy is assigned to the token. Since the compiled
+        policy is stored on the token, it's cached along with the token.
+
+        Type:
+            reviewboard.webapi.token_policy.CompiledTokenPolicy
+        """
+        compiled_policy = getattr(self, '_compiled_policy', None)
+
+        if (compiled_policy is None or
+            compiled_policy.policy is not self.policy):
+            compiled_policy = CompiledTokenPolicy(self.policy)
+            self._compiled_policy = compiled_policy
+
+        return compiled_policy
+
     @classmethod
     def get_root_resource(self):
         from reviewboard.webapi.resources import resources
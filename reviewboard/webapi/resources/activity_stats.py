@@ -0,0 +1,111 @@
+from __future__ import unicode_literals
+
+import datetime
+
+from django.utils import six, timezone
+from djblets.webapi.decorators import (webapi_request_fields,
+                                       webapi_response_errors)
+from djblets.webapi.errors import (INVALID_FORM_DATA, NOT_LOGGED_IN,
+                                   PERMISSION_DENIED)
+from djblets.webapi.fields import DateTimeFieldType
+
+from reviewboard.admin.activity_stats import (OBJECT_TYPES,
+                                              get_activity_totals,
+                                              get_daily_activity_counts)
+from reviewboard.webapi.base import WebAPIResource
+from reviewboard.webapi.decorators import (webapi_check_login_required,
+                                           webapi_check_local_site)
+
+
+class ActivityStatsResource(WebAPIResource):
+    """Statistics on activity on the Review Board server.
+
+    This contains the total number of comments, reviews, review requests,
+    users and other objects on the server, along with the number created
+    on each day in a range of dates. These are the same statistics shown in
+    the administration dashboard, and are only available to administrators.
+
+    Daily counts are grouped by UTC date, and days with no activity are left
+    out. The ``user_logins`` counts are the number of users whose last login
+    was on each day.
+
+    Counts are periodically recomputed, and may briefly lag behind the
+    objects actually on the server.
+    """
+
+    added_in = '4.0'
+
+    name = 'activity_stats'
+    policy_id = 'activity_stats'
+    singleton = True
+    mimetype_item_resource_name = 'activity-stats'
+
+    #: The number of days of activity returned by default.
+    DEFAULT_DAYS = 30
+
+    @webapi_check_local_site
+    @webapi_response_errors(INVALID_FORM_DATA, NOT_LOGGED_IN,
+                            PERMISSION_DENIED)
+    @webapi_check_login_required
+    @webapi_request_fields(
+        optional={
+            'start': {
+                'type': DateTimeFieldType,
+                'description': 'The first day to return daily counts for. '
+                               'This defaults to 29 days before ``end``, '
+                               'for a total of 30 days. This must be a '
+                               'valid :term:`date/time format`.',
+            },
+            'end': {
+                'type': DateTimeFieldType,
+                'description': 'The last day to return daily counts for. '
+                               'This defaults to the current day. This must '
+                               'be a valid :term:`date/time format`.',
+            },
+        },
+    )
+    def get(self, request, start=None, end=None, *args, **kwargs):
+        """Returns the activity statistics for the server."""
+        if not (request.user.is_authenticated() and request.user.is_staff):
+            return self.get_no_access_error(request)
+
+        if end is None:
+            end = timezone.now().date()
+        else:
+            end = end.date()
+
+        if start is None:
+            start = end - datetime.timedelta(days=self.DEFAULT_DAYS - 1)
+        else:
+            start = start.date()
+
+        if start > end:
+            return INVALID_FORM_DATA, {
+                'fields': {
+                    'start': ['This must not be later than the end date.'],
+                },
+            }
+
+        daily_counts = get_daily_activity_counts(OBJECT_TYPES, start=start,
+                                                 end=end)
+
+        return 200, {
+            self.item_result_key: {
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'totals': get_activity_totals(OBJECT_TYPES),
+                'daily': dict(
+                    (object_type, [
+                        {
+                            'date': date.isoformat(),
+                            'count': count,
+                        }
+                        for date, count in counts
+                    ])
+                    for object_type, counts in six.iteritems(daily_counts)
+                ),
+            },
+        }
+
+
+activity_stats_resource = ActivityStatsResource()
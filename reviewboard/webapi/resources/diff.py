@@ -3,7 +3,6 @@ from __future__ import unicode_literals
 import logging
 
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
-from django.http import HttpResponse
 from django.utils import six
 from djblets.util.http import get_http_requested_mimetype, set_last_modified
 from djblets.webapi.decorators import (webapi_login_required,
@@ -22,6 +21,7 @@ from djblets.webapi.fields import (DateTimeFieldType,
 from reviewboard.diffviewer.errors import DiffTooBigError, EmptyDiffError
 from reviewboard.diffviewer.features import dvcs_feature
 from reviewboard.diffviewer.models import DiffSet
+from reviewboard.diffviewer.raw_diff import build_raw_diff_response
 from reviewboard.reviews.forms import UploadDiffForm
 from reviewboard.reviews.models import ReviewRequest, ReviewRequestDraft
 from reviewboard.scmtools.errors import FileNotFoundError
@@ -186,9 +186,7 @@ class DiffResource(WebAPIResource):
             return DOES_NOT_EXIST
 
         tool = review_request.repository.get_scmtool()
-        data = tool.get_parser('').raw_diff(diffset)
-
-        resp = HttpResponse(data, content_type='text/x-patch')
+        resp = build_raw_diff_response(request, tool.get_parser(''), diffset)
 
         if diffset.name == 'diff':
             filename = 'bug%s.patch' % \
@@ -1,19 +1,95 @@
 from __future__ import unicode_literals
 
-from django.core.exceptions import ObjectDoesNotExist
-from djblets.webapi.decorators import webapi_login_required
-from djblets.webapi.errors import DOES_NOT_EXIST
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import transaction
+from django.utils import six
+from djblets.webapi.decorators import (webapi_login_required,
+                                       webapi_request_fields,
+                                       webapi_response_errors)
+from djblets.webapi.errors import (DOES_NOT_EXIST, INVALID_FORM_DATA,
+                                   NOT_LOGGED_IN, PERMISSION_DENIED)
+from djblets.webapi.fields import (DictFieldType,
+                                   IntFieldType,
+                                   ListFieldType)
 
+from reviewboard.accounts.models import ReviewRequestVisit
+from reviewboard.diffviewer.models import FileDiff
+from reviewboard.reviews.errors import PublishError
+from reviewboard.reviews.models import Comment, Review
 from reviewboard.webapi.base import WebAPIResource
 from reviewboard.webapi.decorators import webapi_check_local_site
+from reviewboard.webapi.errors import PUBLISH_ERROR
+from reviewboard.webapi.mixins import MarkdownFieldsMixin
 from reviewboard.webapi.resources import resources
+from reviewboard.webapi.resources.base_diff_comment import \
+    BaseDiffCommentResource
+from reviewboard.webapi.resources.base_review import BaseReviewResource
+
+
+class _ReviewUpdateFailed(Exception):
+    """Signals that a draft review couldn't be updated.
+
+    This is raised to roll back the transaction creating the review.
+
+    Attributes:
+        result (tuple or djblets.webapi.errors.WebAPIError):
+            The error payload to return.
+    """
+
+    def __init__(self, result):
+        """Initialize the exception.
+
+        Args:
+            result (tuple or djblets.webapi.errors.WebAPIError):
+                The error payload to return.
+        """
+        super(_ReviewUpdateFailed, self).__init__()
+
+        self.result = result
 
 
 class ReviewDraftResource(WebAPIResource):
-    """A redirecting resource that points to the current draft review."""
+    """A redirecting resource that points to the current draft review.
+
+    This can also be used to create or update the draft review along with
+    many diff comments at once, and optionally publish it, in a single
+    request. This is much faster than creating each comment separately, and
+    is intended for automated tools that post large reviews.
+    """
     name = 'review_draft'
     singleton = True
     uri_name = 'draft'
+    allowed_methods = ('GET', 'POST')
+    mimetype_item_resource_name = 'review'
+
+    #: The required fields for each entry in ``diff_comments``.
+    DIFF_COMMENT_REQUIRED_FIELDS = dict({
+        'filediff_id': {
+            'type': IntFieldType,
+            'description': 'The ID of the file diff the comment is on.',
+        },
+        'first_line': {
+            'type': IntFieldType,
+            'description': 'The line number the comment starts at.',
+        },
+        'num_lines': {
+            'type': IntFieldType,
+            'description': 'The number of lines the comment spans.',
+        },
+    }, **BaseDiffCommentResource.REQUIRED_CREATE_FIELDS)
+
+    #: The optional fields for each entry in ``diff_comments``.
+    DIFF_COMMENT_OPTIONAL_FIELDS = {
+        'interfilediff_id': {
+            'type': IntFieldType,
+            'description': 'The ID of the second file diff in the '
+                           'interdiff the comment is on.',
+        },
+        'issue_opened':
+            BaseDiffCommentResource.OPTIONAL_CREATE_FIELDS['issue_opened'],
+        'text_type':
+            BaseDiffCommentResource.OPTIONAL_CREATE_FIELDS['text_type'],
+    }
 
     @webapi_check_local_site
     @webapi_login_required
@@ -35,5 +111,250 @@ class ReviewDraftResource(WebAPIResource):
                 resources.review.get_href(review, request, *args, **kwargs)),
         }
 
+    @webapi_check_local_site
+    @webapi_login_required
+    @webapi_response_errors(DOES_NOT_EXIST, INVALID_FORM_DATA, NOT_LOGGED_IN,
+                            PERMISSION_DENIED, PUBLISH_ERROR)
+    @webapi_request_fields(
+        required={
+            'diff_comments': {
+                'type': ListFieldType,
+                'items': {
+                    'type': DictFieldType,
+                },
+                'description': 'A JSON list of diff comments to add to the '
+                               'draft review. Each comment is an object '
+                               'with ``filediff_id``, ``first_line``, '
+                               '``num_lines`` and ``text`` keys, and '
+                               'optional ``interfilediff_id``, '
+                               '``issue_opened`` and ``text_type`` keys. '
+                               'These work the same as the fields for '
+                               'creating a single diff comment.',
+            },
+        },
+        optional=BaseReviewResource.CREATE_UPDATE_OPTIONAL_FIELDS,
+        allow_unknown=True
+    )
+    def create(self, request, diff_comments, public=False,
+               publish_to_owner_only=False, publish_and_archive=False,
+               *args, **kwargs):
+        """Adds many diff comments to the draft review at once.
+
+        This creates a draft review if the user doesn't already have one,
+        adds all the comments in ``diff_comments`` to it, and updates any
+        other fields of the review that are provided. If ``public`` is true,
+        the review is then published. This all happens in a single request,
+        and the comments are stored together, which is much faster than
+        creating each comment separately. The comments are inserted with one
+        query, followed by one query to look up their IDs (the database
+        layer can't return the IDs of rows inserted together).
+
+        If any of the comments are invalid, nothing is added and the errors
+        are reported for the ``diff_comments`` field.
+
+        On success, this returns :http:`201` with the review in the payload
+        and a ``Location`` header pointing to it.
+
+        Extensions listening for new comments will receive a single
+        ``comments_bulk_created`` signal for the batch, rather than a
+        ``post_save`` signal for each comment.
+        """
+        try:
+            review_request = \
+                resources.review_request.get_object(request, *args, **kwargs)
+        except ObjectDoesNotExist:
+            return DOES_NOT_EXIST
+
+        comments, errors = self._build_diff_comments(review_request,
+                                                     diff_comments)
+
+        if errors:
+            return INVALID_FORM_DATA, {
+                'fields': {
+                    'diff_comments': errors,
+                },
+            }
+
+        try:
+            with transaction.atomic():
+                review, is_new = Review.objects.get_or_create(
+                    review_request=review_request,
+                    user=request.user,
+                    public=False,
+                    base_reply_to__isnull=True)
+
+                result = resources.review.update_review(request, review,
+                                                        *args, **kwargs)
+
+                if not isinstance(result, tuple) or result[0] != 200:
+                    # Raising rolls back the new draft review and any
+                    # changes made to it.
+                    raise _ReviewUpdateFailed(result)
+
+                review.add_comments(comments, user=request.user)
+        except _ReviewUpdateFailed as e:
+            return e.result
+
+        if public:
+            if is_new:
+                # These are the only comments in the review, so the number
+                # of issues opened is already known.
+                open_issue_count = sum(
+                    1
+                    for comment in comments
+                    if comment.issue_opened
+                )
+            else:
+                open_issue_count = None
+
+            try:
+                review.publish(user=request.user,
+                               to_owner_only=publish_to_owner_only,
+                               request=request,
+                               open_issue_count=open_issue_count)
+            except PublishError as e:
+                return PUBLISH_ERROR.with_message(six.text_type(e))
+
+            if publish_and_archive:
+                ReviewRequestVisit.objects.update_visibility(
+                    review_request, request.user,
+                    ReviewRequestVisit.ARCHIVED)
+
+        return 201, {
+            'review': review,
+        }, {
+            'Location': resources.review.get_href(review, request,
+                                                  *args, **kwargs),
+        }
+
+    def _build_diff_comments(self, review_request, diff_comments):
+        """Build diff comments from the data provided by the client.
+
+        All file diffs are checked in a single query.
+
+        Args:
+            review_request (reviewboard.reviews.models.ReviewRequest):
+                The review request being reviewed.
+
+            diff_comments (list of dict):
+                The data for each comment.
+
+        Returns:
+            tuple:
+            A 2-tuple of:
+
+            * The new, unsaved comments
+              (:py:class:`list` of
+              :py:class:`~reviewboard.reviews.models.Comment`).
+            * A list of error messages, if any of the comments were invalid
+              (:py:class:`list` of :py:class:`unicode`).
+        """
+        errors = []
+        cleaned_comments = []
+
+        for i, data in enumerate(diff_comments, start=1):
+            cleaned_data, comment_errors = self._clean_diff_comment(data)
+
+            if comment_errors:
+                errors += [
+                    'Comment %d: %s' % (i, error)
+                    for error in comment_errors
+                ]
+            else:
+                cleaned_comments.append((i, cleaned_data))
+
+        filediff_ids = set()
+
+        for i, cleaned_data in cleaned_comments:
+            filediff_ids.add(cleaned_data['filediff_id'])
+
+            if cleaned_data.get('interfilediff_id'):
+                filediff_ids.add(cleaned_data['interfilediff_id'])
+
+        valid_filediff_ids = set(
+            FileDiff.objects
+            .filter(pk__in=filediff_ids,
+                    diffset__history__review_request=review_request)
+            .values_list('pk', flat=True))
+        comments = []
+
+        for i, cleaned_data in cleaned_comments:
+            filediff_id = cleaned_data['filediff_id']
+            interfilediff_id = cleaned_data.get('interfilediff_id')
+
+            if filediff_id not in valid_filediff_ids:
+                errors.append('Comment %d: This is not a valid filediff ID.'
+                              % i)
+            elif interfilediff_id == filediff_id:
+                errors.append('Comment %d: The interfilediff ID cannot be '
+                              'the same as filediff_id.'
+                              % i)
+            elif (interfilediff_id and
+                  interfilediff_id not in valid_filediff_ids):
+                errors.append('Comment %d: This is not a valid '
+                              'interfilediff ID.'
+                              % i)
+
+            issue_opened = cleaned_data.get('issue_opened', False)
+
+            if issue_opened:
+                issue_status = Comment.OPEN
+            else:
+                issue_status = None
+
+            comments.append(Comment(
+                filediff_id=filediff_id,
+                interfilediff_id=interfilediff_id or None,
+                first_line=cleaned_data['first_line'],
+                num_lines=cleaned_data['num_lines'],
+                text=cleaned_data['text'].strip(),
+                rich_text=(cleaned_data.get('text_type') ==
+                           MarkdownFieldsMixin.TEXT_TYPE_MARKDOWN),
+                issue_opened=issue_opened,
+                issue_status=issue_status))
+
+        return comments, errors
+
+    def _clean_diff_comment(self, data):
+        """Validate and normalize the data for a single diff comment.
+
+        Args:
+            data (dict):
+                The data for the comment.
+
+        Returns:
+            tuple:
+            A 2-tuple of:
+
+            * The normalized data (:py:class:`dict`).
+            * A list of error messages (:py:class:`list` of
+              :py:class:`unicode`).
+        """
+        cleaned_data = {}
+        errors = []
+
+        for fields, required in ((self.DIFF_COMMENT_REQUIRED_FIELDS, True),
+                                 (self.DIFF_COMMENT_OPTIONAL_FIELDS, False)):
+            for field_name, info in sorted(six.iteritems(fields)):
+                value = data.get(field_name)
+
+                if value is None:
+                    if required:
+                        errors.append('The %s field is required.'
+                                      % field_name)
+
+                    continue
+
+                try:
+                    cleaned_data[field_name] = \
+                        info['type'](info).clean_value(value)
+                except (TypeError, ValidationError) as e:
+                    errors.append('Invalid value for %s: %s'
+                                  % (field_name,
+                                     '; '.join(getattr(e, 'messages',
+                                                       [six.text_type(e)]))))
+
+        return cleaned_data, errors
+
 
 review_draft_resource = ReviewDraftResource()
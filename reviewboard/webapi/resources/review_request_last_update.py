@@ -10,6 +10,7 @@ from djblets.webapi.fields import (ChoiceFieldType,
                                    StringFieldType)
 
 from reviewboard.diffviewer.models import DiffSet
+from reviewboard.reviews.activity import get_activity_version
 from reviewboard.reviews.models import Review, ReviewRequest
 from reviewboard.webapi.base import WebAPIResource
 from reviewboard.webapi.decorators import (webapi_check_local_site,
@@ -81,16 +82,21 @@ class ReviewRequestLastUpdateResource(WebAPIResource):
                                                                review_request):
             return self.get_no_access_error(request)
 
+        # The activity version changes any time there's new public activity
+        # on the review request, so we can check it before doing the more
+        # expensive work of finding out what that activity was.
+        etag = encode_etag('%s:%s' % (
+            review_request.pk,
+            get_activity_version(review_request.pk)))
+
+        if etag_if_none_match(request, etag):
+            return HttpResponseNotModified()
+
         info = review_request.get_last_activity_info()
         timestamp = info['timestamp']
         updated_object = info['updated_object']
         changedesc = info['changedesc']
 
-        etag = encode_etag('%s:%s' % (timestamp, updated_object.pk))
-
-        if etag_if_none_match(request, etag):
-            return HttpResponseNotModified()
-
         summary = None
         update_type = None
 
@@ -9,6 +9,9 @@ api_token_list_mimetype = _build_mimetype('api-tokens')
 api_token_item_mimetype = _build_mimetype('api-token')
 
 
+activity_stats_mimetype = _build_mimetype('activity-stats')
+
+
 archived_item_mimetype = _build_mimetype('archived-review-request')
 
 
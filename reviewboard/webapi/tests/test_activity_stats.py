@@ -0,0 +1,88 @@
+from __future__ import unicode_literals
+
+from djblets.webapi.errors import INVALID_FORM_DATA, PERMISSION_DENIED
+
+from reviewboard.admin.activity_stats import update_activity_counts
+from reviewboard.webapi.resources import resources
+from reviewboard.webapi.tests.base import BaseWebAPITestCase
+from reviewboard.webapi.tests.mimetypes import activity_stats_mimetype
+from reviewboard.webapi.tests.urls import get_activity_stats_url
+
+
+class ResourceTests(BaseWebAPITestCase):
+    """Testing the ActivityStatsResource APIs."""
+
+    fixtures = ['test_users']
+    sample_api_url = 'activity-stats/'
+    resource = resources.activity_stats
+
+    def test_get(self):
+        """Testing the GET activity-stats/ API"""
+        review_request = self.create_review_request(publish=True)
+        self.create_review(review_request, publish=True)
+        update_activity_counts()
+
+        self._login_user(admin=True)
+
+        rsp = self.api_get(get_activity_stats_url(),
+                           expected_mimetype=activity_stats_mimetype)
+
+        self.assertEqual(rsp['stat'], 'ok')
+
+        stats_rsp = rsp['activity_stats']
+        self.assertEqual(stats_rsp['totals']['review_requests'], 1)
+        self.assertEqual(stats_rsp['totals']['reviews'], 1)
+        self.assertEqual(len(stats_rsp['daily']['reviews']), 1)
+        self.assertEqual(stats_rsp['daily']['reviews'][0]['count'], 1)
+        self.assertEqual(stats_rsp['daily']['reviews'][0]['date'],
+                         stats_rsp['end'])
+
+    def test_get_with_range(self):
+        """Testing the GET activity-stats/ API with start and end"""
+        review_request = self.create_review_request(publish=True)
+        self.create_review(review_request, publish=True)
+        update_activity_counts()
+
+        self._login_user(admin=True)
+
+        rsp = self.api_get(
+            get_activity_stats_url(),
+            {
+                'start': '2017-01-01',
+                'end': '2017-01-31',
+            },
+            expected_mimetype=activity_stats_mimetype)
+
+        self.assertEqual(rsp['stat'], 'ok')
+
+        stats_rsp = rsp['activity_stats']
+        self.assertEqual(stats_rsp['start'], '2017-01-01')
+        self.assertEqual(stats_rsp['end'], '2017-01-31')
+        self.assertEqual(stats_rsp['totals']['reviews'], 1)
+        self.assertEqual(stats_rsp['daily']['reviews'], [])
+
+    def test_get_with_invalid_range(self):
+        """Testing the GET activity-stats/ API with start after end"""
+        self._login_user(admin=True)
+
+        rsp = self.api_get(
+            get_activity_stats_url(),
+            {
+                'start': '2017-02-01',
+                'end': '2017-01-31',
+            },
+            expected_status=400)
+
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], INVALID_FORM_DATA.code)
+        self.assertIn('start', rsp['fields'])
+
+    def test_get_not_admin(self):
+        """Testing the GET activity-stats/ API as a non-administrator"""
+        self._login_user()
+
+        rsp = self.api_get(get_activity_stats_url(),
+                           expected_status=403)
+
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], PERMISSION_DENIED.code)
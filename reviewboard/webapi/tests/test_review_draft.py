@@ -0,0 +1,244 @@
+from __future__ import unicode_literals
+
+import json
+
+from djblets.webapi.errors import INVALID_FORM_DATA
+
+from reviewboard.reviews.models import Review, ReviewRequest
+from reviewboard.webapi.resources import resources
+from reviewboard.webapi.tests.base import BaseWebAPITestCase
+from reviewboard.webapi.tests.mimetypes import review_item_mimetype
+from reviewboard.webapi.tests.urls import (get_review_draft_url,
+                                           get_review_item_url)
+
+
+class ResourceTests(BaseWebAPITestCase):
+    """Testing the ReviewDraftResource APIs."""
+
+    fixtures = ['test_users', 'test_scmtools']
+    sample_api_url = 'review-requests/<id>/reviews/draft/'
+    resource = resources.review_draft
+
+    def setUp(self):
+        super(ResourceTests, self).setUp()
+
+        self.review_request = self.create_review_request(
+            create_repository=True,
+            publish=True)
+        diffset = self.create_diffset(self.review_request)
+        self.filediff = self.create_filediff(diffset)
+
+    def test_post(self):
+        """Testing the POST review-requests/<id>/reviews/draft/ API"""
+        rsp = self.api_post(
+            get_review_draft_url(self.review_request),
+            {
+                'body_top': 'Found some problems.',
+                'diff_comments': json.dumps([
+                    {
+                        'filediff_id': self.filediff.pk,
+                        'first_line': i,
+                        'num_lines': 1,
+                        'text': 'Comment %d' % i,
+                        'issue_opened': i % 2 == 0,
+                    }
+                    for i in range(1, 51)
+                ]),
+            },
+            expected_mimetype=review_item_mimetype)
+
+        self.assertEqual(rsp['stat'], 'ok')
+
+        review = Review.objects.get(pk=rsp['review']['id'])
+        self.assertFalse(review.public)
+        self.assertEqual(review.user, self.user)
+        self.assertEqual(review.body_top, 'Found some problems.')
+
+        comments = list(review.comments.order_by('pk'))
+        self.assertEqual(len(comments), 50)
+        self.assertEqual(comments[0].text, 'Comment 1')
+        self.assertEqual(comments[0].filediff, self.filediff)
+        self.assertFalse(comments[0].issue_opened)
+        self.assertTrue(comments[1].issue_opened)
+        self.assertEqual(comments[1].issue_status, comments[1].OPEN)
+
+    def test_post_with_public(self):
+        """Testing the POST review-requests/<id>/reviews/draft/ API with
+        public=1
+        """
+        rsp = self.api_post(
+            get_review_draft_url(self.review_request),
+            {
+                'public': True,
+                'diff_comments': json.dumps([
+                    {
+                        'filediff_id': self.filediff.pk,
+                        'first_line': i,
+                        'num_lines': 1,
+                        'text': 'Comment %d' % i,
+                        'issue_opened': True,
+                    }
+                    for i in range(1, 11)
+                ]),
+            },
+            expected_mimetype=review_item_mimetype)
+
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertTrue(rsp['review']['public'])
+
+        review = Review.objects.get(pk=rsp['review']['id'])
+        self.assertTrue(review.public)
+        self.assertEqual(review.comments.count(), 10)
+
+        review_request = ReviewRequest.objects.get(pk=self.review_request.pk)
+        self.assertEqual(review_request.issue_open_count, 10)
+
+    def test_post_with_existing_draft(self):
+        """Testing the POST review-requests/<id>/reviews/draft/ API with an
+        existing draft review
+        """
+        review = self.create_review(self.review_request, user=self.user)
+        self.create_diff_comment(review, self.filediff, issue_opened=True)
+
+        rsp = self.api_post(
+            get_review_draft_url(self.review_request),
+            {
+                'public': True,
+                'diff_comments': json.dumps([{
+                    'filediff_id': self.filediff.pk,
+                    'first_line': 10,
+                    'num_lines': 1,
+                    'text': 'New comment',
+                    'issue_opened': True,
+                }]),
+            },
+            expected_mimetype=review_item_mimetype)
+
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertEqual(rsp['review']['id'], review.pk)
+        self.assertEqual(review.comments.count(), 2)
+
+        review_request = ReviewRequest.objects.get(pk=self.review_request.pk)
+        self.assertEqual(review_request.issue_open_count, 2)
+
+    def test_post_with_invalid_comments(self):
+        """Testing the POST review-requests/<id>/reviews/draft/ API with
+        invalid comments
+        """
+        other_review_request = self.create_review_request(
+            repository=self.review_request.repository)
+        other_filediff = self.create_filediff(
+            self.create_diffset(other_review_request))
+
+        rsp = self.api_post(
+            get_review_draft_url(self.review_request),
+            {
+                'diff_comments': json.dumps([
+                    {
+                        'filediff_id': self.filediff.pk,
+                        'first_line': 1,
+                        'num_lines': 1,
+                        'text': 'Valid comment',
+                    },
+                    {
+                        'filediff_id': other_filediff.pk,
+                        'first_line': 1,
+                        'num_lines': 1,
+                        'text': 'Wrong review request',
+                    },
+                    {
+                        'filediff_id': self.filediff.pk,
+                        'first_line': 'abc',
+                        'text': 'Bad line numbers',
+                    },
+                ]),
+            },
+            expected_status=400)
+
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], INVALID_FORM_DATA.code)
+        self.assertEqual(
+            rsp['fields']['diff_comments'],
+            [
+                'Comment 3: Invalid value for first_line: "abc" is not an '
+                'integer',
+                'Comment 3: The num_lines field is required.',
+                'Comment 2: This is not a valid filediff ID.',
+            ])
+        self.assertFalse(Review.objects.filter(
+            review_request=self.review_request).exists())
+
+    def test_post_with_invalid_review_fields(self):
+        """Testing the POST review-requests/<id>/reviews/draft/ API with
+        invalid review fields doesn't create a draft review
+        """
+        rsp = self.api_post(
+            get_review_draft_url(self.review_request),
+            {
+                'extra_data:json': 'not JSON',
+                'diff_comments': json.dumps([{
+                    'filediff_id': self.filediff.pk,
+                    'first_line': 1,
+                    'num_lines': 1,
+                    'text': 'New comment',
+                }]),
+            },
+            expected_status=400)
+
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], INVALID_FORM_DATA.code)
+        self.assertFalse(Review.objects.filter(
+            review_request=self.review_request).exists())
+
+    def test_post_with_published_review(self):
+        """Testing the POST review-requests/<id>/reviews/draft/ API creates
+        a new draft when the user's existing review is published
+        """
+        review = self.create_review(self.review_request, user=self.user,
+                                    publish=True)
+
+        rsp = self.api_post(
+            get_review_draft_url(self.review_request),
+            {
+                'diff_comments': json.dumps([{
+                    'filediff_id': self.filediff.pk,
+                    'first_line': 1,
+                    'num_lines': 1,
+                    'text': 'New comment',
+                }]),
+            },
+            expected_mimetype=review_item_mimetype)
+
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertNotEqual(rsp['review']['id'], review.pk)
+        self.assertEqual(review.comments.count(), 0)
+
+    def test_post_not_logged_in(self):
+        """Testing the POST review-requests/<id>/reviews/draft/ API when not
+        logged in
+        """
+        self.client.logout()
+
+        rsp = self.api_post(
+            get_review_draft_url(self.review_request),
+            {
+                'diff_comments': '[]',
+            },
+            expected_status=401)
+
+        self.assertEqual(rsp['stat'], 'fail')
+
+    def test_post_location(self):
+        """Testing the POST review-requests/<id>/reviews/draft/ API returns
+        the review's location
+        """
+        rsp, response = self.api_post_with_response(
+            get_review_draft_url(self.review_request),
+            {
+                'diff_comments': '[]',
+            },
+            expected_mimetype=review_item_mimetype)
+
+        self.assertEqual(rsp['stat'], 'ok')
+        self.assertTrue(response['Location'].endswith(
+            get_review_item_url(self.review_request, rsp['review']['id'])))
@@ -0,0 +1,115 @@
+"""Unit tests for reviewboard.webapi.token_cache."""
+
+from __future__ import unicode_literals
+
+from django.contrib.auth.models import User
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from reviewboard.testing import TestCase
+from reviewboard.webapi.auth_backends import TokenAuthBackend
+from reviewboard.webapi.token_cache import (get_oauth2_access_token,
+                                            get_webapi_token)
+
+
+@override_settings(WEBAPI_TOKEN_CACHE_SECONDS=300)
+class TokenCacheTests(TestCase):
+    """Unit tests for reviewboard.webapi.token_cache."""
+
+    fixtures = ['test_users']
+
+    def setUp(self):
+        super(TokenCacheTests, self).setUp()
+
+        self.user = User.objects.get(username='doc')
+        self.webapi_token = self.create_webapi_token(self.user)
+
+    def test_get_webapi_token(self):
+        """Testing get_webapi_token caches the token and user"""
+        webapi_token = get_webapi_token(self.webapi_token.token)
+        self.assertEqual(webapi_token.pk, self.webapi_token.pk)
+
+        with self.assertNumQueries(0):
+            webapi_token = get_webapi_token(self.webapi_token.token)
+            self.assertEqual(webapi_token.pk, self.webapi_token.pk)
+            self.assertEqual(webapi_token.user, self.user)
+            self.assertEqual(webapi_token.policy, {'access': 'rw'})
+
+    def test_get_webapi_token_not_found(self):
+        """Testing get_webapi_token with an unknown token"""
+        self.assertIsNone(get_webapi_token('abc123'))
+
+    def test_get_webapi_token_after_update(self):
+        """Testing get_webapi_token after the token is updated"""
+        get_webapi_token(self.webapi_token.token)
+
+        self.webapi_token.policy = {'access': 'ro'}
+        self.webapi_token.save()
+
+        self.assertEqual(get_webapi_token(self.webapi_token.token).policy,
+                         {'access': 'ro'})
+
+    def test_get_webapi_token_after_delete(self):
+        """Testing get_webapi_token after the token is deleted"""
+        get_webapi_token(self.webapi_token.token)
+
+        self.webapi_token.delete()
+
+        self.assertIsNone(get_webapi_token(self.webapi_token.token))
+
+    def test_authenticate_after_user_deactivated(self):
+        """Testing TokenAuthBackend.authenticate after the user is
+        deactivated
+        """
+        backend = TokenAuthBackend()
+
+        self.assertEqual(backend.authenticate(token=self.webapi_token.token),
+                         self.user)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(backend.authenticate(token=self.webapi_token.token))
+
+    def test_get_webapi_token_after_login(self):
+        """Testing get_webapi_token keeps the token cached after the user's
+        last login time is updated
+        """
+        get_webapi_token(self.webapi_token.token)
+
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=('last_login',))
+
+        with self.assertNumQueries(0):
+            get_webapi_token(self.webapi_token.token)
+
+    def test_get_oauth2_access_token(self):
+        """Testing get_oauth2_access_token caches the token, application and
+        user
+        """
+        application = self.create_oauth_application(user=self.user)
+        token = self.create_oauth_token(application, self.user,
+                                        'session:read')
+
+        get_oauth2_access_token(token.token)
+
+        with self.assertNumQueries(0):
+            access_token = get_oauth2_access_token(token.token)
+            self.assertEqual(access_token.pk, token.pk)
+            self.assertEqual(access_token.application, application)
+            self.assertEqual(access_token.user, self.user)
+
+    def test_get_oauth2_access_token_after_application_disabled(self):
+        """Testing get_oauth2_access_token after the application is disabled
+        """
+        application = self.create_oauth_application(user=self.user)
+        token = self.create_oauth_token(application, self.user,
+                                        'session:read')
+
+        get_oauth2_access_token(token.token)
+
+        application.enabled = False
+        application.save()
+
+        self.assertFalse(
+            get_oauth2_access_token(token.token).application.enabled)
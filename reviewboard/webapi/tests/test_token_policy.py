@@ -0,0 +1,270 @@
+"""Unit tests for reviewboard.webapi.token_policy."""
+
+from __future__ import unicode_literals
+
+import pickle
+import random
+
+from django.contrib.auth.models import User
+from djblets.webapi.errors import PERMISSION_DENIED
+from djblets.webapi.resources.mixins.api_tokens import ResourceAPITokenMixin
+
+from reviewboard.testing import TestCase
+from reviewboard.webapi.tests.base import BaseWebAPITestCase
+from reviewboard.webapi.tests.mimetypes import session_mimetype
+from reviewboard.webapi.tests.urls import get_session_url
+from reviewboard.webapi.token_policy import CompiledTokenPolicy
+
+
+class PolicyInterpreter(ResourceAPITokenMixin):
+    """Djblets's interpreted policy checks, for comparison."""
+
+    policy_id = None
+
+    def __init__(self, policy_id):
+        self.policy_id = policy_id
+
+
+class CompiledTokenPolicyTests(TestCase):
+    """Unit tests for reviewboard.webapi.token_policy.CompiledTokenPolicy."""
+
+    POLICY_IDS = ['review_request', 'review', 'user']
+    OBJECT_IDS = ['1', '2', '3', '*']
+    METHODS = ['GET', 'HEAD', 'POST', 'PUT', 'DELETE', '*']
+
+    def test_no_resources(self):
+        """Testing CompiledTokenPolicy with no resources policy"""
+        for policy in (None, {}, {'resources': {}}):
+            compiled_policy = CompiledTokenPolicy(policy)
+
+            self.assertEqual(compiled_policy.rules, {})
+            self.assertTrue(compiled_policy.is_resource_method_allowed(
+                'review_request', 'DELETE', '1'))
+
+    def test_precedence(self):
+        """Testing CompiledTokenPolicy rule precedence"""
+        compiled_policy = CompiledTokenPolicy({
+            'resources': {
+                '*': {
+                    'allow': ['*'],
+                    'block': ['DELETE'],
+                },
+                'review_request': {
+                    '*': {
+                        'block': ['*'],
+                        'allow': ['GET'],
+                    },
+                    '42': {
+                        'allow': ['*'],
+                        'block': ['PUT'],
+                    },
+                },
+            },
+        })
+
+        is_allowed = compiled_policy.is_resource_method_allowed
+
+        self.assertTrue(is_allowed('review_request', 'DELETE', '42'))
+        self.assertFalse(is_allowed('review_request', 'PUT', '42'))
+        self.assertTrue(is_allowed('review_request', 'GET', '1'))
+        self.assertFalse(is_allowed('review_request', 'POST', None))
+        self.assertTrue(is_allowed('review', 'PUT', '1'))
+        self.assertFalse(is_allowed('review', 'DELETE', '1'))
+
+    def test_block_over_allow(self):
+        """Testing CompiledTokenPolicy with a method both blocked and allowed
+        """
+        compiled_policy = CompiledTokenPolicy({
+            'resources': {
+                'review': {
+                    '*': {
+                        'allow': ['GET', 'PUT'],
+                        'block': ['PUT'],
+                    },
+                },
+            },
+        })
+
+        self.assertTrue(compiled_policy.is_resource_method_allowed(
+            'review', 'GET', '1'))
+        self.assertFalse(compiled_policy.is_resource_method_allowed(
+            'review', 'PUT', '1'))
+
+    def test_fuzz_equivalence(self):
+        """Testing CompiledTokenPolicy against the Djblets policy checks with
+        randomly-generated policies
+        """
+        rand = random.Random(4096)
+        interpreters = [
+            PolicyInterpreter(policy_id)
+            for policy_id in self.POLICY_IDS
+        ]
+
+        for i in range(1000):
+            policy = self._make_random_policy(rand)
+            compiled_policy = CompiledTokenPolicy(policy)
+            resources_policy = policy['resources']
+
+            for interpreter in interpreters:
+                for object_id in self.OBJECT_IDS + [None]:
+                    for method in self.METHODS[:-1]:
+                        if resources_policy:
+                            expected = interpreter.is_resource_method_allowed(
+                                resources_policy, method, object_id)
+                        else:
+                            expected = True
+
+                        self.assertEqual(
+                            compiled_policy.is_resource_method_allowed(
+                                interpreter.policy_id, method, object_id),
+                            expected,
+                            'Mismatch for %s %s/%s with policy %r'
+                            % (method, interpreter.policy_id, object_id,
+                               policy))
+
+    def test_webapi_token_compiled_policy(self):
+        """Testing WebAPIToken.compiled_policy"""
+        user = User.objects.create(username='test-user')
+        webapi_token = self.create_webapi_token(user)
+
+        compiled_policy = webapi_token.compiled_policy
+        self.assertIs(compiled_policy.policy, webapi_token.policy)
+        self.assertIs(webapi_token.compiled_policy, compiled_policy)
+
+        webapi_token.policy = {
+            'resources': {
+                '*': {
+                    'block': ['*'],
+                },
+            },
+        }
+
+        self.assertIsNot(webapi_token.compiled_policy, compiled_policy)
+        self.assertFalse(
+            webapi_token.compiled_policy.is_resource_method_allowed(
+                'review', 'GET', None))
+
+    def test_webapi_token_compiled_policy_pickled(self):
+        """Testing WebAPIToken.compiled_policy after pickling the token"""
+        user = User.objects.create(username='test-user')
+        webapi_token = self.create_webapi_token(user)
+        compiled_policy = webapi_token.compiled_policy
+
+        webapi_token = pickle.loads(pickle.dumps(webapi_token))
+
+        self.assertIs(webapi_token.compiled_policy.policy,
+                      webapi_token.policy)
+        self.assertEqual(webapi_token.compiled_policy.rules,
+                         compiled_policy.rules)
+
+    def _make_random_policy(self, rand):
+        """Return a randomly-generated policy.
+
+        Args:
+            rand (random.Random):
+                The random number generator.
+
+        Returns:
+            dict:
+            The policy.
+        """
+        resources_policy = {}
+
+        for policy_id in ['*'] + self.POLICY_IDS:
+            if rand.random() < 0.5:
+                continue
+
+            if policy_id == '*':
+                resources_policy[policy_id] = \
+                    self._make_random_section(rand)
+            else:
+                resources_policy[policy_id] = dict(
+                    (object_id, self._make_random_section(rand))
+                    for object_id in rand.sample(self.OBJECT_IDS,
+                                                 rand.randint(0, 3))
+                )
+
+        return {
+            'resources': resources_policy,
+        }
+
+    def _make_random_section(self, rand):
+        """Return a randomly-generated allow/block policy section.
+
+        Args:
+            rand (random.Random):
+                The random number generator.
+
+        Returns:
+            dict:
+            The policy section.
+        """
+        section = {}
+
+        for key in ('allow', 'block'):
+            if rand.random() < 0.6:
+                section[key] = rand.sample(self.METHODS,
+                                           rand.randint(0, 3))
+
+        return section
+
+
+class TokenPolicyAPITests(BaseWebAPITestCase):
+    """Testing API token policies with API requests."""
+
+    fixtures = ['test_users']
+
+    def test_allowed(self):
+        """Testing API requests with an API token policy allowing access"""
+        rsp = self._get_session({
+            'resources': {
+                '*': {
+                    'block': ['*'],
+                },
+                'session': {
+                    '*': {
+                        'allow': ['GET'],
+                    },
+                },
+            },
+        }, expected_mimetype=session_mimetype)
+
+        self.assertEqual(rsp['stat'], 'ok')
+
+    def test_blocked(self):
+        """Testing API requests with an API token policy blocking access"""
+        rsp = self._get_session({
+            'resources': {
+                'session': {
+                    '*': {
+                        'block': ['GET'],
+                    },
+                },
+            },
+        }, expected_status=403)
+
+        self.assertEqual(rsp['stat'], 'fail')
+        self.assertEqual(rsp['err']['code'], PERMISSION_DENIED.code)
+
+    def _get_session(self, policy, **kwargs):
+        """Return the session resource using a token with the given policy.
+
+        Args:
+            policy (dict):
+                The policy for the token.
+
+            **kwargs (dict):
+                Additional keyword arguments for the request.
+
+        Returns:
+            dict:
+            The parsed response.
+        """
+        self.client.logout()
+
+        webapi_token = self.create_webapi_token(self.user, policy=policy)
+
+        return self.api_get(
+            get_session_url(),
+            HTTP_AUTHORIZATION='token %s' % webapi_token.token,
+            **kwargs)
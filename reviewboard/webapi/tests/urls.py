@@ -18,6 +18,14 @@ def _normalize_id(value, allowed_cls, id_field='pk', ischecker=isinstance):
                          % (allowed_cls, value))
 
 
+#
+# ActivityStatsResource
+#
+def get_activity_stats_url(local_site_name=None):
+    return resources.activity_stats.get_item_url(
+        local_site_name=local_site_name)
+
+
 #
 # APITokenResource
 #
@@ -495,6 +503,15 @@ def get_review_item_url(review_request, review_id, local_site_name=None):
         review_id=review_id)
 
 
+#
+# ReviewDraftResource
+#
+def get_review_draft_url(review_request, local_site_name=None):
+    return resources.review_draft.get_item_url(
+        local_site_name=local_site_name,
+        review_request_id=review_request.display_id)
+
+
 #
 # ReviewDiffCommentResource
 #
@@ -0,0 +1,235 @@
+"""Caching of API tokens used for authentication.
+
+Clients authenticating with an API token or OAuth2 access token send it with
+every request, and each request would otherwise need to look up the token,
+its owner and (for OAuth2) its application in the database before anything
+else can happen. Automated clients can make many requests per second with
+the same long-lived token.
+
+Tokens are instead cached after they're first looked up, along with their
+owner, compiled policy and application, for up to
+``WEBAPI_TOKEN_CACHE_SECONDS`` seconds (and never past an OAuth2 token's
+expiration). Cached tokens are invalidated when the token is updated or
+deleted (revoked), or when its owner or application changes.
+"""
+
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+from djblets.cache.backend import make_cache_key
+from oauth2_provider.models import AccessToken
+
+from reviewboard.oauth.models import Application
+from reviewboard.webapi.models import WebAPIToken
+
+
+def _make_cache_key(token_type, token):
+    """Return the cache key for a cached token.
+
+    Args:
+        token_type (unicode):
+            The type of token (``api`` or ``oauth2``).
+
+        token (unicode):
+            The token string sent by the client.
+
+    Returns:
+        unicode:
+        The cache key.
+    """
+    return make_cache_key('webapi-token-%s-%s'
+                          % (token_type,
+                             hashlib.sha256(token.encode('utf-8'))
+                             .hexdigest()))
+
+
+def get_webapi_token(token):
+    """Return the API token for a token string.
+
+    Args:
+        token (unicode):
+            The token string sent by the client.
+
+    Returns:
+        reviewboard.webapi.models.WebAPIToken:
+        The API token, with its user loaded, or ``None`` if there's no
+        matching token.
+    """
+    cache_key = _make_cache_key('api', token)
+    webapi_token = cache.get(cache_key)
+
+    if webapi_token is None:
+        try:
+            webapi_token = (
+                WebAPIToken.objects
+                .select_related('user')
+                .get(token=token)
+            )
+        except WebAPIToken.DoesNotExist:
+            return None
+
+        if settings.WEBAPI_TOKEN_CACHE_SECONDS:
+            # Compile the policy now, so it's cached along with the token.
+            webapi_token.compiled_policy
+
+            cache.set(cache_key, webapi_token,
+                      settings.WEBAPI_TOKEN_CACHE_SECONDS)
+
+    return webapi_token
+
+
+def get_oauth2_access_token(token):
+    """Return the OAuth2 access token for a token string.
+
+    Args:
+        token (unicode):
+            The token string sent by the client.
+
+    Returns:
+        oauth2_provider.models.AccessToken:
+        The access token, with its user and application loaded, or ``None``
+        if there's no matching token.
+    """
+    cache_key = _make_cache_key('oauth2', token)
+    access_token = cache.get(cache_key)
+
+    if access_token is None:
+        try:
+            access_token = (
+                AccessToken.objects
+                .select_related('application', 'user')
+                .get(token=token)
+            )
+        except AccessToken.DoesNotExist:
+            return None
+
+        expires_in = int((access_token.expires -
+                          timezone.now()).total_seconds())
+        timeout = min(settings.WEBAPI_TOKEN_CACHE_SECONDS, expires_in)
+
+        if timeout > 0:
+            cache.set(cache_key, access_token, timeout)
+
+    return access_token
+
+
+def invalidate_tokens(token_type, tokens):
+    """Remove tokens from the cache.
+
+    This is called automatically when tokens change, and only needs to be
+    called directly if tokens are changed without saving them.
+
+    Args:
+        token_type (unicode):
+            The type of token (``api`` or ``oauth2``).
+
+        tokens (list of unicode):
+            The token strings.
+    """
+    if tokens and settings.WEBAPI_TOKEN_CACHE_SECONDS:
+        cache.delete_many([
+            _make_cache_key(token_type, token)
+            for token in tokens
+        ])
+
+
+def _on_webapi_token_changed(instance, **kwargs):
+    """Remove an API token from the cache when it's updated or deleted.
+
+    Args:
+        instance (reviewboard.webapi.models.WebAPIToken):
+            The token that changed.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    invalidate_tokens('api', [instance.token])
+
+
+def _on_access_token_changed(instance, **kwargs):
+    """Remove an OAuth2 access token from the cache when it changes.
+
+    Args:
+        instance (oauth2_provider.models.AccessToken):
+            The token that changed.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    invalidate_tokens('oauth2', [instance.token])
+
+
+def _on_application_changed(instance, created=False, **kwargs):
+    """Remove an application's access tokens from the cache when it changes.
+
+    Args:
+        instance (reviewboard.oauth.models.Application):
+            The application that changed.
+
+        created (bool, optional):
+            Whether the application was newly created.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    if created or not settings.WEBAPI_TOKEN_CACHE_SECONDS:
+        return
+
+    invalidate_tokens(
+        'oauth2',
+        list(AccessToken.objects
+             .filter(application=instance.pk)
+             .values_list('token', flat=True)))
+
+
+def _on_user_changed(instance, created=False, update_fields=None,
+                     **kwargs):
+    """Remove a user's tokens from the cache when the user changes.
+
+    Saves that only update the last login time (which happens on every
+    login) are ignored.
+
+    Args:
+        instance (django.contrib.auth.models.User):
+            The user that changed.
+
+        created (bool, optional):
+            Whether the user was newly created.
+
+        update_fields (frozenset, optional):
+            The fields that were saved, if only some were saved.
+
+        **kwargs (dict):
+            Additional keyword arguments passed to the signal.
+    """
+    if (created or
+        not settings.WEBAPI_TOKEN_CACHE_SECONDS or
+        (update_fields is not None and
+         set(update_fields) <= {'last_login'})):
+        return
+
+    invalidate_tokens(
+        'api',
+        list(WebAPIToken.objects
+             .filter(user=instance.pk)
+             .values_list('token', flat=True)))
+    invalidate_tokens(
+        'oauth2',
+        list(AccessToken.objects
+             .filter(user=instance.pk)
+             .values_list('token', flat=True)))
+
+
+def connect_signals():
+    """Connect the signal handlers that invalidate cached tokens."""
+    for signal in (post_save, post_delete):
+        signal.connect(_on_webapi_token_changed, sender=WebAPIToken)
+        signal.connect(_on_access_token_changed, sender=AccessToken)
+        signal.connect(_on_application_changed, sender=Application)
+        signal.connect(_on_user_changed, sender=User)
@@ -0,0 +1,130 @@
+"""Compiled access policies for API tokens.
+
+An API token's policy is a JSON document listing which HTTP methods are
+allowed or blocked for each resource (by policy ID), for specific objects
+within a resource, and globally. Djblets interprets this document on every
+request, walking the nested dictionaries and lists to find a matching rule.
+
+This module instead compiles a policy once into a flat decision table keyed
+by ``(policy ID, method, object ID)``, where the method and object ID may be
+the ``*`` wildcard. Checking a request then only requires a handful of
+dictionary lookups, in the same order of precedence as Djblets:
+
+1. The rules for the specific object in the resource's policy.
+2. The ``*`` rules in the resource's policy.
+3. The global ``*`` rules.
+
+Within each of those, a rule for the specific method takes precedence over a
+``*`` method rule, and blocked methods take precedence over allowed ones. If
+no rules match, access is allowed.
+"""
+
+from __future__ import unicode_literals
+
+from django.utils import six
+
+
+#: The wildcard used for policy IDs, object IDs and methods in policies.
+WILDCARD = '*'
+
+
+class CompiledTokenPolicy(object):
+    """An API token policy compiled into a decision table.
+
+    This produces the same decisions as
+    :py:meth:`djblets.webapi.resources.mixins.api_tokens.
+    ResourceAPITokenMixin.is_resource_method_allowed`.
+
+    Compiled policies are stored on the token they were compiled from
+    (see :py:attr:`reviewboard.webapi.models.WebAPIToken.compiled_policy`),
+    and are cached along with it.
+    """
+
+    def __init__(self, policy):
+        """Initialize the compiled policy.
+
+        Args:
+            policy (dict):
+                The token's policy. This is expected to have passed
+                :py:meth:`~djblets.webapi.models.BaseWebAPIToken.
+                validate_policy`.
+        """
+        #: The policy this was compiled from.
+        self.policy = policy
+
+        #: The decision table.
+        #:
+        #: This maps ``(policy_id, method, object_id)`` to whether access is
+        #: allowed. The global rules use a ``policy_id`` and ``object_id`` of
+        #: ``*``.
+        self.rules = {}
+
+        resources_policy = (policy or {}).get('resources')
+
+        if not resources_policy:
+            return
+
+        for policy_id, resource_policy in six.iteritems(resources_policy):
+            if policy_id == WILDCARD:
+                self._add_rules(WILDCARD, WILDCARD, resource_policy)
+            elif resource_policy:
+                for object_id, sub_policy in six.iteritems(resource_policy):
+                    self._add_rules(policy_id, object_id, sub_policy)
+
+    def is_resource_method_allowed(self, policy_id, method, object_id):
+        """Return whether a method can be performed on a resource.
+
+        Args:
+            policy_id (unicode):
+                The policy ID of the resource.
+
+            method (unicode):
+                The HTTP method.
+
+            object_id (unicode):
+                The ID of the object being accessed, or ``None`` when
+                accessing a list resource.
+
+        Returns:
+            bool:
+            Whether the method is allowed.
+        """
+        rules = self.rules
+
+        if rules:
+            for key in ((policy_id, method, object_id),
+                        (policy_id, WILDCARD, object_id),
+                        (policy_id, method, WILDCARD),
+                        (policy_id, WILDCARD, WILDCARD),
+                        (WILDCARD, method, WILDCARD),
+                        (WILDCARD, WILDCARD, WILDCARD)):
+                try:
+                    return rules[key]
+                except KeyError:
+                    pass
+
+        return True
+
+    def _add_rules(self, policy_id, object_id, sub_policy):
+        """Add the rules from a policy section to the decision table.
+
+        Args:
+            policy_id (unicode):
+                The policy ID the section applies to.
+
+            object_id (unicode):
+                The object ID the section applies to.
+
+            sub_policy (dict):
+                The policy section, containing ``allow`` and/or ``block``
+                lists of methods.
+        """
+        if not sub_policy:
+            return
+
+        # Blocked methods take precedence, so they're added last. Anything
+        # that isn't a string can never match a method, so it's skipped.
+        for allowed, key in ((True, 'allow'), (False, 'block')):
+            for method in sub_policy.get(key, []):
+                if isinstance(method, six.string_types):
+                    self.rules[(policy_id, method, object_id)] = allowed